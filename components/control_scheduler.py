@@ -0,0 +1,135 @@
+import threading as worker_threads
+import time as timing
+from components import stage_timing as stage_timer
+
+CONTROL_RATE = 50.0   # Hz, regulation rate when control runs on its own thread
+
+
+class FixedRateScheduler:
+    """
+    Calls a tick function at a fixed rate on absolute deadlines, so the
+    cadence does not drift with how long each tick takes.
+    Tick k is due at start + k * period and must finish before tick k + 1
+    is due; a tick that overruns is counted as a missed deadline. Slots
+    that have passed entirely are skipped rather than run back to back,
+    so a stall never turns into a burst of stale commands.
+    The clock and sleep functions are injectable, which lets the
+    scheduler run against a fake clock without a thread.
+    """
+
+    def __init__(self, tick_function, rate=CONTROL_RATE, clock=timing.monotonic, sleep=None):
+        self.tick_function = tick_function
+        self.period = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.failure = None
+        self.jitter_histogram = stage_timer.LatencyHistogram()
+        self.work_histogram = stage_timer.LatencyHistogram()
+        self._stop_request = worker_threads.Event()
+        self._worker = None
+        self.reset()
+
+    def reset(self):
+        """
+        Restarts the schedule and clears the statistics.
+        """
+        self.next_due = None
+        self.last_tick = None
+        self.started_at = None
+        self.tick_count = 0
+        self.missed_deadlines = 0
+        self.skipped_ticks = 0
+        self.jitter_histogram.reset()
+        self.work_histogram.reset()
+
+    def _wait(self, duration):
+        if self.sleep is not None:
+            self.sleep(duration)
+        else:
+            self._stop_request.wait(duration)
+
+    def run_once(self):
+        """
+        Waits for the next due time and runs one tick.
+        The tick function receives the tick time and the seconds elapsed
+        since the previous tick (one period for the first tick).
+        """
+        now = self.clock()
+        if self.next_due is None:
+            self.next_due = now
+            self.started_at = now
+        if now < self.next_due:
+            self._wait(self.next_due - now)
+            now = self.clock()
+        self.jitter_histogram.record(int(max(now - self.next_due, 0.0) * 1e6))
+        elapsed = now - self.last_tick if self.last_tick is not None else self.period
+        self.last_tick = now
+        self.tick_function(now, elapsed)
+        finished = self.clock()
+        self.work_histogram.record(int((finished - now) * 1e6))
+        self.tick_count += 1
+        self.next_due += self.period
+        if finished > self.next_due:
+            self.missed_deadlines += 1
+            skipped = int((finished - self.next_due) / self.period)
+            self.skipped_ticks += skipped
+            self.next_due += skipped * self.period
+
+    def start(self):
+        """
+        Runs the schedule on a daemon thread until stop is called or a tick raises.
+        """
+        self.reset()
+        self.failure = None
+        self._stop_request.clear()
+        self._worker = worker_threads.Thread(target=self._run, name="control", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while not self._stop_request.is_set():
+            try:
+                self.run_once()
+            except Exception as error:
+                self.failure = error
+                print(f"Control tick failed: {error}")
+                break
+
+    def stop(self, timeout=1.0):
+        """
+        Ends the thread and waits for the tick in progress to finish.
+        Args:
+            timeout (float): Maximum wait in seconds.
+        """
+        self._stop_request.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def is_running(self):
+        """
+        Reports whether the scheduling thread is alive.
+        Returns:
+            bool: True while ticks are being issued.
+        """
+        return self._worker is not None and self._worker.is_alive()
+
+    def report_statistics(self):
+        """
+        Summarises the achieved cadence.
+        Returns:
+            dict: Tick count, achieved rate, missed deadlines, skipped ticks and
+                p50/p99/max start jitter and tick work in milliseconds.
+        """
+        running_time = self.last_tick - self.started_at if self.tick_count > 1 else 0.0
+        return {
+            "ticks": self.tick_count,
+            "target_rate": 1.0 / self.period,
+            "achieved_rate": (self.tick_count - 1) / running_time if running_time > 0 else 0.0,
+            "missed_deadlines": self.missed_deadlines,
+            "skipped_ticks": self.skipped_ticks,
+            "jitter_p50_ms": self.jitter_histogram.percentile(50) / 1000.0,
+            "jitter_p99_ms": self.jitter_histogram.percentile(99) / 1000.0,
+            "jitter_max_ms": self.jitter_histogram.maximum_value / 1000.0,
+            "work_p50_ms": self.work_histogram.percentile(50) / 1000.0,
+            "work_p99_ms": self.work_histogram.percentile(99) / 1000.0,
+        }
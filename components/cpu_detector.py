@@ -0,0 +1,220 @@
+import concurrent.futures
+import threading as worker_threads
+import time as timing
+import numpy as array_utils
+
+from components import detection_types
+
+DNN_INPUT_SIZE = (300, 300)          # SSD-MobileNet-v2 input resolution
+DNN_INPUT_SCALE = 1.0 / 127.5        # TensorFlow SSD preprocessing maps pixels to [-1, 1]
+DNN_INPUT_MEAN = (127.5, 127.5, 127.5)
+DNN_CONFIDENCE_THRESHOLD = 0.5       # same default threshold as detectNet
+DNN_WORKERS = 4                      # threads preparing and decoding frames around each batch
+DNN_OUTPUT_WIDTH = 7                 # DetectionOutput rows: image, class, confidence, left, top, right, bottom
+SYNTHETIC_FRAME_SIZE = (1280, 720)
+SYNTHETIC_FRAME_RATE = 30.0
+
+
+class OpenCVDetectionBackend:
+    """
+    Runs an SSD detector through OpenCV DNN on the CPU, with the same
+    detect(captured_image, window) interface as JetsonDetectionBackend.
+    detect_batch stacks several frames into one blob so the network runs
+    once per batch; resizing and normalising each frame before the forward
+    pass and decoding each frame's rows after it run on a thread pool, as
+    OpenCV releases the GIL in those calls. Detections come back as
+    DetectionBox records for every class, like detectNet, and are
+    filtered to people by the caller.
+    """
+
+    def __init__(self, model_path=None, config_path="", worker_count=DNN_WORKERS, input_size=DNN_INPUT_SIZE,
+                 confidence_threshold=DNN_CONFIDENCE_THRESHOLD, network=None):
+        if network is None:
+            import cv2 as vision_lib
+            network = vision_lib.dnn.readNet(model_path, config_path)
+        self.network = network
+        self.input_size = input_size
+        self.confidence_threshold = confidence_threshold
+        self.worker_count = worker_count
+        self.worker_pool = concurrent.futures.ThreadPoolExecutor(worker_count, thread_name_prefix="dnn")
+        self.forward_lock = worker_threads.Lock()
+        self.frames_per_second = 0.0
+        self.batch_count = 0
+        self.frame_count = 0
+        self.forward_time = 0.0
+        self.total_time = 0.0
+
+    def prepare_frame(self, captured_image, window=None):
+        """
+        Crops, resizes and normalises one frame into a network input blob.
+        Args:
+            captured_image (ndarray): BGR or BGRA frame.
+            window (tuple): (left, top, right, bottom) to crop, None for the full frame.
+        Returns:
+            tuple: Blob of shape (1, 3, height, width) and the (width, height) it covers.
+        """
+        import cv2 as vision_lib
+        if window is not None:
+            captured_image = captured_image[window[1]:window[3], window[0]:window[2]]
+        if captured_image.ndim == 3 and captured_image.shape[2] == 4:
+            captured_image = vision_lib.cvtColor(captured_image, vision_lib.COLOR_BGRA2BGR)
+        input_blob = vision_lib.dnn.blobFromImage(captured_image, DNN_INPUT_SCALE, self.input_size, DNN_INPUT_MEAN, swapRB=True)
+        return input_blob, (captured_image.shape[1], captured_image.shape[0])
+
+    def decode_detections(self, batch_index, output_rows, frame_size):
+        """
+        Converts the network rows belonging to one frame into detections.
+        Args:
+            batch_index (int): Position of the frame in the batch.
+            output_rows (ndarray): DetectionOutput rows of the whole batch, shape (N, 7).
+            frame_size (tuple): Width and height the coordinates are scaled to.
+        Returns:
+            list: DetectionBox records above the confidence threshold.
+        """
+        frame_rows = output_rows[(output_rows[:, 0] == batch_index) & (output_rows[:, 2] >= self.confidence_threshold)]
+        corners = array_utils.clip(frame_rows[:, 3:7], 0.0, 1.0) * array_utils.array(frame_size * 2, dtype=array_utils.float32)
+        return [detection_types.build_detection_box(left, top, right, bottom, class_id=int(class_id), confidence=float(confidence))
+                for (class_id, confidence), (left, top, right, bottom) in zip(frame_rows[:, 1:3], corners)]
+
+    def detect_batch(self, captured_images, windows=None):
+        """
+        Detects objects in several frames with a single forward pass.
+        Args:
+            captured_images (list): BGR or BGRA frames, any sizes.
+            windows (list): Optional crop window per frame.
+        Returns:
+            list: One list of DetectionBox records per frame, in window coordinates.
+        """
+        batch_started = timing.perf_counter()
+        if windows is None:
+            windows = [None] * len(captured_images)
+        prepared = list(self.worker_pool.map(self.prepare_frame, captured_images, windows))
+        batch_blob = array_utils.concatenate([input_blob for input_blob, frame_size in prepared])
+        forward_started = timing.perf_counter()
+        with self.forward_lock:
+            self.network.setInput(batch_blob)
+            network_output = self.network.forward()
+        self.forward_time += timing.perf_counter() - forward_started
+        output_rows = network_output.reshape(-1, DNN_OUTPUT_WIDTH)
+        detections = list(self.worker_pool.map(self.decode_detections, range(len(prepared)), [output_rows] * len(prepared),
+                                               [frame_size for input_blob, frame_size in prepared]))
+        batch_time = timing.perf_counter() - batch_started
+        self.total_time += batch_time
+        self.batch_count += 1
+        self.frame_count += len(captured_images)
+        self.frames_per_second = len(captured_images) / batch_time if batch_time > 0 else 0.0
+        return detections
+
+    def detect(self, captured_image, window=None):
+        """
+        Detects objects in a frame or in a window of it.
+        Args:
+            captured_image (ndarray): Full camera frame.
+            window (tuple): (left, top, right, bottom) in pixels, None for the full frame.
+        Returns:
+            list: Detections in the coordinates of the window.
+        """
+        return self.detect_batch([captured_image], [window])[0]
+
+    def network_speed(self):
+        """
+        Obtains the throughput of the last batch.
+        Returns:
+            float: Frames per second.
+        """
+        return self.frames_per_second
+
+    def report_statistics(self):
+        """
+        Summarises the work done so far.
+        Returns:
+            dict: Batches, frames, frames per second overall and the share of time spent in the forward pass.
+        """
+        return {
+            "batches": self.batch_count,
+            "frames": self.frame_count,
+            "frames_per_second": self.frame_count / self.total_time if self.total_time > 0 else 0.0,
+            "forward_share": self.forward_time / self.total_time if self.total_time > 0 else 0.0,
+        }
+
+    def close(self):
+        """
+        Stops the worker threads.
+        """
+        self.worker_pool.shutdown(wait=True)
+
+
+class VideoFileSource:
+    """
+    Reads frames from a video file with the Capture/GetWidth/GetHeight/Close
+    interface of jetson_utils.videoSource.
+    """
+
+    def __init__(self, video_path, loop=False):
+        import cv2 as vision_lib
+        self.video_path = video_path
+        self.loop = loop
+        self.capture_device = vision_lib.VideoCapture(video_path)
+        if not self.capture_device.isOpened():
+            raise IOError(f"Cannot open video {video_path}")
+        self.width = int(self.capture_device.get(vision_lib.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture_device.get(vision_lib.CAP_PROP_FRAME_HEIGHT))
+
+    def Capture(self, *args, **kwargs):
+        import cv2 as vision_lib
+        frame_read, frame = self.capture_device.read()
+        if not frame_read and self.loop:
+            self.capture_device.set(vision_lib.CAP_PROP_POS_FRAMES, 0)
+            frame_read, frame = self.capture_device.read()
+        return frame if frame_read else None
+
+    def GetWidth(self):
+        return self.width
+
+    def GetHeight(self):
+        return self.height
+
+    def Close(self):
+        self.capture_device.release()
+
+
+class SyntheticVideoSource:
+    """
+    Generates frames of a dark, person-sized block walking across a fixed
+    textured background, with the videoSource interface. Paced to the
+    frame rate unless the rate is 0.
+    """
+
+    def __init__(self, frame_size=SYNTHETIC_FRAME_SIZE, frame_rate=SYNTHETIC_FRAME_RATE, seed=0):
+        self.width, self.height = frame_size
+        self.frame_interval = 1.0 / frame_rate if frame_rate > 0 else 0.0
+        self.frame_index = 0
+        self.next_frame_time = None
+        random_state = array_utils.random.RandomState(seed)
+        self.background = random_state.randint(60, 200, (self.height, self.width, 3)).astype(array_utils.uint8)
+
+    def Capture(self, *args, **kwargs):
+        if self.frame_interval > 0:
+            if self.next_frame_time is None:
+                self.next_frame_time = timing.monotonic()
+            timing.sleep(max(0.0, self.next_frame_time - timing.monotonic()))
+            self.next_frame_time += self.frame_interval
+        person_height = self.height // 2
+        person_width = person_height // 3
+        travel = self.width - person_width
+        phase = (self.frame_index * 8) % (2 * travel)
+        left = phase if phase < travel else 2 * travel - phase
+        top = (self.height - person_height) // 2
+        frame = self.background.copy()
+        frame[top:top + person_height, left:left + person_width] = 20
+        self.frame_index += 1
+        return frame
+
+    def GetWidth(self):
+        return self.width
+
+    def GetHeight(self):
+        return self.height
+
+    def Close(self):
+        pass
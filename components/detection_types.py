@@ -0,0 +1,30 @@
+import collections
+
+PERSON_CLASS_ID = 1
+
+# Mirrors the attributes of jetson_inference detections used by the follow loop
+DetectionBox = collections.namedtuple("DetectionBox", [
+    "Left", "Top", "Right", "Bottom",
+    "Center", "Width", "Height",
+    "ClassID", "Confidence", "TrackID",
+])
+
+
+def build_detection_box(left, top, right, bottom, class_id=PERSON_CLASS_ID, confidence=1.0, track_id=-1):
+    """
+    Creates a detection with the derived center and size filled in.
+    Args:
+        left (float): Left edge in pixels.
+        top (float): Top edge in pixels.
+        right (float): Right edge in pixels.
+        bottom (float): Bottom edge in pixels.
+        class_id (int): Detector class, 1 for a person.
+        confidence (float): Detection confidence (0-1).
+        track_id (int): Persistent track identifier, -1 if untracked.
+    Returns:
+        DetectionBox: Detection record.
+    """
+    left, top, right, bottom = float(left), float(top), float(right), float(bottom)
+    return DetectionBox(left, top, right, bottom,
+                        ((left + right) / 2.0, (top + bottom) / 2.0), right - left, bottom - top,
+                        class_id, confidence, track_id)
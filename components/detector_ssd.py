@@ -1,20 +1,300 @@
-import jetson_inference as neural_processor
-import jetson_utils as camera_handler
-import cv2 as vision_lib
+import time as timing
 import numpy as array_utils
+from components import stage_timing as stage_timer
+from components import inference_scheduler as inference_schedule
+from components import detection_types
+from components import cpu_detector
+from components import multi_camera
+
+ROI_PADDING = 0.6            # fraction of the target box size added on every side of the window
+ROI_MIN_SIZE = 300           # windows are never smaller than the SSD input resolution
+ROI_SIZE_STEP = 32           # window sizes are rounded up to this step so crop buffers can be reused
+ROI_REFRESH_INTERVAL = 30    # frames between forced full-frame detections
+ROI_EDGE_MARGIN = 2          # detections this close (pixels) to an inner window edge are treated as cut off
+DETECTION_NETWORK = "ssd-mobilenet-v2"
+CAMERA_URI = "csi://0"
+SYNTHETIC_URI = "synthetic://"
+DETECTION_BACKENDS = ("jetson", "opencv")   # detectNet on the Jetson GPU, OpenCV DNN on any CPU
 
 recognition_engine = None
+detection_backend = None
 image_source = None
+inference_scheduler = None
+region_detector = None
+multi_camera_detector = None
+stream_detections = {}       # newest StreamDetections of every camera, by stream name
+engine_cache = {}            # detection backends already built in this process, by backend and network
+
+
+class JetsonDetectionBackend:
+    """
+    Runs detectNet on a full cudaImage or on a cropped window of it.
+    Crop buffers are allocated once per window size and reused.
+    """
+
+    def __init__(self, network_name=DETECTION_NETWORK):
+        import jetson_inference as neural_processor
+        self.network = neural_processor.detectNet(network_name)
+        self.crop_buffers = {}
+
+    def detect(self, captured_image, window=None):
+        """
+        Detects objects in a frame or in a window of it.
+        Args:
+            captured_image (cudaImage): Full camera frame.
+            window (tuple): (left, top, right, bottom) in pixels, None for the full frame.
+        Returns:
+            list: Detections in the coordinates of the window.
+        """
+        import jetson_utils as camera_handler
+        if window is None:
+            return self.network.Detect(captured_image)
+        window_size = (window[2] - window[0], window[3] - window[1])
+        crop_buffer = self.crop_buffers.get(window_size)
+        if crop_buffer is None:
+            crop_buffer = camera_handler.cudaAllocMapped(width=window_size[0], height=window_size[1], format=captured_image.format)
+            self.crop_buffers[window_size] = crop_buffer
+        camera_handler.cudaCrop(captured_image, crop_buffer, window)
+        return self.network.Detect(crop_buffer)
+
+    def detect_batch(self, captured_images, windows=None):
+        """
+        Detects objects in several frames. detectNet takes one image at a
+        time, so this runs one inference per frame: N cameras cost N
+        forward passes, and each added camera lowers the batch rate as
+        much as with separate calls. Only the OpenCV backend batches.
+        Args:
+            captured_images (list): Full camera frames.
+            windows (list): Optional crop window per frame.
+        Returns:
+            list: One list of detections per frame, in window coordinates.
+        """
+        if windows is None:
+            windows = [None] * len(captured_images)
+        return [self.detect(captured_image, window) for captured_image, window in zip(captured_images, windows)]
+
+    def network_speed(self):
+        """
+        Obtains the network throughput of the last detection.
+        Returns:
+            float: Frames per second.
+        """
+        return self.network.GetNetworkFPS()
+
+
+def map_detection_to_frame(detection, window):
+    """
+    Moves a detection from window coordinates into full-frame coordinates.
+    Args:
+        detection: Detection with Left/Top/Right/Bottom/ClassID/Confidence attributes.
+        window (tuple): (left, top, right, bottom) the detection was found in.
+    Returns:
+        DetectionBox: Detection in full-frame pixels.
+    """
+    return detection_types.build_detection_box(detection.Left + window[0], detection.Top + window[1],
+                                               detection.Right + window[0], detection.Bottom + window[1],
+                                               class_id=detection.ClassID, confidence=getattr(detection, "Confidence", 1.0))
+
+
+def is_cut_by_window(detection, window, image_size, margin=ROI_EDGE_MARGIN):
+    """
+    Checks whether a window-coordinate detection touches a window edge that
+    lies inside the frame, i.e. whether the crop cut the object off.
+    Args:
+        detection: Detection with Left/Top/Right/Bottom attributes in window coordinates.
+        window (tuple): (left, top, right, bottom) in full-frame pixels.
+        image_size (tuple): Full frame width and height.
+        margin (float): Distance in pixels counted as touching.
+    Returns:
+        bool: True if the detection is truncated by the crop.
+    """
+    window_width, window_height = window[2] - window[0], window[3] - window[1]
+    return ((window[0] > 0 and detection.Left <= margin) or
+            (window[1] > 0 and detection.Top <= margin) or
+            (window[2] < image_size[0] and detection.Right >= window_width - margin) or
+            (window[3] < image_size[1] and detection.Bottom >= window_height - margin))
+
+
+class RegionOfInterestDetector:
+    """
+    Detects inside a padded window around the followed person instead of
+    the whole frame. Falls back to the full frame when the window holds no
+    person, when no target is known and every refresh_interval frames so
+    people entering the view are still found. People cut off by a window
+    edge are dropped, since their truncated boxes slide with the window.
+    """
+
+    def __init__(self, backend, image_size, padding=ROI_PADDING, refresh_interval=ROI_REFRESH_INTERVAL, min_size=ROI_MIN_SIZE):
+        self.backend = backend
+        self.image_size = image_size
+        self.padding = padding
+        self.refresh_interval = refresh_interval
+        self.min_size = min_size
+        self.focus_box = None
+        self.frames_since_full = 0
+        self.full_detections = 0
+        self.window_detections = 0
+        self.fallbacks = 0
+        self.window_area = 0.0
+        self.full_time = 0.0
+        self.window_time = 0.0
+
+    def focus_on(self, target):
+        """
+        Sets the box the next window is centered on.
+        Args:
+            target: Detection with Left/Top/Right/Bottom attributes, None after the target was lost.
+        """
+        self.focus_box = None if target is None else (target.Left, target.Top, target.Right, target.Bottom)
+
+    def compute_window(self, box):
+        """
+        Builds the padded, size-quantised window around a box, kept inside the frame.
+        Args:
+            box (tuple): (left, top, right, bottom) of the target.
+        Returns:
+            tuple: Integer (left, top, right, bottom) window.
+        """
+        image_width, image_height = self.image_size
+        box_width, box_height = box[2] - box[0], box[3] - box[1]
+        window_width = max(box_width * (1.0 + 2.0 * self.padding), self.min_size)
+        window_height = max(box_height * (1.0 + 2.0 * self.padding), self.min_size)
+        window_width = min(int(-(-window_width // ROI_SIZE_STEP) * ROI_SIZE_STEP), image_width)
+        window_height = min(int(-(-window_height // ROI_SIZE_STEP) * ROI_SIZE_STEP), image_height)
+        center_x, center_y = (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+        left = int(min(max(center_x - window_width / 2.0, 0), image_width - window_width))
+        top = int(min(max(center_y - window_height / 2.0, 0), image_height - window_height))
+        return left, top, left + window_width, top + window_height
+
+    def detect(self, captured_image):
+        """
+        Detects objects around the focus box, or in the full frame when required.
+        Args:
+            captured_image: Frame handed to the backend.
+        Returns:
+            list: Detections in full-frame coordinates.
+        """
+        if self.focus_box is not None and self.frames_since_full < self.refresh_interval:
+            window = self.compute_window(self.focus_box)
+            window_started = stage_timer.stage_start()
+            window_clock = timing.perf_counter()
+            window_results = [map_detection_to_frame(result, window) for result in self.backend.detect(captured_image, window)
+                              if not is_cut_by_window(result, window, self.image_size)]
+            self.window_time += timing.perf_counter() - window_clock
+            stage_timer.stage_finish("detect_roi", window_started)
+            self.window_detections += 1
+            self.window_area += (window[2] - window[0]) * (window[3] - window[1]) / float(self.image_size[0] * self.image_size[1])
+            self.frames_since_full += 1
+            if any(result.ClassID == detection_types.PERSON_CLASS_ID for result in window_results):
+                return window_results
+            self.fallbacks += 1
+        full_clock = timing.perf_counter()
+        full_results = self.backend.detect(captured_image)
+        self.full_time += timing.perf_counter() - full_clock
+        self.full_detections += 1
+        self.frames_since_full = 0
+        return full_results
+
+    def report_statistics(self):
+        """
+        Summarises window and full-frame detection.
+        Returns:
+            dict: Detection counts, fallbacks to the full frame, mean window
+            size as a fraction of the frame and mean latency per mode in milliseconds.
+        """
+        return {
+            "full_detections": self.full_detections,
+            "window_detections": self.window_detections,
+            "fallbacks": self.fallbacks,
+            "mean_window_fraction": self.window_area / self.window_detections if self.window_detections else 0.0,
+            "mean_full_ms": self.full_time * 1000.0 / self.full_detections if self.full_detections else 0.0,
+            "mean_window_ms": self.window_time * 1000.0 / self.window_detections if self.window_detections else 0.0,
+        }
+
 
 def prepare_detection_system():
     """
     Sets up the neural network and camera for object recognition.
     """
-    global recognition_engine, image_source
-    recognition_engine = neural_processor.detectNet("ssd-mobilenet-v2")
-    image_source = camera_handler.videoSource("csi://0")
+    load_detection_network()
+    open_image_source()
     print("Recognition system ready")
 
+def load_detection_network(network_name=DETECTION_NETWORK, backend_name="jetson", network_config=""):
+    """
+    Builds the detection network, reusing one already built in this process.
+    TensorRT keeps the serialized engine next to the model, so only the first
+    start after a model change pays for the engine build; this cache also
+    skips deserialising it again when the system is restarted in-process.
+    Args:
+        network_name (str): detectNet model name, or the model file for the OpenCV backend.
+        backend_name (str): One of DETECTION_BACKENDS.
+        network_config (str): Model configuration file for the OpenCV backend (e.g. a .pbtxt).
+    Returns:
+        bool: True if the network came from the cache.
+    """
+    global recognition_engine, detection_backend
+    if backend_name not in DETECTION_BACKENDS:
+        raise ValueError(f"Unknown detection backend '{backend_name}', expected one of {DETECTION_BACKENDS}")
+    cache_key = (backend_name, network_name)
+    was_cached = cache_key in engine_cache
+    if not was_cached:
+        if backend_name == "opencv":
+            engine_cache[cache_key] = cpu_detector.OpenCVDetectionBackend(network_name, network_config)
+        else:
+            engine_cache[cache_key] = JetsonDetectionBackend(network_name)
+    detection_backend = engine_cache[cache_key]
+    recognition_engine = detection_backend.network
+    return was_cached
+
+def open_image_source(camera_uri=CAMERA_URI, backend_name="jetson"):
+    """
+    Opens the camera stream.
+    Args:
+        camera_uri (str): jetson_utils video source URI; for the OpenCV backend a
+            video file path or SYNTHETIC_URI.
+        backend_name (str): One of DETECTION_BACKENDS.
+    """
+    global image_source
+    image_source = build_image_source(camera_uri, backend_name)
+
+def build_image_source(camera_uri, backend_name="jetson"):
+    """
+    Creates a video source for a camera URI.
+    Args:
+        camera_uri (str): jetson_utils video source URI; for the OpenCV backend a
+            video file path or SYNTHETIC_URI.
+        backend_name (str): One of DETECTION_BACKENDS.
+    Returns:
+        Video source with Capture, GetWidth, GetHeight and Close.
+    """
+    if backend_name == "jetson":
+        import jetson_utils as camera_handler
+        return camera_handler.videoSource(camera_uri)
+    if camera_uri == SYNTHETIC_URI:
+        return cpu_detector.SyntheticVideoSource()
+    return cpu_detector.VideoFileSource(camera_uri.replace("file://", "", 1))
+
+def open_camera_streams(camera_uris, backend_name="jetson", capture_mode="synchronized"):
+    """
+    Opens several cameras whose frames are detected together in one batch.
+    The first camera is the primary: it paces the batches, and its frames
+    and detections are the ones retrieve_detected_entities returns.
+    Args:
+        camera_uris (dict): Stream name mapped to camera URI, primary first.
+        backend_name (str): One of DETECTION_BACKENDS.
+        capture_mode (str): One of multi_camera.CAPTURE_MODES.
+    """
+    global image_source, multi_camera_detector
+    camera_streams = [multi_camera.CameraStream(stream_name, build_image_source(camera_uri, backend_name))
+                      for stream_name, camera_uri in camera_uris.items()]
+    image_source = camera_streams[0].image_source
+    multi_camera_detector = multi_camera.MultiCameraDetector(camera_streams, detect_entities_in_frames, capture_mode)
+    multi_camera_detector.start()
+    print(f"Cameras {', '.join(camera_uris)} opened, {capture_mode} capture")
+    if backend_name == "jetson":
+        print("detectNet runs once per camera: every added camera adds a full inference to each batch")
+
 def get_image_resolution():
     """
     Obtains the resolution of the captured image.
@@ -23,24 +303,204 @@ def get_image_resolution():
     """
     return image_source.GetWidth(), image_source.GetHeight()
 
+def enable_adaptive_inference(frame_budget, max_interval=inference_schedule.SCHEDULE_MAX_INTERVAL):
+    """
+    Runs the network only every few frames and propagates the boxes in between.
+    Args:
+        frame_budget (float): Per-frame processing budget in seconds.
+        max_interval (int): Upper bound on frames between full detections.
+    """
+    global inference_scheduler
+    inference_scheduler = inference_schedule.AdaptiveInferenceScheduler(detect_entities_in_frame, frame_budget, max_interval)
+    print(f"Adaptive inference enabled, up to {max_interval} frames between detections")
+
+def enable_region_detection(refresh_interval=ROI_REFRESH_INTERVAL, padding=ROI_PADDING):
+    """
+    Detects in a window around the followed person instead of the full frame.
+    Args:
+        refresh_interval (int): Frames between forced full-frame detections.
+        padding (float): Fraction of the target box size added on every side.
+    """
+    global region_detector
+    region_detector = RegionOfInterestDetector(detection_backend, get_image_resolution(), padding, refresh_interval)
+    print(f"Region detection enabled, full frame every {refresh_interval} frames")
+
+def focus_detection(target):
+    """
+    Centers the next detection window on the followed person.
+    Args:
+        target: Locked target box, None when it was lost.
+    """
+    if region_detector is not None:
+        region_detector.focus_on(target)
+
+def report_region_detection():
+    """
+    Obtains the region detection statistics.
+    Returns:
+        dict: Window and full-frame statistics, or None when disabled.
+    """
+    if region_detector is None:
+        return None
+    return region_detector.report_statistics()
+
+def report_multi_camera():
+    """
+    Obtains the batching and per-camera statistics.
+    Returns:
+        dict: Multi-camera statistics, or None with a single camera.
+    """
+    if multi_camera_detector is None:
+        return None
+    return multi_camera_detector.report_statistics()
+
+def get_stream_detections(stream_name):
+    """
+    Obtains the newest detections of one camera.
+    Args:
+        stream_name (str): Name given to open_camera_streams.
+    Returns:
+        StreamDetections: Humans, frame and capture time, or None before its first detection.
+    """
+    return stream_detections.get(stream_name)
+
+def report_inference_schedule():
+    """
+    Obtains the adaptive inference statistics.
+    Returns:
+        dict: Scheduler statistics, or None when every frame is detected.
+    """
+    if inference_scheduler is None:
+        return None
+    return inference_scheduler.report_statistics()
+
 def terminate_image_source():
     """
     Shuts down the camera connection.
     """
-    image_source.Close()
+    if multi_camera_detector is None:
+        image_source.Close()
+        return
+    multi_camera_detector.stop()
+    for camera_stream in multi_camera_detector.streams:
+        camera_stream.image_source.Close()
+
+def capture_image_frame():
+    """
+    Captures the next frame from the camera without running detection.
+    Returns:
+        tuple: Captured image in GPU memory and its capture time (time.monotonic seconds).
+    """
+    stage_started = stage_timer.stage_start()
+    captured_image = image_source.Capture()
+    # Capture blocks until the frame is complete, so its return is the closest monotonic stamp available
+    captured_at = timing.monotonic()
+    stage_timer.stage_finish("capture", stage_started)
+    return captured_image, captured_at
+
+def detect_entities_in_frame(captured_image):
+    """
+    Runs the recognition network on a previously captured frame.
+    Args:
+        captured_image (cudaImage): Frame returned by capture_image_frame.
+    Returns:
+        tuple: List of detected humans and processing speed.
+    """
+    stage_started = stage_timer.stage_start()
+    if region_detector is not None:
+        recognition_results = region_detector.detect(captured_image)
+    else:
+        recognition_results = detection_backend.detect(captured_image)
+    stage_timer.stage_finish("detect", stage_started)
+    detected_humans = select_humans(recognition_results)
+    processing_speed = detection_backend.network_speed()
+
+    return detected_humans, processing_speed
+
+def detect_entities_in_frames(captured_images):
+    """
+    Runs the recognition network on several frames at once, e.g. one per camera.
+    Args:
+        captured_images (list): Frames returned by capture_image_frame.
+    Returns:
+        tuple: List of detected humans per frame and processing speed.
+    """
+    stage_started = stage_timer.stage_start()
+    recognition_results = detection_backend.detect_batch(captured_images)
+    stage_timer.stage_finish("detect", stage_started)
+    return [select_humans(frame_results) for frame_results in recognition_results], detection_backend.network_speed()
+
+def select_humans(recognition_results):
+    """
+    Keeps the detections of people.
+    Args:
+        recognition_results (list): Detections of any class.
+    Returns:
+        list: Detections with ClassID equal to the person class.
+    """
+    return [result for result in recognition_results if result.ClassID == detection_types.PERSON_CLASS_ID]
+
+def detect_scheduled_entities(captured_image, image_data):
+    """
+    Obtains the humans of a frame through the adaptive scheduler when it is
+    enabled, or by running the network otherwise.
+    Args:
+        captured_image (cudaImage): Frame returned by capture_image_frame.
+        image_data (ndarray): The same frame returned by convert_frame_to_array.
+    Returns:
+        tuple: List of detected humans and processing speed.
+    """
+    if inference_scheduler is None:
+        return detect_entities_in_frame(captured_image)
+    return inference_scheduler.process_frame(captured_image, image_data)
+
+def convert_frame_to_array(captured_image):
+    """
+    Maps a captured frame into a NumPy array for OpenCV processing.
+    Args:
+        captured_image (cudaImage): Frame returned by capture_image_frame.
+    Returns:
+        ndarray: Image data.
+    """
+    if isinstance(captured_image, array_utils.ndarray):
+        return captured_image
+    import jetson_utils as camera_handler
+    stage_started = stage_timer.stage_start()
+    image_data = camera_handler.cudaToNumpy(captured_image)
+    stage_timer.stage_finish("cuda_to_numpy", stage_started)
+    return image_data
 
 def retrieve_detected_entities():
     """
     Detects objects in the current image frame.
     Returns:
-        tuple: List of detected humans, processing speed, and image data.
+        tuple: List of detected humans, processing speed, image data and capture time.
     """
-    detected_humans = []
-    captured_image = image_source.Capture()
-    recognition_results = recognition_engine.Detect(captured_image)
-    for result in recognition_results:
-        if result.ClassID == 1:
-            detected_humans.append(result)
-    processing_speed = recognition_engine.GetNetworkFPS()
+    if multi_camera_detector is not None:
+        return retrieve_camera_detections()
+    captured_image, captured_at = capture_image_frame()
+    if inference_scheduler is not None:
+        image_data = convert_frame_to_array(captured_image)
+        detected_humans, processing_speed = detect_scheduled_entities(captured_image, image_data)
+        return detected_humans, processing_speed, image_data, captured_at
+    detected_humans, processing_speed = detect_entities_in_frame(captured_image)
+
+    return detected_humans, processing_speed, convert_frame_to_array(captured_image), captured_at
 
-    return detected_humans, processing_speed, camera_handler.cudaToNumpy(captured_image)
\ No newline at end of file
+def retrieve_camera_detections():
+    """
+    Detects objects in the next frames of all cameras with one batched call.
+    Detections of every camera are kept for get_stream_detections.
+    Returns:
+        tuple: Detected humans, processing speed, image data and capture time of the primary camera.
+    """
+    primary_name = multi_camera_detector.primary_stream.stream_name
+    batch_detections = {}
+    while primary_name not in batch_detections:
+        if not multi_camera_detector.is_capturing():
+            raise RuntimeError(f"Camera {primary_name} stopped capturing")
+        batch_detections = multi_camera_detector.detect_once()
+    stream_detections.update(batch_detections)
+    primary_detections = batch_detections[primary_name]
+    return (primary_detections.humans, multi_camera_detector.processing_speed,
+            convert_frame_to_array(primary_detections.image), primary_detections.captured_at)
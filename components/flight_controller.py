@@ -1,6 +1,10 @@
-from logging import record_log
 from components import uav_interface as uav_system
-from simple_pid import PIDRegulator
+from components import flight_log as flight_recorder
+from components import stage_timing as stage_timer
+from components import control_scheduler as control_timing
+from simple_pid import PID as PIDRegulator
+import json
+import threading as worker_threads
 import time as clock
 
 ACTIVATE_PID_ROTATION = True
@@ -17,6 +21,15 @@ STEERING_PROPORTIONAL = 0.2
 STEERING_INTEGRAL = 0
 STEERING_DERIVATIVE = 0
 
+NOT_REGULATED = float("nan")   # logged for a channel that was not regulated in a tick
+
+LATENCY_NOMINAL_DELAY = 0.08    # capture-to-command delay (seconds) the gains above were tuned at
+LATENCY_MIN_GAIN_SCALE = 0.4    # gain scheduling never cuts P and D below this fraction
+LATENCY_COMPENSATION_MODES = ("predict", "gains", "both", "off")
+
+CONTROL_STALE_TIMEOUT = 0.5       # seconds without a fresh estimate after which the control thread stops steering
+CONTROL_MAX_EXTRAPOLATION = 0.2   # longest span (seconds) an estimate is extrapolated by the control thread
+
 is_regulation_enabled = True
 rotation_regulator = None
 steering_regulator = None
@@ -26,31 +39,112 @@ rotation_input_data = 0
 velocity_input_data = 0
 is_regulation_enabled = True
 
-rotation_log_file = None
-velocity_log_file = None
+phase = "launch"
+lidar_alignment = flight_recorder.LIDAR_ALIGNMENT_UNKNOWN
+flight_data_log = None
+latency_compensation = "predict"
+nominal_control_delay = LATENCY_NOMINAL_DELAY
+rotation_measured_at = None
+velocity_measured_at = None
+rotation_base_tunings = None
+steering_base_tunings = None
+control_gain_scale = 1.0
+control_delay_histogram = stage_timer.LatencyHistogram()
+rotation_input_rate = 0.0
+velocity_input_rate = 0.0
+rotation_estimated_at = None
+velocity_estimated_at = None
+control_input_lock = worker_threads.Lock()
+control_scheduler = None
 
-def configure_regulation_system(method):
+def load_gain_set(gains_path, choice=0):
+    """
+    Reads gains chosen by the gain tuner.
+    Args:
+        gains_path (str): JSON file written by gain_tuner.save_gain_set.
+        choice (int): Position in each channel's Pareto set, 0 for the most balanced gains.
+    Returns:
+        dict: Channel name ('rotation', 'steering') mapped to (P, I, D, output limit).
+    """
+    with open(gains_path) as gains_file:
+        stored_gains = json.load(gains_file)
+    gain_set = {}
+    for channel in ("rotation", "steering"):
+        if stored_gains.get(channel):
+            pareto_set = stored_gains[channel]["pareto"]
+            entry = pareto_set[min(choice, len(pareto_set) - 1)]
+            gain_set[channel] = (entry["proportional"], entry["integral"], entry["derivative"], entry["output_limit"])
+    return gain_set
+
+def configure_regulation_system(method, gain_set=None):
     """
     Sets up the regulation system for rotation and steering.
     Args:
         method (str): Regulation method ('PID' or 'Simple').
+        gain_set (dict): Channel gains returned by load_gain_set, replacing the
+            constants above for the channels it contains.
     """
-    global steering_regulator, rotation_regulator
+    global steering_regulator, rotation_regulator, rotation_base_tunings, steering_base_tunings, control_gain_scale
+    global active_rotation_value, active_steering_value, rotation_input_data, velocity_input_data
+    global rotation_measured_at, velocity_measured_at, rotation_input_rate, velocity_input_rate
+    global rotation_estimated_at, velocity_estimated_at
 
     print("Preparing regulation system")
 
+    rotation_gains = (ROTATION_PROPORTIONAL, ROTATION_INTEGRAL, ROTATION_DERIVATIVE, ROTATION_LIMIT)
+    steering_gains = (STEERING_PROPORTIONAL, STEERING_INTEGRAL, STEERING_DERIVATIVE, VELOCITY_LIMIT)
+    if gain_set is not None:
+        rotation_gains = gain_set.get("rotation", rotation_gains)
+        steering_gains = gain_set.get("steering", steering_gains)
+        print(f"Tuned gains: rotation {rotation_gains}, steering {steering_gains}")
+
     if method == 'PID':
-        rotation_regulator = PIDRegulator(ROTATION_PROPORTIONAL, ROTATION_INTEGRAL, ROTATION_DERIVATIVE, setpoint=0)
-        rotation_regulator.output_limits = (-ROTATION_LIMIT, ROTATION_LIMIT)
-        steering_regulator = PIDRegulator(STEERING_PROPORTIONAL, STEERING_INTEGRAL, STEERING_DERIVATIVE, setpoint=0)
-        steering_regulator.output_limits = (-VELOCITY_LIMIT, VELOCITY_LIMIT)
+        rotation_regulator = PIDRegulator(rotation_gains[0], rotation_gains[1], rotation_gains[2], setpoint=0)
+        rotation_regulator.output_limits = (-rotation_gains[3], rotation_gains[3])
+        steering_regulator = PIDRegulator(steering_gains[0], steering_gains[1], steering_gains[2], setpoint=0)
+        steering_regulator.output_limits = (-steering_gains[3], steering_gains[3])
         print("PID regulation configured")
     else:
-        rotation_regulator = PIDRegulator(ROTATION_PROPORTIONAL, 0, 0, setpoint=0)
-        rotation_regulator.output_limits = (-ROTATION_LIMIT, ROTATION_LIMIT)
-        steering_regulator = PIDRegulator(STEERING_PROPORTIONAL, 0, 0, setpoint=0)
-        steering_regulator.output_limits = (-VELOCITY_LIMIT, VELOCITY_LIMIT)
+        rotation_regulator = PIDRegulator(rotation_gains[0], 0, 0, setpoint=0)
+        rotation_regulator.output_limits = (-rotation_gains[3], rotation_gains[3])
+        steering_regulator = PIDRegulator(steering_gains[0], 0, 0, setpoint=0)
+        steering_regulator.output_limits = (-steering_gains[3], steering_gains[3])
         print("Simple regulation configured")
+    rotation_base_tunings = rotation_regulator.tunings
+    steering_base_tunings = steering_regulator.tunings
+    control_gain_scale = 1.0
+    # The new regulators start from no deviation rather than the last inputs of an earlier flight
+    with control_input_lock:
+        active_rotation_value, active_steering_value = 0, 0
+        rotation_input_data, velocity_input_data = 0, 0
+        rotation_measured_at, velocity_measured_at = None, None
+        rotation_input_rate, velocity_input_rate = 0.0, 0.0
+        rotation_estimated_at, velocity_estimated_at = None, None
+
+def configure_latency_compensation(mode, nominal_delay=LATENCY_NOMINAL_DELAY):
+    """
+    Selects how the measured capture-to-command delay is compensated.
+    Args:
+        mode (str): 'predict' extrapolates the target state to the command time,
+            'gains' scales P and D down when the delay exceeds nominal_delay,
+            'both' does both and 'off' only records the delay.
+        nominal_delay (float): Delay in seconds the gains were tuned at.
+    """
+    global latency_compensation, nominal_control_delay
+    if mode not in LATENCY_COMPENSATION_MODES:
+        raise ValueError(f"Unknown latency compensation '{mode}', expected one of {LATENCY_COMPENSATION_MODES}")
+    latency_compensation = mode
+    nominal_control_delay = nominal_delay
+    control_delay_histogram.reset()
+    print(f"Latency compensation: {mode}, nominal delay {round(nominal_delay * 1000)} ms")
+
+def predicts_measurement_delay():
+    """
+    Reports whether measurements should be extrapolated to the command time.
+    Returns:
+        bool: True in 'predict' and 'both' modes.
+    """
+    return latency_compensation in ("predict", "both")
 
 def activate_uav_connection(uav_endpoint):
     """
@@ -58,7 +152,29 @@ def activate_uav_connection(uav_endpoint):
     Args:
         uav_endpoint (str): Connection endpoint for the UAV.
     """
-    uav_system.connect_uav(uav_endpoint)
+    uav_system.establish_uav_connection(uav_endpoint)
+
+def deactivate_uav_connection():
+    """
+    Closes the connection to the UAV.
+    """
+    uav_system.sever_uav_connection()
+
+def subscribe_telemetry(callback):
+    """
+    Calls a function with every UAV telemetry update.
+    Args:
+        callback (callable): Function taking a TelemetrySnapshot, run on the telemetry thread.
+    """
+    uav_system.subscribe_telemetry(callback)
+
+def fetch_yaw_rate():
+    """
+    Obtains the UAV yaw rate from telemetry.
+    Returns:
+        float: Yaw rate in rad/s, positive clockwise.
+    """
+    return uav_system.query_yaw_rate()
 
 def fetch_rotation_value():
     """
@@ -68,14 +184,21 @@ def fetch_rotation_value():
     """
     return active_rotation_value
 
-def set_horizontal_input(new_horizontal_input):
+def set_horizontal_input(new_horizontal_input, measured_at=None, input_rate=0.0, estimated_at=None):
     """
     Sets the horizontal input for rotation regulation.
     Args:
         new_horizontal_input (float): Horizontal deviation value.
+        measured_at (float): Capture time (time.monotonic) of the frame it came from.
+        input_rate (float): Rate of change of the deviation per second, used by the fixed-rate control thread.
+        estimated_at (float): Time the deviation refers to, measured_at if omitted.
     """
-    global rotation_input_data
-    rotation_input_data = new_horizontal_input
+    global rotation_input_data, rotation_measured_at, rotation_input_rate, rotation_estimated_at
+    with control_input_lock:
+        rotation_input_data = new_horizontal_input
+        rotation_measured_at = measured_at
+        rotation_input_rate = input_rate
+        rotation_estimated_at = estimated_at if estimated_at is not None else measured_at
 
 def fetch_velocity_command():
     """
@@ -85,14 +208,55 @@ def fetch_velocity_command():
     """
     return active_steering_value
 
-def set_distance_input(new_distance_input):
+def set_distance_input(new_distance_input, measured_at=None, input_rate=0.0, estimated_at=None):
     """
     Sets the distance input for velocity regulation.
     Args:
         new_distance_input (float): Distance deviation value.
+        measured_at (float): Time (time.monotonic) of the measurement it came from.
+        input_rate (float): Rate of change of the deviation per second, used by the fixed-rate control thread.
+        estimated_at (float): Time the deviation refers to, measured_at if omitted.
+    """
+    global velocity_input_data, velocity_measured_at, velocity_input_rate, velocity_estimated_at
+    with control_input_lock:
+        velocity_input_data = new_distance_input
+        velocity_measured_at = measured_at
+        velocity_input_rate = input_rate
+        velocity_estimated_at = estimated_at if estimated_at is not None else measured_at
+
+def schedule_regulator_gains(control_delay):
+    """
+    Scales the proportional and derivative gains down in proportion to how
+    far the control delay exceeds the nominal delay, keeping the loop's
+    phase margin as the pipeline slows.
+    Args:
+        control_delay (float): Capture-to-command delay in seconds.
+    """
+    global control_gain_scale
+    if rotation_base_tunings is None or control_delay <= 0:
+        return
+    gain_scale = min(1.0, max(LATENCY_MIN_GAIN_SCALE, nominal_control_delay / control_delay))
+    if abs(gain_scale - control_gain_scale) < 0.01:
+        return
+    control_gain_scale = gain_scale
+    for regulator, base_tunings in ((rotation_regulator, rotation_base_tunings), (steering_regulator, steering_base_tunings)):
+        regulator.tunings = (base_tunings[0] * gain_scale, base_tunings[1], base_tunings[2] * gain_scale)
+
+def summarise_control_delay():
     """
-    global velocity_input_data
-    velocity_input_data = new_distance_input
+    Summarises the capture-to-command delays seen by the rotation channel.
+    Returns:
+        dict: Sample count, p50/p90/p99/max delay in milliseconds, compensation mode and current gain scale.
+    """
+    return {
+        "count": control_delay_histogram.total_count,
+        "p50_ms": control_delay_histogram.percentile(50) / 1000.0,
+        "p90_ms": control_delay_histogram.percentile(90) / 1000.0,
+        "p99_ms": control_delay_histogram.percentile(99) / 1000.0,
+        "max_ms": control_delay_histogram.maximum_value / 1000.0,
+        "mode": latency_compensation,
+        "gain_scale": control_gain_scale,
+    }
 
 def set_operation_phase(new_phase):
     """
@@ -103,81 +267,216 @@ def set_operation_phase(new_phase):
     global phase
     phase = new_phase
 
+def set_lidar_alignment(is_aligned):
+    """
+    Updates whether the LIDAR beam falls inside the followed target, logged with each regulation tick.
+    Args:
+        is_aligned (bool): True if the beam is inside the target box.
+    """
+    global lidar_alignment
+    lidar_alignment = int(bool(is_aligned))
+
 def trigger_ascension(maximum_height):
     """
     Initiates UAV ascension to the specified height.
     Args:
         maximum_height (float): Target height in meters.
     """
-    uav_system.ascend_and_activate(maximum_height)
+    uav_system.initiate_ascension(maximum_height)
 
 def trigger_descent():
     """
     Commands the UAV to descend.
     """
-    uav_system.descend()
+    stop_fixed_rate_control()
+    uav_system.commence_landing()
 
 def show_uav_information():
     """
     Displays the current status of the UAV.
     """
-    print(uav_system.get_navigation_status())
-    print(uav_system.get_power_status())
-    print(uav_system.get_firmware_version())
+    telemetry = uav_system.query_telemetry_snapshot()
+    print(f"Mode: {telemetry.mode} Armed: {telemetry.armed} EKF OK: {telemetry.ekf_ok}")
+    print(f"Battery: {telemetry.battery_voltage} V, {telemetry.battery_level} %")
+    print(uav_system.query_firmware_details())
 
 def prepare_log_files(base_filepath):
     """
-    Sets up log files for rotation and velocity data.
+    Sets up the binary flight data log.
     Args:
         base_filepath (str): Base path for log files.
     """
-    global rotation_log_file, velocity_log_file
-    rotation_log_file = open(base_filepath + "_rotation.txt", "a")
-    rotation_log_file.write("P: I: D: Error: Output:\n")
-
-    velocity_log_file = open(base_filepath + "_velocity.txt", "a")
-    velocity_log_file.write("P: I: D: Error: Output:\n")
+    global flight_data_log
+    flight_data_log = flight_recorder.FlightDataLog(base_filepath + "_flight.bin")
 
-def record_rotation_log(output_value):
+def close_log_files():
     """
-    Records rotation regulation data to the log file.
-    Args:
-        output_value (float): Rotation output value.
+    Writes pending log records and closes the flight data log.
     """
-    global rotation_log_file
-    rotation_log_file.write(f"0,0,0,{rotation_input_data},{output_value}\n")
+    global flight_data_log
+    if flight_data_log is not None:
+        flight_data_log.close()
+        flight_data_log = None
 
-def record_velocity_log(output_value):
+def record_regulation_log(rotation_output, velocity_output, rotation_delay=NOT_REGULATED, velocity_delay=NOT_REGULATED, rotation_input=None, velocity_input=None):
     """
-    Records velocity regulation data to the log file.
+    Records one regulation tick to the flight data log.
+    Channels that were not regulated this tick are logged as NaN.
     Args:
-        output_value (float): Velocity output value.
+        rotation_output (float): Rotation command sent, or None.
+        velocity_output (float): Velocity command sent, or None.
+        rotation_delay (float): Age in seconds of the measurement behind the rotation command.
+        velocity_delay (float): Age in seconds of the measurement behind the velocity command.
+        rotation_input (float): Deviation the rotation regulator acted on, the last set input if omitted.
+        velocity_input (float): Deviation the velocity regulator acted on, the last set input if omitted.
     """
-    global velocity_log_file
-    velocity_log_file.write(f"0,0,0,{rotation_input_data},{output_value}\n")
+    if flight_data_log is None:
+        return
+    rotation_terms = (NOT_REGULATED,) * 5
+    if rotation_output is not None:
+        rotation_input = rotation_input_data if rotation_input is None else rotation_input
+        rotation_terms = (rotation_input,) + tuple(rotation_regulator.components) + (rotation_output,)
+    velocity_terms = (NOT_REGULATED,) * 5
+    if velocity_output is not None:
+        velocity_input = velocity_input_data if velocity_input is None else velocity_input
+        velocity_terms = (velocity_input,) + tuple(steering_regulator.components) + (velocity_output,)
+    flight_data_log.append((clock.time(), flight_recorder.encode_phase(phase)) + rotation_terms + velocity_terms + (rotation_delay, velocity_delay, lidar_alignment))
 
 def regulate_uav_motion():
     """
     Applies regulation commands to the UAV.
+    While the fixed-rate control thread runs it owns the commands, and this
+    call only leaves the inputs set by the vision loop for its next tick.
+    """
+    if control_scheduler is not None and control_scheduler.is_running():
+        return
+    command_time = clock.monotonic()
+    rotation_delay = command_time - rotation_measured_at if rotation_measured_at is not None else NOT_REGULATED
+    velocity_delay = command_time - velocity_measured_at if velocity_measured_at is not None else NOT_REGULATED
+    issue_regulation_commands(rotation_input_data, velocity_input_data, rotation_delay, velocity_delay)
+
+def issue_regulation_commands(rotation_input, velocity_input, rotation_delay, velocity_delay, elapsed=None, vehicle=uav_system):
+    """
+    Runs both regulators on the given deviations and sends the commands.
+    A zero deviation stops that channel instead of regulating it.
+    Args:
+        rotation_input (float): Horizontal deviation to regulate.
+        velocity_input (float): Distance deviation to regulate.
+        rotation_delay (float): Age in seconds of the measurement behind rotation_input, NaN if unknown.
+        velocity_delay (float): Age in seconds of the measurement behind velocity_input, NaN if unknown.
+        elapsed (float): Seconds since the previous regulation, None to let the regulators time themselves.
+        vehicle (module): Command interface exposing the uav_interface send functions.
     """
     global active_rotation_value, active_steering_value
-    if rotation_input_data == 0:
-        uav_system.send_rotation_command(0)
+    logged_rotation = None
+    logged_velocity = None
+    if rotation_delay == rotation_delay:
+        control_delay_histogram.record(int(rotation_delay * 1e6))
+        if latency_compensation in ("gains", "both"):
+            schedule_regulator_gains(rotation_delay)
+    stage_started = stage_timer.stage_start()
+    if rotation_input == 0:
+        vehicle.send_rotation_command(0)
     else:
-        active_rotation_value = (rotation_regulator(rotation_input_data) * -1)
-        uav_system.send_rotation_command(active_rotation_value)
-        record_rotation_log(active_rotation_value)
+        active_rotation_value = (rotation_regulator(rotation_input, elapsed) * -1)
+        vehicle.send_rotation_command(active_rotation_value)
+        logged_rotation = active_rotation_value
 
-    if velocity_input_data == 0:
-        uav_system.send_motion_command(0, 0, 0)
+    if velocity_input == 0:
+        vehicle.send_motion_command(0, 0, 0)
     else:
-        active_steering_value = (steering_regulator(velocity_input_data) * -1)
-        uav_system.send_motion_command(active_steering_value, 0, 0)
-        record_velocity_log(active_steering_value)
+        active_steering_value = (steering_regulator(velocity_input, elapsed) * -1)
+        vehicle.send_motion_command(active_steering_value, 0, 0)
+        logged_velocity = active_steering_value
+
+    stage_timer.stage_finish("pid", stage_started)
+
+    stage_started = stage_timer.stage_start()
+    vehicle.flush_motion_commands()
+    stage_timer.stage_finish("mavlink_send", stage_started)
+    if logged_rotation is not None or logged_velocity is not None:
+        record_regulation_log(logged_rotation, logged_velocity, rotation_delay, velocity_delay, rotation_input, velocity_input)
+
+def extrapolate_control_input(input_value, input_rate, estimated_at, measured_at, now):
+    """
+    Brings a deviation set by the vision loop forward to a control tick.
+    Args:
+        input_value (float): Deviation as last set.
+        input_rate (float): Its rate of change per second.
+        estimated_at (float): Time the deviation refers to, None if untimed.
+        measured_at (float): Time of the measurement behind it, None if untimed.
+        now (float): Tick time in seconds.
+    Returns:
+        tuple: (deviation, measurement age in seconds). The deviation is 0 once
+            the measurement is older than CONTROL_STALE_TIMEOUT.
+    """
+    if measured_at is None:
+        return input_value, NOT_REGULATED
+    measurement_age = now - measured_at
+    if measurement_age > CONTROL_STALE_TIMEOUT:
+        return 0, measurement_age
+    if predicts_measurement_delay() and estimated_at is not None and input_value != 0:
+        input_value += input_rate * min(max(now - estimated_at, 0.0), CONTROL_MAX_EXTRAPOLATION)
+    return input_value, measurement_age
+
+def regulate_fixed_rate_tick(now, elapsed, vehicle=uav_system):
+    """
+    One tick of the fixed-rate control thread: takes the latest inputs,
+    extrapolates them to the tick time and regulates with the actual
+    tick spacing as the PID sample time.
+    Args:
+        now (float): Tick time in seconds.
+        elapsed (float): Seconds since the previous tick.
+        vehicle (module): Command interface exposing the uav_interface send functions.
+    """
+    with control_input_lock:
+        rotation_state = (rotation_input_data, rotation_input_rate, rotation_estimated_at, rotation_measured_at)
+        velocity_state = (velocity_input_data, velocity_input_rate, velocity_estimated_at, velocity_measured_at)
+    rotation_input, rotation_delay = extrapolate_control_input(*rotation_state, now)
+    velocity_input, velocity_delay = extrapolate_control_input(*velocity_state, now)
+    issue_regulation_commands(rotation_input, velocity_input, rotation_delay, velocity_delay, max(elapsed, 1e-6), vehicle)
+
+def start_fixed_rate_control(rate=control_timing.CONTROL_RATE, clock_function=clock.monotonic, sleep_function=None, vehicle=uav_system):
+    """
+    Starts regulating on a dedicated thread at a fixed rate, decoupled from
+    the detection frame rate. The vision loop keeps setting inputs and
+    regulate_uav_motion stops sending commands until the thread is stopped.
+    Args:
+        rate (float): Regulation rate in Hz.
+        clock_function (callable): Monotonic clock in seconds.
+        sleep_function (callable): Sleep used between ticks, None for an interruptible wait.
+        vehicle (module): Command interface exposing the uav_interface send functions.
+    """
+    global control_scheduler
+    stop_fixed_rate_control()
+    control_scheduler = control_timing.FixedRateScheduler(lambda now, elapsed: regulate_fixed_rate_tick(now, elapsed, vehicle),
+                                                          rate, clock_function, sleep_function)
+    control_scheduler.start()
+    print(f"Fixed-rate control started at {rate} Hz")
+
+def stop_fixed_rate_control():
+    """
+    Stops the fixed-rate control thread if it runs.
+    """
+    if control_scheduler is not None and control_scheduler.is_running():
+        control_scheduler.stop()
+        print(f"Fixed-rate control stopped: {report_fixed_rate_control()}")
+
+def report_fixed_rate_control():
+    """
+    Summarises the cadence of the most recent fixed-rate control run.
+    Returns:
+        dict: Scheduler statistics, empty if fixed-rate control never ran.
+    """
+    if control_scheduler is None:
+        return {}
+    return control_scheduler.report_statistics()
 
 def cease_uav_motion():
     """
     Halts all UAV motion.
     """
+    stop_fixed_rate_control()
     uav_system.send_rotation_command(0)
-    uav_system.send_motion_command(0, 0, 0)
\ No newline at end of file
+    uav_system.send_motion_command(0, 0, 0)
+    uav_system.flush_motion_commands(force=True)
@@ -0,0 +1,543 @@
+import glob
+import json
+import mmap
+import os
+import re
+import time as timing
+import numpy as array_utils
+
+from components import flight_log as flight_recorder
+from components import video_recorder
+
+INDEX_VERSION = 1
+INDEX_MANIFEST = "manifest.json"
+FRAME_MATCH_TOLERANCE = 0.2      # seconds between a tick and the nearest recorded frame for them to be paired
+SATURATION_TOLERANCE = 1e-3      # relative margin below the limit that still counts as saturated
+SATURATION_LIMITS = {"rotation": 20.0, "velocity": 3.0}   # ROTATION_LIMIT and VELOCITY_LIMIT in flight_controller
+
+# Per-tick columns: every flight record field, the flight it belongs to and its frame within that flight
+TICK_COLUMNS = flight_recorder.FLIGHT_RECORD_DTYPE.descr + [("flight", "<u4"), ("frame", "<i4")]
+# Per-frame columns: flight, segment within the flight, byte range of the JPEG data and submission time
+FRAME_COLUMNS = [("flight", "<u4"), ("segment", "<u2"), ("offset", "<u8"), ("size", "<u4"), ("timestamp", "<f8")]
+
+# Base path followed by the suffix of one of the files a flight leaves behind
+FLIGHT_ARTIFACT_PATTERN = re.compile(r"^(.*?)(_converted_flight\.bin|_flight\.bin|_rotation\.txt|_velocity\.txt|_\d{4}\.avi|_\d{4}_frames\.bin|\.avi)$")
+
+
+def discover_flights(flight_paths):
+    """
+    Finds the flights recorded under the given paths.
+    Args:
+        flight_paths (list): Flight base paths, artifact files or directories searched recursively.
+    Returns:
+        list: Sorted flight base paths.
+    """
+    base_paths = set()
+    for flight_path in flight_paths:
+        if os.path.isdir(flight_path):
+            candidates = [os.path.join(directory, file_name) for directory, _, file_names in os.walk(flight_path) for file_name in file_names]
+        else:
+            candidates = [flight_path]
+        for candidate in candidates:
+            artifact_match = FLIGHT_ARTIFACT_PATTERN.match(candidate)
+            if artifact_match is not None:
+                base_paths.add(artifact_match.group(1))
+            elif candidate == flight_path:
+                base_paths.add(flight_path)
+    return sorted(base_paths)
+
+
+def list_video_segments(base_path):
+    """
+    Lists the recordings of a flight in playback order.
+    Args:
+        base_path (str): Flight base path.
+    Returns:
+        list: A legacy <base>.avi first if present, then the numbered recorder segments.
+    """
+    segment_paths = sorted(glob.glob(glob.escape(base_path) + "_[0-9][0-9][0-9][0-9].avi"))
+    if os.path.exists(base_path + ".avi"):
+        segment_paths.insert(0, base_path + ".avi")
+    return segment_paths
+
+
+def list_flight_sources(base_path):
+    """
+    Lists every file the index of a flight is built from.
+    Args:
+        base_path (str): Flight base path.
+    Returns:
+        list: Existing log, frame time and video paths of the flight.
+    """
+    source_paths = [base_path + suffix for suffix in ("_flight.bin", flight_recorder.CONVERTED_LOG_SUFFIX, "_rotation.txt", "_velocity.txt")]
+    for segment_path in list_video_segments(base_path):
+        source_paths += [segment_path, video_recorder.build_frame_times_path(segment_path)]
+    return [source_path for source_path in source_paths if os.path.exists(source_path)]
+
+
+def fingerprint_sources(source_paths):
+    """
+    Captures size and modification time of the source files, so a flight is
+    re-read only once one of its files was appended to.
+    Args:
+        source_paths (list): Source file paths.
+    Returns:
+        dict: Path mapped to [size, mtime in nanoseconds].
+    """
+    fingerprint = {}
+    for source_path in source_paths:
+        source_status = os.stat(source_path)
+        fingerprint[source_path] = [source_status.st_size, source_status.st_mtime_ns]
+    return fingerprint
+
+
+def read_flight_records(base_path):
+    """
+    Reads the regulation records of a flight, from the binary log, a log
+    converted from the legacy text logs, or else the text logs themselves.
+    Args:
+        base_path (str): Flight base path.
+    Returns:
+        ndarray: Structured array of FLIGHT_RECORD_DTYPE records.
+    """
+    if os.path.exists(base_path + "_flight.bin"):
+        return flight_recorder.load_flight_log(base_path + "_flight.bin")
+    if os.path.exists(base_path + flight_recorder.CONVERTED_LOG_SUFFIX):
+        return flight_recorder.load_flight_log(base_path + flight_recorder.CONVERTED_LOG_SUFFIX)
+    if os.path.exists(base_path + "_rotation.txt") and os.path.exists(base_path + "_velocity.txt"):
+        return flight_recorder.read_text_logs(base_path)
+    return array_utils.zeros(0, dtype=flight_recorder.FLIGHT_RECORD_DTYPE)
+
+
+def index_avi_frames(avi_path):
+    """
+    Locates the JPEG data of every frame in an MJPG AVI file.
+    The chunks are walked from the start instead of trusting the idx1 index,
+    which is missing from files still being written or cut short by a crash;
+    a truncated last frame is ignored.
+    Args:
+        avi_path (str): AVI file path.
+    Returns:
+        tuple: Byte offsets and sizes of the frames as int arrays.
+    """
+    frame_offsets = []
+    frame_sizes = []
+    file_size = os.path.getsize(avi_path)
+    if file_size < 12:
+        return array_utils.zeros(0, dtype=array_utils.uint64), array_utils.zeros(0, dtype=array_utils.uint32)
+    with open(avi_path, "rb") as avi_file, mmap.mmap(avi_file.fileno(), 0, access=mmap.ACCESS_READ) as avi_data:
+        if avi_data[0:4] != b"RIFF" or avi_data[8:12] != b"AVI ":
+            raise ValueError(f"{avi_path} is not an AVI file")
+        position = 12
+        while position + 8 <= file_size:
+            chunk_id = avi_data[position:position + 4]
+            chunk_size = int.from_bytes(avi_data[position + 4:position + 8], "little")
+            if chunk_id in (b"RIFF", b"LIST") and avi_data[position + 8:position + 12] in (b"movi", b"rec ", b"AVIX"):
+                # Step into the lists holding frame chunks, their sizes are only final once the writer closed
+                position += 12
+                continue
+            if position + 8 + chunk_size > file_size:
+                break
+            if chunk_id[2:4] in (b"dc", b"db"):
+                frame_offsets.append(position + 8)
+                frame_sizes.append(chunk_size)
+            position += 8 + chunk_size + (chunk_size & 1)
+    return array_utils.array(frame_offsets, dtype=array_utils.uint64), array_utils.array(frame_sizes, dtype=array_utils.uint32)
+
+
+def read_frame_times(segment_path, frame_count):
+    """
+    Reads the submission times written by the recorder for a segment.
+    Args:
+        segment_path (str): Segment file path.
+        frame_count (int): Frames found in the segment.
+    Returns:
+        ndarray: One time per frame, NaN where none was recorded (legacy recordings).
+    """
+    frame_times = array_utils.full(frame_count, array_utils.nan)
+    frame_times_path = video_recorder.build_frame_times_path(segment_path)
+    if os.path.exists(frame_times_path):
+        recorded_times = array_utils.fromfile(frame_times_path, dtype="<f8")[:frame_count]
+        frame_times[:len(recorded_times)] = recorded_times
+    return frame_times
+
+
+def match_ticks_to_frames(tick_times, frame_times, tolerance=FRAME_MATCH_TOLERANCE):
+    """
+    Pairs every tick with the recorded frame closest to it in time.
+    Args:
+        tick_times (ndarray): Tick timestamps.
+        frame_times (ndarray): Frame submission times, NaN for unknown.
+        tolerance (float): Largest time difference of a pair in seconds.
+    Returns:
+        ndarray: Frame number for each tick, -1 when no frame is close enough.
+    """
+    tick_frames = array_utils.full(len(tick_times), -1, dtype=array_utils.int32)
+    known_frames = array_utils.flatnonzero(~array_utils.isnan(frame_times))
+    if len(known_frames) == 0 or len(tick_times) == 0:
+        return tick_frames
+    known_frames = known_frames[array_utils.argsort(frame_times[known_frames], kind="stable")]
+    sorted_times = frame_times[known_frames]
+    after = array_utils.clip(array_utils.searchsorted(sorted_times, tick_times), 1, len(sorted_times) - 1) if len(sorted_times) > 1 else array_utils.zeros(len(tick_times), dtype=array_utils.int64)
+    before = array_utils.maximum(after - 1, 0)
+    nearest = array_utils.where(array_utils.abs(sorted_times[before] - tick_times) <= array_utils.abs(sorted_times[after] - tick_times), before, after)
+    close_enough = array_utils.abs(sorted_times[nearest] - tick_times) <= tolerance
+    tick_frames[close_enough] = known_frames[nearest[close_enough]]
+    return tick_frames
+
+
+def read_flight_columns(base_path):
+    """
+    Reads one flight into tick and frame columns.
+    Args:
+        base_path (str): Flight base path.
+    Returns:
+        tuple: Tick columns dict, frame columns dict and the segment paths the frames refer to.
+    """
+    flight_records = read_flight_records(base_path)
+    segment_paths = list_video_segments(base_path)
+    frame_blocks = {column_name: [] for column_name, _ in FRAME_COLUMNS}
+    for segment_number, segment_path in enumerate(segment_paths):
+        frame_offsets, frame_sizes = index_avi_frames(segment_path)
+        frame_blocks["segment"].append(array_utils.full(len(frame_offsets), segment_number, dtype="<u2"))
+        frame_blocks["offset"].append(frame_offsets)
+        frame_blocks["size"].append(frame_sizes)
+        frame_blocks["timestamp"].append(read_frame_times(segment_path, len(frame_offsets)))
+    frame_count = sum(len(block) for block in frame_blocks["offset"])
+    frame_blocks["flight"].append(array_utils.zeros(frame_count, dtype="<u4"))
+    frame_columns = {column_name: array_utils.concatenate(frame_blocks[column_name]).astype(column_type) if frame_blocks[column_name]
+                     else array_utils.zeros(0, dtype=column_type) for column_name, column_type in FRAME_COLUMNS}
+
+    tick_columns = {field: array_utils.asarray(flight_records[field]) for field in flight_recorder.FLIGHT_RECORD_DTYPE.names}
+    tick_columns["flight"] = array_utils.zeros(len(flight_records), dtype="<u4")
+    tick_columns["frame"] = match_ticks_to_frames(tick_columns["timestamp"], frame_columns["timestamp"])
+    return tick_columns, frame_columns, segment_paths
+
+
+def summarise_flight_columns(tick_columns, frame_columns):
+    """
+    Computes the manifest statistics of a flight.
+    Args:
+        tick_columns (dict): Tick columns of the flight.
+        frame_columns (dict): Frame columns of the flight.
+    Returns:
+        dict: Time span, tick and frame counts and peak command magnitudes.
+    """
+    def finite_extreme(values, reduce):
+        finite_values = values[array_utils.isfinite(values)]
+        return float(reduce(finite_values)) if len(finite_values) else None
+
+    return {
+        "tick_count": len(tick_columns["timestamp"]),
+        "frame_count": len(frame_columns["offset"]),
+        "start_time": finite_extreme(tick_columns["timestamp"], array_utils.min),
+        "end_time": finite_extreme(tick_columns["timestamp"], array_utils.max),
+        "paired_ticks": int(array_utils.count_nonzero(tick_columns["frame"] >= 0)),
+        "max_rotation_output": finite_extreme(array_utils.abs(tick_columns["rotation_output"]), array_utils.max),
+        "max_velocity_output": finite_extreme(array_utils.abs(tick_columns["velocity_output"]), array_utils.max),
+    }
+
+
+def write_column(index_dir, table_name, column_name, column_values):
+    """
+    Stores one column as .npy, replacing the previous file atomically.
+    Args:
+        index_dir (str): Index directory.
+        table_name (str): 'ticks' or 'frames'.
+        column_name (str): Column name.
+        column_values (ndarray): Column data.
+    """
+    column_path = os.path.join(index_dir, f"{table_name}_{column_name}.npy")
+    with open(column_path + ".tmp", "wb") as column_file:
+        array_utils.save(column_file, column_values)
+    os.replace(column_path + ".tmp", column_path)
+
+
+def load_column(index_dir, table_name, column_name, column_type):
+    """
+    Maps one stored column into memory.
+    Args:
+        index_dir (str): Index directory.
+        table_name (str): 'ticks' or 'frames'.
+        column_name (str): Column name.
+        column_type (str): Column dtype, used for empty columns.
+    Returns:
+        ndarray: Read-only memory-mapped column.
+    """
+    column_path = os.path.join(index_dir, f"{table_name}_{column_name}.npy")
+    try:
+        return array_utils.load(column_path, mmap_mode="r")
+    except ValueError:
+        # An empty column cannot be memory mapped
+        return array_utils.zeros(0, dtype=column_type)
+
+
+def update_flight_index(flight_paths, index_dir):
+    """
+    Ingests flights into the columnar index, re-reading only flights whose
+    files changed since the index was last updated.
+    Args:
+        flight_paths (list): Flight base paths, artifact files or directories.
+        index_dir (str): Index directory, created if missing.
+    Returns:
+        dict: Flights, ticks and frames in the index, flights re-read and elapsed seconds.
+    """
+    update_started = timing.perf_counter()
+    os.makedirs(index_dir, exist_ok=True)
+    previous_index = FlightIndex(index_dir) if os.path.exists(os.path.join(index_dir, INDEX_MANIFEST)) else None
+    previous_flights = {flight_entry["base_path"]: flight_entry for flight_entry in previous_index.flights} if previous_index else {}
+    base_paths = sorted(set(discover_flights(flight_paths)) | set(previous_flights))
+
+    tick_blocks = {column_name: [] for column_name, _ in TICK_COLUMNS}
+    frame_blocks = {column_name: [] for column_name, _ in FRAME_COLUMNS}
+    flight_entries = []
+    tick_start = 0
+    frame_start = 0
+    reread_count = 0
+    for base_path in base_paths:
+        source_paths = list_flight_sources(base_path)
+        if not source_paths:
+            # Every file of the flight was removed, drop it from the index
+            continue
+        flight_number = len(flight_entries)
+        fingerprint = fingerprint_sources(source_paths)
+        previous_entry = previous_flights.get(base_path)
+        if previous_entry is not None and previous_entry["sources"] == fingerprint:
+            tick_columns = {column_name: column[previous_entry["tick_start"]:previous_entry["tick_start"] + previous_entry["tick_count"]]
+                            for column_name, column in previous_index.ticks.items()}
+            frame_columns = {column_name: column[previous_entry["frame_start"]:previous_entry["frame_start"] + previous_entry["frame_count"]]
+                             for column_name, column in previous_index.frames.items()}
+            segment_paths = previous_entry["segments"]
+            flight_summary = {summary_name: previous_entry[summary_name] for summary_name in previous_entry
+                              if summary_name not in ("flight", "base_path", "sources", "segments", "tick_start", "frame_start")}
+        else:
+            tick_columns, frame_columns, segment_paths = read_flight_columns(base_path)
+            flight_summary = summarise_flight_columns(tick_columns, frame_columns)
+            reread_count += 1
+
+        for column_name, _ in TICK_COLUMNS:
+            tick_blocks[column_name].append(tick_columns[column_name])
+        tick_blocks["flight"][-1] = array_utils.full(flight_summary["tick_count"], flight_number, dtype="<u4")
+        for column_name, _ in FRAME_COLUMNS:
+            frame_blocks[column_name].append(frame_columns[column_name])
+        frame_blocks["flight"][-1] = array_utils.full(flight_summary["frame_count"], flight_number, dtype="<u4")
+
+        flight_entries.append(dict(flight=flight_number, base_path=base_path, sources=fingerprint, segments=segment_paths,
+                                   tick_start=tick_start, frame_start=frame_start, **flight_summary))
+        tick_start += flight_summary["tick_count"]
+        frame_start += flight_summary["frame_count"]
+
+    if previous_index is not None and reread_count == 0 and len(flight_entries) == len(previous_index.flights):
+        # Nothing was appended since the last update, the stored columns stay as they are
+        previous_index.close()
+        return {"flights": len(flight_entries), "reread_flights": 0, "ticks": tick_start, "frames": frame_start,
+                "elapsed": timing.perf_counter() - update_started}
+    for table_name, table_columns, table_blocks in (("ticks", TICK_COLUMNS, tick_blocks), ("frames", FRAME_COLUMNS, frame_blocks)):
+        for column_name, column_type in table_columns:
+            column_values = array_utils.concatenate(table_blocks[column_name]).astype(column_type, copy=False) if table_blocks[column_name] \
+                else array_utils.zeros(0, dtype=column_type)
+            write_column(index_dir, table_name, column_name, column_values)
+    if previous_index is not None:
+        previous_index.close()
+    manifest = {"version": INDEX_VERSION, "tick_count": tick_start, "frame_count": frame_start, "flights": flight_entries}
+    with open(os.path.join(index_dir, INDEX_MANIFEST + ".tmp"), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(os.path.join(index_dir, INDEX_MANIFEST + ".tmp"), os.path.join(index_dir, INDEX_MANIFEST))
+    return {
+        "flights": len(flight_entries),
+        "reread_flights": reread_count,
+        "ticks": tick_start,
+        "frames": frame_start,
+        "elapsed": timing.perf_counter() - update_started,
+    }
+
+
+def query_rotation_saturated(ticks, limit=SATURATION_LIMITS["rotation"]):
+    """
+    Selects ticks whose rotation command reached the rotation limit.
+    Args:
+        ticks (dict): Tick columns.
+        limit (float): Rotation limit in degrees/s.
+    Returns:
+        ndarray: Boolean mask over the ticks.
+    """
+    return array_utils.abs(ticks["rotation_output"]) >= limit * (1.0 - SATURATION_TOLERANCE)
+
+
+def query_velocity_saturated(ticks, limit=SATURATION_LIMITS["velocity"]):
+    """
+    Selects ticks whose velocity command reached the velocity limit.
+    Args:
+        ticks (dict): Tick columns.
+        limit (float): Velocity limit in m/s.
+    Returns:
+        ndarray: Boolean mask over the ticks.
+    """
+    return array_utils.abs(ticks["velocity_output"]) >= limit * (1.0 - SATURATION_TOLERANCE)
+
+
+def query_lidar_unaligned(ticks):
+    """
+    Selects ticks regulated while the LIDAR beam was outside the target box.
+    Args:
+        ticks (dict): Tick columns.
+    Returns:
+        ndarray: Boolean mask over the ticks.
+    """
+    return ticks["lidar_aligned"] == 0
+
+
+TICK_QUERIES = {
+    "rotation_saturated": query_rotation_saturated,
+    "velocity_saturated": query_velocity_saturated,
+    "lidar_unaligned": query_lidar_unaligned,
+}
+
+
+class FlightIndex:
+    """
+    Read side of the flight index: memory-mapped tick and frame columns and
+    the per-flight manifest. Queries only touch the pages of the columns they
+    read, and a frame is fetched by mapping its segment and decoding one
+    JPEG at a stored byte offset.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, INDEX_MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("version") != INDEX_VERSION:
+            raise ValueError(f"{index_dir} holds an index of another version, rebuild it")
+        self.flights = manifest["flights"]
+        self.ticks = {column_name: load_column(index_dir, "ticks", column_name, column_type) for column_name, column_type in TICK_COLUMNS}
+        self.frames = {column_name: load_column(index_dir, "frames", column_name, column_type) for column_name, column_type in FRAME_COLUMNS}
+        self.flight_frame_starts = array_utils.array([flight_entry["frame_start"] for flight_entry in self.flights], dtype=array_utils.int64)
+        self._segment_maps = {}
+
+    def find_ticks(self, tick_query, flights=None, phase=None):
+        """
+        Runs a query over the tick columns.
+        Args:
+            tick_query (callable or str): Function mapping tick columns to a boolean mask, or a TICK_QUERIES name.
+            flights (list): Flight numbers to search, all flights if None.
+            phase (str): Only return ticks logged in this phase.
+        Returns:
+            ndarray: Matching tick rows.
+        """
+        if isinstance(tick_query, str):
+            tick_query = TICK_QUERIES[tick_query]
+        if flights is None:
+            row_ranges = [(0, len(self.ticks["timestamp"]))]
+        else:
+            row_ranges = [(self.flights[flight]["tick_start"], self.flights[flight]["tick_start"] + self.flights[flight]["tick_count"]) for flight in flights]
+        matching_rows = []
+        for range_start, range_stop in row_ranges:
+            tick_window = {column_name: column[range_start:range_stop] for column_name, column in self.ticks.items()}
+            tick_mask = tick_query(tick_window)
+            if phase is not None:
+                tick_mask &= tick_window["phase"] == flight_recorder.encode_phase(phase)
+            matching_rows.append(array_utils.flatnonzero(tick_mask) + range_start)
+        return array_utils.concatenate(matching_rows) if matching_rows else array_utils.zeros(0, dtype=array_utils.int64)
+
+    def tick_frames(self, tick_rows):
+        """
+        Looks up the recorded frames of ticks.
+        Args:
+            tick_rows (ndarray): Tick rows.
+        Returns:
+            ndarray: Frame rows, -1 for ticks without a paired frame.
+        """
+        local_frames = self.ticks["frame"][tick_rows].astype(array_utils.int64)
+        frame_rows = self.flight_frame_starts[self.ticks["flight"][tick_rows]] + local_frames
+        return array_utils.where(local_frames >= 0, frame_rows, -1)
+
+    def describe_ticks(self, tick_rows):
+        """
+        Gathers the logged values of ticks.
+        Args:
+            tick_rows (ndarray): Tick rows.
+        Returns:
+            list: One dict per tick with every tick column and the flight base path.
+        """
+        tick_rows = array_utils.asarray(tick_rows)
+        tick_values = {column_name: column[tick_rows].tolist() for column_name, column in self.ticks.items()}
+        return [dict({column_name: tick_values[column_name][row_number] for column_name in tick_values},
+                     base_path=self.flights[tick_values["flight"][row_number]]["base_path"]) for row_number in range(len(tick_rows))]
+
+    def _map_segment(self, segment_path):
+        segment_map = self._segment_maps.get(segment_path)
+        if segment_map is None:
+            with open(segment_path, "rb") as segment_file:
+                segment_map = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._segment_maps[segment_path] = segment_map
+        return segment_map
+
+    def read_frame_bytes(self, frame_row):
+        """
+        Fetches the JPEG data of one recorded frame.
+        Args:
+            frame_row (int): Frame row.
+        Returns:
+            bytes: JPEG-encoded frame.
+        """
+        flight_entry = self.flights[int(self.frames["flight"][frame_row])]
+        segment_map = self._map_segment(flight_entry["segments"][int(self.frames["segment"][frame_row])])
+        frame_offset = int(self.frames["offset"][frame_row])
+        return segment_map[frame_offset:frame_offset + int(self.frames["size"][frame_row])]
+
+    def read_frame(self, frame_row):
+        """
+        Fetches and decodes one recorded frame.
+        Args:
+            frame_row (int): Frame row.
+        Returns:
+            ndarray: BGR image, or None if the data does not decode.
+        """
+        import cv2 as vision_lib
+
+        return vision_lib.imdecode(array_utils.frombuffer(self.read_frame_bytes(frame_row), dtype=array_utils.uint8), vision_lib.IMREAD_COLOR)
+
+    def close(self):
+        """
+        Releases the mapped segments and columns.
+        """
+        for segment_map in self._segment_maps.values():
+            segment_map.close()
+        self._segment_maps = {}
+        self.ticks = {}
+        self.frames = {}
+
+
+def run_index_queries(flight_index, query_names, frame_count=10):
+    """
+    Times the named queries and the retrieval of the frames they match.
+    Args:
+        flight_index (FlightIndex): Open index.
+        query_names (list): TICK_QUERIES names.
+        frame_count (int): Matching frames decoded per query.
+    Returns:
+        dict: Per query the matching ticks, flights and paired frames, the
+            query time and the mean time to fetch and decode one frame in milliseconds.
+    """
+    query_results = {}
+    for query_name in query_names:
+        query_started = timing.perf_counter()
+        tick_rows = flight_index.find_ticks(query_name)
+        frame_rows = flight_index.tick_frames(tick_rows)
+        query_elapsed = timing.perf_counter() - query_started
+
+        paired_frames = array_utils.unique(frame_rows[frame_rows >= 0])
+        fetched_frames = paired_frames[array_utils.linspace(0, len(paired_frames) - 1, min(frame_count, len(paired_frames))).astype(int)] if len(paired_frames) else paired_frames
+        fetch_started = timing.perf_counter()
+        for frame_row in fetched_frames:
+            flight_index.read_frame(frame_row)
+        fetch_elapsed = timing.perf_counter() - fetch_started
+
+        query_results[query_name] = {
+            "ticks": len(tick_rows),
+            "flights": len(array_utils.unique(flight_index.ticks["flight"][tick_rows])),
+            "frames": len(paired_frames),
+            "query_ms": query_elapsed * 1000.0,
+            "frame_ms": fetch_elapsed * 1000.0 / len(fetched_frames) if len(fetched_frames) else 0.0,
+        }
+    return query_results
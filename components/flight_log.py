@@ -0,0 +1,273 @@
+import os
+import queue
+import sys
+import threading as worker_threads
+import time as timing
+import numpy as array_utils
+
+FLIGHT_LOG_MAGIC = b"AIDRFLOG"
+FLIGHT_LOG_VERSION = 3
+FLIGHT_LOG_HEADER_DTYPE = array_utils.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4")])
+FLIGHT_LOG_BATCH_SIZE = 256       # records buffered in memory before a write is handed off
+FLIGHT_LOG_FLUSH_INTERVAL = 1.0   # seconds before a partially filled batch is written anyway
+CONVERTED_LOG_SUFFIX = "_converted_flight.bin"   # kept apart from the _flight.bin the flight itself appends to
+
+FLIGHT_RECORD_FIELDS_V1 = [
+    ("timestamp", "<f8"),
+    ("phase", "u1"),
+    ("rotation_input", "<f4"),
+    ("rotation_p", "<f4"),
+    ("rotation_i", "<f4"),
+    ("rotation_d", "<f4"),
+    ("rotation_output", "<f4"),
+    ("velocity_input", "<f4"),
+    ("velocity_p", "<f4"),
+    ("velocity_i", "<f4"),
+    ("velocity_d", "<f4"),
+    ("velocity_output", "<f4"),
+]
+
+# Version 2 adds the age of the measurement each command was computed from (capture to command, seconds)
+FLIGHT_RECORD_FIELDS_V2 = FLIGHT_RECORD_FIELDS_V1 + [
+    ("rotation_delay", "<f4"),
+    ("velocity_delay", "<f4"),
+]
+
+# Version 3 adds whether the LIDAR beam was inside the target box when the command was computed
+FLIGHT_RECORD_DTYPE = array_utils.dtype(FLIGHT_RECORD_FIELDS_V2 + [
+    ("lidar_aligned", "u1"),
+])
+
+FLIGHT_RECORD_DTYPES = {
+    1: array_utils.dtype(FLIGHT_RECORD_FIELDS_V1),
+    2: array_utils.dtype(FLIGHT_RECORD_FIELDS_V2),
+    3: FLIGHT_RECORD_DTYPE,
+}
+
+PHASE_CODES = {"launch": 0, "seek": 1, "pursuit": 2, "descend": 3}
+PHASE_UNKNOWN = 255
+LIDAR_ALIGNMENT_UNKNOWN = 255
+
+# Value of a field a record does not carry; float fields not listed here are NaN
+MISSING_FIELD_VALUES = {"phase": PHASE_UNKNOWN, "lidar_aligned": LIDAR_ALIGNMENT_UNKNOWN}
+
+
+def encode_phase(phase_name):
+    """
+    Converts a phase name into its log code.
+    Args:
+        phase_name (str): Phase identifier such as 'pursuit'.
+    Returns:
+        int: Phase code, PHASE_UNKNOWN for unrecognised names.
+    """
+    return PHASE_CODES.get(phase_name, PHASE_UNKNOWN)
+
+
+def retire_outdated_log(log_path):
+    """
+    Renames an existing log written with another record layout, so new
+    records are never appended to it.
+    Args:
+        log_path (str): Path about to be opened for appending.
+    """
+    if not os.path.exists(log_path) or os.path.getsize(log_path) < FLIGHT_LOG_HEADER_DTYPE.itemsize:
+        return
+    header = array_utils.fromfile(log_path, dtype=FLIGHT_LOG_HEADER_DTYPE, count=1)
+    if header[0]["magic"] == FLIGHT_LOG_MAGIC and header[0]["version"] == FLIGHT_LOG_VERSION:
+        return
+    retired_path = f"{log_path}.v{header[0]['version']}"
+    os.replace(log_path, retired_path)
+    print(f"Existing flight log uses another layout, moved to {retired_path}")
+
+
+class FlightDataLog:
+    """
+    Append-only binary log of fixed-size regulation records.
+    Records are collected in a NumPy batch and written by a background thread,
+    so the control loop only pays for one structured-array assignment per tick.
+    """
+
+    def __init__(self, log_path, batch_size=FLIGHT_LOG_BATCH_SIZE, flush_interval=FLIGHT_LOG_FLUSH_INTERVAL):
+        self.log_path = log_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records_written = 0
+        self._batch = array_utils.empty(batch_size, dtype=FLIGHT_RECORD_DTYPE)
+        self._batch_count = 0
+        self._batch_started = timing.monotonic()
+        self._write_queue = queue.Queue()
+        retire_outdated_log(log_path)
+        self._log_file = open(log_path, "ab")
+        if self._log_file.tell() == 0:
+            header = array_utils.array([(FLIGHT_LOG_MAGIC, FLIGHT_LOG_VERSION, FLIGHT_RECORD_DTYPE.itemsize)], dtype=FLIGHT_LOG_HEADER_DTYPE)
+            self._log_file.write(header.tobytes())
+        self._writer = worker_threads.Thread(target=self._write_batches, name="flight_log_writer", daemon=True)
+        self._writer.start()
+
+    def append(self, record):
+        """
+        Adds one record to the current batch.
+        Args:
+            record (tuple): Field values in FLIGHT_RECORD_DTYPE order.
+        """
+        if self._batch_count == 0:
+            self._batch_started = timing.monotonic()
+        self._batch[self._batch_count] = record
+        self._batch_count += 1
+        if self._batch_count == self.batch_size or timing.monotonic() - self._batch_started >= self.flush_interval:
+            self.flush()
+
+    def append_batch(self, records):
+        """
+        Queues a block of records for writing, after any records already batched.
+        Args:
+            records (ndarray): Structured array of FLIGHT_RECORD_DTYPE records.
+        """
+        self.flush()
+        self._write_queue.put(records)
+
+    def flush(self):
+        """
+        Hands the current batch to the writer thread.
+        """
+        if self._batch_count == 0:
+            return
+        self._write_queue.put(self._batch[:self._batch_count])
+        self._batch = array_utils.empty(self.batch_size, dtype=FLIGHT_RECORD_DTYPE)
+        self._batch_count = 0
+
+    def close(self):
+        """
+        Writes any pending records and closes the file.
+        """
+        self.flush()
+        self._write_queue.put(None)
+        self._writer.join()
+        self._log_file.close()
+
+    def _write_batches(self):
+        while True:
+            batch = self._write_queue.get()
+            if batch is None:
+                break
+            self._log_file.write(batch.tobytes())
+            self._log_file.flush()
+            self.records_written += len(batch)
+
+
+def load_flight_log(log_path):
+    """
+    Maps a binary flight log into memory without parsing.
+    Logs written with an older layout are copied into FLIGHT_RECORD_DTYPE,
+    with the fields they lack set to their MISSING_FIELD_VALUES.
+    Args:
+        log_path (str): Path to a file written by FlightDataLog.
+    Returns:
+        ndarray: Read-only structured array of FLIGHT_RECORD_DTYPE records.
+    """
+    header_size = FLIGHT_LOG_HEADER_DTYPE.itemsize
+    header = array_utils.fromfile(log_path, dtype=FLIGHT_LOG_HEADER_DTYPE, count=1)
+    if len(header) == 0 or header[0]["magic"] != FLIGHT_LOG_MAGIC:
+        raise ValueError(f"{log_path} is not a flight data log")
+    stored_dtype = FLIGHT_RECORD_DTYPES.get(int(header[0]["version"]))
+    if stored_dtype is None or header[0]["record_size"] != stored_dtype.itemsize:
+        raise ValueError(f"{log_path} uses an unsupported record layout (version {header[0]['version']})")
+    # A crash can leave a partially written record at the end, ignore it
+    record_count = (os.path.getsize(log_path) - header_size) // stored_dtype.itemsize
+    if record_count == 0:
+        return array_utils.zeros(0, dtype=FLIGHT_RECORD_DTYPE)
+    stored_records = array_utils.memmap(log_path, dtype=stored_dtype, mode="r", offset=header_size, shape=(record_count,))
+    if stored_dtype == FLIGHT_RECORD_DTYPE:
+        return stored_records
+    upgraded_records = array_utils.empty(record_count, dtype=FLIGHT_RECORD_DTYPE)
+    for field in FLIGHT_RECORD_DTYPE.names:
+        upgraded_records[field] = stored_records[field] if field in stored_dtype.names else MISSING_FIELD_VALUES.get(field, array_utils.nan)
+    upgraded_records.flags.writeable = False
+    return upgraded_records
+
+
+def read_text_log_rows(text_path):
+    """
+    Reads the P,I,D,Error,Output rows of a legacy text log.
+    Args:
+        text_path (str): Path to a _rotation.txt or _velocity.txt file.
+    Returns:
+        ndarray: Float array with one row of five values per logged tick.
+    """
+    rows = []
+    with open(text_path) as text_file:
+        for line in text_file:
+            fields = line.strip().split(",")
+            if len(fields) != 5:
+                # Header lines are repeated each time the file is reopened
+                continue
+            try:
+                rows.append([float(field) for field in fields])
+            except ValueError:
+                continue
+    return array_utils.array(rows, dtype=array_utils.float64).reshape(-1, 5)
+
+
+def read_text_logs(base_filepath):
+    """
+    Reads the legacy _rotation.txt and _velocity.txt files as flight records.
+    The text logs carry no timestamps, phase or LIDAR alignment, so those fields
+    hold their MISSING_FIELD_VALUES. Legacy velocity rows logged the rotation
+    input instead of the distance input, so velocity_input is left as NaN for them.
+    Args:
+        base_filepath (str): Base path the text logs were created with.
+    Returns:
+        ndarray: Structured array of FLIGHT_RECORD_DTYPE records, rotation rows first.
+    """
+    rotation_rows = read_text_log_rows(base_filepath + "_rotation.txt")
+    velocity_rows = read_text_log_rows(base_filepath + "_velocity.txt")
+
+    converted = array_utils.empty(len(rotation_rows) + len(velocity_rows), dtype=FLIGHT_RECORD_DTYPE)
+    for field in FLIGHT_RECORD_DTYPE.names:
+        converted[field] = MISSING_FIELD_VALUES.get(field, array_utils.nan)
+
+    rotation_records = converted[:len(rotation_rows)]
+    rotation_records["rotation_p"] = rotation_rows[:, 0]
+    rotation_records["rotation_i"] = rotation_rows[:, 1]
+    rotation_records["rotation_d"] = rotation_rows[:, 2]
+    rotation_records["rotation_input"] = rotation_rows[:, 3]
+    rotation_records["rotation_output"] = rotation_rows[:, 4]
+
+    velocity_records = converted[len(rotation_rows):]
+    velocity_records["velocity_p"] = velocity_rows[:, 0]
+    velocity_records["velocity_i"] = velocity_rows[:, 1]
+    velocity_records["velocity_d"] = velocity_rows[:, 2]
+    velocity_records["velocity_output"] = velocity_rows[:, 4]
+    return converted
+
+
+def convert_text_logs(base_filepath, log_path=None):
+    """
+    Converts the legacy _rotation.txt and _velocity.txt files into a binary flight log.
+    The output is never appended to, so converting twice cannot duplicate records.
+    Args:
+        base_filepath (str): Base path the text logs were created with.
+        log_path (str): Output path, defaults to base_filepath + CONVERTED_LOG_SUFFIX.
+    Returns:
+        int: Number of records written.
+    """
+    if log_path is None:
+        log_path = base_filepath + CONVERTED_LOG_SUFFIX
+    if os.path.exists(log_path):
+        raise FileExistsError(f"{log_path} already exists, remove it to convert again")
+    converted = read_text_logs(base_filepath)
+    flight_data_log = FlightDataLog(log_path)
+    flight_data_log.append_batch(converted)
+    flight_data_log.close()
+    return len(converted)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 flight_log.py <log base path>")
+        sys.exit(1)
+    try:
+        print(f"Converted {convert_text_logs(sys.argv[1])} records")
+    except FileExistsError as error:
+        print(error)
+        sys.exit(1)
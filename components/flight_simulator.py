@@ -0,0 +1,445 @@
+import math
+import sys
+import time as timing
+import types
+import numpy as array_utils
+
+from components import replay_standins as standins
+
+SIM_PHYSICS_STEP = 0.01           # seconds per kinematics integration step
+SIM_TELEMETRY_RATE = 10.0         # attribute updates per second, the default dronekit stream rate
+SIM_FRAME_RATE = 30.0             # camera frames per second
+SIM_DETECT_LATENCY = 0.05         # virtual seconds per detector call, roughly SSD-MobileNet-v2 on a Nano
+SIM_CAMERA_FOV = 62.2             # degrees, horizontal field of view of the IMX219 CSI camera
+
+SIM_MAX_YAW_RATE = 45.0           # deg/s the autopilot turns at for a MAV_CMD_CONDITION_YAW without a rate
+SIM_YAW_TIME_CONSTANT = 0.3       # seconds, first-order yaw response
+SIM_VELOCITY_TIME_CONSTANT = 0.5  # seconds, first-order velocity response
+SIM_MAX_ACCELERATION = 2.5        # m/s^2
+SIM_VELOCITY_TIMEOUT = 3.0        # seconds after which ArduCopter drops a guided velocity setpoint
+SIM_CLIMB_RATE = 1.5              # m/s during simple_takeoff
+SIM_LAND_SPEED = 0.5              # m/s in LAND mode
+SIM_BATTERY_DRAIN = 0.05          # percent per second while armed
+
+PERSON_HEIGHT = 1.7               # meters
+PERSON_WIDTH = 0.5                # meters
+PERSON_SPEED_RANGE = (0.6, 1.4)   # walking speeds in m/s
+PERSON_PAUSE_RANGE = (0.0, 3.0)   # seconds spent standing at each waypoint
+PERSON_AREA_RADIUS = 15.0         # meters around the start the waypoints are drawn from
+PERSON_WALK_DURATION = (30.0, 90.0)   # seconds before the person leaves the scene
+
+SIM_DETECTION_RANGE = 20.0        # meters beyond which the detector misses the person
+SIM_MISS_RATE = 0.02              # fraction of frames the detector misses a visible person
+SIM_BOX_NOISE = 3.0               # pixels of noise on every box edge
+SIM_MIN_VISIBLE = 0.3             # fraction of the box that must be inside the frame to be detected
+SIM_LIDAR_NOISE = 0.02            # meters
+SIM_LIDAR_DROPOUT = 0.01          # fraction of TF-mini frames reporting no return
+SIM_LIDAR_STRENGTH = 900.0        # signal strength of a return from the person
+
+
+class VirtualClock:
+    """
+    Simulated time with the monotonic, perf_counter, time and sleep functions
+    of the time module. Time only moves when the simulation advances it;
+    each advance is cut into fixed physics steps and every registered
+    listener is called after each step, so the world and the clock never
+    disagree. Sleeping advances the clock instead of blocking.
+    """
+
+    def __init__(self, step=SIM_PHYSICS_STEP):
+        self.step = step
+        self.now = 0.0
+        self.epoch = timing.time()
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """
+        Registers a function called after every physics step.
+        Args:
+            callback (callable): Function taking the new time and the step length in seconds.
+        """
+        self.listeners.append(callback)
+
+    def advance(self, duration):
+        """
+        Moves time forward, stepping the listeners on the way.
+        Args:
+            duration (float): Seconds to advance.
+        """
+        target_time = self.now + duration
+        while target_time - self.now > 1e-9:
+            step = min(self.step, target_time - self.now)
+            self.now += step
+            for listener in self.listeners:
+                listener(self.now, step)
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def monotonic_ns(self):
+        return int(self.now * 1e9)
+
+    def perf_counter_ns(self):
+        return int(self.now * 1e9)
+
+    def time(self):
+        return self.epoch + self.now
+
+    def sleep(self, duration):
+        self.advance(max(duration, 0.0))
+
+    def as_time_module(self):
+        """
+        Builds a module object that can stand in for the time module.
+        Returns:
+            module: The time module with its clocks and sleep replaced by this clock.
+        """
+        time_module = types.ModuleType("time")
+        time_module.__dict__.update({name: getattr(timing, name) for name in dir(timing) if not name.startswith("__")})
+        for name in ("monotonic", "perf_counter", "monotonic_ns", "perf_counter_ns", "time", "sleep"):
+            setattr(time_module, name, getattr(self, name))
+        return time_module
+
+
+def swap_time_modules(time_module, module_attributes):
+    """
+    Points the time alias of several modules at another time module.
+    Args:
+        time_module (module): Replacement, e.g. VirtualClock.as_time_module().
+        module_attributes (list): (module, attribute name) pairs, e.g. (lidar_module, 'timing').
+    Returns:
+        list: (module, attribute name, previous value) triples for restore_time_modules.
+    """
+    replaced = []
+    for module, attribute_name in module_attributes:
+        replaced.append((module, attribute_name, getattr(module, attribute_name)))
+        setattr(module, attribute_name, time_module)
+    return replaced
+
+
+def restore_time_modules(replaced):
+    """
+    Undoes swap_time_modules.
+    Args:
+        replaced (list): Triples returned by swap_time_modules.
+    """
+    for module, attribute_name, previous in reversed(replaced):
+        setattr(module, attribute_name, previous)
+
+
+def wrap_angle(angle):
+    """
+    Wraps angles into [-pi, pi).
+    Args:
+        angle (float): Angle in radians, or an ndarray of them.
+    Returns:
+        float: Equivalent angle in [-pi, pi), an ndarray for an ndarray.
+    """
+    return (angle + math.pi) % (2.0 * math.pi) - math.pi
+
+
+class SimulatedVehicle(standins.ReplayVehicle):
+    """
+    Stand-in dronekit Vehicle flying simple multirotor kinematics.
+    It obeys the messages uav_interface sends: a relative or absolute
+    MAV_CMD_CONDITION_YAW turns the heading towards its target at the
+    autopilot yaw rate, and a body-frame SET_POSITION_TARGET_LOCAL_NED
+    sets the velocity the vehicle accelerates towards until the guided
+    velocity timeout. simple_takeoff climbs to the requested altitude and
+    LAND mode descends and disarms on the ground. Attribute listeners are
+    called at the telemetry rate. The world frame is north, east, up.
+    """
+
+    def __init__(self, virtual_clock):
+        super().__init__()
+        self.virtual_clock = virtual_clock
+        self.version = "simulator"
+        self.armed = False
+        self.mode = types.SimpleNamespace(name="STABILIZE")
+        self.north = 0.0
+        self.east = 0.0
+        self.altitude = 0.0
+        self.yaw = 0.0
+        self.yaw_target = 0.0
+        self.yaw_rate = 0.0
+        self.velocity_ned = array_utils.zeros(3)
+        self.velocity_command = (0.0, 0.0, 0.0)
+        self.velocity_commanded_at = None
+        self.takeoff_altitude = None
+        self.battery_level = 100.0
+        self.landed_at = None
+        self.messages_received = 0
+        self.attribute_listeners = {}
+        self.next_telemetry = 0.0
+        self.publish_state()
+        virtual_clock.add_listener(self.step)
+
+    def send_mavlink(self, message):
+        self.messages_received += 1
+        if message.name == "COMMAND_LONG":
+            from dronekit import mavutil
+            if message.fields[2] != mavutil.mavlink.MAV_CMD_CONDITION_YAW:
+                return
+            turn = math.radians(message.param1)
+            if message.fields[7]:
+                self.yaw_target = wrap_angle(self.yaw + (turn if message.param3 >= 0 else -turn))
+            else:
+                self.yaw_target = wrap_angle(turn)
+        else:
+            self.velocity_command = (message.vx, message.vy, message.vz)
+            self.velocity_commanded_at = self.virtual_clock.monotonic()
+
+    def add_attribute_listener(self, attribute_name, callback):
+        self.attribute_listeners.setdefault(attribute_name, []).append(callback)
+
+    def remove_attribute_listener(self, attribute_name, callback):
+        if callback in self.attribute_listeners.get(attribute_name, []):
+            self.attribute_listeners[attribute_name].remove(callback)
+
+    def simple_takeoff(self, target_elevation):
+        if self.armed and self.mode.name == "GUIDED":
+            self.takeoff_altitude = target_elevation
+
+    def is_airborne(self):
+        """
+        Reports whether the vehicle is off the ground.
+        Returns:
+            bool: True above 5 cm.
+        """
+        return self.altitude > 0.05
+
+    def desired_velocity(self, now):
+        """
+        Works out the north, east, up velocity the autopilot is steering towards.
+        Args:
+            now (float): Current virtual time.
+        Returns:
+            ndarray: Desired velocity in m/s.
+        """
+        desired = array_utils.zeros(3)
+        if not self.armed:
+            return desired
+        if self.mode.name == "LAND":
+            desired[2] = -SIM_LAND_SPEED
+            return desired
+        if self.takeoff_altitude is not None:
+            desired[2] = max(-SIM_CLIMB_RATE, min(SIM_CLIMB_RATE, 2.0 * (self.takeoff_altitude - self.altitude)))
+        if self.velocity_commanded_at is not None and now - self.velocity_commanded_at <= SIM_VELOCITY_TIMEOUT and self.is_airborne():
+            forward, right, down = self.velocity_command
+            desired[0] = forward * math.cos(self.yaw) - right * math.sin(self.yaw)
+            desired[1] = forward * math.sin(self.yaw) + right * math.cos(self.yaw)
+            if down != 0:
+                desired[2] = -down
+        return desired
+
+    def step(self, now, duration):
+        """
+        Integrates the kinematics over one physics step and publishes
+        telemetry when it is due.
+        Args:
+            now (float): Virtual time at the end of the step.
+            duration (float): Step length in seconds.
+        """
+        if self.armed:
+            self.battery_level = max(0.0, self.battery_level - SIM_BATTERY_DRAIN * duration)
+            velocity_change = (self.desired_velocity(now) - self.velocity_ned) * min(1.0, duration / SIM_VELOCITY_TIME_CONSTANT)
+            change_limit = SIM_MAX_ACCELERATION * duration
+            change_size = float(array_utils.linalg.norm(velocity_change))
+            if change_size > change_limit:
+                velocity_change *= change_limit / change_size
+            self.velocity_ned += velocity_change
+            yaw_error = wrap_angle(self.yaw_target - self.yaw) if self.is_airborne() else 0.0
+            maximum_rate = math.radians(SIM_MAX_YAW_RATE)
+            self.yaw_rate = max(-maximum_rate, min(maximum_rate, yaw_error / SIM_YAW_TIME_CONSTANT))
+            self.yaw = wrap_angle(self.yaw + self.yaw_rate * duration)
+            self.north += self.velocity_ned[0] * duration
+            self.east += self.velocity_ned[1] * duration
+            self.altitude += self.velocity_ned[2] * duration
+            if self.altitude <= 0.0:
+                self.altitude = 0.0
+                self.velocity_ned[:] = 0.0
+                if self.mode.name == "LAND":
+                    self.armed = False
+                    self.landed_at = now
+        if now + 1e-9 >= self.next_telemetry:
+            self.next_telemetry = now + 1.0 / SIM_TELEMETRY_RATE
+            self.publish_state()
+            self.notify_listeners()
+
+    def publish_state(self):
+        """
+        Refreshes the dronekit-style attributes from the kinematic state.
+        """
+        self.attitude = types.SimpleNamespace(roll=0.0, pitch=0.0, yaw=self.yaw)
+        self.velocity = [float(self.velocity_ned[0]), float(self.velocity_ned[1]), float(-self.velocity_ned[2])]
+        self.battery = types.SimpleNamespace(voltage=13.2 + 3.6 * self.battery_level / 100.0, current=12.0 if self.armed else 0.0,
+                                             level=int(self.battery_level))
+        relative_frame = types.SimpleNamespace(lat=self.north / 111320.0, lon=self.east / 111320.0, alt=self.altitude)
+        self.location = types.SimpleNamespace(global_frame=relative_frame, global_relative_frame=relative_frame)
+
+    def notify_listeners(self):
+        """
+        Calls the attribute listeners with the current values.
+        """
+        for attribute_name, callbacks in self.attribute_listeners.items():
+            value = self
+            for part in attribute_name.split("."):
+                value = getattr(value, part)
+            for callback in list(callbacks):
+                callback(self, attribute_name, value)
+
+
+class SimulatedPerson:
+    """
+    A person walking between random waypoints around where they started,
+    pausing at each, who leaves the scene after the walk duration.
+    """
+
+    def __init__(self, random_source, north, east, walk_duration):
+        self.random_source = random_source
+        self.start = (north, east)
+        self.north = north
+        self.east = east
+        self.walk_duration = walk_duration
+        self.elapsed = 0.0
+        self.present = True
+        self.waypoint = None
+        self.speed = 0.0
+        self.pause_left = random_source.uniform(*PERSON_PAUSE_RANGE)
+
+    def step(self, now, duration):
+        """
+        Walks the person over one physics step.
+        Args:
+            now (float): Virtual time at the end of the step.
+            duration (float): Step length in seconds.
+        """
+        self.elapsed += duration
+        if self.elapsed >= self.walk_duration:
+            self.present = False
+        if not self.present:
+            return
+        if self.pause_left > 0:
+            self.pause_left -= duration
+            return
+        if self.waypoint is None:
+            bearing = self.random_source.uniform(-math.pi, math.pi)
+            reach = PERSON_AREA_RADIUS * math.sqrt(self.random_source.uniform())
+            self.waypoint = (self.start[0] + reach * math.cos(bearing), self.start[1] + reach * math.sin(bearing))
+            self.speed = self.random_source.uniform(*PERSON_SPEED_RANGE)
+        to_north, to_east = self.waypoint[0] - self.north, self.waypoint[1] - self.east
+        remaining = math.hypot(to_north, to_east)
+        travel = self.speed * duration
+        if travel >= remaining:
+            self.north, self.east = self.waypoint
+            self.waypoint = None
+            self.pause_left = self.random_source.uniform(*PERSON_PAUSE_RANGE)
+            return
+        self.north += to_north / remaining * travel
+        self.east += to_east / remaining * travel
+
+
+class SimulatedScene:
+    """
+    Live scenario for the replay stand-ins. The camera, detector and
+    serial stand-ins read it like a recorded ReplayScenario, but every
+    captured frame waits in virtual time for the next camera frame, every
+    detector call takes the detection latency, and the boxes and TF-mini
+    ranges are measured from the simulated vehicle and person. The vehicle
+    is handed to replay_connect. Ground truth is recorded per frame.
+    """
+
+    def __init__(self, virtual_clock, random_source, walk_duration=None, frame_size=standins.REPLAY_FRAME_SIZE,
+                 frame_rate=SIM_FRAME_RATE, detect_latency=SIM_DETECT_LATENCY):
+        self.scenario_name = "simulated"
+        self.tick_count = sys.maxsize
+        self.network_fps = 1.0 / detect_latency
+        self.virtual_clock = virtual_clock
+        self.random_source = random_source
+        self.frame_size = frame_size
+        self.frame_interval = 1.0 / frame_rate
+        self.detect_latency = detect_latency
+        self.focal_length = frame_size[0] / 2.0 / math.tan(math.radians(SIM_CAMERA_FOV) / 2.0)
+        self.frame = array_utils.full((frame_size[1], frame_size[0], 3), 40, dtype=array_utils.uint8)
+        self.vehicle = SimulatedVehicle(virtual_clock)
+        if walk_duration is None:
+            walk_duration = random_source.uniform(*PERSON_WALK_DURATION)
+        self.person = SimulatedPerson(random_source, random_source.uniform(3.0, 6.0), random_source.uniform(-1.0, 1.0), walk_duration)
+        virtual_clock.add_listener(self.person.step)
+        self.phase = "launch"
+        self.tick_boxes = []
+        self.ground_truth = []
+
+    def person_relative(self):
+        """
+        Locates the person in the vehicle's body frame.
+        Returns:
+            tuple: Forward and rightward distance in meters.
+        """
+        to_north = self.person.north - self.vehicle.north
+        to_east = self.person.east - self.vehicle.east
+        forward = to_north * math.cos(self.vehicle.yaw) + to_east * math.sin(self.vehicle.yaw)
+        right = -to_north * math.sin(self.vehicle.yaw) + to_east * math.cos(self.vehicle.yaw)
+        return forward, right
+
+    def measure_boxes(self):
+        """
+        Projects the person through the pinhole camera as the detector would report them.
+        Returns:
+            list: Zero or one (left, top, right, bottom) box in pixels, clipped to the frame.
+        """
+        forward, right = self.person_relative()
+        if not self.person.present or forward < 0.3 or math.hypot(forward, right) > SIM_DETECTION_RANGE:
+            return []
+        if self.random_source.uniform() < SIM_MISS_RATE:
+            return []
+        center_x, center_y = self.frame_size[0] / 2.0, self.frame_size[1] / 2.0
+        scale = self.focal_length / forward
+        edges = array_utils.array([center_x + (right - PERSON_WIDTH / 2.0) * scale,
+                                   center_y - (PERSON_HEIGHT - self.vehicle.altitude) * scale,
+                                   center_x + (right + PERSON_WIDTH / 2.0) * scale,
+                                   center_y + self.vehicle.altitude * scale])
+        edges += self.random_source.normal(0.0, SIM_BOX_NOISE, 4)
+        clipped = array_utils.clip(edges, 0.0, [self.frame_size[0], self.frame_size[1]] * 2)
+        box_area = (edges[2] - edges[0]) * (edges[3] - edges[1])
+        if box_area <= 0 or (clipped[2] - clipped[0]) * (clipped[3] - clipped[1]) < SIM_MIN_VISIBLE * box_area:
+            return []
+        return [tuple(float(edge) for edge in clipped)]
+
+    def measure_range(self):
+        """
+        Casts the TF-mini beam along the camera axis.
+        Returns:
+            tuple: (distance in meters, signal strength); (0, 0) without a return.
+        """
+        forward, right = self.person_relative()
+        on_person = self.person.present and forward > 0 and abs(right) <= PERSON_WIDTH / 2.0 and self.vehicle.altitude <= PERSON_HEIGHT
+        if not on_person or self.random_source.uniform() < SIM_LIDAR_DROPOUT:
+            return 0.0, 0.0
+        return max(0.0, forward + self.random_source.normal(0.0, SIM_LIDAR_NOISE)), SIM_LIDAR_STRENGTH
+
+    def record_ground_truth(self):
+        """
+        Stores the true distance and bearing of the person at the current frame.
+        """
+        forward, right = self.person_relative()
+        self.ground_truth.append((self.virtual_clock.monotonic(), self.phase, self.person.present,
+                                  math.hypot(forward, right), math.degrees(math.atan2(right, forward))))
+
+    def frame_at(self, tick_index):
+        # The camera delivers frames on a fixed grid, so a capture waits for the next one
+        next_frame = math.floor(self.virtual_clock.monotonic() / self.frame_interval + 1e-6) * self.frame_interval + self.frame_interval
+        self.virtual_clock.advance(next_frame - self.virtual_clock.monotonic())
+        self.tick_boxes = self.measure_boxes()
+        self.record_ground_truth()
+        return self.frame
+
+    def boxes_at(self, tick_index):
+        self.virtual_clock.sleep(self.detect_latency)
+        return self.tick_boxes
+
+    def lidar_at(self, sample_index):
+        return self.measure_range()
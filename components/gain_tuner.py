@@ -0,0 +1,397 @@
+import collections
+import concurrent.futures
+import json
+import math
+import os
+import numpy as array_utils
+
+from components import flight_log as flight_recorder
+from components import flight_simulator as simulator
+from components import replay_standins as standins
+
+TUNING_CHANNELS = ("rotation", "steering")
+TUNING_DURATION = 12.0           # seconds simulated per target-motion profile
+TUNING_CONTROL_RATE = 15.0       # regulation ticks per second, the pursuit loop rate with a 50 ms detector
+TUNING_DELAY = 0.08              # seconds from capture to command
+TUNING_CHUNK_SIZE = 2048         # gain combinations simulated together in one array
+TUNING_WORKERS = os.cpu_count() or 1
+SETTLE_WINDOW = 5.0              # seconds after the start in which overshoot and settling are measured
+SETTLE_FRACTION = 0.05           # settled once the error stays within this fraction of the initial error
+SETTLE_BANDS = {"rotation": 20.0, "steering": 0.1}       # ... or within this many pixels / meters
+MEASUREMENT_NOISE = {"rotation": 3.0, "steering": 0.03}  # pixels / meters of noise added to every measurement
+FOLLOW_DISTANCE = 1.5            # meters kept to the person, THRESHOLD_RANGE in follow_main
+RECORDED_SEGMENT_GAP = 1.0       # seconds without regulation that split a logged pursuit into segments
+RECORDED_MIN_DURATION = 2.0      # seconds, shorter logged segments are skipped
+
+# Gains of the hand-tuned defaults, as (P, I, D, output limit) grids around them
+DEFAULT_GAIN_GRIDS = {
+    "rotation": (array_utils.linspace(0.05, 1.5, 30), (0.0, 0.02, 0.05, 0.1, 0.2, 0.4), (0.0, 0.005, 0.01, 0.02, 0.05), (10.0, 20.0, 30.0, 45.0)),
+    "steering": (array_utils.linspace(0.05, 1.5, 30), (0.0, 0.02, 0.05, 0.1, 0.2), (0.0, 0.05, 0.1, 0.2, 0.4), (1.0, 2.0, 3.0)),
+}
+
+SCORE_NAMES = ("overshoot", "settling_time", "effort", "rms_error")
+PARETO_SCORES = ("overshoot", "settling_time", "effort")
+
+PlantModel = collections.namedtuple("PlantModel", [
+    "control_interval", "delay_ticks", "physics_step",
+    "yaw_time_constant", "max_yaw_rate", "focal_length", "frame_width",
+    "velocity_time_constant", "max_acceleration", "follow_distance",
+])
+
+TargetProfile = collections.namedtuple("TargetProfile", ["profile_name", "reference", "noise"])
+
+
+def build_plant_model(control_rate=TUNING_CONTROL_RATE, delay=TUNING_DELAY, frame_width=standins.REPLAY_FRAME_SIZE[0],
+                      follow_distance=FOLLOW_DISTANCE):
+    """
+    Describes the vehicle the gains are tuned for, with the yaw and velocity
+    response of the closed-loop simulator.
+    Args:
+        control_rate (float): Regulation ticks per second.
+        delay (float): Seconds from capture to command.
+        frame_width (int): Camera image width in pixels.
+        follow_distance (float): Distance in meters the steering channel holds.
+    Returns:
+        PlantModel: Plant description.
+    """
+    control_interval = 1.0 / control_rate
+    return PlantModel(
+        control_interval=control_interval,
+        delay_ticks=int(round(delay / control_interval)),
+        physics_step=min(simulator.SIM_PHYSICS_STEP * 2, control_interval),
+        yaw_time_constant=simulator.SIM_YAW_TIME_CONSTANT,
+        max_yaw_rate=math.radians(simulator.SIM_MAX_YAW_RATE),
+        focal_length=frame_width / 2.0 / math.tan(math.radians(simulator.SIM_CAMERA_FOV) / 2.0),
+        frame_width=frame_width,
+        velocity_time_constant=simulator.SIM_VELOCITY_TIME_CONSTANT,
+        max_acceleration=simulator.SIM_MAX_ACCELERATION,
+        follow_distance=follow_distance,
+    )
+
+
+def build_gain_grid(proportional_values, integral_values, derivative_values, limit_values):
+    """
+    Forms every combination of the given gains.
+    Args:
+        proportional_values (sequence): P gains.
+        integral_values (sequence): I gains.
+        derivative_values (sequence): D gains.
+        limit_values (sequence): Output limits.
+    Returns:
+        ndarray: Combinations of shape (N, 4), columns P, I, D and output limit.
+    """
+    grids = array_utils.meshgrid(proportional_values, integral_values, derivative_values, limit_values, indexing="ij")
+    return array_utils.stack([grid.ravel() for grid in grids], axis=1).astype(array_utils.float64)
+
+
+def generate_target_profiles(channel, plant, duration=TUNING_DURATION, seed=0):
+    """
+    Builds the target-motion model: where the person is over time, as a
+    bearing in radians for the rotation channel or as a distance along the
+    line of sight in meters for the steering channel.
+    Profiles start off target like an acquisition, then cover a standing,
+    crossing or weaving person.
+    Args:
+        channel (str): 'rotation' or 'steering'.
+        plant (PlantModel): Plant the profiles are sampled for.
+        duration (float): Seconds per profile.
+        seed (int): Seed of the measurement noise.
+    Returns:
+        list: TargetProfile records.
+    """
+    random_source = array_utils.random.RandomState(seed)
+    tick_times = array_utils.arange(int(duration / plant.control_interval)) * plant.control_interval
+    if channel == "rotation":
+        references = {
+            "step": array_utils.full(len(tick_times), math.radians(15.0)),
+            "crossing": array_utils.arctan2(1.0 * tick_times - 2.0, 4.0),
+            "weave": math.radians(10.0) + math.radians(12.0) * array_utils.sin(0.8 * tick_times),
+        }
+    else:
+        references = {
+            "step": array_utils.full(len(tick_times), 5.0),
+            "walk_away": 3.0 + 1.2 * array_utils.minimum(tick_times, 6.0),
+            "approach": array_utils.maximum(6.0 - 1.0 * tick_times, 2.5),
+            "weave": 3.0 + array_utils.sin(0.5 * tick_times),
+        }
+    return [TargetProfile(profile_name, reference, random_source.normal(0.0, MEASUREMENT_NOISE[channel], len(tick_times)))
+            for profile_name, reference in references.items()]
+
+
+class BatchedPID:
+    """
+    Many PID regulators stepped together, one per gain combination, with
+    the arithmetic of simple_pid: proportional on error, integral clamped
+    to the output limits and derivative on the measurement.
+    """
+
+    def __init__(self, gains):
+        self.proportional, self.integral, self.derivative, self.limit = (gains[:, column] for column in range(4))
+        self.integral_term = array_utils.zeros(len(gains))
+        self.last_input = None
+
+    def __call__(self, measured, dt):
+        error = -measured
+        self.integral_term = array_utils.clip(self.integral_term + self.integral * error * dt, -self.limit, self.limit)
+        output = self.proportional * error + self.integral_term
+        if self.last_input is not None:
+            output -= self.derivative * (measured - self.last_input) / dt
+        self.last_input = measured
+        return array_utils.clip(output, -self.limit, self.limit)
+
+
+def simulate_channel(channel, gains, profile, plant):
+    """
+    Flies one target-motion profile with every gain combination at once.
+    The measurement reaching each regulator is delay_ticks old and noisy;
+    the command is applied like flight_controller does (negated regulator
+    output) to the yaw or forward-velocity response of the plant.
+    Args:
+        channel (str): 'rotation' or 'steering'.
+        gains (ndarray): Combinations of shape (N, 4).
+        profile (TargetProfile): Target motion.
+        plant (PlantModel): Vehicle response.
+    Returns:
+        ndarray: Scores of shape (N, 4) in SCORE_NAMES order.
+    """
+    candidate_count = len(gains)
+    regulator = BatchedPID(gains)
+    state = array_utils.zeros(candidate_count)      # yaw in radians, or position along the line of sight
+    state_rate = array_utils.zeros(candidate_count)  # forward velocity for steering
+    command_target = array_utils.zeros(candidate_count)
+    measurements = collections.deque(maxlen=plant.delay_ticks + 1)
+    half_width = plant.frame_width / 2.0
+    substeps = max(1, int(round(plant.control_interval / plant.physics_step)))
+    substep = plant.control_interval / substeps
+    settle_ticks = int(SETTLE_WINDOW / plant.control_interval)
+    initial_error = None
+    peak_opposite = array_utils.zeros(candidate_count)
+    last_unsettled = array_utils.zeros(candidate_count)
+    squared_command = array_utils.zeros(candidate_count)
+    squared_error = array_utils.zeros(candidate_count)
+    for tick, target in enumerate(profile.reference):
+        if channel == "rotation":
+            error = plant.focal_length * array_utils.tan(array_utils.clip(simulator.wrap_angle(target - state), -1.2, 1.2))
+            error = array_utils.clip(error, -half_width, half_width)
+        else:
+            error = target - state - plant.follow_distance
+        measurements.append(error + profile.noise[tick])
+        command = -regulator(measurements[0], plant.control_interval)
+        if initial_error is None:
+            initial_error = error.copy()
+            band = array_utils.maximum(SETTLE_FRACTION * array_utils.abs(initial_error), SETTLE_BANDS[channel])
+        if tick < settle_ticks:
+            peak_opposite = array_utils.maximum(peak_opposite, -array_utils.sign(initial_error) * error)
+            last_unsettled = array_utils.where(array_utils.abs(error) > band, tick + 1, last_unsettled)
+        squared_command += command * command
+        squared_error += error * error
+        if channel == "rotation":
+            command_target = state + array_utils.radians(command)
+            for step in range(substeps):
+                yaw_rate = array_utils.clip(simulator.wrap_angle(command_target - state) / plant.yaw_time_constant,
+                                            -plant.max_yaw_rate, plant.max_yaw_rate)
+                state = state + yaw_rate * substep
+        else:
+            for step in range(substeps):
+                velocity_change = (command - state_rate) * min(1.0, substep / plant.velocity_time_constant)
+                limit = plant.max_acceleration * substep
+                state_rate = state_rate + array_utils.clip(velocity_change, -limit, limit)
+                state = state + state_rate * substep
+    tick_count = len(profile.reference)
+    overshoot = array_utils.where(array_utils.abs(initial_error) > band, peak_opposite / array_utils.maximum(array_utils.abs(initial_error), 1e-9), 0.0)
+    return array_utils.stack([
+        overshoot,
+        last_unsettled * plant.control_interval,
+        array_utils.sqrt(squared_command / tick_count),
+        array_utils.sqrt(squared_error / tick_count),
+    ], axis=1)
+
+
+def evaluate_gain_chunk(channel, gains, profiles, plant):
+    """
+    Scores gain combinations over every profile; runs in a worker process.
+    Args:
+        channel (str): 'rotation' or 'steering'.
+        gains (ndarray): Combinations of shape (N, 4).
+        profiles (list): TargetProfile records.
+        plant (PlantModel): Vehicle response.
+    Returns:
+        ndarray: Scores of shape (N, 4), averaged over the profiles.
+    """
+    return array_utils.mean([simulate_channel(channel, gains, profile, plant) for profile in profiles], axis=0)
+
+
+def evaluate_gains(channel, gains, profiles, plant, worker_count=TUNING_WORKERS, chunk_size=TUNING_CHUNK_SIZE):
+    """
+    Scores all gain combinations, in chunks spread over a process pool.
+    Args:
+        channel (str): 'rotation' or 'steering'.
+        gains (ndarray): Combinations of shape (N, 4).
+        profiles (list): TargetProfile records.
+        plant (PlantModel): Vehicle response.
+        worker_count (int): Processes, 1 to score in this process.
+        chunk_size (int): Combinations simulated together.
+    Returns:
+        ndarray: Scores of shape (N, 4) in SCORE_NAMES order.
+    """
+    chunk_size = min(chunk_size, max(1, -(-len(gains) // max(worker_count, 1))))
+    gain_chunks = [gains[start:start + chunk_size] for start in range(0, len(gains), chunk_size)]
+    if worker_count <= 1:
+        return array_utils.concatenate([evaluate_gain_chunk(channel, gain_chunk, profiles, plant) for gain_chunk in gain_chunks])
+    with concurrent.futures.ProcessPoolExecutor(worker_count) as tuning_pool:
+        chunk_scores = tuning_pool.map(evaluate_gain_chunk, [channel] * len(gain_chunks), gain_chunks,
+                                       [profiles] * len(gain_chunks), [plant] * len(gain_chunks))
+        return array_utils.concatenate(list(chunk_scores))
+
+
+def find_pareto_set(objectives, block_size=256):
+    """
+    Finds the combinations no other combination beats on every objective.
+    Of combinations with identical objectives only the first is kept.
+    Args:
+        objectives (ndarray): Values to minimise, shape (N, K).
+        block_size (int): Rows compared against all others at once.
+    Returns:
+        ndarray: Indices of the non-dominated rows.
+    """
+    dominated = array_utils.zeros(len(objectives), dtype=bool)
+    for start in range(0, len(objectives), block_size):
+        block = objectives[start:start + block_size, None, :]
+        no_worse = array_utils.all(objectives[None, :, :] <= block, axis=2)
+        better = array_utils.any(objectives[None, :, :] < block, axis=2)
+        dominated[start:start + block_size] = array_utils.any(no_worse & better, axis=1)
+    pareto_indices = array_utils.flatnonzero(~dominated)
+    unique_rows, first_indices = array_utils.unique(objectives[pareto_indices], axis=0, return_index=True)
+    return array_utils.sort(pareto_indices[first_indices])
+
+
+def rank_pareto_set(scores, pareto_indices):
+    """
+    Orders a Pareto set from the most balanced combination outwards: each
+    objective is scaled to 0-1 over the set and the scaled values are summed.
+    Args:
+        scores (ndarray): Scores of shape (N, 4).
+        pareto_indices (ndarray): Indices returned by find_pareto_set.
+    Returns:
+        ndarray: The indices, best balanced first.
+    """
+    objectives = scores[pareto_indices][:, [SCORE_NAMES.index(name) for name in PARETO_SCORES]]
+    spread = objectives.max(axis=0) - objectives.min(axis=0)
+    scaled = (objectives - objectives.min(axis=0)) / array_utils.where(spread > 0, spread, 1.0)
+    return pareto_indices[array_utils.argsort(scaled.sum(axis=1), kind="stable")]
+
+
+def read_recorded_profiles(log_paths, channel, plant):
+    """
+    Recovers target motion from pursuits in flight logs. The plant is
+    flown with the logged commands to reconstruct the vehicle's yaw or
+    position, and the logged error is added back to it, so the person's
+    path can be replayed against other gains. The logged error is the
+    fused estimate the regulator acted on, so the recovered path carries
+    the estimator's lag and jumps.
+    Args:
+        log_paths (list): Binary flight logs written by FlightDataLog.
+        channel (str): 'rotation' or 'steering'.
+        plant (PlantModel): Plant used for the reconstruction and the replay.
+    Returns:
+        list: TargetProfile records, one per logged pursuit segment.
+    """
+    input_field, output_field = ("rotation_input", "rotation_output") if channel == "rotation" else ("velocity_input", "velocity_output")
+    profiles = []
+    for log_path in log_paths:
+        records = flight_recorder.load_flight_log(log_path)
+        records = records[(records["phase"] == flight_recorder.PHASE_CODES["pursuit"]) & array_utils.isfinite(records[output_field])]
+        if len(records) == 0:
+            continue
+        record_times = records["timestamp"]
+        record_gaps = array_utils.diff(record_times)
+        segment_breaks = array_utils.flatnonzero((record_gaps > RECORDED_SEGMENT_GAP) | (record_gaps < 0)) + 1
+        segment_starts = array_utils.concatenate(([0], segment_breaks, [len(records)]))
+        for segment_index, (start, end) in enumerate(zip(segment_starts[:-1], segment_starts[1:])):
+            segment = records[start:end]
+            if segment["timestamp"][-1] - segment["timestamp"][0] < RECORDED_MIN_DURATION:
+                continue
+            tick_times = array_utils.arange(segment["timestamp"][0], segment["timestamp"][-1], plant.control_interval)
+            errors = array_utils.interp(tick_times, segment["timestamp"], segment[input_field].astype(array_utils.float64))
+            commands = array_utils.interp(tick_times, segment["timestamp"], segment[output_field].astype(array_utils.float64))
+            vehicle_path = reconstruct_vehicle_path(channel, commands, plant)
+            if channel == "rotation":
+                reference = vehicle_path + array_utils.arctan(errors / plant.focal_length)
+            else:
+                reference = vehicle_path + errors + plant.follow_distance
+            profiles.append(TargetProfile(f"{os.path.basename(log_path)}:{segment_index}", reference, array_utils.zeros(len(reference))))
+    return profiles
+
+
+def reconstruct_vehicle_path(channel, commands, plant):
+    """
+    Flies the plant with a logged command sequence.
+    Args:
+        channel (str): 'rotation' or 'steering'.
+        commands (ndarray): Command per control tick.
+        plant (PlantModel): Vehicle response.
+    Returns:
+        ndarray: Yaw in radians or position in meters at each tick, before the command of that tick.
+    """
+    state, state_rate = 0.0, 0.0
+    substeps = max(1, int(round(plant.control_interval / plant.physics_step)))
+    substep = plant.control_interval / substeps
+    vehicle_path = array_utils.empty(len(commands))
+    for tick, command in enumerate(commands):
+        vehicle_path[tick] = state
+        for step in range(substeps):
+            if channel == "rotation":
+                yaw_error = math.radians(command) - (state - vehicle_path[tick])
+                state += max(-plant.max_yaw_rate, min(plant.max_yaw_rate, yaw_error / plant.yaw_time_constant)) * substep
+            else:
+                velocity_change = (command - state_rate) * min(1.0, substep / plant.velocity_time_constant)
+                limit = plant.max_acceleration * substep
+                state_rate += max(-limit, min(limit, velocity_change))
+                state += state_rate * substep
+    return vehicle_path
+
+
+def tune_channel(channel, plant, gains=None, log_paths=None, worker_count=TUNING_WORKERS):
+    """
+    Sweeps a gain grid on one channel and keeps its Pareto set.
+    Args:
+        channel (str): 'rotation' or 'steering'.
+        plant (PlantModel): Vehicle response.
+        gains (ndarray): Combinations of shape (N, 4), DEFAULT_GAIN_GRIDS if None.
+        log_paths (list): Flight logs whose pursuits are used as target motion instead of the synthetic profiles.
+        worker_count (int): Processes.
+    Returns:
+        dict: Combination count, profile names and the ranked Pareto entries,
+            each with its gains and scores.
+    """
+    if channel not in TUNING_CHANNELS:
+        raise ValueError(f"Unknown tuning channel '{channel}', expected one of {TUNING_CHANNELS}")
+    if gains is None:
+        gains = build_gain_grid(*DEFAULT_GAIN_GRIDS[channel])
+    profiles = read_recorded_profiles(log_paths, channel, plant) if log_paths else generate_target_profiles(channel, plant)
+    if len(profiles) == 0:
+        raise ValueError(f"No pursuit segments with {channel} commands in {log_paths}")
+    scores = evaluate_gains(channel, gains, profiles, plant, worker_count)
+    pareto_objectives = scores[:, [SCORE_NAMES.index(name) for name in PARETO_SCORES]]
+    ranked_indices = rank_pareto_set(scores, find_pareto_set(pareto_objectives))
+    return {
+        "combinations": len(gains),
+        "profiles": [profile.profile_name for profile in profiles],
+        "pareto": [dict(zip(("proportional", "integral", "derivative", "output_limit"), (float(value) for value in gains[index])),
+                        **{score_name: float(score) for score_name, score in zip(SCORE_NAMES, scores[index])})
+                   for index in ranked_indices],
+    }
+
+
+def save_gain_set(gains_path, channel_results, plant):
+    """
+    Writes Pareto sets as the JSON file flight_controller.load_gain_set reads.
+    Args:
+        gains_path (str): Output path.
+        channel_results (dict): Channel name mapped to the result of tune_channel.
+        plant (PlantModel): Plant the gains were tuned for.
+    """
+    gain_set = {"plant": plant._asdict()}
+    gain_set.update(channel_results)
+    with open(gains_path, "w") as gains_file:
+        json.dump(gain_set, gains_file, indent=1)
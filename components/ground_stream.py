@@ -0,0 +1,580 @@
+import collections
+import socket
+import struct
+import threading as worker_threads
+import time as timing
+import numpy as array_utils
+from components import stage_timing as stage_timer
+
+STREAM_TRANSPORTS = ("udp", "http")
+STREAM_PORT = 5600
+STREAM_BITRATE = 2000000                 # bits per second the ground link can carry
+STREAM_FRAME_RATE = 15.0                 # frames per second sent at most
+STREAM_QUEUE_LENGTH = 2                  # frames waiting for the encoder; older ones are dropped
+STREAM_QUALITY_RANGE = (30, 85)          # JPEG quality limits
+STREAM_QUALITY_STEP = 5
+STREAM_SCALES = (1.0, 0.75, 0.5, 0.35, 0.25)   # resolution steps tried once quality is at its minimum
+STREAM_UNDERSHOOT = 0.5                  # frames below this share of the budget raise the quality
+STREAM_OVERSHOOT = 2.0                   # frames above this multiple of the budget lower the resolution at once
+STREAM_CLIENT_TIMEOUT = 5.0              # seconds without a hello or ack before a UDP client is dropped
+STREAM_SOCKET_TIMEOUT = 0.2
+UDP_PAYLOAD_SIZE = 1400                  # fragment size that fits an Ethernet MTU with headers
+
+FRAME_MAGIC = b"UAVF"
+ACK_MAGIC = b"UAVA"
+HELLO_MAGIC = b"UAVH"
+FRAME_HEADER = struct.Struct("!4sIHHdd")   # magic, frame id, fragment index, fragment count, capture stamp, capture wall time
+ACK_MESSAGE = struct.Struct("!4sId")       # magic, frame id, capture stamp echoed back
+MULTIPART_BOUNDARY = "uavframe"
+
+
+def encode_jpeg(frame_data, quality, scale=1.0):
+    """
+    Encodes a frame as JPEG.
+    Args:
+        frame_data (ndarray): BGR image.
+        quality (int): JPEG quality.
+        scale (float): Resolution factor applied before encoding.
+    Returns:
+        bytes: JPEG data.
+    """
+    import cv2 as vision_lib
+    if scale < 1.0:
+        frame_data = vision_lib.resize(frame_data, None, fx=scale, fy=scale, interpolation=vision_lib.INTER_AREA)
+    encoded, jpeg_data = vision_lib.imencode(".jpg", frame_data, [vision_lib.IMWRITE_JPEG_QUALITY, quality])
+    return jpeg_data.tobytes()
+
+
+class DropOldestQueue:
+    """
+    Bounded queue whose put never blocks: when full, the oldest item is
+    discarded to make room for the new one.
+    """
+
+    def __init__(self, maximum_length=STREAM_QUEUE_LENGTH):
+        self.items = collections.deque(maxlen=maximum_length)
+        self.item_ready = worker_threads.Condition()
+        self.dropped_count = 0
+
+    def put(self, item):
+        """
+        Adds an item, discarding the oldest one when the queue is full.
+        Args:
+            item: Item to add.
+        Returns:
+            bool: True if an older item was discarded.
+        """
+        with self.item_ready:
+            discarded = len(self.items) == self.items.maxlen
+            if discarded:
+                self.dropped_count += 1
+            self.items.append(item)
+            self.item_ready.notify()
+        return discarded
+
+    def take_newest(self, timeout=None):
+        """
+        Removes the newest item and discards the rest.
+        Args:
+            timeout (float): Seconds to wait for an item, None to wait forever.
+        Returns:
+            The newest item, or None when the wait timed out.
+        """
+        with self.item_ready:
+            if not self.items:
+                self.item_ready.wait_for(lambda: len(self.items) > 0, timeout)
+            if not self.items:
+                return None
+            newest_item = self.items.pop()
+            self.dropped_count += len(self.items)
+            self.items.clear()
+        return newest_item
+
+
+class BitrateController:
+    """
+    Picks JPEG quality and resolution so encoded frames fit a bitrate budget.
+    The first frame is calibrated: the highest quality and resolution whose
+    encoding fits the budget is searched for, so the stream starts within
+    it. After that a frame over its share of the budget lowers the quality a step; at the
+    lowest quality, or when the frame is far over budget, the resolution
+    steps down instead. Frames well under
+    the budget step the quality back up, and at the highest quality the
+    resolution.
+    """
+
+    def __init__(self, bitrate=STREAM_BITRATE, frame_rate=STREAM_FRAME_RATE, quality_range=STREAM_QUALITY_RANGE, scales=STREAM_SCALES):
+        self.frame_budget = bitrate / 8.0 / frame_rate
+        self.minimum_quality, self.maximum_quality = quality_range
+        self.scales = scales
+        self.quality = self.maximum_quality
+        self.scale_index = 0
+        self.calibrated = False
+
+    def calibrate(self, encoded_size):
+        """
+        Starts from the highest quality and resolution that fit the budget.
+        Qualities are searched in STREAM_QUALITY_STEP steps at each resolution, largest first.
+        Args:
+            encoded_size (callable): Called with a quality and a scale, returns the encoded size of the frame in bytes.
+        """
+        self.calibrated = True
+        qualities = list(range(self.maximum_quality, self.minimum_quality - 1, -STREAM_QUALITY_STEP))
+        for scale_index, scale in enumerate(self.scales):
+            if encoded_size(qualities[-1], scale) > self.frame_budget:
+                continue
+            # binary search for the highest quality that fits; the lowest one is known to
+            lowest_fitting, highest_failing = len(qualities) - 1, -1
+            while lowest_fitting - highest_failing > 1:
+                middle = (lowest_fitting + highest_failing) // 2
+                if encoded_size(qualities[middle], scale) <= self.frame_budget:
+                    lowest_fitting = middle
+                else:
+                    highest_failing = middle
+            self.scale_index, self.quality = scale_index, qualities[lowest_fitting]
+            return
+        self.scale_index, self.quality = len(self.scales) - 1, self.minimum_quality
+
+    def current_scale(self):
+        """
+        Obtains the resolution factor to encode at.
+        Returns:
+            float: Fraction of the full frame size.
+        """
+        return self.scales[self.scale_index]
+
+    def update(self, encoded_bytes):
+        """
+        Adjusts quality and resolution after a frame was encoded.
+        Args:
+            encoded_bytes (int): Size of the encoded frame.
+        """
+        middle_quality = (self.minimum_quality + self.maximum_quality) // 2
+        can_downscale = self.scale_index < len(self.scales) - 1
+        if encoded_bytes > self.frame_budget * STREAM_OVERSHOOT and can_downscale:
+            self.scale_index += 1
+        elif encoded_bytes > self.frame_budget:
+            if self.quality > self.minimum_quality:
+                self.quality = max(self.quality - STREAM_QUALITY_STEP, self.minimum_quality)
+            elif can_downscale:
+                self.scale_index += 1
+                self.quality = middle_quality
+        elif encoded_bytes < self.frame_budget * STREAM_UNDERSHOOT:
+            if self.quality < self.maximum_quality:
+                self.quality = min(self.quality + STREAM_QUALITY_STEP, self.maximum_quality)
+            elif self.scale_index > 0:
+                self.scale_index -= 1
+                self.quality = middle_quality
+
+
+class StreamClient:
+    """
+    A ground station receiving the stream, with its own delivery statistics.
+    For UDP clients the latency runs from capture to the client's
+    acknowledgement arriving back; for HTTP clients from capture until the
+    frame was handed to the socket.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.last_seen = timing.monotonic()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.latency_histogram = stage_timer.LatencyHistogram()
+        self.pending_frames = DropOldestQueue(1)
+        self.connection = None
+        self.sender = None
+
+    def record_latency(self, captured_at, now=None):
+        """
+        Records the delivery latency of one frame.
+        Args:
+            captured_at (float): Capture time of the frame (time.monotonic seconds).
+            now (float): Delivery time, the current time when None.
+        """
+        now = timing.monotonic() if now is None else now
+        self.latency_histogram.record(int(max(now - captured_at, 0.0) * 1e6))
+
+    def report_statistics(self):
+        """
+        Summarises delivery to this client.
+        Returns:
+            dict: Frames sent and dropped, bytes sent and p50/p99/max latency in milliseconds.
+        """
+        return {
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped + self.pending_frames.dropped_count,
+            "bytes_sent": self.bytes_sent,
+            "latency_p50_ms": self.latency_histogram.percentile(50) / 1000.0,
+            "latency_p99_ms": self.latency_histogram.percentile(99) / 1000.0,
+            "latency_max_ms": self.latency_histogram.maximum_value / 1000.0,
+        }
+
+
+class GroundStreamer:
+    """
+    Streams camera frames to ground stations as MJPEG, over UDP datagrams
+    or an HTTP multipart response.
+    submit only copies the frame into a short drop-oldest queue, so the
+    control loop never waits on encoding or on the network. A sender
+    thread encodes the newest frame at the frame rate, sized by the
+    BitrateController, and sends it to every client. UDP clients subscribe
+    with a hello datagram and acknowledge each complete frame; HTTP
+    clients each get a sender thread, so a slow one only loses its own frames.
+    """
+
+    def __init__(self, transport="udp", port=STREAM_PORT, bitrate=STREAM_BITRATE, frame_rate=STREAM_FRAME_RATE,
+                 queue_length=STREAM_QUEUE_LENGTH, destinations=(), bind_address="0.0.0.0"):
+        if transport not in STREAM_TRANSPORTS:
+            raise ValueError(f"Unknown stream transport '{transport}', expected one of {STREAM_TRANSPORTS}")
+        self.transport = transport
+        self.port = port
+        self.bind_address = bind_address
+        self.frame_interval = 1.0 / frame_rate
+        self.bitrate_control = BitrateController(bitrate, frame_rate)
+        self.frame_queue = DropOldestQueue(queue_length)
+        self.clients = {}
+        self.client_lock = worker_threads.Lock()
+        self.destinations = list(destinations)
+        self.stop_request = worker_threads.Event()
+        self.stream_socket = None
+        self.worker_threads = []
+        self.frame_id = 0
+        self.submitted_count = 0
+        self.encoded_count = 0
+        self.encoded_bytes = 0
+        self.started_at = None
+
+    def start(self):
+        """
+        Opens the socket and starts the sender threads.
+        """
+        self.stop_request.clear()
+        if self.transport == "udp":
+            self.stream_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.stream_socket.bind((self.bind_address, self.port))
+            for destination in self.destinations:
+                self.clients[destination] = StreamClient(destination)
+            receive_target = self._receive_udp_messages
+        else:
+            self.stream_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.stream_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.stream_socket.bind((self.bind_address, self.port))
+            self.stream_socket.listen()
+            receive_target = self._accept_http_clients
+        self.stream_socket.settimeout(STREAM_SOCKET_TIMEOUT)
+        self.port = self.stream_socket.getsockname()[1]
+        self.started_at = timing.monotonic()
+        for thread_name, thread_target in (("stream_send", self._send_frames), ("stream_receive", receive_target)):
+            worker_thread = worker_threads.Thread(target=thread_target, name=thread_name, daemon=True)
+            worker_thread.start()
+            self.worker_threads.append(worker_thread)
+        print(f"Ground stream ({self.transport}) on port {self.port}")
+
+    def submit(self, frame_data, captured_at=None):
+        """
+        Queues a frame for the ground stations without blocking.
+        Args:
+            frame_data (ndarray): BGR image; it is copied, so the caller may keep drawing on it.
+            captured_at (float): Capture time (time.monotonic seconds), now when None.
+        Returns:
+            bool: False if an older queued frame was dropped to make room.
+        """
+        self.submitted_count += 1
+        captured_at = timing.monotonic() if captured_at is None else captured_at
+        return not self.frame_queue.put((array_utils.array(frame_data, copy=True), captured_at))
+
+    def encode_frame(self, frame_data):
+        """
+        Encodes a frame at the current quality and resolution.
+        Args:
+            frame_data (ndarray): BGR image.
+        Returns:
+            bytes: JPEG data.
+        """
+        stage_started = stage_timer.stage_start()
+        if not self.bitrate_control.calibrated:
+            self.bitrate_control.calibrate(lambda quality, scale: len(encode_jpeg(frame_data, quality, scale)))
+        jpeg_bytes = encode_jpeg(frame_data, self.bitrate_control.quality, self.bitrate_control.current_scale())
+        stage_timer.stage_finish("stream_encode", stage_started)
+        self.bitrate_control.update(len(jpeg_bytes))
+        return jpeg_bytes
+
+    def _send_frames(self):
+        next_send = timing.monotonic()
+        while not self.stop_request.is_set():
+            delay = next_send - timing.monotonic()
+            if delay > 0 and self.stop_request.wait(delay):
+                break
+            queued_frame = self.frame_queue.take_newest(STREAM_SOCKET_TIMEOUT)
+            if queued_frame is None:
+                continue
+            frame_data, captured_at = queued_frame
+            jpeg_bytes = self.encode_frame(frame_data)
+            self.frame_id += 1
+            self.encoded_count += 1
+            self.encoded_bytes += len(jpeg_bytes)
+            next_send = max(next_send + self.frame_interval, timing.monotonic())
+            if self.transport == "udp":
+                self.send_datagrams(self.frame_id, jpeg_bytes, captured_at)
+            else:
+                with self.client_lock:
+                    http_clients = list(self.clients.values())
+                for stream_client in http_clients:
+                    stream_client.pending_frames.put((self.frame_id, jpeg_bytes, captured_at))
+
+    def send_datagrams(self, frame_id, jpeg_bytes, captured_at):
+        """
+        Sends one encoded frame to every UDP client as numbered fragments.
+        Args:
+            frame_id (int): Sequential frame number.
+            jpeg_bytes (bytes): Encoded frame.
+            captured_at (float): Capture time (time.monotonic seconds).
+        """
+        capture_wall_time = timing.time() - (timing.monotonic() - captured_at)
+        fragment_count = max(1, -(-len(jpeg_bytes) // UDP_PAYLOAD_SIZE))
+        datagrams = [FRAME_HEADER.pack(FRAME_MAGIC, frame_id, fragment_index, fragment_count, captured_at, capture_wall_time) +
+                     jpeg_bytes[fragment_index * UDP_PAYLOAD_SIZE:(fragment_index + 1) * UDP_PAYLOAD_SIZE]
+                     for fragment_index in range(fragment_count)]
+        now = timing.monotonic()
+        with self.client_lock:
+            for address, stream_client in list(self.clients.items()):
+                if address not in self.destinations and now - stream_client.last_seen > STREAM_CLIENT_TIMEOUT:
+                    print(f"Ground station {address} timed out")
+                    del self.clients[address]
+                    continue
+                try:
+                    for datagram in datagrams:
+                        self.stream_socket.sendto(datagram, address)
+                except OSError:
+                    stream_client.frames_dropped += 1
+                    continue
+                stream_client.frames_sent += 1
+                stream_client.bytes_sent += len(jpeg_bytes)
+
+    def _receive_udp_messages(self):
+        while not self.stop_request.is_set():
+            try:
+                message, address = self.stream_socket.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with self.client_lock:
+                stream_client = self.clients.get(address)
+                if message[:4] == HELLO_MAGIC and stream_client is None:
+                    print(f"Ground station {address} subscribed")
+                    stream_client = self.clients[address] = StreamClient(address)
+                if stream_client is None:
+                    continue
+                stream_client.last_seen = timing.monotonic()
+                if message[:4] == ACK_MAGIC and len(message) == ACK_MESSAGE.size:
+                    stream_client.record_latency(ACK_MESSAGE.unpack(message)[2], stream_client.last_seen)
+
+    def _accept_http_clients(self):
+        while not self.stop_request.is_set():
+            try:
+                connection, address = self.stream_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            stream_client = StreamClient(address)
+            stream_client.connection = connection
+            stream_client.sender = worker_threads.Thread(target=self._serve_http_client, args=(stream_client,),
+                                                         name=f"stream_client-{address[1]}", daemon=True)
+            stream_client.sender.start()
+
+    def _serve_http_client(self, stream_client):
+        connection = stream_client.connection
+        try:
+            connection.settimeout(STREAM_CLIENT_TIMEOUT)
+            request_data = b""
+            while b"\r\n\r\n" not in request_data:
+                request_chunk = connection.recv(1024)
+                if not request_chunk:
+                    return
+                request_data += request_chunk
+            connection.sendall(("HTTP/1.0 200 OK\r\nCache-Control: no-cache\r\n"
+                                f"Content-Type: multipart/x-mixed-replace; boundary={MULTIPART_BOUNDARY}\r\n\r\n").encode())
+            print(f"Ground station {stream_client.address} connected")
+            with self.client_lock:
+                self.clients[stream_client.address] = stream_client
+            while not self.stop_request.is_set():
+                queued_frame = stream_client.pending_frames.take_newest(STREAM_SOCKET_TIMEOUT)
+                if queued_frame is None:
+                    continue
+                frame_id, jpeg_bytes, captured_at = queued_frame
+                capture_wall_time = timing.time() - (timing.monotonic() - captured_at)
+                part_header = (f"--{MULTIPART_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg_bytes)}\r\n"
+                               f"X-Frame-Id: {frame_id}\r\nX-Capture-Time: {capture_wall_time:.6f}\r\n\r\n").encode()
+                connection.sendall(part_header + jpeg_bytes + b"\r\n")
+                stream_client.record_latency(captured_at)
+                stream_client.frames_sent += 1
+                stream_client.bytes_sent += len(jpeg_bytes)
+        except OSError as error:
+            print(f"Ground station {stream_client.address} disconnected: {error}")
+        finally:
+            connection.close()
+            with self.client_lock:
+                if self.clients.get(stream_client.address) is stream_client:
+                    del self.clients[stream_client.address]
+
+    def close(self):
+        """
+        Stops the sender threads and closes the socket.
+        """
+        self.stop_request.set()
+        for worker_thread in self.worker_threads:
+            worker_thread.join(STREAM_CLIENT_TIMEOUT)
+        self.worker_threads = []
+        with self.client_lock:
+            http_senders = [stream_client.sender for stream_client in self.clients.values() if stream_client.sender is not None]
+        for sender in http_senders:
+            sender.join(STREAM_CLIENT_TIMEOUT)
+        if self.stream_socket is not None:
+            self.stream_socket.close()
+            self.stream_socket = None
+
+    def report_statistics(self):
+        """
+        Summarises the stream.
+        Returns:
+            dict: Submitted, encoded and dropped frame counts, the encoded bitrate,
+                current quality and scale, and the statistics of each client under 'clients'.
+        """
+        running_time = timing.monotonic() - self.started_at if self.started_at is not None else 0.0
+        with self.client_lock:
+            client_reports = {f"{address[0]}:{address[1]}": stream_client.report_statistics() for address, stream_client in self.clients.items()}
+        return {
+            "submitted": self.submitted_count,
+            "encoded": self.encoded_count,
+            "dropped": self.frame_queue.dropped_count,
+            "bitrate": self.encoded_bytes * 8.0 / running_time if running_time > 0 else 0.0,
+            "quality": self.bitrate_control.quality,
+            "scale": self.bitrate_control.current_scale(),
+            "clients": client_reports,
+        }
+
+
+class UdpStreamReceiver:
+    """
+    Ground-station side of the UDP stream: subscribes, reassembles frames
+    from their fragments and acknowledges each complete frame. Frames with
+    a missing fragment are abandoned as soon as a newer frame completes.
+    """
+
+    def __init__(self, streamer_address, bind_address=("0.0.0.0", 0)):
+        self.streamer_address = streamer_address
+        self.receive_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receive_socket.bind(bind_address)
+        self.partial_frames = {}
+        self.last_hello = None
+        self.last_frame_id = 0
+        self.received_frames = 0
+        self.incomplete_frames = 0
+        self.latency_histogram = stage_timer.LatencyHistogram()
+
+    def subscribe(self):
+        """
+        Sends a hello so the streamer keeps sending to this receiver.
+        """
+        self.receive_socket.sendto(HELLO_MAGIC, self.streamer_address)
+        self.last_hello = timing.monotonic()
+
+    def receive_frame(self, timeout=1.0):
+        """
+        Waits for the next complete frame.
+        Args:
+            timeout (float): Seconds to wait.
+        Returns:
+            tuple: Frame id, JPEG bytes and capture-to-receive latency in seconds
+                (from the wall clocks of both ends), or None on timeout.
+        """
+        receive_deadline = timing.monotonic() + timeout
+        while True:
+            if self.last_hello is None or timing.monotonic() - self.last_hello > STREAM_CLIENT_TIMEOUT / 2:
+                self.subscribe()
+            time_left = receive_deadline - timing.monotonic()
+            if time_left <= 0:
+                return None
+            self.receive_socket.settimeout(min(time_left, STREAM_CLIENT_TIMEOUT / 2))
+            try:
+                datagram = self.receive_socket.recv(FRAME_HEADER.size + UDP_PAYLOAD_SIZE)
+            except socket.timeout:
+                continue
+            magic, frame_id, fragment_index, fragment_count, captured_at, capture_wall_time = FRAME_HEADER.unpack_from(datagram)
+            if magic != FRAME_MAGIC or frame_id <= self.last_frame_id:
+                continue
+            fragments = self.partial_frames.setdefault(frame_id, {})
+            fragments[fragment_index] = datagram[FRAME_HEADER.size:]
+            if len(fragments) < fragment_count:
+                continue
+            latency = timing.time() - capture_wall_time
+            self.receive_socket.sendto(ACK_MESSAGE.pack(ACK_MAGIC, frame_id, captured_at), self.streamer_address)
+            for stale_frame_id in [pending_id for pending_id in self.partial_frames if pending_id <= frame_id]:
+                if stale_frame_id != frame_id:
+                    self.incomplete_frames += 1
+                del self.partial_frames[stale_frame_id]
+            self.last_frame_id = frame_id
+            self.received_frames += 1
+            self.latency_histogram.record(int(max(latency, 0.0) * 1e6))
+            return frame_id, b"".join(fragments[index] for index in range(fragment_count)), latency
+
+    def close(self):
+        """
+        Closes the socket.
+        """
+        self.receive_socket.close()
+
+
+class HttpStreamReceiver:
+    """
+    Ground-station side of the HTTP multipart stream.
+    """
+
+    def __init__(self, streamer_address, timeout=STREAM_CLIENT_TIMEOUT):
+        self.connection = socket.create_connection(streamer_address, timeout)
+        self.connection.sendall(b"GET /stream HTTP/1.0\r\n\r\n")
+        self.stream_file = self.connection.makefile("rb")
+        self.received_frames = 0
+        self.latency_histogram = stage_timer.LatencyHistogram()
+        while self.stream_file.readline() not in (b"\r\n", b""):
+            pass
+
+    def receive_frame(self, timeout=1.0):
+        """
+        Reads the next part of the multipart response.
+        Args:
+            timeout (float): Seconds to wait.
+        Returns:
+            tuple: Frame id, JPEG bytes and capture-to-receive latency in seconds, or None on timeout.
+        """
+        self.connection.settimeout(timeout)
+        part_headers = {}
+        try:
+            header_line = self.stream_file.readline()
+            while header_line.strip() != f"--{MULTIPART_BOUNDARY}".encode():
+                if header_line == b"":
+                    return None
+                header_line = self.stream_file.readline()
+            header_line = self.stream_file.readline()
+            while header_line not in (b"\r\n", b""):
+                header_name, header_value = header_line.decode().split(":", 1)
+                part_headers[header_name.strip().lower()] = header_value.strip()
+                header_line = self.stream_file.readline()
+            jpeg_bytes = self.stream_file.read(int(part_headers["content-length"]))
+        except socket.timeout:
+            return None
+        latency = timing.time() - float(part_headers["x-capture-time"])
+        self.received_frames += 1
+        self.latency_histogram.record(int(max(latency, 0.0) * 1e6))
+        return int(part_headers["x-frame-id"]), jpeg_bytes, latency
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        self.stream_file.close()
+        self.connection.close()
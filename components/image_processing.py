@@ -1,7 +1,12 @@
-import cv2 as image_proc
 import argparse as opt_handler
 import sys as sys_ops
 import math as calc
+import numpy as array_utils
+from components import overlay_renderer as overlay
+
+MINIMUM_SHAPE_AREA = 100000.0    # contours smaller than this (in pixels) are ignored
+
+annotation_text = overlay.TextRasterCache()   # labels are rasterized once per distinct string
 
 def determine_midpoint(shape_data):
     """
@@ -11,6 +16,7 @@ def determine_midpoint(shape_data):
     Returns:
         tuple: Midpoint coordinates (x, y).
     """
+    import cv2 as image_proc
     shape_moments = image_proc.moments(shape_data)
     mid_x = int(shape_moments['m10'] / shape_moments['m00'])
     mid_y = int(shape_moments['m01'] / shape_moments['m00'])
@@ -55,56 +61,150 @@ def check_coordinate_in_region(coord, boundary_left, boundary_right, boundary_to
     else:
         return False
 
-def handle_frame_data(image_data):
+def measure_contour_geometry(shape_list):
     """
-    Processes the image data to identify and annotate shapes.
+    Computes the area and centroid of every contour in one vectorized pass.
+    Uses the same polygon moments as cv2.moments on a contour.
     Args:
-        image_data: Input image data.
+        shape_list (list): Contours as returned by findContours.
     Returns:
-        Annotated image data.
+        tuple: Areas (N,), centroids (N, 2) as floats (NaN for zero-area contours).
     """
-    monochrome = image_proc.cvtColor(image_data, image_proc.COLOR_BGR2GRAY)
-    shape_list, hierarchy_info = image_proc.findContours(monochrome, image_proc.RETR_EXTERNAL, image_proc.CHAIN_APPROX_SIMPLE)
+    if len(shape_list) == 0:
+        return array_utils.zeros(0), array_utils.zeros((0, 2))
+    point_counts = array_utils.fromiter((len(shape_item) for shape_item in shape_list), dtype=array_utils.intp, count=len(shape_list))
+    points = array_utils.concatenate(shape_list).reshape(-1, 2).astype(array_utils.float64)
+    segment_starts = array_utils.zeros(len(point_counts), dtype=array_utils.intp)
+    array_utils.cumsum(point_counts[:-1], out=segment_starts[1:])
 
-    image_midpoint = (round(image_data.shape[1] / 2), round(image_data.shape[0] / 2))
+    # Index of the following vertex, wrapping around within each contour
+    next_index = array_utils.arange(1, len(points) + 1)
+    next_index[segment_starts + point_counts - 1] = segment_starts
+    x_values, y_values = points[:, 0], points[:, 1]
+    x_next, y_next = x_values[next_index], y_values[next_index]
+    cross_terms = x_values * y_next - x_next * y_values
 
-    selected_shapes = []
-    for shape_item in shape_list:
-        shape_size = image_proc.contourArea(shape_item)
-        print(shape_size)
-        if shape_size > 100000.0:
-            selected_shapes.append(shape_item)
-
-    shape_counter = 0
-    chosen_target = ((image_midpoint[0], image_midpoint[1]), 0)
-    if len(selected_shapes) > 1:
-        for shape_item in selected_shapes:
-            shape_midpoint = determine_midpoint(shape_item)
-            if shape_counter == 0:
-                shape_midpoint = determine_midpoint(shape_item)
-                distance_measure = measure_distance(shape_midpoint, image_midpoint)
-                chosen_target = (shape_midpoint, distance_measure)
-            else:
-                current_measure = measure_distance(shape_midpoint, image_midpoint)
-                if abs(chosen_target[1]) > abs(current_measure):
-                    shape_midpoint = determine_midpoint(shape_item)
-                    chosen_target = (shape_midpoint, current_measure)
-            shape_counter += 1
-
-    elif len(selected_shapes) == 1:
-        shape_midpoint = determine_midpoint(selected_shapes[0])
-        distance_measure = measure_distance(shape_midpoint, image_midpoint)
-        chosen_target = (shape_midpoint, distance_measure)
+    doubled_area = array_utils.add.reduceat(cross_terms, segment_starts)
+    moment_x = array_utils.add.reduceat((x_values + x_next) * cross_terms, segment_starts)
+    moment_y = array_utils.add.reduceat((y_values + y_next) * cross_terms, segment_starts)
 
-    else:
-        image_proc.putText(image_data, "NO OBJECT", (50, 50), image_proc.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, image_proc.LINE_AA)
+    centroids = array_utils.full((len(point_counts), 2), array_utils.nan)
+    has_area = doubled_area != 0
+    centroids[has_area, 0] = moment_x[has_area] / (3.0 * doubled_area[has_area])
+    centroids[has_area, 1] = moment_y[has_area] / (3.0 * doubled_area[has_area])
+    return array_utils.abs(doubled_area) / 2.0, centroids
+
+def select_contour_target(shape_list, image_midpoint, minimum_area=MINIMUM_SHAPE_AREA):
+    """
+    Chooses the large contour whose centroid is closest to the image midpoint.
+    Args:
+        shape_list (list): Contours as returned by findContours.
+        image_midpoint (tuple): Image center (x, y).
+        minimum_area (float): Smallest contour area considered.
+    Returns:
+        tuple: Target midpoint (x, y), its distance to the image midpoint and
+        the indices of the contours above minimum_area. The midpoint itself with
+        distance 0 is returned when no contour qualifies.
+    """
+    areas, centroids = measure_contour_geometry(shape_list)
+    selected_indices = array_utils.flatnonzero(areas > minimum_area)
+    if len(selected_indices) == 0:
+        return (image_midpoint[0], image_midpoint[1]), 0, selected_indices
+    midpoints = array_utils.trunc(centroids[selected_indices])
+    distances = array_utils.hypot(midpoints[:, 0] - image_midpoint[0], midpoints[:, 1] - image_midpoint[1])
+    closest = int(array_utils.argmin(distances))
+    return (int(midpoints[closest, 0]), int(midpoints[closest, 1])), float(distances[closest]), selected_indices
+
+def select_frame_targets(frame_stack, minimum_area=MINIMUM_SHAPE_AREA):
+    """
+    Chooses the contour target of every frame in a batch.
+    Contours of all frames are measured together in one vectorized pass.
+    Args:
+        frame_stack (ndarray): BGR frames shaped (N, height, width, 3).
+        minimum_area (float): Smallest contour area considered.
+    Returns:
+        tuple: Targets (N, 2) int, distances (N,) float and a found mask (N,) bool.
+        Frames without a qualifying contour get the image midpoint and distance 0.
+    """
+    import cv2 as image_proc
+    frame_count, frame_height, frame_width = frame_stack.shape[:3]
+    image_midpoint = (round(frame_width / 2), round(frame_height / 2))
+    all_shapes = []
+    shape_frame_ids = []
+    for frame_index in range(frame_count):
+        monochrome = image_proc.cvtColor(frame_stack[frame_index], image_proc.COLOR_BGR2GRAY)
+        shape_list, hierarchy_info = image_proc.findContours(monochrome, image_proc.RETR_EXTERNAL, image_proc.CHAIN_APPROX_SIMPLE)
+        all_shapes.extend(shape_list)
+        shape_frame_ids.append(array_utils.full(len(shape_list), frame_index, dtype=array_utils.intp))
+
+    targets = array_utils.tile(array_utils.array(image_midpoint, dtype=array_utils.int64), (frame_count, 1))
+    distances = array_utils.zeros(frame_count)
+    found = array_utils.zeros(frame_count, dtype=bool)
+    if len(all_shapes) == 0:
+        return targets, distances, found
+
+    areas, centroids = measure_contour_geometry(all_shapes)
+    frame_ids = array_utils.concatenate(shape_frame_ids)
+    selected = areas > minimum_area
+    if not array_utils.any(selected):
+        return targets, distances, found
+    frame_ids = frame_ids[selected]
+    midpoints = array_utils.trunc(centroids[selected])
+    shape_distances = array_utils.hypot(midpoints[:, 0] - image_midpoint[0], midpoints[:, 1] - image_midpoint[1])
+
+    # Sort by frame, then distance; the stable sort keeps the first contour on ties
+    order = array_utils.lexsort((shape_distances, frame_ids))
+    winning_frames, first_positions = array_utils.unique(frame_ids[order], return_index=True)
+    winners = order[first_positions]
+    targets[winning_frames] = midpoints[winners].astype(array_utils.int64)
+    distances[winning_frames] = shape_distances[winners]
+    found[winning_frames] = True
+    return targets, distances, found
+
+def annotate_contour_target(image_data, chosen_target, image_midpoint, selected_shapes):
+    """
+    Draws the chosen target, its offset line and the selected contours.
+    Args:
+        image_data: Image to draw on.
+        chosen_target (tuple): Target midpoint (x, y) and its distance.
+        image_midpoint (tuple): Image center (x, y).
+        selected_shapes (list): Contours above the area threshold.
+    Returns:
+        Annotated image data.
+    """
+    import cv2 as image_proc
+    if len(selected_shapes) == 0:
+        annotation_text.draw(image_data, "NO OBJECT", (50, 50))
 
     image_proc.circle(image_data, chosen_target[0], 20, (0, 0, 255), thickness=-1, lineType=8, shift=0)
-    image_proc.putText(image_data, str(chosen_target[1]), (50, 50), image_proc.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, image_proc.LINE_AA)
+    annotation_text.draw(image_data, str(chosen_target[1]), (50, 50))
     image_proc.line(image_data, image_midpoint, chosen_target[0], (255, 0, 0), thickness=10, lineType=8, shift=0)
 
     image_proc.circle(image_data, image_midpoint, 20, (0, 255, 0), thickness=-1, lineType=8, shift=0)
 
     image_proc.drawContours(image_data, selected_shapes, -1, (255, 255, 255), 3)
 
-    return image_data
\ No newline at end of file
+    return image_data
+
+def handle_frame_data(image_data, annotate=True):
+    """
+    Processes the image data to identify and annotate shapes.
+    Args:
+        image_data: Input image data.
+        annotate (bool): Draw the selection onto the image.
+    Returns:
+        Annotated image data.
+    """
+    import cv2 as image_proc
+    monochrome = image_proc.cvtColor(image_data, image_proc.COLOR_BGR2GRAY)
+    shape_list, hierarchy_info = image_proc.findContours(monochrome, image_proc.RETR_EXTERNAL, image_proc.CHAIN_APPROX_SIMPLE)
+
+    image_midpoint = (round(image_data.shape[1] / 2), round(image_data.shape[0] / 2))
+
+    target_midpoint, distance_measure, selected_indices = select_contour_target(shape_list, image_midpoint)
+
+    if annotate:
+        selected_shapes = [shape_list[shape_index] for shape_index in selected_indices]
+        annotate_contour_target(image_data, (target_midpoint, distance_measure), image_midpoint, selected_shapes)
+
+    return image_data
@@ -0,0 +1,289 @@
+import math
+import time as timing
+import numpy as array_utils
+
+from components import detection_types
+from components import stage_timing as stage_timer
+
+PROPAGATION_DOWNSCALE = 0.5        # optical flow runs on a half-resolution grayscale frame
+PROPAGATION_MAX_POINTS = 40        # keypoints tracked per box
+PROPAGATION_MIN_POINTS = 4         # fewer surviving keypoints than this loses the box
+PROPAGATION_FB_THRESHOLD = 1.0     # forward-backward flow error (pixels) above which a point is rejected
+SCHEDULE_MAX_INTERVAL = 8          # frames between full detections, upper bound
+SCHEDULE_MIN_CONFIDENCE = 0.5      # mean keypoint survival below which detection runs immediately
+COST_SMOOTHING = 0.2               # weight of the newest sample in the cost moving averages
+
+FLOW_PARAMETERS = dict(winSize=(15, 15), maxLevel=2,
+                       criteria=(3, 10, 0.03))   # cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, kept numeric so cv2 loads on first use
+
+
+def prepare_flow_frame(image_data, downscale=PROPAGATION_DOWNSCALE):
+    """
+    Converts a camera frame into the grayscale image used for optical flow.
+    Args:
+        image_data (ndarray): BGR, BGRA/RGBA or grayscale frame.
+        downscale (float): Resize factor.
+    Returns:
+        ndarray: Downscaled 8-bit grayscale image.
+    """
+    import cv2 as vision_lib
+    image_data = array_utils.asarray(image_data)
+    if image_data.ndim == 3:
+        conversion = vision_lib.COLOR_BGRA2GRAY if image_data.shape[2] == 4 else vision_lib.COLOR_BGR2GRAY
+        image_data = vision_lib.cvtColor(image_data, conversion)
+    if image_data.dtype != array_utils.uint8:
+        image_data = array_utils.clip(image_data, 0, 255).astype(array_utils.uint8)
+    if downscale != 1.0:
+        image_data = vision_lib.resize(image_data, None, fx=downscale, fy=downscale, interpolation=vision_lib.INTER_AREA)
+    return image_data
+
+
+class BoxPropagator:
+    """
+    Carries detection boxes from frame to frame with pyramidal Lucas-Kanade
+    optical flow on keypoints inside each box. The keypoints of all boxes
+    are tracked in one forward and one backward flow call; each box moves by
+    the median keypoint displacement and scales by the median change of
+    keypoint spacing.
+    """
+
+    def __init__(self, downscale=PROPAGATION_DOWNSCALE, max_points=PROPAGATION_MAX_POINTS, fb_threshold=PROPAGATION_FB_THRESHOLD):
+        self.downscale = downscale
+        self.max_points = max_points
+        self.fb_threshold = fb_threshold
+        self.previous_frame = None
+        self.boxes = array_utils.zeros((0, 4))
+        self.templates = []
+        self.points = array_utils.zeros((0, 2), dtype=array_utils.float32)
+        self.point_owners = array_utils.zeros(0, dtype=array_utils.intp)
+        self.initial_counts = array_utils.zeros(0)
+
+    def reset(self, flow_frame, detections):
+        """
+        Restarts propagation from fresh detections.
+        Args:
+            flow_frame (ndarray): Frame prepared with prepare_flow_frame.
+            detections (list): Detections with Left/Top/Right/Bottom attributes.
+        """
+        import cv2 as vision_lib
+        self.previous_frame = flow_frame
+        self.templates = list(detections)
+        self.boxes = array_utils.array([[detection.Left, detection.Top, detection.Right, detection.Bottom] for detection in detections], dtype=array_utils.float64).reshape(-1, 4)
+        frame_height, frame_width = flow_frame.shape[:2]
+        box_points = []
+        box_owners = []
+        for box_index, box in enumerate(self.boxes * self.downscale):
+            left, top = max(int(box[0]), 0), max(int(box[1]), 0)
+            right, bottom = min(int(math.ceil(box[2])), frame_width), min(int(math.ceil(box[3])), frame_height)
+            if right - left < 8 or bottom - top < 8:
+                continue
+            corners = vision_lib.goodFeaturesToTrack(flow_frame[top:bottom, left:right], self.max_points, 0.01, 3)
+            if corners is None:
+                continue
+            box_points.append(corners.reshape(-1, 2) + (left, top))
+            box_owners.append(array_utils.full(len(corners), box_index, dtype=array_utils.intp))
+        self.points = array_utils.concatenate(box_points).astype(array_utils.float32) if box_points else array_utils.zeros((0, 2), dtype=array_utils.float32)
+        self.point_owners = array_utils.concatenate(box_owners) if box_owners else array_utils.zeros(0, dtype=array_utils.intp)
+        self.initial_counts = array_utils.bincount(self.point_owners, minlength=len(self.boxes)).astype(array_utils.float64)
+
+    def propagate(self, flow_frame):
+        """
+        Moves every box onto a new frame.
+        Args:
+            flow_frame (ndarray): Frame prepared with prepare_flow_frame.
+        Returns:
+            tuple: (N, 4) boxes in full-resolution pixels and (N,) confidences,
+            the fraction of each box's keypoints still tracked.
+        """
+        import cv2 as vision_lib
+        box_count = len(self.boxes)
+        if box_count == 0 or len(self.points) == 0 or self.previous_frame is None:
+            self.previous_frame = flow_frame
+            return self.boxes.copy(), array_utils.zeros(box_count)
+
+        forward_points, forward_status, _ = vision_lib.calcOpticalFlowPyrLK(self.previous_frame, flow_frame, self.points, None, **FLOW_PARAMETERS)
+        backward_points, backward_status, _ = vision_lib.calcOpticalFlowPyrLK(flow_frame, self.previous_frame, forward_points, None, **FLOW_PARAMETERS)
+        forward_backward_error = array_utils.linalg.norm(self.points - backward_points, axis=1)
+        tracked = (forward_status.ravel() == 1) & (backward_status.ravel() == 1) & (forward_backward_error < self.fb_threshold)
+
+        confidences = array_utils.zeros(box_count)
+        for box_index in range(box_count):
+            owned = tracked & (self.point_owners == box_index)
+            if array_utils.count_nonzero(owned) < PROPAGATION_MIN_POINTS:
+                continue
+            old_points = self.points[owned].astype(array_utils.float64)
+            new_points = forward_points[owned].astype(array_utils.float64)
+            displacement = array_utils.median(new_points - old_points, axis=0) / self.downscale
+            pair_a, pair_b = array_utils.triu_indices(len(old_points), 1)
+            old_spacing = array_utils.linalg.norm(old_points[pair_a] - old_points[pair_b], axis=1)
+            new_spacing = array_utils.linalg.norm(new_points[pair_a] - new_points[pair_b], axis=1)
+            usable = old_spacing > 1e-3
+            scale = float(array_utils.median(new_spacing[usable] / old_spacing[usable])) if array_utils.any(usable) else 1.0
+            box = self.boxes[box_index]
+            center_x = (box[0] + box[2]) / 2.0 + displacement[0]
+            center_y = (box[1] + box[3]) / 2.0 + displacement[1]
+            half_width = (box[2] - box[0]) * scale / 2.0
+            half_height = (box[3] - box[1]) * scale / 2.0
+            self.boxes[box_index] = (center_x - half_width, center_y - half_height, center_x + half_width, center_y + half_height)
+            confidences[box_index] = array_utils.count_nonzero(owned) / max(self.initial_counts[box_index], 1.0)
+
+        self.points = forward_points[tracked].reshape(-1, 2)
+        self.point_owners = self.point_owners[tracked]
+        self.previous_frame = flow_frame
+        return self.boxes.copy(), confidences
+
+    def build_detections(self, boxes, confidences):
+        """
+        Wraps propagated boxes as detection records.
+        Args:
+            boxes (ndarray): (N, 4) boxes returned by propagate.
+            confidences (ndarray): (N,) propagation confidences.
+        Returns:
+            list: DetectionBox per box whose keypoints are still tracked.
+        """
+        propagated = []
+        for box_index, confidence in enumerate(confidences):
+            if confidence <= 0:
+                continue
+            template = self.templates[box_index]
+            detection_confidence = getattr(template, "Confidence", 1.0) * confidence
+            propagated.append(detection_types.build_detection_box(*boxes[box_index], class_id=getattr(template, "ClassID", detection_types.PERSON_CLASS_ID), confidence=detection_confidence))
+        return propagated
+
+
+class AdaptiveInferenceScheduler:
+    """
+    Runs the full detector only every few frames and propagates its boxes
+    with optical flow in between.
+    The interval never drops below what the frame budget requires given the
+    measured detection and propagation costs. Above that floor it grows by
+    one frame after every confident propagation run and halves whenever the
+    keypoint survival falls below min_confidence, which also triggers an
+    immediate detection. A detector cheaper than propagation runs on every frame.
+    """
+
+    def __init__(self, detect_function, frame_budget=0.04, max_interval=SCHEDULE_MAX_INTERVAL,
+                 min_confidence=SCHEDULE_MIN_CONFIDENCE, propagator=None, clock=timing.perf_counter):
+        self.detect_function = detect_function
+        self.frame_budget = frame_budget
+        self.max_interval = max_interval
+        self.min_confidence = min_confidence
+        self.propagator = propagator if propagator is not None else BoxPropagator()
+        self.clock = clock
+        self.detection_interval = 1
+        self.frames_since_detection = 0
+        self.detection_pending = True
+        self.confident_run = True
+        self.network_speed = 0.0
+        self.mean_detect_cost = None
+        self.mean_propagate_cost = None
+        self.frames_processed = 0
+        self.detections_run = 0
+        self.forced_detections = 0
+        self.propagations_run = 0
+        self.total_detect_time = 0.0
+        self.total_propagate_time = 0.0
+
+    def budget_interval(self):
+        """
+        Computes the smallest detection interval that keeps the average
+        per-frame cost within the frame budget.
+        Returns:
+            int: Frames between detections.
+        """
+        if self.mean_detect_cost is None or self.mean_detect_cost <= self.frame_budget:
+            return 1
+        propagate_cost = self.mean_propagate_cost if self.mean_propagate_cost is not None else 0.0
+        if propagate_cost >= self.frame_budget:
+            return self.max_interval
+        return min(self.max_interval, int(math.ceil((self.mean_detect_cost - propagate_cost) / (self.frame_budget - propagate_cost))))
+
+    def process_frame(self, detector_input, image_data):
+        """
+        Produces the detections of one frame, either from the detector or by propagation.
+        Args:
+            detector_input: Frame handed to detect_function (e.g. the captured cudaImage).
+            image_data (ndarray): The same frame as a NumPy array.
+        Returns:
+            tuple: List of detected humans and the network processing speed.
+        """
+        self.frames_processed += 1
+        flow_frame = prepare_flow_frame(image_data, self.propagator.downscale)
+        if not self.detection_pending and self.frames_since_detection < self.detection_interval:
+            stage_started = stage_timer.stage_start()
+            propagate_started = self.clock()
+            boxes, confidences = self.propagator.propagate(flow_frame)
+            propagated = self.propagator.build_detections(boxes, confidences)
+            self._record_propagate_cost(self.clock() - propagate_started)
+            stage_timer.stage_finish("propagate", stage_started)
+            if len(propagated) > 0 and float(array_utils.mean(confidences)) >= self.min_confidence:
+                self.frames_since_detection += 1
+                return propagated, self.network_speed
+            self.confident_run = False
+            self.forced_detections += 1
+        return self._run_detection(detector_input, flow_frame)
+
+    def _run_detection(self, detector_input, flow_frame):
+        detect_started = self.clock()
+        detected_humans, self.network_speed = self.detect_function(detector_input)
+        detect_cost = self.clock() - detect_started
+        self.detections_run += 1
+        self.total_detect_time += detect_cost
+        self.mean_detect_cost = detect_cost if self.mean_detect_cost is None else self.mean_detect_cost + COST_SMOOTHING * (detect_cost - self.mean_detect_cost)
+
+        if self.detection_pending or not self.confident_run:
+            self.detection_interval = max(1, self.detection_interval // 2)
+        else:
+            self.detection_interval += 1
+        if self.mean_propagate_cost is not None and self.mean_detect_cost <= self.mean_propagate_cost:
+            # Propagating saves nothing when the detector is this cheap
+            self.detection_interval = 1
+        self.detection_interval = min(max(self.detection_interval, self.budget_interval()), self.max_interval)
+
+        self.propagator.reset(flow_frame, detected_humans)
+        self.frames_since_detection = 1
+        self.confident_run = True
+        # Nothing to propagate without a person in view, so keep detecting every frame
+        self.detection_pending = len(detected_humans) == 0
+        return detected_humans, self.network_speed
+
+    def _record_propagate_cost(self, propagate_cost):
+        self.propagations_run += 1
+        self.total_propagate_time += propagate_cost
+        if self.mean_propagate_cost is None:
+            self.mean_propagate_cost = propagate_cost
+        else:
+            self.mean_propagate_cost += COST_SMOOTHING * (propagate_cost - self.mean_propagate_cost)
+
+    def request_detection(self):
+        """
+        Forces a full detection on the next frame, e.g. after the target was lost.
+        """
+        self.detection_pending = True
+
+    def report_statistics(self):
+        """
+        Summarises the schedule and the control-rate gain over detecting every frame.
+        Returns:
+            dict: Frame, detection and propagation counts, mean costs in
+            milliseconds, current interval, detection-only and effective
+            frame rates, and their ratio as control_rate_gain.
+        """
+        mean_detect = self.total_detect_time / self.detections_run if self.detections_run else 0.0
+        mean_propagate = self.total_propagate_time / self.propagations_run if self.propagations_run else 0.0
+        busy_time = self.total_detect_time + self.total_propagate_time
+        detect_only_rate = 1.0 / mean_detect if mean_detect > 0 else 0.0
+        effective_rate = self.frames_processed / busy_time if busy_time > 0 else 0.0
+        return {
+            "frames": self.frames_processed,
+            "detections": self.detections_run,
+            "forced_detections": self.forced_detections,
+            "propagations": self.propagations_run,
+            "detection_interval": self.detection_interval,
+            "mean_detect_ms": mean_detect * 1000.0,
+            "mean_propagate_ms": mean_propagate * 1000.0,
+            "detection_share": self.total_detect_time / busy_time if busy_time > 0 else 0.0,
+            "detect_only_rate": detect_only_rate,
+            "effective_rate": effective_rate,
+            "control_rate_gain": effective_rate / detect_only_rate if detect_only_rate > 0 else 0.0,
+        }
@@ -1,20 +1,482 @@
+import collections
+import os
+import selectors
 import serial as serial_comm
 import time as timing
+import threading as worker_threads
 import numpy as num_array
 
+TFMINI_FRAME_HEADER = 0x59
+TFMINI_FRAME_LENGTH = 9
+LIDAR_BAUD_RATE = 115200       # TF-mini factory default
+LIDAR_READ_TIMEOUT = 0.05      # seconds a blocking read waits before re-checking for shutdown
+LIDAR_RING_CAPACITY = 1024     # samples kept by the background reader (~10 s at 100 Hz)
+LIDAR_MAX_SAMPLE_AGE = 0.1     # seconds after which the newest sample is too old to fuse (10 frames at 100 Hz)
+LIDAR_READ_CHUNK = 4096        # most bytes taken from a ready port in one read
+PRIMARY_LIDAR = "forward"      # sensor whose samples feed range fusion when several are open
+
+LIDAR_SAMPLE_DTYPE = num_array.dtype([
+    ("timestamp", num_array.float64),
+    ("distance", num_array.float64),
+    ("strength", num_array.float64),
+    ("temperature", num_array.float64),
+])
+
+LidarSensorSpec = collections.namedtuple("LidarSensorSpec", ["sensor_name", "port", "baud_rate", "capacity"])
+LidarSnapshot = collections.namedtuple("LidarSnapshot", ["taken_at", "samples", "skew"])
+
 # Serial port handler for LIDAR interaction
 port_handler = None
+lidar_reader = None
+lidar_parser = None
+lidar_manager = None
+
+
+class TFMiniFrameParser:
+    """
+    Incremental parser for the TF-mini serial stream.
+    Bytes can arrive in arbitrary chunks; the parser resynchronises on the
+    0x59 0x59 header and drops frames whose checksum does not match.
+    """
+
+    def __init__(self):
+        self.frames_parsed = 0
+        self.checksum_failures = 0
+        self.bytes_discarded = 0
+        self._pending = bytearray()
+
+    def feed(self, chunk):
+        """
+        Consumes raw bytes from the serial port.
+        Args:
+            chunk (bytes): Newly received data.
+        Returns:
+            list: Decoded (distance in meters, signal strength, temperature in Celsius) tuples.
+        """
+        self._pending.extend(chunk)
+        decoded_frames = []
+        while True:
+            header_index = self._pending.find(b"\x59\x59")
+            if header_index < 0:
+                # Keep a trailing 0x59, it may be the first half of the next header
+                keep = 1 if self._pending[-1:] == b"\x59" else 0
+                self.bytes_discarded += len(self._pending) - keep
+                del self._pending[:len(self._pending) - keep]
+                break
+            if header_index > 0:
+                self.bytes_discarded += header_index
+                del self._pending[:header_index]
+            if len(self._pending) < TFMINI_FRAME_LENGTH:
+                break
+            frame = self._pending[:TFMINI_FRAME_LENGTH]
+            if (sum(frame[:8]) & 0xFF) != frame[8]:
+                self.checksum_failures += 1
+                self.bytes_discarded += 1
+                del self._pending[:1]
+                continue
+            range_value = frame[2] + frame[3] * 256
+            signal_value = frame[4] + frame[5] * 256
+            thermal_value = (frame[6] + frame[7] * 256) / 8.0 - 256.0
+            decoded_frames.append((range_value / 100.0, signal_value, thermal_value))
+            self.frames_parsed += 1
+            del self._pending[:TFMINI_FRAME_LENGTH]
+        return decoded_frames
+
+
+class LidarSampleRing:
+    """
+    Fixed-size, array-backed ring buffer of timestamped LIDAR samples.
+    One thread appends while others read the latest sample or a time window.
+    """
+
+    def __init__(self, capacity=LIDAR_RING_CAPACITY):
+        self.capacity = capacity
+        self.total_appended = 0
+        self._samples = num_array.zeros(capacity, dtype=LIDAR_SAMPLE_DTYPE)
+        self._guard = worker_threads.Lock()
+
+    def append(self, timestamp, distance, strength, temperature):
+        """
+        Stores a sample, overwriting the oldest one when full.
+        Args:
+            timestamp (float): Monotonic receive time in seconds.
+            distance (float): Distance in meters.
+            strength (float): Signal strength value.
+            temperature (float): Temperature in Celsius.
+        """
+        with self._guard:
+            self._samples[self.total_appended % self.capacity] = (timestamp, distance, strength, temperature)
+            self.total_appended += 1
+
+    def latest(self):
+        """
+        Obtains the newest sample without waiting.
+        Returns:
+            tuple: (timestamp, distance, strength, temperature), or None if empty.
+        """
+        with self._guard:
+            if self.total_appended == 0:
+                return None
+            return self._samples[(self.total_appended - 1) % self.capacity].item()
 
-def activate_lidar_link(port_identifier):
+    def window(self, duration, reference_time=None):
+        """
+        Obtains all samples received within a trailing time window.
+        Args:
+            duration (float): Window length in seconds.
+            reference_time (float): End of the window, defaults to now.
+        Returns:
+            ndarray: Samples in chronological order (LIDAR_SAMPLE_DTYPE).
+        """
+        if reference_time is None:
+            reference_time = timing.monotonic()
+        with self._guard:
+            stored = min(self.total_appended, self.capacity)
+            start = (self.total_appended - stored) % self.capacity
+            ordered = num_array.roll(self._samples[:stored], -start)
+        return ordered[ordered["timestamp"] >= reference_time - duration]
+
+    def nearest(self, reference_time):
+        """
+        Obtains the stored sample received closest to a given time.
+        Args:
+            reference_time (float): Monotonic time in seconds.
+        Returns:
+            tuple: (timestamp, distance, strength, temperature), or None if empty.
+        """
+        with self._guard:
+            stored = min(self.total_appended, self.capacity)
+            if stored == 0:
+                return None
+            closest = num_array.argmin(num_array.abs(self._samples["timestamp"][:stored] - reference_time))
+            return self._samples[closest].item()
+
+
+class LidarReader:
+    """
+    Background thread that reads a serial port, parses TF-mini frames and
+    fills a LidarSampleRing. Any object with a read(size) method works as the
+    port, which allows replaying captured byte streams from a fake or a pty.
+    """
+
+    def __init__(self, serial_port, capacity=LIDAR_RING_CAPACITY):
+        self.serial_port = serial_port
+        self.parser = TFMiniFrameParser()
+        self.samples = LidarSampleRing(capacity)
+        self.sample_arrived = worker_threads.Event()
+        self.failure = None
+        self._stop_request = worker_threads.Event()
+        self._worker = None
+
+    def start(self):
+        """
+        Launches the reader thread.
+        """
+        self._stop_request.clear()
+        self._worker = worker_threads.Thread(target=self._run, name="lidar_reader", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Stops the reader thread.
+        Args:
+            timeout (float): Maximum wait in seconds.
+        """
+        self._stop_request.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def is_running(self):
+        """
+        Reports whether the reader thread is alive.
+        Returns:
+            bool: True while reading.
+        """
+        return self._worker is not None and self._worker.is_alive()
+
+    def _run(self):
+        while not self._stop_request.is_set():
+            try:
+                chunk = self.serial_port.read(max(getattr(self.serial_port, "in_waiting", 0), TFMINI_FRAME_LENGTH))
+            except Exception as error:
+                self.failure = error
+                break
+            if not chunk:
+                continue
+            received_at = timing.monotonic()
+            for distance, strength, temperature in self.parser.feed(chunk):
+                self.samples.append(received_at, distance, strength, temperature)
+                self.sample_arrived.set()
+
+
+def parse_lidar_specs(spec_text, baud_rate=LIDAR_BAUD_RATE, capacity=LIDAR_RING_CAPACITY):
+    """
+    Reads a sensor list of the form name=port[@baud],...
+    Args:
+        spec_text (str): Comma-separated sensor entries, e.g. 'forward=/dev/ttyTHS1,altimeter=/dev/ttyUSB0@921600'.
+        baud_rate (int): Baud rate of entries that give none.
+        capacity (int): Samples kept per sensor.
+    Returns:
+        list: LidarSensorSpec for every entry, in the given order.
+    """
+    sensor_specs = []
+    for sensor_entry in spec_text.split(","):
+        sensor_name, port_entry = sensor_entry.split("=", 1)
+        port_identifier, _, entry_baud = port_entry.partition("@")
+        sensor_specs.append(LidarSensorSpec(sensor_name, port_identifier, int(entry_baud) if entry_baud else baud_rate, capacity))
+    return sensor_specs
+
+
+def open_serial_port(sensor_spec):
+    """
+    Opens the serial port of a sensor for non-blocking reads.
+    Args:
+        sensor_spec (LidarSensorSpec): Sensor configuration.
+    Returns:
+        serial.Serial: Open port.
+    """
+    return serial_comm.Serial(sensor_spec.port, sensor_spec.baud_rate, timeout=0)
+
+
+class LidarSensor:
+    """
+    One sensor handled by a LidarManager: its configuration, open port,
+    frame parser, sample ring and read statistics.
+    """
+
+    def __init__(self, sensor_spec):
+        self.spec = sensor_spec
+        self.serial_port = None
+        self.parser = TFMiniFrameParser()
+        self.samples = LidarSampleRing(sensor_spec.capacity)
+        self.sample_arrived = worker_threads.Event()
+        self.latest_sample = None
+        self.reads = 0
+        self.failure = None
+
+    def report_statistics(self):
+        """
+        Summarises the sensor.
+        Returns:
+            dict: Samples, reads, parser errors, sample rate over the stored samples and the failure if any.
+        """
+        stored_samples = self.samples.window(float("inf"))
+        sample_span = float(stored_samples["timestamp"][-1] - stored_samples["timestamp"][0]) if len(stored_samples) > 1 else 0.0
+        return {
+            "samples": self.samples.total_appended,
+            "reads": self.reads,
+            "checksum_failures": self.parser.checksum_failures,
+            "bytes_discarded": self.parser.bytes_discarded,
+            "samples_per_second": (len(stored_samples) - 1) / sample_span if sample_span > 0 else 0.0,
+            "failure": None if self.failure is None else str(self.failure),
+        }
+
+
+class LidarManager:
+    """
+    Reads any number of TF-mini sensors from one thread.
+    Every port is registered with a selector (epoll on Linux), so the thread
+    sleeps until one of them has bytes and then reads only the ready ones;
+    adding a sensor adds no thread and no polling. After each round of
+    ready ports the newest sample of every sensor is published together as
+    one snapshot, so readers never see sensors from different rounds. A port
+    that fails or closes is dropped and the others keep being read.
+    """
+
+    def __init__(self, sensor_specs, open_port=open_serial_port):
+        self.sensors = collections.OrderedDict((sensor_spec.sensor_name, LidarSensor(sensor_spec)) for sensor_spec in sensor_specs)
+        self.open_port = open_port
+        self.select_rounds = 0
+        self._selector = None
+        self._published = LidarSnapshot(None, {sensor_name: None for sensor_name in self.sensors}, 0.0)
+        self._snapshot_ready = worker_threads.Condition()
+        self._snapshot_count = 0
+        self._stop_request = worker_threads.Event()
+        self._worker = None
+
+    def start(self):
+        """
+        Opens every port and launches the reader thread.
+        """
+        self._stop_request.clear()
+        self._selector = selectors.DefaultSelector()
+        for sensor in self.sensors.values():
+            sensor.serial_port = self.open_port(sensor.spec)
+            self._selector.register(sensor.serial_port.fileno(), selectors.EVENT_READ, sensor)
+        self._worker = worker_threads.Thread(target=self._run, name="lidar_manager", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Stops the reader thread and closes the ports.
+        Args:
+            timeout (float): Maximum wait in seconds.
+        """
+        self._stop_request.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+        for sensor in self.sensors.values():
+            if sensor.serial_port is not None:
+                sensor.serial_port.close()
+                sensor.serial_port = None
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+    def is_running(self):
+        """
+        Reports whether the reader thread is alive.
+        Returns:
+            bool: True while at least one sensor is being read.
+        """
+        return self._worker is not None and self._worker.is_alive()
+
+    def _drop_sensor(self, sensor, error):
+        sensor.failure = error
+        self._selector.unregister(sensor.serial_port.fileno())
+        print(f"LIDAR {sensor.spec.sensor_name} dropped: {error}")
+        # Republish at once so the last range of the dropped sensor is not served as current
+        self._publish_snapshot()
+
+    def _run(self):
+        while not self._stop_request.is_set() and self._selector.get_map():
+            ready_ports = self._selector.select(LIDAR_READ_TIMEOUT)
+            sampled = False
+            for selector_key, _ in ready_ports:
+                sensor = selector_key.data
+                try:
+                    chunk = os.read(selector_key.fd, LIDAR_READ_CHUNK)
+                except BlockingIOError:
+                    continue
+                except OSError as error:
+                    self._drop_sensor(sensor, error)
+                    continue
+                if not chunk:
+                    self._drop_sensor(sensor, EOFError("port closed"))
+                    continue
+                received_at = timing.monotonic()
+                sensor.reads += 1
+                for distance, strength, temperature in sensor.parser.feed(chunk):
+                    sensor.samples.append(received_at, distance, strength, temperature)
+                    sensor.latest_sample = (received_at, distance, strength, temperature)
+                    sensor.sample_arrived.set()
+                    sampled = True
+            self.select_rounds += 1
+            if sampled:
+                self._publish_snapshot()
+
+    def _publish_snapshot(self):
+        latest_samples = {sensor_name: sensor.latest_sample if sensor.failure is None else None
+                          for sensor_name, sensor in self.sensors.items()}
+        with self._snapshot_ready:
+            self._published = LidarSnapshot(timing.monotonic(), latest_samples, measure_sample_skew(latest_samples))
+            self._snapshot_count += 1
+            self._snapshot_ready.notify_all()
+
+    def snapshot(self, max_age=None):
+        """
+        Obtains the newest sample of every sensor, all as of the same read round.
+        Dropped sensors have no sample.
+        Args:
+            max_age (float): Replace samples older than this many seconds with None.
+        Returns:
+            LidarSnapshot: Publication time, sensor name mapped to
+                (timestamp, distance, strength, temperature) or None, and the
+                spread of the sample times in seconds.
+        """
+        published = self._published
+        if max_age is None:
+            return published
+        now = timing.monotonic()
+        fresh_samples = {sensor_name: sample if sample is not None and now - sample[0] <= max_age else None
+                         for sensor_name, sample in published.samples.items()}
+        return LidarSnapshot(published.taken_at, fresh_samples, measure_sample_skew(fresh_samples))
+
+    def aligned_snapshot(self, reference_time, max_offset=None):
+        """
+        Obtains the sample of every sensor received closest to a given time,
+        e.g. the capture time of a camera frame.
+        Args:
+            reference_time (float): Monotonic time in seconds.
+            max_offset (float): Replace samples further than this many seconds from the time with None.
+        Returns:
+            LidarSnapshot: Snapshot taken at the reference time.
+        """
+        aligned_samples = {}
+        for sensor_name, sensor in self.sensors.items():
+            sample = sensor.samples.nearest(reference_time)
+            if sample is not None and max_offset is not None and abs(sample[0] - reference_time) > max_offset:
+                sample = None
+            aligned_samples[sensor_name] = sample
+        return LidarSnapshot(reference_time, aligned_samples, measure_sample_skew(aligned_samples))
+
+    def wait_for_snapshot(self, timeout=None):
+        """
+        Waits until a snapshot newer than the current one is published.
+        Args:
+            timeout (float): Maximum wait in seconds, None to wait indefinitely.
+        Returns:
+            LidarSnapshot: The newest snapshot, which is the old one if the wait timed out.
+        """
+        with self._snapshot_ready:
+            awaited_count = self._snapshot_count + 1
+            self._snapshot_ready.wait_for(lambda: self._snapshot_count >= awaited_count, timeout)
+            return self._published
+
+    def await_sample(self, sensor_name):
+        """
+        Waits for the next sample of one sensor.
+        Args:
+            sensor_name (str): Sensor name.
+        Returns:
+            tuple: (timestamp, distance, strength, temperature) received after the call.
+        """
+        sensor = self.sensors[sensor_name]
+        # Clear first so the wait returns a sample received after this call, not the last one returned
+        sensor.sample_arrived.clear()
+        while not sensor.sample_arrived.wait(LIDAR_READ_TIMEOUT):
+            if sensor.failure is not None:
+                raise RuntimeError(f"LIDAR {sensor_name} dropped: {sensor.failure}")
+            if not self.is_running():
+                raise RuntimeError("LIDAR manager stopped")
+        return sensor.latest_sample
+
+    def report_statistics(self):
+        """
+        Summarises every sensor.
+        Returns:
+            dict: Select rounds and the statistics of each sensor under 'sensors'.
+        """
+        return {
+            "select_rounds": self.select_rounds,
+            "sensors": {sensor_name: sensor.report_statistics() for sensor_name, sensor in self.sensors.items()},
+        }
+
+
+def measure_sample_skew(samples):
+    """
+    Computes how far apart in time the samples of a snapshot were received.
+    Args:
+        samples (dict): Sensor name mapped to a sample tuple or None.
+    Returns:
+        float: Latest minus earliest sample time in seconds, 0 with fewer than two samples.
+    """
+    sample_times = [sample[0] for sample in samples.values() if sample is not None]
+    return max(sample_times) - min(sample_times) if len(sample_times) > 1 else 0.0
+
+
+def activate_lidar_link(port_identifier, baud_rate=LIDAR_BAUD_RATE):
     """
     Initiates a serial connection to the LIDAR device.
     Args:
         port_identifier (str): Serial port identifier (e.g., '/dev/ttyTHS1').
+        baud_rate (int): Serial speed the sensor is configured for.
     Returns:
         str: Connection status ('successful' or 'already_active').
     """
     global port_handler
-    port_handler = serial_comm.Serial(port_identifier, 115200, timeout=0)
+    port_handler = serial_comm.Serial(port_identifier, baud_rate, timeout=LIDAR_READ_TIMEOUT)
     if port_handler.isOpen() == False:
         port_handler.open()
         return "successful"
@@ -37,22 +499,177 @@ def verify_lidar_link():
     global port_handler
     return port_handler.isOpen()
 
+def open_lidar_sensors(sensor_specs):
+    """
+    Opens several sensors read together by one LidarManager; the sensor
+    named PRIMARY_LIDAR, or else the first, then serves the sample functions below.
+    Args:
+        sensor_specs (list): LidarSensorSpec for every sensor.
+    Returns:
+        str: Connection status ('successful').
+    """
+    global lidar_manager
+    lidar_manager = LidarManager(sensor_specs)
+    lidar_manager.start()
+    return "successful"
+
+def close_lidar_sensors():
+    """
+    Stops the LidarManager and closes its ports.
+    """
+    global lidar_manager
+    if lidar_manager is not None:
+        lidar_manager.stop()
+        lidar_manager = None
+
+def fetch_lidar_snapshot(max_age=None):
+    """
+    Obtains the newest sample of every open sensor without blocking.
+    Args:
+        max_age (float): Replace samples older than this many seconds with None.
+    Returns:
+        LidarSnapshot: Snapshot of all sensors, or None when no LidarManager is open.
+    """
+    if lidar_manager is None:
+        return None
+    return lidar_manager.snapshot(max_age)
+
+def find_primary_lidar():
+    """
+    Names the sensor of the LidarManager that feeds range fusion.
+    Returns:
+        str: PRIMARY_LIDAR when it is open, else the first sensor.
+    """
+    if PRIMARY_LIDAR in lidar_manager.sensors:
+        return PRIMARY_LIDAR
+    return next(iter(lidar_manager.sensors))
+
+def report_lidar_sensors():
+    """
+    Summarises the sensors of the LidarManager.
+    Returns:
+        dict: Manager statistics, empty when no LidarManager is open.
+    """
+    if lidar_manager is None:
+        return {}
+    return lidar_manager.report_statistics()
+
+def start_lidar_reader(capacity=LIDAR_RING_CAPACITY):
+    """
+    Starts the background reader on the active serial connection.
+    Args:
+        capacity (int): Number of samples kept in the ring buffer.
+    """
+    global lidar_reader
+    if lidar_reader is None or not lidar_reader.is_running():
+        lidar_reader = LidarReader(port_handler, capacity)
+        lidar_reader.start()
+
+def stop_lidar_reader():
+    """
+    Stops the background reader if it is running.
+    """
+    global lidar_reader
+    if lidar_reader is not None:
+        lidar_reader.stop()
+        lidar_reader = None
+
+def fetch_latest_lidar_sample(max_age=None):
+    """
+    Obtains the newest sample from the background reader without blocking.
+    Args:
+        max_age (float): Reject samples older than this many seconds.
+    Returns:
+        tuple: (timestamp, distance in meters, signal strength, temperature), or None.
+    """
+    if lidar_reader is None:
+        return None
+    sample = lidar_reader.samples.latest()
+    if sample is None:
+        return None
+    if max_age is not None and timing.monotonic() - sample[0] > max_age:
+        return None
+    return sample
+
+def query_lidar_window(duration):
+    """
+    Obtains the samples received by the background reader in the last few seconds.
+    Args:
+        duration (float): Window length in seconds.
+    Returns:
+        ndarray: Samples with timestamp, distance, strength and temperature fields.
+    """
+    if lidar_reader is None:
+        return num_array.zeros(0, dtype=LIDAR_SAMPLE_DTYPE)
+    return lidar_reader.samples.window(duration)
+
+def await_timed_lidar_sample():
+    """
+    Obtains the next valid sample with the time it was received, from the
+    primary sensor of the LidarManager or the background reader when one is
+    running, or by reading the port directly otherwise.
+    Returns:
+        tuple: (timestamp in time.monotonic seconds, distance in meters, signal strength, temperature in Celsius).
+    """
+    global lidar_parser
+    if lidar_manager is not None:
+        return lidar_manager.await_sample(find_primary_lidar())
+    if lidar_reader is not None:
+        # Clear first so the wait returns a sample received after this call, not the last one fused
+        lidar_reader.sample_arrived.clear()
+        while not lidar_reader.sample_arrived.wait(LIDAR_READ_TIMEOUT):
+            if lidar_reader.failure is not None:
+                raise RuntimeError(f"LIDAR reader failed: {lidar_reader.failure}")
+            if not lidar_reader.is_running():
+                raise RuntimeError("LIDAR reader stopped")
+        return lidar_reader.samples.latest()
+    if lidar_parser is None:
+        lidar_parser = TFMiniFrameParser()
+    while True:
+        decoded_frames = lidar_parser.feed(port_handler.read(max(port_handler.in_waiting, TFMINI_FRAME_LENGTH)))
+        if len(decoded_frames) > 0:
+            return (timing.monotonic(),) + tuple(decoded_frames[-1])
+
+def await_lidar_sample():
+    """
+    Obtains the next valid sample, from the background reader when it is
+    running or by reading the port directly otherwise.
+    Returns:
+        tuple: (distance in meters, signal strength, temperature in Celsius).
+    """
+    return tuple(await_timed_lidar_sample()[1:])
+
+def obtain_timed_lidar_measurements(max_age=LIDAR_MAX_SAMPLE_AGE):
+    """
+    Retrieves distance and signal strength with the time they were received.
+    With the LidarManager or the background reader running this never
+    blocks: it returns the newest sample of the primary sensor, or None once
+    that sensor has been silent for max_age or was dropped. Without either
+    the port is read directly until a frame arrives.
+    Args:
+        max_age (float): Oldest sample in seconds accepted from the LidarManager or background reader.
+    Returns:
+        tuple: (timestamp in time.monotonic seconds, distance in meters, signal strength value), or None.
+    """
+    if lidar_manager is not None:
+        sample = fetch_lidar_snapshot(max_age).samples[find_primary_lidar()]
+    elif lidar_reader is not None:
+        sample = fetch_latest_lidar_sample(max_age)
+    else:
+        sample = await_timed_lidar_sample()
+    if sample is None:
+        return None
+    sample_time, range_value, signal_value, thermal_value = sample
+    return sample_time, range_value, signal_value
+
 def obtain_lidar_measurements():
     """
     Retrieves distance and signal strength from the LIDAR device.
     Returns:
         tuple: (distance in meters, signal strength value).
     """
-    global port_handler
-    while True:
-        pending_bytes = port_handler.in_waiting
-        if pending_bytes > 6:
-            incoming_data = port_handler.read(7)
-            port_handler.reset_input_buffer()
-            if incoming_data[0] == 0x59 and incoming_data[1] == 0x59:
-                range_value = incoming_data[2] + incoming_data[3] * 256
-                signal_value = incoming_data[4] + incoming_data[5] * 256
-                return range_value / 100.0, signal_value
+    range_value, signal_value, thermal_value = await_lidar_sample()
+    return range_value, signal_value
 
 def obtain_lidar_thermal_reading():
     """
@@ -60,13 +677,4 @@ def obtain_lidar_thermal_reading():
     Returns:
         float: Temperature in Celsius.
     """
-    global port_handler
-    while True:
-        pending_bytes = port_handler.in_waiting
-        if pending_bytes > 8:
-            incoming_data = port_handler.read(9)
-            port_handler.reset_input_buffer()
-            if incoming_data[0] == 0x59 and incoming_data[1] == 0x59:
-                thermal_value = incoming_data[6] + incoming_data[7] * 256
-                thermal_value = (thermal_value / 8.0) - 256.0
-                return thermal_value
\ No newline at end of file
+    return await_lidar_sample()[2]
@@ -0,0 +1,229 @@
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import time as timing
+
+MISSION_EXECUTOR_WORKERS = 4   # threads running blocking hardware calls
+BATTERY_LOW_LEVEL = 20         # percent, below which the mission is aborted
+
+TARGET_ACQUIRED = "target_acquired"
+TARGET_LOST = "target_lost"
+KEY_PRESSED = "key_pressed"
+BATTERY_LOW = "battery_low"
+EKF_UNHEALTHY = "ekf_unhealthy"
+PHASE_TIMEOUT = "phase_timeout"
+PHASE_COMPLETED = "phase_completed"
+PHASE_FAILED = "phase_failed"
+
+MissionEvent = collections.namedtuple("MissionEvent", ["name", "payload", "timestamp"])
+PhaseRecord = collections.namedtuple("PhaseRecord", ["phase_name", "next_phase", "reason", "duration"])
+
+
+class MissionPhase:
+    """
+    One phase of the mission: an async action plus the events that end it.
+    The action receives the runtime and returns the name of the next phase.
+    Returning None leaves the phase waiting for an event or its timeout,
+    except in a final phase, where it ends the mission. A final phase that
+    raises also ends the mission.
+    """
+
+    def __init__(self, phase_name, action, transitions=None, timeout=None, timeout_phase=None, final=False):
+        self.phase_name = phase_name
+        self.action = action
+        self.transitions = transitions or {}
+        self.timeout = timeout
+        self.timeout_phase = timeout_phase
+        self.final = final
+
+
+class MissionRuntime:
+    """
+    Runs mission phases on an asyncio loop and switches between them on
+    events instead of polling.
+    Events can be posted from any thread (keyboard hooks, telemetry
+    listeners, pipeline workers). Each event is looked up in the current
+    phase's transitions, then in the mission-wide ones; a match cancels
+    the running action and starts the next phase. Blocking hardware calls
+    go through run_blocking so the loop stays responsive, and cancellation
+    waits for the call in flight so two phases never drive the hardware
+    at once.
+    """
+
+    def __init__(self, phases, global_transitions=None, executor=None, clock=timing.monotonic):
+        self.phases = {phase.phase_name: phase for phase in phases}
+        self.global_transitions = global_transitions or {}
+        self.executor = executor
+        self.clock = clock
+        self.current_phase = None
+        self.phase_started = None
+        self.history = []
+        self.event_log = []
+        self._loop = None
+        self._events = None
+        self._early_events = []
+        self._blocking_calls = set()
+        self._phase_timers = []
+
+    def post_event(self, event_name, payload=None):
+        """
+        Queues an event for the supervisor; safe to call from any thread.
+        Args:
+            event_name (str): Event identifier, e.g. TARGET_LOST.
+            payload: Optional detail, e.g. the key that was pressed.
+        """
+        mission_event = MissionEvent(event_name, payload, self.clock())
+        if self._loop is None:
+            self._early_events.append(mission_event)
+        elif self._loop.is_closed():
+            return
+        else:
+            self._loop.call_soon_threadsafe(self._events.put_nowait, mission_event)
+
+    def start_timer(self, delay, event_name, payload=None):
+        """
+        Posts an event after a delay unless the current phase ends first.
+        Args:
+            delay (float): Seconds until the event.
+            event_name (str): Event to post.
+            payload: Optional event detail.
+        Returns:
+            TimerHandle: Handle whose cancel() drops the timer.
+        """
+        timer = self._loop.call_later(delay, self.post_event, event_name, payload)
+        self._phase_timers.append(timer)
+        return timer
+
+    def remaining_time(self):
+        """
+        Reports how long the current phase may still run.
+        Returns:
+            float: Seconds until the phase timeout, None without a timeout.
+        """
+        phase = self.phases.get(self.current_phase)
+        if phase is None or phase.timeout is None:
+            return None
+        return max(0.0, phase.timeout - (self.clock() - self.phase_started))
+
+    async def run_blocking(self, function, *args):
+        """
+        Runs a blocking call on the executor.
+        The call is shielded: cancelling the phase does not abandon it, the
+        runtime waits for it before starting the next phase.
+        Args:
+            function (callable): Blocking function.
+            *args: Arguments passed to it.
+        Returns:
+            The function's return value.
+        """
+        blocking_call = self._loop.run_in_executor(self.executor, functools.partial(function, *args))
+        self._blocking_calls.add(blocking_call)
+        blocking_call.add_done_callback(self._blocking_calls.discard)
+        return await asyncio.shield(blocking_call)
+
+    async def run(self, initial_phase):
+        """
+        Runs phases until a final phase completes.
+        Args:
+            initial_phase (str): Name of the first phase.
+        Returns:
+            list: PhaseRecord per phase run, in order.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+        owns_executor = self.executor is None
+        if owns_executor:
+            self.executor = concurrent.futures.ThreadPoolExecutor(MISSION_EXECUTOR_WORKERS, thread_name_prefix="mission")
+        for mission_event in self._early_events:
+            self._events.put_nowait(mission_event)
+        self._early_events = []
+        phase_name = initial_phase
+        try:
+            while phase_name is not None:
+                phase = self.phases[phase_name]
+                self.current_phase = phase_name
+                self.phase_started = self.clock()
+                next_phase, reason = await self._supervise(phase)
+                self.history.append(PhaseRecord(phase_name, next_phase, reason, self.clock() - self.phase_started))
+                if next_phase is not None:
+                    print(f"Phase: {phase_name.upper()} -> {next_phase.upper()} ({reason})")
+                phase_name = next_phase
+        finally:
+            self.current_phase = None
+            if owns_executor:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+            self._loop = None
+        return self.history
+
+    async def _supervise(self, phase):
+        phase_task = asyncio.ensure_future(phase.action(self))
+        deadline = self.phase_started + phase.timeout if phase.timeout is not None else None
+        try:
+            while True:
+                event_task = asyncio.ensure_future(self._events.get())
+                waiting_for = {event_task} if phase_task is None else {phase_task, event_task}
+                time_left = None if deadline is None else max(0.0, deadline - self.clock())
+                finished, _ = await asyncio.wait(waiting_for, timeout=time_left, return_when=asyncio.FIRST_COMPLETED)
+                if event_task in finished:
+                    mission_event = event_task.result()
+                    self.event_log.append((phase.phase_name, mission_event))
+                    next_phase = phase.transitions.get(mission_event.name, self.global_transitions.get(mission_event.name))
+                    if next_phase is not None and next_phase != phase.phase_name:
+                        return next_phase, mission_event.name
+                else:
+                    event_task.cancel()
+                if phase_task is not None and phase_task in finished:
+                    completed_task, phase_task = phase_task, None
+                    if completed_task.exception() is not None:
+                        print(f"Phase {phase.phase_name} failed: {completed_task.exception()}")
+                        # A failed final phase, or one whose failure leads back to itself, ends the mission instead of retrying
+                        failure_phase = self.global_transitions.get(PHASE_FAILED)
+                        if phase.final or failure_phase == phase.phase_name:
+                            return None, PHASE_FAILED
+                        return failure_phase, PHASE_FAILED
+                    if completed_task.result() is not None:
+                        return completed_task.result(), PHASE_COMPLETED
+                    if phase.final:
+                        return None, PHASE_COMPLETED
+                if len(finished) == 0:
+                    return phase.timeout_phase, PHASE_TIMEOUT
+        finally:
+            for timer in self._phase_timers:
+                timer.cancel()
+            self._phase_timers = []
+            if phase_task is not None and not phase_task.done():
+                phase_task.cancel()
+                await asyncio.gather(phase_task, return_exceptions=True)
+            if self._blocking_calls:
+                await asyncio.gather(*self._blocking_calls, return_exceptions=True)
+
+
+class VehicleHealthMonitor:
+    """
+    Turns telemetry updates into mission events: BATTERY_LOW once the
+    battery level drops below the threshold, EKF_UNHEALTHY when the EKF
+    goes from healthy to unhealthy. Meant to be registered as a telemetry
+    observer, so it runs on the telemetry thread and only posts events.
+    """
+
+    def __init__(self, runtime, battery_low_level=BATTERY_LOW_LEVEL):
+        self.runtime = runtime
+        self.battery_low_level = battery_low_level
+        self.battery_reported = False
+        self.ekf_was_ok = False
+
+    def handle_snapshot(self, telemetry):
+        """
+        Checks one telemetry snapshot.
+        Args:
+            telemetry (TelemetrySnapshot): Latest UAV state.
+        """
+        if telemetry.battery_level is not None and telemetry.battery_level < self.battery_low_level and not self.battery_reported:
+            self.battery_reported = True
+            self.runtime.post_event(BATTERY_LOW, telemetry.battery_level)
+        if telemetry.ekf_ok is not None:
+            if self.ekf_was_ok and not telemetry.ekf_ok:
+                self.runtime.post_event(EKF_UNHEALTHY)
+            self.ekf_was_ok = bool(telemetry.ekf_ok)
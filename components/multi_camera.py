@@ -0,0 +1,236 @@
+import collections
+import concurrent.futures
+import threading as worker_threads
+import time as timing
+from components import stage_timing as stage_timer
+
+CAPTURE_MODES = ("synchronized", "independent")
+PRIMARY_STREAM = "forward"    # stream whose frames pace the batches and drive the follow loop
+FRAME_WAIT_TIMEOUT = 1.0      # seconds detect_once waits for a new primary frame
+
+StreamDetections = collections.namedtuple("StreamDetections", ["stream_name", "humans", "image", "captured_at"])
+
+
+class CameraStream:
+    """
+    One camera of a multi-camera rig: its video source, the newest frame
+    not yet detected and the stream's own statistics.
+    """
+
+    def __init__(self, stream_name, image_source):
+        self.stream_name = stream_name
+        self.image_source = image_source
+        self.frame_lock = worker_threads.Condition()
+        self.pending_frame = None
+        self.latency_histogram = stage_timer.LatencyHistogram()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the pending frame and the statistics.
+        """
+        with self.frame_lock:
+            self.pending_frame = None
+        self.captured_frames = 0
+        self.detected_frames = 0
+        self.dropped_frames = 0
+        self.first_detection = None
+        self.last_detection = None
+        self.latency_histogram.reset()
+
+    def capture(self):
+        """
+        Captures one frame and keeps it as the pending frame; an older pending
+        frame that was never detected is counted as dropped.
+        Returns:
+            tuple: Captured image and its capture time (time.monotonic seconds).
+        """
+        captured_image = self.image_source.Capture()
+        captured_at = timing.monotonic()
+        with self.frame_lock:
+            if self.pending_frame is not None:
+                self.dropped_frames += 1
+            self.pending_frame = (captured_image, captured_at)
+            self.captured_frames += 1
+            self.frame_lock.notify_all()
+        return captured_image, captured_at
+
+    def take_frame(self, timeout=0.0):
+        """
+        Removes the pending frame, waiting for one up to the timeout.
+        Args:
+            timeout (float): Seconds to wait, 0 to return at once.
+        Returns:
+            tuple: Captured image and capture time, or None when no new frame arrived.
+        """
+        with self.frame_lock:
+            if self.pending_frame is None and timeout > 0:
+                self.frame_lock.wait_for(lambda: self.pending_frame is not None, timeout)
+            pending_frame, self.pending_frame = self.pending_frame, None
+        return pending_frame
+
+    def record_detection(self, captured_at, detected_at):
+        """
+        Accounts for one detected frame of this stream.
+        Args:
+            captured_at (float): Capture time of the frame.
+            detected_at (float): Time its detections became available.
+        """
+        self.detected_frames += 1
+        if self.first_detection is None:
+            self.first_detection = detected_at
+        self.last_detection = detected_at
+        self.latency_histogram.record(int(max(detected_at - captured_at, 0.0) * 1e6))
+
+    def report_statistics(self):
+        """
+        Summarises the stream.
+        Returns:
+            dict: Frames captured, detected and dropped, detected frames per second
+                and p50/p99/max capture-to-detection latency in milliseconds.
+        """
+        running_time = self.last_detection - self.first_detection if self.detected_frames > 1 else 0.0
+        return {
+            "captured_frames": self.captured_frames,
+            "detected_frames": self.detected_frames,
+            "dropped_frames": self.dropped_frames,
+            "frames_per_second": (self.detected_frames - 1) / running_time if running_time > 0 else 0.0,
+            "latency_p50_ms": self.latency_histogram.percentile(50) / 1000.0,
+            "latency_p99_ms": self.latency_histogram.percentile(99) / 1000.0,
+            "latency_max_ms": self.latency_histogram.maximum_value / 1000.0,
+        }
+
+
+class MultiCameraDetector:
+    """
+    Runs one batched detection over the frames of several cameras and hands
+    the detections back per camera.
+    In synchronized mode every batch captures one frame from each camera,
+    side by side on a thread pool, so all streams are detected at the same
+    rate and their frames are close in time. In independent mode each
+    camera captures on its own thread at its own rate and a batch takes the
+    newest frame of every camera that has one; frames overwritten before
+    they were detected are counted as dropped. The first stream (the
+    primary) paces the batches in both modes.
+    """
+
+    def __init__(self, streams, detect_batch, capture_mode="synchronized"):
+        if capture_mode not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode '{capture_mode}', expected one of {CAPTURE_MODES}")
+        self.streams = list(streams)
+        self.primary_stream = self.streams[0]
+        self.detect_batch = detect_batch
+        self.capture_mode = capture_mode
+        self.capture_pool = None
+        self.capture_threads = []
+        self.stop_request = worker_threads.Event()
+        self.batch_count = 0
+        self.batched_frames = 0
+        self.processing_speed = 0.0
+
+    def start(self):
+        """
+        Starts the capture threads.
+        """
+        self.stop_request.clear()
+        for stream in self.streams:
+            stream.reset()
+        self.batch_count = 0
+        self.batched_frames = 0
+        if self.capture_mode == "synchronized":
+            self.capture_pool = concurrent.futures.ThreadPoolExecutor(len(self.streams), thread_name_prefix="capture")
+            return
+        for stream in self.streams:
+            capture_thread = worker_threads.Thread(target=self._capture_continuously, args=(stream,),
+                                                   name=f"capture-{stream.stream_name}", daemon=True)
+            capture_thread.start()
+            self.capture_threads.append(capture_thread)
+
+    def _capture_continuously(self, stream):
+        while not self.stop_request.is_set():
+            try:
+                stream.capture()
+            except Exception as error:
+                print(f"Camera {stream.stream_name} capture failed: {error}")
+                break
+
+    def stop(self):
+        """
+        Stops the capture threads.
+        """
+        self.stop_request.set()
+        if self.capture_pool is not None:
+            self.capture_pool.shutdown(wait=True)
+            self.capture_pool = None
+        for capture_thread in self.capture_threads:
+            capture_thread.join(FRAME_WAIT_TIMEOUT)
+        self.capture_threads = []
+
+    def is_capturing(self):
+        """
+        Tells whether the primary camera can still deliver frames.
+        Returns:
+            bool: False once the primary capture thread of independent mode has ended.
+        """
+        if self.capture_mode == "synchronized":
+            return True
+        return bool(self.capture_threads) and self.capture_threads[0].is_alive()
+
+    def collect_frames(self, timeout=FRAME_WAIT_TIMEOUT):
+        """
+        Gathers the frames of the next batch.
+        Args:
+            timeout (float): Seconds to wait for a new primary frame in independent mode.
+        Returns:
+            list: (stream, captured image, capture time) for every stream in the batch.
+        """
+        stage_started = stage_timer.stage_start()
+        if self.capture_mode == "synchronized":
+            for capture_call in [self.capture_pool.submit(stream.capture) for stream in self.streams]:
+                capture_call.result()
+        batch_frames = []
+        primary_frame = self.primary_stream.take_frame(timeout)
+        if primary_frame is not None:
+            batch_frames.append((self.primary_stream,) + primary_frame)
+            for stream in self.streams[1:]:
+                stream_frame = stream.take_frame()
+                if stream_frame is not None:
+                    batch_frames.append((stream,) + stream_frame)
+        stage_timer.stage_finish("capture", stage_started)
+        return batch_frames
+
+    def detect_once(self, timeout=FRAME_WAIT_TIMEOUT):
+        """
+        Captures or collects one batch of frames and detects people in all of them at once.
+        Args:
+            timeout (float): Seconds to wait for a new primary frame in independent mode.
+        Returns:
+            dict: Stream name mapped to StreamDetections, for the streams in the batch;
+                empty when the primary stream produced no frame in time.
+        """
+        batch_frames = self.collect_frames(timeout)
+        if not batch_frames:
+            return {}
+        frame_humans, self.processing_speed = self.detect_batch([captured_image for stream, captured_image, captured_at in batch_frames])
+        detected_at = timing.monotonic()
+        self.batch_count += 1
+        self.batched_frames += len(batch_frames)
+        stream_detections = {}
+        for (stream, captured_image, captured_at), humans in zip(batch_frames, frame_humans):
+            stream.record_detection(captured_at, detected_at)
+            stream_detections[stream.stream_name] = StreamDetections(stream.stream_name, humans, captured_image, captured_at)
+        return stream_detections
+
+    def report_statistics(self):
+        """
+        Summarises batching and every stream.
+        Returns:
+            dict: Capture mode, batch count, mean frames per batch and the
+                statistics of each stream under 'streams'.
+        """
+        return {
+            "capture_mode": self.capture_mode,
+            "batches": self.batch_count,
+            "mean_batch_size": self.batched_frames / self.batch_count if self.batch_count else 0.0,
+            "streams": {stream.stream_name: stream.report_statistics() for stream in self.streams},
+        }
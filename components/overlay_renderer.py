@@ -0,0 +1,410 @@
+import collections
+import numpy as array_utils
+
+TEXT_CACHE_CAPACITY = 512       # rasterized text strings kept
+DISPLAY_PRECISION = 2           # decimals of the numbers shown; values that round alike reuse one raster
+TEXT_COLOR = (0, 0, 255)
+CENTER_COLOR = (0, 255, 0)
+TARGET_COLOR = (0, 0, 255)
+OFFSET_COLOR = (255, 0, 0)
+GAUGE_COLOR = (0, 255, 0)
+GAUGE_FRAME_COLOR = (200, 200, 200)
+GAUGE_SCALE = 200               # pixels of gauge per metre of range
+GAUGE_RANGE = 3.0               # metres covered by the gauge frame
+MARKER_RADIUS = 20
+LINE_THICKNESS = 10
+FONT_SCALE = 1.0
+FONT_THICKNESS = 3
+
+PursuitOverlay = collections.namedtuple("PursuitOverlay", [
+    "lidar_measure", "target_position", "target_box", "orientation_adjust", "horizontal_offset",
+    "vertical_offset", "frame_speed", "forward_speed", "is_lidar_aimed"])
+
+
+def stamp_patch(image_data, left, top, patch_color, patch_mask):
+    """
+    Copies the masked pixels of a patch onto an image in place, clipped to the image.
+    The mask is one bit per pixel: a masked copy costs a fraction of a
+    putText call, while blending a fractional alpha per pixel costs more
+    than drawing the element again.
+    Args:
+        image_data (ndarray): BGR image.
+        left (int): Image column of the patch's first column.
+        top (int): Image row of the patch's first row.
+        patch_color (ndarray): BGR patch.
+        patch_mask (ndarray): Non-zero where the patch is drawn.
+    """
+    import cv2 as vision_lib
+    image_height, image_width = image_data.shape[:2]
+    patch_height, patch_width = patch_mask.shape
+    clip_left, clip_top = max(0, -left), max(0, -top)
+    clip_right, clip_bottom = min(patch_width, image_width - left), min(patch_height, image_height - top)
+    if clip_right <= clip_left or clip_bottom <= clip_top:
+        return
+    region = image_data[top + clip_top:top + clip_bottom, left + clip_left:left + clip_right]
+    vision_lib.copyTo(patch_color[clip_top:clip_bottom, clip_left:clip_right], patch_mask[clip_top:clip_bottom, clip_left:clip_right], region)
+
+
+def build_layer_mask(mask_size, draw_function):
+    """
+    Draws an element into a new mask and thresholds its antialiased edge.
+    Args:
+        mask_size (tuple): Height and width of the mask.
+        draw_function (callable): Called with the mask to draw the element in 255.
+    Returns:
+        ndarray: uint8 mask, 1 where the element covers at least half a pixel.
+    """
+    element_mask = array_utils.zeros(mask_size, dtype=array_utils.uint8)
+    draw_function(element_mask)
+    return (element_mask >= 128).astype(array_utils.uint8)
+
+
+def build_color_patch(mask_shape, color):
+    """
+    Builds a single-colour patch for a mask.
+    Args:
+        mask_shape (tuple): Height and width.
+        color (tuple): BGR colour.
+    Returns:
+        ndarray: BGR patch.
+    """
+    patch_color = array_utils.empty(tuple(mask_shape) + (3,), dtype=array_utils.uint8)
+    patch_color[:] = color
+    return patch_color
+
+
+def round_display_values(overlay_state):
+    """
+    Rounds the numbers of the pursuit overlay to the precision they are shown at.
+    Args:
+        overlay_state (PursuitOverlay): Values of the current frame.
+    Returns:
+        PursuitOverlay: Shown values only, the drawn geometry left out so equal texts compare equal.
+    """
+    return PursuitOverlay(
+        round(overlay_state.lidar_measure, DISPLAY_PRECISION), None, None,
+        round(overlay_state.orientation_adjust, DISPLAY_PRECISION), round(overlay_state.horizontal_offset, DISPLAY_PRECISION),
+        round(overlay_state.vertical_offset, DISPLAY_PRECISION), round(overlay_state.frame_speed, DISPLAY_PRECISION),
+        round(overlay_state.forward_speed, DISPLAY_PRECISION), overlay_state.is_lidar_aimed)
+
+
+class TextRasterCache:
+    """
+    Rasterizes strings into masks and stamps them on later frames, so
+    putText only runs for strings not seen recently. A string is drawn with
+    putText the first time it is seen and only rasterized when it comes
+    back: building a raster costs several putText calls, which a value
+    shown once never pays back. Least recently used strings are evicted first.
+    """
+
+    def __init__(self, capacity=TEXT_CACHE_CAPACITY):
+        self.capacity = capacity
+        self.rasters = collections.OrderedDict()
+        self.seen_once = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def rasterize(self, text, color=TEXT_COLOR, font_scale=FONT_SCALE, thickness=FONT_THICKNESS):
+        """
+        Obtains the mask of a string, rendering it on a cache miss.
+        Args:
+            text (str): String to draw.
+            color (tuple): BGR text colour.
+            font_scale (float): Hershey font scale.
+            thickness (int): Stroke thickness in pixels.
+        Returns:
+            tuple: Colour patch, mask, its offset from the putText origin (x, y) and the text advance in pixels.
+        """
+        import cv2 as vision_lib
+        raster_key = (text, color, font_scale, thickness)
+        raster = self.rasters.get(raster_key)
+        if raster is not None:
+            self.hits += 1
+            self.rasters.move_to_end(raster_key)
+            return raster
+        self.misses += 1
+        (text_width, text_height), baseline = vision_lib.getTextSize(text, vision_lib.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        padding = thickness + 1
+        text_mask = build_layer_mask((text_height + baseline + 2 * padding, text_width + 2 * padding), lambda element_mask: vision_lib.putText(
+            element_mask, text, (padding, text_height + padding), vision_lib.FONT_HERSHEY_SIMPLEX, font_scale, 255, thickness, vision_lib.LINE_AA))
+        raster = (build_color_patch(text_mask.shape, color), text_mask, (-padding, -text_height - padding), text_width)
+        self.rasters[raster_key] = raster
+        if len(self.rasters) > self.capacity:
+            self.rasters.popitem(last=False)
+        return raster
+
+    def draw(self, image_data, text, origin, color=TEXT_COLOR, font_scale=FONT_SCALE, thickness=FONT_THICKNESS):
+        """
+        Draws a string like putText, from the cache when it was drawn before.
+        Args:
+            image_data (ndarray): BGR image drawn on in place.
+            text (str): String to draw.
+            origin (tuple): putText origin (x, y).
+            color (tuple): BGR text colour.
+            font_scale (float): Hershey font scale.
+            thickness (int): Stroke thickness in pixels.
+        Returns:
+            int: Text advance in pixels.
+        """
+        raster_key = (text, color, font_scale, thickness)
+        if raster_key not in self.rasters and raster_key not in self.seen_once:
+            import cv2 as vision_lib
+            self.misses += 1
+            self.seen_once[raster_key] = None
+            if len(self.seen_once) > self.capacity:
+                self.seen_once.popitem(last=False)
+            vision_lib.putText(image_data, text, (int(origin[0]), int(origin[1])), vision_lib.FONT_HERSHEY_SIMPLEX,
+                               font_scale, color, thickness, vision_lib.LINE_AA)
+            return vision_lib.getTextSize(text, vision_lib.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0][0]
+        self.seen_once.pop(raster_key, None)
+        text_color, text_mask, (offset_x, offset_y), advance = self.rasterize(text, color, font_scale, thickness)
+        stamp_patch(image_data, int(origin[0] + offset_x), int(origin[1] + offset_y), text_color, text_mask)
+        return advance
+
+    def draw_segments(self, image_data, segments, origin, color=TEXT_COLOR, font_scale=FONT_SCALE, thickness=FONT_THICKNESS):
+        """
+        Draws a line as consecutive strings, each cached on its own, so the
+        labels of a line stay cached while the numbers between them change.
+        Args:
+            image_data (ndarray): BGR image drawn on in place.
+            segments (tuple): Strings drawn left to right.
+            origin (tuple): putText origin (x, y) of the first string.
+            color (tuple): BGR text colour.
+            font_scale (float): Hershey font scale.
+            thickness (int): Stroke thickness in pixels.
+        """
+        origin_x, origin_y = origin
+        for segment in segments:
+            origin_x += self.draw(image_data, segment, (origin_x, origin_y), color, font_scale, thickness)
+
+    def report_statistics(self):
+        """
+        Summarises cache use.
+        Returns:
+            dict: Hits, misses, hit rate and strings held.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self.rasters),
+        }
+
+
+class OverlaySink:
+    """
+    One consumer of annotated frames (recorder, ground stream, display),
+    with the resolution its overlay is drawn at.
+    """
+
+    def __init__(self, sink_name, consumer, scale=1.0, overlay=True):
+        self.sink_name = sink_name
+        self.consumer = consumer
+        self.scale = scale
+        self.overlay = overlay
+        self.enabled = True
+
+
+class OverlayRenderer:
+    """
+    Draws the pursuit overlay for each output sink.
+    Static elements (the image center marker and the range gauge frame) are
+    rendered once per frame size into small masked patches stamped onto
+    every frame. Text goes through a TextRasterCache keyed on the values
+    rounded to display precision, label and number apart, so a number is
+    only re-rasterized when a shown digit changes and every frame shows
+    the current values.
+    Sinks can take the overlay at a
+    reduced resolution, take raw frames, or be disabled; with no enabled
+    sink nothing is drawn at all.
+    """
+
+    def __init__(self, frame_size):
+        self.frame_size = frame_size
+        self.text_cache = TextRasterCache()
+        self.static_layers = {}
+        self.sinks = collections.OrderedDict()
+        self.text_values = None
+        self.text_lines = None
+
+    def add_sink(self, sink_name, consumer, scale=1.0, overlay=True):
+        """
+        Registers a consumer of frames.
+        Args:
+            sink_name (str): Name used to enable or disable the sink.
+            consumer (callable): Called with the frame and its capture time; it must
+                copy the frame if it keeps it.
+            scale (float): Resolution factor the frame and overlay are drawn at.
+            overlay (bool): False to hand over the frame without overlay.
+        """
+        self.sinks[sink_name] = OverlaySink(sink_name, consumer, scale, overlay)
+
+    def set_sink_enabled(self, sink_name, enabled):
+        """
+        Turns a sink on or off without removing it.
+        Args:
+            sink_name (str): Name given to add_sink.
+            enabled (bool): Whether the sink receives frames.
+        """
+        self.sinks[sink_name].enabled = enabled
+
+    def has_active_sinks(self):
+        """
+        Reports whether anybody is watching.
+        Returns:
+            bool: True if at least one sink is enabled.
+        """
+        return any(sink.enabled for sink in self.sinks.values())
+
+    def static_layer(self, frame_size, scale):
+        """
+        Builds, or reuses, the pre-rendered static elements for a frame size.
+        Args:
+            frame_size (tuple): Width and height of the frame drawn on.
+            scale (float): Resolution factor relative to the camera frame.
+        Returns:
+            list: (left, top, colour patch, mask) tuples.
+        """
+        import cv2 as vision_lib
+        layer_key = (frame_size, scale)
+        layer_patches = self.static_layers.get(layer_key)
+        if layer_patches is not None:
+            return layer_patches
+        frame_width, frame_height = frame_size
+        marker_radius = max(2, int(round(MARKER_RADIUS * scale)))
+        marker_size = 2 * marker_radius + 3
+        marker_mask = build_layer_mask((marker_size, marker_size), lambda element_mask: vision_lib.circle(
+            element_mask, (marker_size // 2, marker_size // 2), marker_radius, 255, thickness=-1, lineType=vision_lib.LINE_AA))
+        gauge_left, gauge_right = int((self.frame_size[0] - 62) * scale), int((self.frame_size[0] - 38) * scale)
+        gauge_bottom = int((self.frame_size[1] - 48) * scale)
+        gauge_top = max(0, int((self.frame_size[1] - GAUGE_RANGE * GAUGE_SCALE) * scale))
+        gauge_shape = (gauge_bottom - gauge_top + 1, gauge_right - gauge_left + 1)
+        gauge_mask = build_layer_mask(gauge_shape, lambda element_mask: vision_lib.rectangle(
+            element_mask, (0, 0), (gauge_shape[1] - 1, gauge_shape[0] - 1), 255, thickness=max(1, int(round(2 * scale)))))
+        layer_patches = [
+            (frame_width // 2 - marker_size // 2, frame_height // 2 - marker_size // 2, build_color_patch(marker_mask.shape, CENTER_COLOR), marker_mask),
+            (gauge_left, gauge_top, build_color_patch(gauge_shape, GAUGE_FRAME_COLOR), gauge_mask),
+        ]
+        self.static_layers[layer_key] = layer_patches
+        return layer_patches
+
+    def draw_pursuit(self, image_data, overlay_state, scale=1.0):
+        """
+        Draws the pursuit overlay on a frame in place.
+        Args:
+            image_data (ndarray): BGR frame at the given scale.
+            overlay_state (PursuitOverlay): Values shown.
+            scale (float): Resolution factor relative to the camera frame.
+        """
+        import cv2 as vision_lib
+        frame_height, frame_width = image_data.shape[:2]
+        for left, top, patch_color, patch_mask in self.static_layer((frame_width, frame_height), scale):
+            stamp_patch(image_data, left, top, patch_color, patch_mask)
+        line_thickness = max(1, int(round(LINE_THICKNESS * scale)))
+        marker_radius = max(2, int(round(MARKER_RADIUS * scale)))
+        font_scale = FONT_SCALE * scale
+        font_thickness = max(1, int(round(FONT_THICKNESS * scale)))
+        center = (frame_width // 2, frame_height // 2)
+        target = (int(overlay_state.target_position[0] * scale), int(overlay_state.target_position[1] * scale))
+
+        gauge_x = int((self.frame_size[0] - 50) * scale)
+        gauge_bottom = int((self.frame_size[1] - 50) * scale)
+        gauge_top = int((self.frame_size[1] - overlay_state.lidar_measure * GAUGE_SCALE) * scale)
+        vision_lib.line(image_data, (gauge_x, gauge_bottom), (gauge_x, gauge_top), GAUGE_COLOR, thickness=line_thickness)
+        vision_lib.line(image_data, center, target, OFFSET_COLOR, thickness=line_thickness)
+        target_box = overlay_state.target_box
+        vision_lib.rectangle(image_data, (int(target_box.Left * scale), int(target_box.Bottom * scale)),
+                             (int(target_box.Right * scale), int(target_box.Top * scale)), TARGET_COLOR, thickness=line_thickness)
+        vision_lib.circle(image_data, target, marker_radius, TARGET_COLOR, thickness=-1)
+
+        text_values = round_display_values(overlay_state)
+        if text_values != self.text_values:
+            self.text_lines = self.format_pursuit_text(text_values)
+            self.text_values = text_values
+        for (origin_x, origin_y), segments in self.text_lines:
+            self.text_cache.draw_segments(image_data, segments, (origin_x * scale, origin_y * scale), TEXT_COLOR, font_scale, font_thickness)
+
+    def format_pursuit_text(self, text_values):
+        """
+        Formats the text lines of the pursuit overlay.
+        Args:
+            text_values (PursuitOverlay): Values shown, rounded by round_display_values.
+        Returns:
+            tuple: (origin, segments) per line, origins in camera frame pixels.
+        """
+        return (
+            ((self.frame_size[0] - 300, 200), ("Range: ", f"{text_values.lidar_measure}")),
+            ((50, 50), ("FPS: ", f"{text_values.frame_speed}", " Rotation: ", f"{text_values.orientation_adjust}",
+                        " Forward: ", f"{text_values.forward_speed}")),
+            ((50, 100), ("LIDAR aligned: ", f"{text_values.is_lidar_aimed}")),
+            ((50, 150), ("X offset: ", f"{text_values.horizontal_offset}", " Y offset: ", f"{text_values.vertical_offset}")),
+        )
+
+    def draw_status(self, image_data, status_text, scale=1.0):
+        """
+        Draws a single status line, e.g. while seeking.
+        Args:
+            image_data (ndarray): BGR frame at the given scale.
+            status_text (str): Text shown in the top left corner.
+            scale (float): Resolution factor relative to the camera frame.
+        """
+        self.text_cache.draw(image_data, status_text, (50 * scale, 50 * scale), TEXT_COLOR, FONT_SCALE * scale,
+                             max(1, int(round(FONT_THICKNESS * scale))))
+
+    def publish(self, image_data, captured_at=None, overlay_state=None, status_text=None):
+        """
+        Hands a frame to every enabled sink with the overlay each one asked for.
+        Raw and reduced-resolution sinks are served before the full-resolution
+        overlay is drawn onto the frame itself, so no full-size copy is made.
+        Args:
+            image_data (ndarray): Camera frame; full-resolution sinks get it annotated in place.
+            captured_at (float): Capture time passed on to the consumers.
+            overlay_state (PursuitOverlay): Pursuit values, None for no pursuit overlay.
+            status_text (str): Status line, None for none.
+        """
+        import cv2 as vision_lib
+        active_sinks = [sink for sink in self.sinks.values() if sink.enabled]
+        active_sinks.sort(key=lambda sink: sink.overlay and sink.scale >= 1.0)
+        full_frame_annotated = False
+        for sink in active_sinks:
+            sink_frame = image_data
+            if sink.scale < 1.0:
+                sink_frame = vision_lib.resize(image_data, None, fx=sink.scale, fy=sink.scale, interpolation=vision_lib.INTER_AREA)
+            elif sink.overlay and full_frame_annotated:
+                sink.consumer(sink_frame, captured_at)
+                continue
+            else:
+                full_frame_annotated = sink.overlay
+            if sink.overlay:
+                if overlay_state is not None:
+                    self.draw_pursuit(sink_frame, overlay_state, sink.scale)
+                if status_text is not None:
+                    self.draw_status(sink_frame, status_text, sink.scale)
+            sink.consumer(sink_frame, captured_at)
+
+
+def draw_direct_overlay(image_data, overlay_state, display_center):
+    """
+    Draws the pursuit overlay with one OpenCV call per element on every
+    frame. Kept as the reference the cached renderer is measured against.
+    Args:
+        image_data (ndarray): BGR frame drawn on in place.
+        overlay_state (PursuitOverlay): Values shown.
+        display_center (tuple): Image center (x, y).
+    """
+    import cv2
+    display_height, display_width = image_data.shape[:2]
+    lidar_measure, target_position, primary_target = overlay_state.lidar_measure, overlay_state.target_position, overlay_state.target_box
+    lidar_x_pos = display_width - 50
+    lidar_y_pos = display_height - 50
+    lidar_y_pos_extended = int(display_height - lidar_measure * 200)
+    cv2.line(image_data, (lidar_x_pos, lidar_y_pos), (lidar_x_pos, lidar_y_pos_extended), (0, 255, 0), thickness=10, lineType=8, shift=0)
+    cv2.putText(image_data, f"Range: {round(lidar_measure, 2)}", (display_width - 300, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
+    cv2.line(image_data, (int(display_center[0]), int(display_center[1])), (int(target_position[0]), int(target_position[1])), (255, 0, 0), thickness=10, lineType=8, shift=0)
+    cv2.rectangle(image_data, (int(primary_target.Left), int(primary_target.Bottom)), (int(primary_target.Right), int(primary_target.Top)), (0, 0, 255), thickness=10)
+    cv2.circle(image_data, (int(display_center[0]), int(display_center[1])), 20, (0, 255, 0), thickness=-1, lineType=8, shift=0)
+    cv2.circle(image_data, (int(target_position[0]), int(target_position[1])), 20, (0, 0, 255), thickness=-1, lineType=8, shift=0)
+    cv2.putText(image_data, f"FPS: {round(overlay_state.frame_speed, 2)} Rotation: {round(overlay_state.orientation_adjust, 2)} Forward: {round(overlay_state.forward_speed, 2)}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
+    cv2.putText(image_data, f"LIDAR aligned: {overlay_state.is_lidar_aimed}", (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
+    cv2.putText(image_data, f"X offset: {round(overlay_state.horizontal_offset, 2)} Y offset: {round(overlay_state.vertical_offset, 2)}", (50, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
@@ -0,0 +1,245 @@
+import threading as worker_threads
+import time as timing
+import collections
+
+THROUGHPUT_WINDOW = 60   # Number of recent completions used for rate estimates
+
+
+class LatestValueSlot:
+    """
+    Single-entry hand-off between two pipeline stages.
+    Publishing replaces any value the consumer has not taken yet, so a slow
+    consumer always works on the freshest item instead of a growing backlog.
+    """
+
+    def __init__(self, slot_name):
+        self.slot_name = slot_name
+        self.published_count = 0
+        self.dropped_count = 0
+        self._condition = worker_threads.Condition()
+        self._value = None
+        self._has_value = False
+        self._closed = False
+
+    def publish(self, value):
+        """
+        Stores a new value, discarding the previous one if it was never taken.
+        Args:
+            value: Item handed to the next stage (must not be None).
+        """
+        with self._condition:
+            if self._has_value:
+                self.dropped_count += 1
+            self._value = value
+            self._has_value = True
+            self.published_count += 1
+            self._condition.notify_all()
+
+    def take(self, timeout=None):
+        """
+        Waits for an unread value and consumes it.
+        Args:
+            timeout (float): Maximum wait in seconds, None to wait forever.
+        Returns:
+            The latest value, or None on timeout or when the slot is closed.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._has_value or self._closed, timeout):
+                return None
+            if not self._has_value:
+                return None
+            value = self._value
+            self._value = None
+            self._has_value = False
+            return value
+
+    def close(self):
+        """
+        Wakes up any waiting consumer so it can observe shutdown.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class PipelineStage:
+    """
+    Worker thread that repeatedly takes from an input slot, processes the item
+    and publishes the result to an output slot.
+    A stage without an input slot calls its work function in a loop (source stage).
+    The work function returns None when there is nothing to hand downstream.
+    """
+
+    def __init__(self, stage_name, work_function, input_slot=None, output_slot=None):
+        self.stage_name = stage_name
+        self.work_function = work_function
+        self.input_slot = input_slot
+        self.output_slot = output_slot
+        self.processed_count = 0
+        self.busy_seconds = 0.0
+        self.failure = None
+        self._completion_times = collections.deque(maxlen=THROUGHPUT_WINDOW)
+        self._stop_request = worker_threads.Event()
+        self._worker = None
+        self._started_at = None
+
+    def start(self, stop_request):
+        """
+        Launches the worker thread.
+        Args:
+            stop_request (Event): Shared event that ends every stage of the pipeline.
+        """
+        self._stop_request = stop_request
+        self._started_at = timing.monotonic()
+        self._worker = worker_threads.Thread(target=self._run, name=self.stage_name, daemon=True)
+        self._worker.start()
+
+    def join(self, timeout=None):
+        """
+        Waits for the worker thread to finish.
+        Args:
+            timeout (float): Maximum wait in seconds.
+        """
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def _run(self):
+        while not self._stop_request.is_set():
+            if self.input_slot is not None:
+                item = self.input_slot.take(timeout=0.1)
+                if item is None:
+                    continue
+            work_started = timing.monotonic()
+            try:
+                if self.input_slot is None:
+                    result = self.work_function()
+                else:
+                    result = self.work_function(item)
+            except Exception as error:
+                self.failure = error
+                self._stop_request.set()
+                break
+            work_finished = timing.monotonic()
+            self.busy_seconds += work_finished - work_started
+            self.processed_count += 1
+            self._completion_times.append(work_finished)
+            if result is not None and self.output_slot is not None:
+                self.output_slot.publish(result)
+
+    def measure_throughput(self):
+        """
+        Summarises how fast this stage is running.
+        Returns:
+            dict: Items per second over the recent window, mean work time in
+            milliseconds, utilisation (0-1) and items dropped at the input slot.
+        """
+        recent = list(self._completion_times)
+        items_per_second = 0.0
+        if len(recent) > 1 and recent[-1] > recent[0]:
+            items_per_second = (len(recent) - 1) / (recent[-1] - recent[0])
+        mean_work_ms = 0.0
+        if self.processed_count > 0:
+            mean_work_ms = self.busy_seconds / self.processed_count * 1000.0
+        utilisation = 0.0
+        if self._started_at is not None:
+            elapsed = timing.monotonic() - self._started_at
+            if elapsed > 0:
+                utilisation = min(self.busy_seconds / elapsed, 1.0)
+        dropped_inputs = self.input_slot.dropped_count if self.input_slot is not None else 0
+        return {
+            "processed": self.processed_count,
+            "items_per_second": items_per_second,
+            "mean_work_ms": mean_work_ms,
+            "utilisation": utilisation,
+            "dropped_inputs": dropped_inputs,
+        }
+
+
+class StagedPipeline:
+    """
+    Chain of PipelineStage workers connected by LatestValueSlot hand-offs.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.stop_request = worker_threads.Event()
+
+    def add_stage(self, stage_name, work_function):
+        """
+        Appends a stage fed by the output of the previous one.
+        Args:
+            stage_name (str): Name used in throughput reports.
+            work_function (callable): Processing step; takes no argument for the first stage.
+        Returns:
+            PipelineStage: The created stage.
+        """
+        input_slot = None
+        if len(self.stages) > 0:
+            previous_stage = self.stages[-1]
+            input_slot = LatestValueSlot(stage_name)
+            previous_stage.output_slot = input_slot
+        stage = PipelineStage(stage_name, work_function, input_slot=input_slot)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        """
+        Starts every stage worker.
+        """
+        self.stop_request.clear()
+        for stage in self.stages:
+            stage.start(self.stop_request)
+
+    def stop(self, timeout=1.0):
+        """
+        Signals all stages to finish and waits for them.
+        Args:
+            timeout (float): Maximum wait per stage in seconds.
+        """
+        self.stop_request.set()
+        for stage in self.stages:
+            if stage.input_slot is not None:
+                stage.input_slot.close()
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def is_running(self):
+        """
+        Reports whether the pipeline is still active.
+        Returns:
+            bool: False once stopped or after a stage failed.
+        """
+        return not self.stop_request.is_set()
+
+    def report_failure(self):
+        """
+        Obtains the first exception raised by a stage.
+        Returns:
+            Exception: Stage failure, or None if all stages are healthy.
+        """
+        for stage in self.stages:
+            if stage.failure is not None:
+                return stage.failure
+        return None
+
+    def report_stage_throughput(self):
+        """
+        Collects per-stage throughput figures.
+        Returns:
+            dict: Stage name mapped to its measure_throughput summary.
+        """
+        return {stage.stage_name: stage.measure_throughput() for stage in self.stages}
+
+    def identify_bottleneck(self):
+        """
+        Finds the stage whose per-item work time caps the pipeline rate.
+        Returns:
+            str: Name of the slowest stage, or None if nothing ran yet.
+        """
+        slowest_stage = None
+        slowest_work_ms = -1.0
+        for stage_name, summary in self.report_stage_throughput().items():
+            if summary["processed"] > 0 and summary["mean_work_ms"] > slowest_work_ms:
+                slowest_stage = stage_name
+                slowest_work_ms = summary["mean_work_ms"]
+        return slowest_stage
@@ -0,0 +1,314 @@
+import math
+
+LIDAR_MIN_RANGE = 0.1              # meters, closer readings are dropouts
+LIDAR_MAX_RANGE = 12.0             # meters, TF-mini rated range
+LIDAR_MIN_STRENGTH = 100           # TF-mini readings weaker than this are unreliable
+LIDAR_SATURATED_STRENGTH = 65535   # strength reported when the receiver saturates
+LIDAR_RANGE_NOISE = 0.05           # meters
+BOX_RANGE_NOISE = 0.10             # box-height range noise as a fraction of the range, once calibrated
+BOX_RANGE_UNCALIBRATED_NOISE = 0.35
+BOX_EDGE_MARGIN = 2                # boxes touching the top or bottom image edge are cut off
+RANGE_ACCELERATION_NOISE = 1.5     # m/s^2
+OFFSET_MEASUREMENT_NOISE = 4.0     # pixels
+OFFSET_ACCELERATION_NOISE = 400.0  # pixels/s^2
+OUTLIER_GATE = 9.0                 # squared normalised innovation beyond which a sample is rejected (3 sigma)
+OUTLIER_RESET_COUNT = 5            # consecutive rejections after which the track restarts on the new value
+PERSON_HEIGHT = 1.7                # meters
+CAMERA_HORIZONTAL_FOV = 62.2       # degrees, IMX219 CSI camera
+CAMERA_VERTICAL_FOV = 48.8         # degrees
+CALIBRATION_SMOOTHING = 0.05       # weight of each LIDAR/box pair in the box-height scale estimate
+CALIBRATION_MAX_SKEW = 0.1         # seconds between a LIDAR sample and the box it calibrates against
+
+
+def focal_length_pixels(image_extent, field_of_view):
+    """
+    Computes the pinhole focal length along one image axis.
+    Args:
+        image_extent (float): Image width or height in pixels.
+        field_of_view (float): Field of view along that axis in degrees.
+    Returns:
+        float: Focal length in pixels.
+    """
+    return (image_extent / 2.0) / math.tan(math.radians(field_of_view) / 2.0)
+
+
+class KinematicTrack:
+    """
+    Constant-velocity Kalman filter over one scalar and its rate of change.
+    The 2x2 covariance is kept as three floats, so predicting and correcting
+    are a handful of multiplications per sample. Measurements whose
+    normalised innovation exceeds the gate are rejected; a run of
+    rejections restarts the track on the latest value.
+    """
+
+    def __init__(self, acceleration_noise, gate=OUTLIER_GATE, reset_count=OUTLIER_RESET_COUNT):
+        self.acceleration_noise = acceleration_noise
+        self.gate = gate
+        self.reset_count = reset_count
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the state.
+        """
+        self.initialised = False
+        self.timestamp = None
+        self.value = 0.0
+        self.rate = 0.0
+        self.variance = 0.0
+        self.covariance = 0.0
+        self.rate_variance = 0.0
+        self.consecutive_rejections = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def start(self, timestamp, value, variance):
+        """
+        Initialises the track on a first measurement with an unknown rate.
+        Args:
+            timestamp (float): Measurement time in seconds.
+            value (float): Measured value.
+            variance (float): Measurement variance.
+        """
+        self.initialised = True
+        self.timestamp = timestamp
+        self.value = value
+        self.rate = 0.0
+        self.variance = variance
+        self.covariance = 0.0
+        self.rate_variance = variance * 25.0
+        self.consecutive_rejections = 0
+
+    def predict(self, timestamp, control_rate=0.0):
+        """
+        Moves the state forward in time.
+        Args:
+            timestamp (float): Target time in seconds; earlier times leave the state unchanged.
+            control_rate (float): Known rate added to the estimated one, e.g. from ego-motion.
+        """
+        elapsed = timestamp - self.timestamp
+        if elapsed <= 0:
+            return
+        noise = self.acceleration_noise ** 2
+        self.value += (self.rate + control_rate) * elapsed
+        self.variance += elapsed * (2.0 * self.covariance + elapsed * self.rate_variance) + noise * elapsed ** 4 / 4.0
+        self.covariance += elapsed * self.rate_variance + noise * elapsed ** 3 / 2.0
+        self.rate_variance += noise * elapsed ** 2
+        self.timestamp = timestamp
+
+    def correct(self, timestamp, measurement, variance, control_rate=0.0):
+        """
+        Predicts to the measurement time and fuses the measurement.
+        Args:
+            timestamp (float): Measurement time in seconds.
+            measurement (float): Measured value.
+            variance (float): Measurement variance.
+            control_rate (float): Known rate applied over the prediction.
+        Returns:
+            bool: True if the measurement was accepted.
+        """
+        if not self.initialised:
+            self.start(timestamp, measurement, variance)
+            self.accepted += 1
+            return True
+        self.predict(timestamp, control_rate)
+        innovation = measurement - self.value
+        innovation_variance = self.variance + variance
+        if innovation * innovation > self.gate * innovation_variance:
+            self.rejected += 1
+            self.consecutive_rejections += 1
+            if self.consecutive_rejections >= self.reset_count:
+                self.start(timestamp, measurement, variance)
+            return False
+        value_gain = self.variance / innovation_variance
+        rate_gain = self.covariance / innovation_variance
+        self.value += value_gain * innovation
+        self.rate += rate_gain * innovation
+        self.rate_variance -= rate_gain * self.covariance
+        self.variance *= 1.0 - value_gain
+        self.covariance *= 1.0 - value_gain
+        self.consecutive_rejections = 0
+        self.accepted += 1
+        return True
+
+    def extrapolate(self, timestamp, control_rate=0.0):
+        """
+        Predicts the value at a time without changing the state.
+        Args:
+            timestamp (float): Time in seconds.
+            control_rate (float): Known rate added to the estimated one.
+        Returns:
+            float: Predicted value, None before the first measurement.
+        """
+        if not self.initialised:
+            return None
+        return self.value + (self.rate + control_rate) * max(timestamp - self.timestamp, 0.0)
+
+
+class RangeEstimator:
+    """
+    Fuses LIDAR range with a range inferred from the person's box height.
+    LIDAR samples that are dropouts, out of range or too weak are discarded
+    before they reach the filter. The box-height scale (range times box
+    height) starts from the camera geometry and is refined whenever a
+    LIDAR sample and a box arrive together.
+    """
+
+    def __init__(self, image_height, person_height=PERSON_HEIGHT, vertical_fov=CAMERA_VERTICAL_FOV):
+        self.image_height = image_height
+        self.default_scale = person_height * focal_length_pixels(image_height, vertical_fov)
+        self.track = KinematicTrack(RANGE_ACCELERATION_NOISE)
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the range and the box-height calibration.
+        """
+        self.track.reset()
+        self.height_scale = self.default_scale
+        self.scale_calibrated = False
+        self.last_box_height = None
+        self.last_box_time = None
+        self.invalid_lidar = 0
+
+    def update_lidar(self, timestamp, distance, strength):
+        """
+        Fuses one LIDAR sample.
+        Args:
+            timestamp (float): Sample time in seconds.
+            distance (float): Measured range in meters.
+            strength (float): Signal strength reported with it.
+        Returns:
+            bool: True if the sample was used.
+        """
+        if not (LIDAR_MIN_RANGE < distance < LIDAR_MAX_RANGE) or not (LIDAR_MIN_STRENGTH <= strength < LIDAR_SATURATED_STRENGTH):
+            self.invalid_lidar += 1
+            return False
+        if not self.track.correct(timestamp, distance, LIDAR_RANGE_NOISE ** 2):
+            return False
+        if self.last_box_time is not None and abs(timestamp - self.last_box_time) <= CALIBRATION_MAX_SKEW:
+            measured_scale = distance * self.last_box_height
+            if self.scale_calibrated:
+                self.height_scale += CALIBRATION_SMOOTHING * (measured_scale - self.height_scale)
+            else:
+                self.height_scale = measured_scale
+                self.scale_calibrated = True
+        return True
+
+    def update_box(self, timestamp, top, bottom):
+        """
+        Fuses the range implied by the height of the person's box.
+        Args:
+            timestamp (float): Frame time in seconds.
+            top (float): Top edge of the box in pixels.
+            bottom (float): Bottom edge of the box in pixels.
+        Returns:
+            bool: True if the box was used.
+        """
+        if top <= BOX_EDGE_MARGIN or bottom >= self.image_height - BOX_EDGE_MARGIN or bottom - top < 1.0:
+            return False
+        self.last_box_height = bottom - top
+        self.last_box_time = timestamp
+        box_range = self.height_scale / self.last_box_height
+        relative_noise = BOX_RANGE_NOISE if self.scale_calibrated else BOX_RANGE_UNCALIBRATED_NOISE
+        return self.track.correct(timestamp, box_range, (relative_noise * box_range) ** 2)
+
+    def estimate(self, timestamp):
+        """
+        Predicts the range at a time.
+        Args:
+            timestamp (float): Time in seconds, usually now.
+        Returns:
+            float: Range in meters, None before any usable measurement.
+        """
+        return self.track.extrapolate(timestamp)
+
+    def estimate_rate(self):
+        """
+        Obtains the estimated range rate.
+        Returns:
+            float: Range rate in m/s, positive when the person moves away.
+        """
+        return self.track.rate
+
+
+class BearingEstimator:
+    """
+    Filters the horizontal pixel offset of the target. The UAV's own yaw
+    rate moves the whole image, so it is applied as a known rate of
+    -yaw_rate * focal length and the filter only has to follow the
+    person's motion.
+    """
+
+    def __init__(self, image_width, horizontal_fov=CAMERA_HORIZONTAL_FOV):
+        self.focal_length = focal_length_pixels(image_width, horizontal_fov)
+        self.track = KinematicTrack(OFFSET_ACCELERATION_NOISE)
+
+    def reset(self):
+        """
+        Forgets the offset.
+        """
+        self.track.reset()
+
+    def update(self, timestamp, horizontal_offset, yaw_rate=0.0):
+        """
+        Fuses one measured offset.
+        Args:
+            timestamp (float): Frame time in seconds.
+            horizontal_offset (float): Target center minus image center, in pixels.
+            yaw_rate (float): UAV yaw rate in rad/s, positive clockwise.
+        Returns:
+            bool: True if the offset was accepted.
+        """
+        return self.track.correct(timestamp, horizontal_offset, OFFSET_MEASUREMENT_NOISE ** 2, -yaw_rate * self.focal_length)
+
+    def estimate(self, timestamp, yaw_rate=0.0):
+        """
+        Predicts the offset at a time.
+        Args:
+            timestamp (float): Time in seconds, usually now.
+            yaw_rate (float): UAV yaw rate in rad/s over the prediction.
+        Returns:
+            float: Offset in pixels, None before the first measurement.
+        """
+        return self.track.extrapolate(timestamp, -yaw_rate * self.focal_length)
+
+    def estimate_rate(self, yaw_rate=0.0):
+        """
+        Obtains the rate at which the offset changes in the image.
+        Args:
+            yaw_rate (float): UAV yaw rate in rad/s.
+        Returns:
+            float: Offset rate in pixels/s, person motion plus ego-motion.
+        """
+        return self.track.rate - yaw_rate * self.focal_length
+
+
+class BoxcarAverage:
+    """
+    Fixed-length moving average with a running sum, the smoothing the
+    follow loop used before the Kalman estimators. Kept as the benchmark
+    baseline.
+    """
+
+    def __init__(self, length):
+        self.samples = [0.0] * length
+        self.length = length
+        self.count = 0
+        self.total = 0.0
+
+    def append(self, value):
+        """
+        Adds a sample and drops the oldest one once the window is full.
+        Args:
+            value (float): New sample.
+        Returns:
+            float: Mean of the samples in the window.
+        """
+        slot = self.count % self.length
+        if self.count >= self.length:
+            self.total -= self.samples[slot]
+        self.samples[slot] = value
+        self.total += value
+        self.count += 1
+        return self.total / min(self.count, self.length)
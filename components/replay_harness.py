@@ -0,0 +1,1290 @@
+import collections
+import contextlib
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import time as timing
+import cv2 as vision_lib
+import numpy as array_utils
+from serial import Serial as HardwareSerial
+
+from components import replay_standins as standins
+from components import inference_scheduler as inference_schedule
+from components import target_tracker as person_tracker
+from components import range_fusion as state_estimation
+from components import cpu_detector
+from components import multi_camera
+from components import detection_types
+from components import ground_stream
+from components import overlay_renderer as overlay
+from components import flight_simulator as simulator
+from components import mission_runtime as mission
+from components import lidar_module as lidar_system
+
+REPLAY_NETWORK_FPS = 30.0
+REPLAY_DETECT_COST = 0.05   # seconds per fake detector call, roughly SSD-MobileNet-v2 on a Nano
+REPLAY_PIXEL_COST = 0.015   # extra seconds per megapixel handed to the simulated detector
+REPLAY_DNN_BATCH_COST = 0.03   # seconds of fixed overhead per simulated OpenCV DNN forward pass
+REPLAY_DNN_FRAME_COST = 0.02   # extra seconds per image in a simulated forward pass
+LIDAR_BENCH_RATE = 100.0       # TF-mini frames per second written to each pty, the sensor's default output rate
+LIDAR_SNAPSHOT_INTERVAL = 0.02 # seconds between snapshots taken while the LIDAR benchmark runs
+LIDAR_LAYOUTS = ("selector", "threads")
+
+# Temporary log directories created for replays; removed by remove_replay_logs or when the interpreter exits
+replay_log_directories = []
+
+
+class ReplayScenario:
+    """
+    Per-tick detections, LIDAR samples and optional frames fed to the follow loop.
+    """
+
+    def __init__(self, scenario_name, boxes, lidar_samples, frames=None, network_fps=REPLAY_NETWORK_FPS, textured=False, true_distances=None):
+        self.scenario_name = scenario_name
+        self.true_distances = None if true_distances is None else array_utils.asarray(true_distances, dtype=array_utils.float64)
+        self.boxes = boxes
+        self.lidar_samples = array_utils.asarray(lidar_samples, dtype=array_utils.float64)
+        self.frames = frames
+        self.network_fps = network_fps
+        self.textured = textured
+        self.tick_count = len(boxes)
+        self._blank_frame = array_utils.full((standins.REPLAY_FRAME_SIZE[1], standins.REPLAY_FRAME_SIZE[0], 3), 40, dtype=array_utils.uint8)
+        self._person_textures = None
+
+    def boxes_at(self, tick_index):
+        """
+        Obtains the person boxes of one tick.
+        Args:
+            tick_index (int): Tick number.
+        Returns:
+            list: (left, top, right, bottom) tuples in pixels.
+        """
+        return self.boxes[tick_index]
+
+    def lidar_at(self, tick_index):
+        """
+        Obtains the LIDAR sample of one tick.
+        Args:
+            tick_index (int): Tick number.
+        Returns:
+            tuple: (distance in meters, signal strength).
+        """
+        return tuple(self.lidar_samples[tick_index])
+
+    def frame_at(self, tick_index):
+        """
+        Obtains a writable copy of the frame of one tick.
+        Args:
+            tick_index (int): Tick number.
+        Returns:
+            ndarray: BGR image.
+        """
+        if self.frames is None:
+            if self.textured:
+                return self.render_textured_frame(tick_index)
+            return self._blank_frame.copy()
+        return array_utils.array(self.frames[tick_index])
+
+    def render_textured_frame(self, tick_index):
+        """
+        Draws every box of a tick as a noise-textured patch over a textured
+        background, giving optical flow something to track.
+        Args:
+            tick_index (int): Tick number.
+        Returns:
+            ndarray: BGR image.
+        """
+        if self._person_textures is None:
+            random_source = array_utils.random.RandomState(len(self.scenario_name))
+            background = random_source.randint(0, 256, self._blank_frame.shape[:2]).astype(array_utils.uint8)
+            self._textured_background = vision_lib.cvtColor(vision_lib.GaussianBlur(background, (0, 0), 3), vision_lib.COLOR_GRAY2BGR)
+            self._person_textures = []
+            for person in range(max(len(tick_boxes) for tick_boxes in self.boxes)):
+                texture = vision_lib.GaussianBlur(random_source.randint(0, 256, (320, 128)).astype(array_utils.uint8), (0, 0), 1.5)
+                self._person_textures.append(vision_lib.cvtColor(texture, vision_lib.COLOR_GRAY2BGR))
+        frame = self._textured_background.copy()
+        frame_height, frame_width = frame.shape[:2]
+        # Draw far people first so nearer (taller) boxes occlude them
+        tick_boxes = self.boxes[tick_index]
+        for person in sorted(range(len(tick_boxes)), key=lambda person: tick_boxes[person][3] - tick_boxes[person][1]):
+            left, top, right, bottom = (int(round(edge)) for edge in tick_boxes[person])
+            if right - left < 2 or bottom - top < 2:
+                continue
+            patch = vision_lib.resize(self._person_textures[person], (right - left, bottom - top), interpolation=vision_lib.INTER_LINEAR)
+            clipped_left, clipped_top = max(left, 0), max(top, 0)
+            clipped_right, clipped_bottom = min(right, frame_width), min(bottom, frame_height)
+            if clipped_right <= clipped_left or clipped_bottom <= clipped_top:
+                continue
+            frame[clipped_top:clipped_bottom, clipped_left:clipped_right] = patch[clipped_top - top:clipped_bottom - top, clipped_left - left:clipped_right - left]
+        return frame
+
+
+def save_scenario(scenario, scenario_path):
+    """
+    Stores a scenario as an .npz file.
+    Args:
+        scenario (ReplayScenario): Scenario to store.
+        scenario_path (str): Output path.
+    """
+    box_counts = array_utils.array([len(tick_boxes) for tick_boxes in scenario.boxes], dtype=array_utils.int32)
+    flat_boxes = array_utils.array([box for tick_boxes in scenario.boxes for box in tick_boxes], dtype=array_utils.float64).reshape(-1, 4)
+    stored_arrays = {"box_counts": box_counts, "boxes": flat_boxes, "lidar": scenario.lidar_samples}
+    if scenario.frames is not None:
+        stored_arrays["frames"] = scenario.frames
+    if scenario.true_distances is not None:
+        stored_arrays["true_distances"] = scenario.true_distances
+    array_utils.savez_compressed(scenario_path, **stored_arrays)
+
+
+def load_scenario(scenario_path):
+    """
+    Loads a scenario stored with save_scenario.
+    Args:
+        scenario_path (str): Path to the .npz file.
+    Returns:
+        ReplayScenario: Loaded scenario.
+    """
+    stored_arrays = array_utils.load(scenario_path)
+    box_offsets = array_utils.concatenate(([0], array_utils.cumsum(stored_arrays["box_counts"])))
+    flat_boxes = stored_arrays["boxes"]
+    boxes = [[tuple(box) for box in flat_boxes[box_offsets[tick]:box_offsets[tick + 1]]] for tick in range(len(box_offsets) - 1)]
+    frames = stored_arrays["frames"] if "frames" in stored_arrays.files else None
+    true_distances = stored_arrays["true_distances"] if "true_distances" in stored_arrays.files else None
+    return ReplayScenario(os.path.basename(scenario_path), boxes, stored_arrays["lidar"], frames, true_distances=true_distances)
+
+
+def project_person_box(horizontal_position, distance, image_size=standins.REPLAY_FRAME_SIZE):
+    """
+    Projects a standing person into a camera bounding box.
+    Args:
+        horizontal_position (float): Offset from the image center as a fraction of the width (-0.5 to 0.5).
+        distance (float): Distance to the person in meters.
+        image_size (tuple): Image width and height.
+    Returns:
+        tuple: (left, top, right, bottom) in pixels.
+    """
+    image_width, image_height = image_size
+    box_height = min(image_height * 0.95, image_height * 1.6 / max(distance, 0.3))
+    box_width = box_height * 0.4
+    center_x = image_width / 2.0 + horizontal_position * image_width
+    center_y = image_height / 2.0
+    return (center_x - box_width / 2.0, center_y - box_height / 2.0, center_x + box_width / 2.0, center_y + box_height / 2.0)
+
+
+def generate_walking_person(tick_count=2000, seed=0):
+    """
+    Synthesises one person weaving across the view at a varying distance,
+    with occasional LIDAR dropouts.
+    Args:
+        tick_count (int): Number of ticks.
+        seed (int): Random seed.
+    Returns:
+        ReplayScenario: Synthetic scenario.
+    """
+    random_source = array_utils.random.RandomState(seed)
+    tick_times = array_utils.arange(tick_count) / REPLAY_NETWORK_FPS
+    horizontal_positions = 0.25 * array_utils.sin(tick_times * 0.7)
+    distances = 3.0 + array_utils.sin(tick_times * 0.3)
+    boxes = [[project_person_box(horizontal_positions[tick], distances[tick])] for tick in range(tick_count)]
+    lidar_samples = array_utils.stack([distances + random_source.normal(0, 0.03, tick_count), array_utils.full(tick_count, 900.0)], axis=1)
+    lidar_samples[random_source.rand(tick_count) < 0.02] = (0.0, 0.0)
+    return ReplayScenario("walking_person", boxes, lidar_samples, true_distances=distances)
+
+
+def generate_crowd(tick_count=2000, seed=0, bystander_count=12):
+    """
+    Synthesises a walking person surrounded by randomly wandering bystanders.
+    Args:
+        tick_count (int): Number of ticks.
+        seed (int): Random seed.
+        bystander_count (int): Number of additional people.
+    Returns:
+        ReplayScenario: Synthetic scenario.
+    """
+    random_source = array_utils.random.RandomState(seed)
+    walking_person = generate_walking_person(tick_count, seed)
+    bystander_positions = random_source.uniform(-0.45, 0.45, bystander_count)
+    bystander_distances = random_source.uniform(2.0, 8.0, bystander_count)
+    boxes = []
+    for tick in range(tick_count):
+        bystander_positions = array_utils.clip(bystander_positions + random_source.normal(0, 0.004, bystander_count), -0.45, 0.45)
+        tick_boxes = list(walking_person.boxes[tick])
+        tick_boxes.extend(project_person_box(bystander_positions[person], bystander_distances[person]) for person in range(bystander_count))
+        boxes.append(tick_boxes)
+    return ReplayScenario("crowd", boxes, walking_person.lidar_samples, true_distances=walking_person.true_distances)
+
+
+def generate_stationary_person(tick_count=2000, seed=0):
+    """
+    Synthesises a person standing still at the follow distance.
+    Args:
+        tick_count (int): Number of ticks.
+        seed (int): Random seed.
+    Returns:
+        ReplayScenario: Synthetic scenario.
+    """
+    random_source = array_utils.random.RandomState(seed)
+    boxes = [[project_person_box(0.0, 1.5)] for tick in range(tick_count)]
+    lidar_samples = array_utils.stack([1.5 + random_source.normal(0, 0.01, tick_count), array_utils.full(tick_count, 1200.0)], axis=1)
+    return ReplayScenario("stationary_person", boxes, lidar_samples, true_distances=array_utils.full(tick_count, 1.5))
+
+
+BENCHMARK_SCENARIOS = {
+    "walking_person": generate_walking_person,
+    "crowd": generate_crowd,
+    "stationary_person": generate_stationary_person,
+}
+
+
+def import_follow_module():
+    """
+    Imports follow_main against the stand-in hardware modules without starting it.
+    Returns:
+        module: The imported follow_main module.
+    """
+    if "follow_main" in sys.modules:
+        return sys.modules["follow_main"]
+    standins.install_standin_modules()
+    components_path = os.path.dirname(os.path.abspath(__file__))
+    repository_path = os.path.dirname(components_path)
+    for search_path in (repository_path, components_path):
+        if search_path not in sys.path:
+            sys.path.insert(0, search_path)
+    return importlib.import_module("follow_main")
+
+
+def replay_arguments(log_dir=None, algorithm="PID", gains_path=None):
+    """
+    Builds the follow_main command line used for replays.
+    Args:
+        log_dir (str): Base path for the flight log, defaults to a temporary directory.
+        algorithm (str): Control algorithm passed to follow_main.
+        gains_path (str): Gain file passed to follow_main, None for the built-in gains.
+    Returns:
+        list: Command-line arguments.
+    """
+    if log_dir is None:
+        log_directory = tempfile.TemporaryDirectory(prefix="replay_")
+        replay_log_directories.append(log_directory)
+        log_dir = os.path.join(log_directory.name, "replay")
+    # Replays read the LIDAR stand-in inside each tick, so every tick fuses the sample of its own tick
+    arguments = ["--operation=replay", f"--log_dir={log_dir}", f"--algorithm={algorithm}", "--direct_lidar"]
+    if gains_path is not None:
+        arguments.append(f"--gains={gains_path}")
+    return arguments
+
+
+def remove_replay_logs():
+    """
+    Closes the flight log of a started follow_main and removes the temporary
+    log directories created by replay_arguments.
+    """
+    follow_module = sys.modules.get("follow_main")
+    if follow_module is not None and follow_module.parsed_options is not None:
+        follow_module.regulator.close_log_files()
+    while replay_log_directories:
+        replay_log_directories.pop().cleanup()
+
+
+def load_follow_module(log_dir=None, algorithm="PID"):
+    """
+    Imports follow_main against the stand-in hardware modules and starts it once.
+    Args:
+        log_dir (str): Base path for the flight log, defaults to a temporary directory.
+        algorithm (str): Control algorithm passed to follow_main.
+    Returns:
+        module: The started follow_main module.
+    """
+    follow_module = import_follow_module()
+    if follow_module.parsed_options is None:
+        follow_module.start_system(replay_arguments(log_dir, algorithm))
+    return follow_module
+
+
+def run_startup_benchmark(startup_workers, startup_delays=standins.REPLAY_STARTUP_DELAYS, warm=False):
+    """
+    Times importing and starting follow_main against stand-ins that take
+    representative hardware start-up times.
+    Args:
+        startup_workers (int): Startup steps run at once, 1 for a sequential start.
+        startup_delays (dict): Stand-in start-up costs in seconds.
+        warm (bool): Keep an inference engine built by an earlier run.
+    Returns:
+        dict: Import time in milliseconds and the startup breakdown of follow_main.start_system.
+    """
+    import_started = timing.perf_counter()
+    follow_module = import_follow_module()
+    import_time = timing.perf_counter() - import_started
+    if not warm:
+        follow_module.object_tracker.engine_cache.clear()
+    if follow_module.parsed_options is not None:
+        follow_module.regulator.deactivate_uav_connection()
+    standins.replay_state.startup_delays = dict(startup_delays)
+    try:
+        startup_report = follow_module.start_system(replay_arguments(), startup_workers)
+    finally:
+        standins.replay_state.startup_delays = {}
+    return {
+        "import_ms": import_time * 1000.0,
+        "startup": startup_report,
+    }
+
+
+def run_pursuit_replay(follow_module, scenario):
+    """
+    Runs the real pursuit loop over a scenario as fast as possible.
+    Each tick spans two consecutive camera captures, so the latency covers
+    detection, LIDAR parsing, averaging, PID, MAVLink dispatch and rendering.
+    Args:
+        follow_module (module): Module returned by load_follow_module.
+        scenario (ReplayScenario): Scenario to replay.
+    Returns:
+        dict: Tick latencies in seconds, outcome phase and MAVLink messages sent.
+    """
+    standins.replay_state.load(scenario)
+    follow_module.range_estimate.reset()
+    follow_module.bearing_estimate.reset()
+    follow_module.target_lock.reset()
+    follow_module.regulator.configure_regulation_system(follow_module.parsed_options.algorithm)
+    follow_module.regulator.set_operation_phase("pursuit")
+
+    next_phase = follow_module.execute_pursuit()
+    follow_module.regulator.stop_fixed_rate_control()
+
+    capture_times = array_utils.array(standins.replay_state.capture_times)
+    return {
+        "scenario": scenario.scenario_name,
+        "next_phase": next_phase,
+        "tick_latencies": array_utils.diff(capture_times),
+        "messages_sent": list(standins.replay_state.sent_messages),
+    }
+
+
+def wait_simulated_cost(duration):
+    """
+    Blocks for a simulated processing time without burning the CPU.
+    Args:
+        duration (float): Seconds to wait.
+    """
+    wait_deadline = timing.perf_counter() + duration
+    while timing.perf_counter() < wait_deadline:
+        timing.sleep(max(0.0, wait_deadline - timing.perf_counter()) / 2)
+
+
+class SimulatedDetectionBackend:
+    """
+    CPU stand-in for the detector backend. Returns the scenario boxes of a
+    tick, clipped to the requested window, after a latency made of a fixed
+    part plus a part proportional to the pixels processed.
+    """
+
+    def __init__(self, scenario, fixed_cost=REPLAY_DETECT_COST, pixel_cost=REPLAY_PIXEL_COST):
+        self.scenario = scenario
+        self.fixed_cost = fixed_cost
+        self.pixel_cost = pixel_cost
+        self.last_cost = 0.0
+
+    def detect(self, tick_index, window=None):
+        """
+        Detects the people of a tick in the full frame or a window of it.
+        Args:
+            tick_index (int): Tick number, standing in for the captured frame.
+            window (tuple): (left, top, right, bottom) in pixels, None for the full frame.
+        Returns:
+            list: ReplayDetection objects in window coordinates.
+        """
+        tick_boxes = self.scenario.boxes_at(tick_index)
+        if window is None:
+            processed_pixels = standins.REPLAY_FRAME_SIZE[0] * standins.REPLAY_FRAME_SIZE[1]
+        else:
+            processed_pixels = (window[2] - window[0]) * (window[3] - window[1])
+            tick_boxes = standins.boxes_in_window(tick_boxes, window)
+        self.last_cost = self.fixed_cost + self.pixel_cost * processed_pixels / 1e6
+        wait_simulated_cost(self.last_cost)
+        return [standins.ReplayDetection(*box) for box in tick_boxes]
+
+    def network_speed(self):
+        """
+        Obtains the simulated network throughput.
+        Returns:
+            float: Frames per second of the last call.
+        """
+        return 1.0 / self.last_cost if self.last_cost > 0 else self.scenario.network_fps
+
+
+class SimulatedDnnNetwork:
+    """
+    Stand-in for a cv2.dnn network when no model file is available. The
+    forward pass takes a fixed overhead plus a per-image cost, and returns
+    one person and one non-person DetectionOutput row per image in the blob.
+    """
+
+    def __init__(self, batch_cost=REPLAY_DNN_BATCH_COST, frame_cost=REPLAY_DNN_FRAME_COST):
+        self.batch_cost = batch_cost
+        self.frame_cost = frame_cost
+        self.input_blob = None
+
+    def setInput(self, input_blob):
+        self.input_blob = input_blob
+
+    def forward(self):
+        image_count = self.input_blob.shape[0]
+        wait_simulated_cost(self.batch_cost + self.frame_cost * image_count)
+        output_rows = []
+        for image_index in range(image_count):
+            output_rows.append([image_index, 1, 0.9, 0.40, 0.25, 0.55, 0.75])
+            output_rows.append([image_index, 3, 0.8, 0.05, 0.60, 0.30, 0.80])
+        return array_utils.array(output_rows, dtype=array_utils.float32).reshape(1, 1, -1, cpu_detector.DNN_OUTPUT_WIDTH)
+
+    def getPerfProfile(self):
+        return 0, []
+
+
+def read_benchmark_frames(frame_count, video_path=None):
+    """
+    Reads frames up front so the detector benchmark does not time decoding.
+    Args:
+        frame_count (int): Number of frames.
+        video_path (str): Video file, None for synthetic frames.
+    Returns:
+        list: BGR frames.
+    """
+    if video_path is None:
+        frame_source = cpu_detector.SyntheticVideoSource(frame_rate=0)
+    else:
+        frame_source = cpu_detector.VideoFileSource(video_path, loop=True)
+    benchmark_frames = [frame_source.Capture() for frame_index in range(frame_count)]
+    frame_source.Close()
+    return benchmark_frames
+
+
+def run_detector_throughput(benchmark_frames, batch_size, worker_count, model_path=None, config_path=""):
+    """
+    Measures OpenCV DNN detection throughput for one batch size and thread count.
+    Args:
+        benchmark_frames (list): Frames from read_benchmark_frames.
+        batch_size (int): Frames per forward pass.
+        worker_count (int): Threads preparing and decoding frames.
+        model_path (str): Model file, None for SimulatedDnnNetwork.
+        config_path (str): Model configuration file.
+    Returns:
+        dict: Frames per second, batch latency percentiles, forward share and people found.
+    """
+    network = SimulatedDnnNetwork() if model_path is None else None
+    detector = cpu_detector.OpenCVDetectionBackend(model_path, config_path, worker_count, network=network)
+    batch_latencies = []
+    people_found = 0
+    run_started = timing.perf_counter()
+    try:
+        for batch_start in range(0, len(benchmark_frames), batch_size):
+            batch_started = timing.perf_counter()
+            frame_detections = detector.detect_batch(benchmark_frames[batch_start:batch_start + batch_size])
+            batch_latencies.append(timing.perf_counter() - batch_started)
+            people_found += sum(len([detection for detection in detections if detection.ClassID == 1]) for detections in frame_detections)
+    finally:
+        detector.close()
+    run_time = timing.perf_counter() - run_started
+    detector_statistics = detector.report_statistics()
+    return {
+        "batch_size": batch_size,
+        "workers": worker_count,
+        "frames_per_second": len(benchmark_frames) / run_time,
+        "batch_p50_ms": float(array_utils.percentile(batch_latencies, 50)) * 1000.0,
+        "batch_p99_ms": float(array_utils.percentile(batch_latencies, 99)) * 1000.0,
+        "forward_share": detector_statistics["forward_share"],
+        "people_found": people_found,
+    }
+
+
+def run_multi_camera_benchmark(stream_count, capture_mode="synchronized", batch_count=100, video_paths=None, batched=True,
+                               model_path=None, config_path="", frame_rate=cpu_detector.SYNTHETIC_FRAME_RATE):
+    """
+    Detects people in several camera streams at once and measures every stream.
+    Args:
+        stream_count (int): Number of cameras.
+        capture_mode (str): One of multi_camera.CAPTURE_MODES.
+        batch_count (int): Batches to run.
+        video_paths (list): Video files used in turn as the streams, None for synthetic cameras.
+        batched (bool): One forward pass for all streams, or one per stream for comparison.
+        model_path (str): Model file, None for SimulatedDnnNetwork.
+        config_path (str): Model configuration file.
+        frame_rate (float): Frame rate of the synthetic cameras.
+    Returns:
+        dict: MultiCameraDetector statistics plus the aggregate detected frames per second.
+    """
+    network = SimulatedDnnNetwork() if model_path is None else None
+    detector = cpu_detector.OpenCVDetectionBackend(model_path, config_path, network=network)
+
+    def detect_people(captured_images):
+        if batched:
+            frame_results = detector.detect_batch(captured_images)
+        else:
+            frame_results = [detector.detect(captured_image) for captured_image in captured_images]
+        return ([[result for result in results if result.ClassID == detection_types.PERSON_CLASS_ID] for results in frame_results],
+                detector.network_speed())
+
+    camera_streams = []
+    for stream_index in range(stream_count):
+        if video_paths:
+            image_source = cpu_detector.VideoFileSource(video_paths[stream_index % len(video_paths)], loop=True)
+        else:
+            image_source = cpu_detector.SyntheticVideoSource(frame_rate=frame_rate, seed=stream_index)
+        camera_streams.append(multi_camera.CameraStream(f"camera{stream_index}", image_source))
+    camera_detector = multi_camera.MultiCameraDetector(camera_streams, detect_people, capture_mode)
+    camera_detector.start()
+    run_started = timing.perf_counter()
+    try:
+        for batch_index in range(batch_count):
+            camera_detector.detect_once()
+    finally:
+        camera_detector.stop()
+        detector.close()
+        for camera_stream in camera_streams:
+            camera_stream.image_source.Close()
+    run_time = timing.perf_counter() - run_started
+    summary = camera_detector.report_statistics()
+    summary["batched"] = batched
+    summary["total_frames_per_second"] = camera_detector.batched_frames / run_time
+    return summary
+
+
+def run_ground_stream_benchmark(transport="udp", frame_count=150, bitrate=ground_stream.STREAM_BITRATE, client_count=2,
+                                frame_rate=ground_stream.STREAM_FRAME_RATE, source_rate=cpu_detector.SYNTHETIC_FRAME_RATE):
+    """
+    Streams synthetic camera frames to local receivers over loopback.
+    Args:
+        transport (str): One of ground_stream.STREAM_TRANSPORTS.
+        frame_count (int): Frames submitted.
+        bitrate (float): Bitrate budget in bits per second.
+        client_count (int): Receivers connected at once.
+        frame_rate (float): Frames per second the streamer sends at most.
+        source_rate (float): Frames per second submitted by the simulated camera.
+    Returns:
+        dict: Streamer statistics, p50/p99/max time spent in submit in milliseconds
+            and frames and latency seen by each receiver.
+    """
+    streamer = ground_stream.GroundStreamer(transport, 0, bitrate, frame_rate, bind_address="127.0.0.1")
+    streamer.start()
+    if transport == "udp":
+        receivers = [ground_stream.UdpStreamReceiver(("127.0.0.1", streamer.port)) for client_index in range(client_count)]
+    else:
+        receivers = [ground_stream.HttpStreamReceiver(("127.0.0.1", streamer.port)) for client_index in range(client_count)]
+    receiving = [True]
+
+    def receive_frames(receiver):
+        while receiving[0]:
+            receiver.receive_frame(0.5)
+
+    receiver_threads = [threading.Thread(target=receive_frames, args=(receiver,), daemon=True) for receiver in receivers]
+    for receiver_thread in receiver_threads:
+        receiver_thread.start()
+    wait_simulated_cost(0.3)
+    frame_source = cpu_detector.SyntheticVideoSource(frame_rate=source_rate)
+    submit_times = []
+    for frame_index in range(frame_count):
+        frame_data = frame_source.Capture()
+        captured_at = timing.monotonic()
+        submit_started = timing.perf_counter()
+        streamer.submit(frame_data, captured_at)
+        submit_times.append(timing.perf_counter() - submit_started)
+    wait_simulated_cost(0.5)
+    receiving[0] = False
+    for receiver_thread in receiver_threads:
+        receiver_thread.join()
+    summary = streamer.report_statistics()
+    streamer.close()
+    summary["submit_p50_ms"] = float(array_utils.percentile(submit_times, 50)) * 1000.0
+    summary["submit_p99_ms"] = float(array_utils.percentile(submit_times, 99)) * 1000.0
+    summary["submit_max_ms"] = float(array_utils.max(submit_times)) * 1000.0
+    summary["receivers"] = [{
+        "frames": receiver.received_frames,
+        "latency_p50_ms": receiver.latency_histogram.percentile(50) / 1000.0,
+        "latency_p99_ms": receiver.latency_histogram.percentile(99) / 1000.0,
+    } for receiver in receivers]
+    for receiver in receivers:
+        receiver.close()
+    return summary
+
+
+def stream_lidar_frames(master_fds, frame_count, sample_rate, sent_times):
+    """
+    Writes numbered TF-mini frames to pty masters at a fixed rate.
+    Frame k of every sensor reports k centimetres, so a received sample
+    identifies the frame it came from.
+    Args:
+        master_fds (list): Master side of every pty.
+        frame_count (int): Frames written to each pty.
+        sample_rate (float): Frames per second per pty.
+        sent_times (list): Receives the monotonic write time of every frame, one list per pty.
+    """
+    stream_started = timing.monotonic()
+    for frame_index in range(frame_count):
+        wait_simulated_cost(stream_started + frame_index / sample_rate - timing.monotonic())
+        tfmini_frame = standins.encode_tfmini_frame(frame_index / 100.0, 900)
+        for sensor_index, master_fd in enumerate(master_fds):
+            sent_times[sensor_index].append(timing.monotonic())
+            os.write(master_fd, tfmini_frame)
+
+
+def open_benchmark_port(sensor_spec):
+    """
+    Opens a benchmark pty with pyserial for non-blocking reads.
+    Args:
+        sensor_spec (LidarSensorSpec): Sensor whose port to open.
+    Returns:
+        serial.Serial: Open port.
+    """
+    return HardwareSerial(sensor_spec.port, sensor_spec.baud_rate, timeout=0)
+
+
+def run_lidar_benchmark(sensor_count, layout="selector", duration=3.0, sample_rate=LIDAR_BENCH_RATE):
+    """
+    Streams TF-mini frames into one pty per sensor and reads them back through
+    pyserial, either with one LidarManager selector thread or one LidarReader
+    thread per port.
+    Args:
+        sensor_count (int): Number of sensors.
+        layout (str): One of LIDAR_LAYOUTS.
+        duration (float): Seconds of frames written to each pty.
+        sample_rate (float): Frames per second per sensor.
+    Returns:
+        dict: Reader threads, process CPU use, p50/p99 snapshot skew in
+            milliseconds and per sensor the received and lost frames and p50/p99
+            write-to-sample latency in milliseconds.
+    """
+    if layout not in LIDAR_LAYOUTS:
+        raise ValueError(f"Unknown LIDAR layout '{layout}', expected one of {LIDAR_LAYOUTS}")
+    frame_count = int(duration * sample_rate)
+    pty_pairs = [os.openpty() for sensor_index in range(sensor_count)]
+    sensor_specs = [lidar_system.LidarSensorSpec(f"lidar{sensor_index}", os.ttyname(slave_fd), lidar_system.LIDAR_BAUD_RATE, frame_count + 16)
+                    for sensor_index, (master_fd, slave_fd) in enumerate(pty_pairs)]
+    # The ptys are read through pyserial even after the replay stand-ins replaced it for the follow loop
+    if layout == "selector":
+        lidar_manager = lidar_system.LidarManager(sensor_specs, open_port=open_benchmark_port)
+        lidar_manager.start()
+        sample_rings = [sensor.samples for sensor in lidar_manager.sensors.values()]
+        take_snapshot = lidar_manager.snapshot
+    else:
+        lidar_readers = [lidar_system.LidarReader(HardwareSerial(sensor_spec.port, sensor_spec.baud_rate, timeout=lidar_system.LIDAR_READ_TIMEOUT),
+                                                  sensor_spec.capacity) for sensor_spec in sensor_specs]
+        for lidar_reader in lidar_readers:
+            lidar_reader.start()
+        sample_rings = [lidar_reader.samples for lidar_reader in lidar_readers]
+
+        def take_snapshot():
+            latest_samples = {sensor_spec.sensor_name: lidar_reader.samples.latest() for sensor_spec, lidar_reader in zip(sensor_specs, lidar_readers)}
+            return lidar_system.LidarSnapshot(timing.monotonic(), latest_samples, lidar_system.measure_sample_skew(latest_samples))
+
+    sent_times = [[] for sensor_index in range(sensor_count)]
+    writer = threading.Thread(target=stream_lidar_frames, args=([master_fd for master_fd, slave_fd in pty_pairs], frame_count, sample_rate, sent_times),
+                              name="lidar_writer", daemon=True)
+    cpu_started = timing.process_time()
+    run_started = timing.perf_counter()
+    writer.start()
+    snapshot_skews = []
+    while writer.is_alive():
+        wait_simulated_cost(LIDAR_SNAPSHOT_INTERVAL)
+        snapshot_skews.append(take_snapshot().skew)
+    wait_simulated_cost(0.1)
+    cpu_time = timing.process_time() - cpu_started
+    run_time = timing.perf_counter() - run_started
+
+    if layout == "selector":
+        lidar_manager.stop()
+    else:
+        for lidar_reader in lidar_readers:
+            lidar_reader.stop()
+            lidar_reader.serial_port.close()
+    for master_fd, slave_fd in pty_pairs:
+        os.close(master_fd)
+        os.close(slave_fd)
+
+    sensor_summaries = {}
+    for sensor_spec, sample_ring, sensor_sent_times in zip(sensor_specs, sample_rings, sent_times):
+        received_samples = sample_ring.window(float("inf"))
+        frame_indices = array_utils.round(received_samples["distance"] * 100.0).astype(int)
+        latencies = received_samples["timestamp"] - array_utils.asarray(sensor_sent_times)[frame_indices] if len(frame_indices) else array_utils.zeros(1)
+        sensor_summaries[sensor_spec.sensor_name] = {
+            "received": len(received_samples),
+            "lost": frame_count - len(received_samples),
+            "latency_p50_ms": float(array_utils.percentile(latencies, 50)) * 1000.0,
+            "latency_p99_ms": float(array_utils.percentile(latencies, 99)) * 1000.0,
+        }
+    return {
+        "layout": layout,
+        "threads": 1 if layout == "selector" else sensor_count,
+        "cpu_percent": cpu_time / run_time * 100.0,
+        "skew_p50_ms": float(array_utils.percentile(snapshot_skews, 50)) * 1000.0 if snapshot_skews else 0.0,
+        "skew_p99_ms": float(array_utils.percentile(snapshot_skews, 99)) * 1000.0 if snapshot_skews else 0.0,
+        "sensors": sensor_summaries,
+    }
+
+
+def generate_overlay_states(frame_count, frame_size=standins.REPLAY_FRAME_SIZE, seed=0):
+    """
+    Builds pursuit overlay values that change every frame like a real pursuit.
+    Args:
+        frame_count (int): Number of frames.
+        frame_size (tuple): Width and height of the frames.
+        seed (int): Random seed.
+    Returns:
+        list: PursuitOverlay per frame.
+    """
+    random_state = array_utils.random.RandomState(seed)
+    frame_width, frame_height = frame_size
+    overlay_states = []
+    for frame_index in range(frame_count):
+        phase = frame_index / 60.0
+        center_x = frame_width / 2 + frame_width / 4 * array_utils.sin(phase)
+        box_height = frame_height / 2 + frame_height / 8 * array_utils.sin(phase / 3)
+        target_box = detection_types.build_detection_box(center_x - box_height / 6, (frame_height - box_height) / 2,
+                                                         center_x + box_height / 6, (frame_height + box_height) / 2)
+        overlay_states.append(overlay.PursuitOverlay(
+            2.0 + 0.5 * array_utils.sin(phase / 2) + random_state.normal(0.0, 0.01), target_box.Center, target_box,
+            random_state.normal(0.0, 5.0), (center_x - frame_width / 2) / frame_width, random_state.normal(0.0, 0.01),
+            20.0 + random_state.normal(0.0, 1.0), random_state.normal(0.5, 0.1), abs(center_x - frame_width / 2) < box_height / 6))
+    return overlay_states
+
+
+def run_overlay_benchmark(frame_count=300, frame_size=standins.REPLAY_FRAME_SIZE):
+    """
+    Times the overlay of each frame with the direct OpenCV renderer (at full
+    resolution, then also downscaled to half as a stream would) and the
+    cached renderer at full resolution, half resolution, without overlay
+    and with no sink. Frames are spaced one camera period apart on the
+    renderer's clock.
+    Args:
+        frame_count (int): Frames per renderer.
+        frame_size (tuple): Width and height of the frames.
+    Returns:
+        dict: Renderer name mapped to p50/p99 milliseconds per frame and, for
+            the cached renderers, the text cache hit rate.
+    """
+    overlay_states = generate_overlay_states(frame_count, frame_size)
+    camera_frame = cpu_detector.SyntheticVideoSource(frame_size, frame_rate=0).Capture()
+    display_center = (frame_size[0] / 2, frame_size[1] / 2)
+    delivered = []
+
+    def consume_frame(frame_data, captured_at):
+        delivered.append(frame_data.shape)
+
+    def time_renderer(draw_frame):
+        frame_times = []
+        for overlay_state in overlay_states:
+            frame_data = camera_frame.copy()
+            draw_started = timing.perf_counter()
+            draw_frame(frame_data, overlay_state)
+            frame_times.append(timing.perf_counter() - draw_started)
+        return {
+            "p50_ms": float(array_utils.percentile(frame_times, 50)) * 1000.0,
+            "p99_ms": float(array_utils.percentile(frame_times, 99)) * 1000.0,
+        }
+
+    def draw_direct(frame_data, overlay_state):
+        overlay.draw_direct_overlay(frame_data, overlay_state, display_center)
+        consume_frame(frame_data, None)
+
+    def draw_direct_half(frame_data, overlay_state):
+        overlay.draw_direct_overlay(frame_data, overlay_state, display_center)
+        consume_frame(vision_lib.resize(frame_data, None, fx=0.5, fy=0.5, interpolation=vision_lib.INTER_AREA), None)
+
+    summary = {"direct": time_renderer(draw_direct), "direct_half": time_renderer(draw_direct_half)}
+    for renderer_name, sink_scale, sink_overlay in (("cached", 1.0, True), ("cached_half", 0.5, True), ("raw", 1.0, False), ("no_sink", None, True)):
+        renderer = overlay.OverlayRenderer(frame_size)
+        if sink_scale is not None:
+            renderer.add_sink(renderer_name, consume_frame, sink_scale, sink_overlay)
+
+        def draw_cached(frame_data, overlay_state):
+            if renderer.has_active_sinks():
+                renderer.publish(frame_data, None, overlay_state)
+
+        summary[renderer_name] = time_renderer(draw_cached)
+        summary[renderer_name]["text_hit_rate"] = renderer.text_cache.report_statistics()["hit_rate"]
+    return summary
+
+
+def run_region_detection_replay(scenario, fixed_cost=REPLAY_DETECT_COST, pixel_cost=REPLAY_PIXEL_COST, refresh_interval=None, use_window=True):
+    """
+    Follows the first person of a scenario with window or full-frame detection
+    on the simulated backend, feeding the tracker's lock back as the focus.
+    Args:
+        scenario (ReplayScenario): Scenario to replay.
+        fixed_cost (float): Simulated detector latency per call in seconds.
+        pixel_cost (float): Simulated latency per megapixel in seconds.
+        refresh_interval (int): Frames between full-frame detections, detector default when None.
+        use_window (bool): Detect in a window around the target instead of the full frame.
+    Returns:
+        dict: Mean and p99 detection latency in milliseconds, mean IoU of the
+        locked box against the followed person, ticks without a lock and,
+        in window mode, the region detector statistics.
+    """
+    standins.install_standin_modules()
+    from components import detector_ssd
+
+    backend = SimulatedDetectionBackend(scenario, fixed_cost, pixel_cost)
+    if refresh_interval is None:
+        refresh_interval = detector_ssd.ROI_REFRESH_INTERVAL
+    region_detector = detector_ssd.RegionOfInterestDetector(backend, standins.REPLAY_FRAME_SIZE, refresh_interval=refresh_interval)
+    target_lock = person_tracker.MultiTargetTracker(standins.REPLAY_FRAME_SIZE)
+    detect_latencies = []
+    target_overlaps = []
+    for tick_index in range(scenario.tick_count):
+        detect_started = timing.perf_counter()
+        if use_window:
+            detections = region_detector.detect(tick_index)
+        else:
+            detections = backend.detect(tick_index)
+        detect_latencies.append(timing.perf_counter() - detect_started)
+        locked_target = target_lock.update(detections)
+        region_detector.focus_on(locked_target)
+        if locked_target is None:
+            target_overlaps.append(0.0)
+            continue
+        true_box = array_utils.array([scenario.boxes_at(tick_index)[0]], dtype=array_utils.float64)
+        locked_box = array_utils.array([[locked_target.Left, locked_target.Top, locked_target.Right, locked_target.Bottom]], dtype=array_utils.float64)
+        target_overlaps.append(float(person_tracker.compute_iou_matrix(true_box, locked_box)[0, 0]))
+
+    region_summary = {
+        "scenario": scenario.scenario_name,
+        "mode": "window" if use_window else "full",
+        "mean_detect_ms": float(array_utils.mean(detect_latencies)) * 1000.0,
+        "p99_detect_ms": float(array_utils.percentile(detect_latencies, 99)) * 1000.0,
+        "mean_iou": float(array_utils.mean(target_overlaps)),
+        "unlocked_ticks": int(array_utils.sum(array_utils.array(target_overlaps) == 0.0)),
+    }
+    if use_window:
+        region_summary.update(region_detector.report_statistics())
+    return region_summary
+
+
+def run_inference_schedule_replay(scenario, detect_cost=REPLAY_DETECT_COST, frame_budget=0.04, max_interval=inference_schedule.SCHEDULE_MAX_INTERVAL):
+    """
+    Drives the adaptive inference scheduler over a scenario with a fake
+    detector that returns the scenario boxes after detect_cost seconds.
+    Args:
+        scenario (ReplayScenario): Scenario to replay; blank scenarios are rendered textured.
+        detect_cost (float): Simulated detector latency in seconds.
+        frame_budget (float): Per-frame budget handed to the scheduler.
+        max_interval (int): Upper bound on frames between detections.
+    Returns:
+        dict: Scheduler statistics plus mean and worst IoU of the reported
+        box against the true box of the followed person.
+    """
+    if scenario.frames is None:
+        scenario.textured = True
+
+    def fake_detect(tick_index):
+        detections = [standins.ReplayDetection(*box) for box in scenario.boxes_at(tick_index)]
+        wait_simulated_cost(detect_cost)
+        return detections, 1.0 / detect_cost if detect_cost > 0 else scenario.network_fps
+
+    scheduler = inference_schedule.AdaptiveInferenceScheduler(fake_detect, frame_budget, max_interval)
+    target_overlaps = []
+    for tick_index in range(scenario.tick_count):
+        detections, network_speed = scheduler.process_frame(tick_index, scenario.frame_at(tick_index))
+        if len(detections) == 0:
+            target_overlaps.append(0.0)
+            continue
+        true_box = array_utils.array([scenario.boxes_at(tick_index)[0]], dtype=array_utils.float64)
+        reported_boxes = array_utils.array([[detection.Left, detection.Top, detection.Right, detection.Bottom] for detection in detections], dtype=array_utils.float64)
+        target_overlaps.append(float(array_utils.max(person_tracker.compute_iou_matrix(true_box, reported_boxes))))
+
+    schedule_summary = scheduler.report_statistics()
+    schedule_summary["scenario"] = scenario.scenario_name
+    schedule_summary["mean_iou"] = float(array_utils.mean(target_overlaps)) if target_overlaps else 0.0
+    schedule_summary["min_iou"] = float(array_utils.min(target_overlaps)) if target_overlaps else 0.0
+    return schedule_summary
+
+
+def measure_tracking_quality(estimates, reference, tick_interval, maximum_lag=15):
+    """
+    Compares an estimated signal with its reference.
+    Args:
+        estimates (ndarray): Estimated value per tick.
+        reference (ndarray): Reference value per tick.
+        tick_interval (float): Seconds between ticks.
+        maximum_lag (int): Largest lag in ticks searched by the cross-correlation.
+    Returns:
+        dict: RMS error, lag in milliseconds (cross-correlation peak) and
+        jitter, the RMS of tick-to-tick changes not present in the reference.
+    """
+    error = estimates - reference
+    centered_estimates = estimates - array_utils.mean(estimates)
+    centered_reference = reference - array_utils.mean(reference)
+    correlations = [array_utils.dot(centered_estimates[lag:], centered_reference[:len(reference) - lag]) / (len(reference) - lag) for lag in range(maximum_lag + 1)]
+    return {
+        "rms_error": float(array_utils.sqrt(array_utils.mean(error ** 2))),
+        "lag_ms": int(array_utils.argmax(correlations)) * tick_interval * 1000.0,
+        "jitter": float(array_utils.sqrt(array_utils.mean(array_utils.diff(error) ** 2))),
+    }
+
+
+def run_range_fusion_replay(scenario, box_noise=2.0, seed=0, boxcar_length=5):
+    """
+    Feeds the followed person's box and the LIDAR samples of a scenario
+    through the Kalman estimators and through the boxcar average the follow
+    loop used before, and compares both against the reference signals.
+    Args:
+        scenario (ReplayScenario): Scenario to replay.
+        box_noise (float): Standard deviation in pixels of the jitter added to the box edges.
+        seed (int): Random seed for the box jitter.
+        boxcar_length (int): Samples in the boxcar baseline.
+    Returns:
+        dict: 'range' and 'offset' entries, each mapping 'kalman' and
+        'boxcar' to the measure_tracking_quality figures.
+    """
+    random_source = array_utils.random.RandomState(seed)
+    image_width, image_height = standins.REPLAY_FRAME_SIZE
+    tick_interval = 1.0 / scenario.network_fps
+    range_estimate = state_estimation.RangeEstimator(image_height)
+    bearing_estimate = state_estimation.BearingEstimator(image_width)
+    range_boxcar = state_estimation.BoxcarAverage(boxcar_length)
+    offset_boxcar = state_estimation.BoxcarAverage(boxcar_length)
+    signals = {name: [] for name in ("kalman_range", "boxcar_range", "kalman_offset", "boxcar_offset", "true_offset", "lidar_range")}
+    boxcar_range = None
+    for tick_index in range(scenario.tick_count):
+        timestamp = tick_index * tick_interval
+        true_box = array_utils.array(scenario.boxes_at(tick_index)[0], dtype=array_utils.float64)
+        left, top, right, bottom = true_box + random_source.normal(0, box_noise, 4)
+        horizontal_offset = (left + right) / 2.0 - image_width / 2.0
+        is_lidar_aimed = left < image_width / 2.0 < right and top < image_height / 2.0 < bottom
+        lidar_distance, lidar_strength = scenario.lidar_at(tick_index)
+
+        range_estimate.update_box(timestamp, top, bottom)
+        if is_lidar_aimed:
+            range_estimate.update_lidar(timestamp, lidar_distance, lidar_strength)
+        bearing_estimate.update(timestamp, horizontal_offset)
+
+        # Baseline: the former follow loop averaged every reading and only used the result on valid, aimed samples
+        averaged_range = range_boxcar.append(lidar_distance)
+        if lidar_distance > 0 and is_lidar_aimed:
+            boxcar_range = averaged_range
+        signals["boxcar_range"].append(boxcar_range if boxcar_range is not None else lidar_distance)
+        signals["kalman_range"].append(range_estimate.estimate(timestamp))
+        signals["boxcar_offset"].append(offset_boxcar.append(horizontal_offset))
+        signals["kalman_offset"].append(bearing_estimate.estimate(timestamp))
+        signals["true_offset"].append((true_box[0] + true_box[2]) / 2.0 - image_width / 2.0)
+        signals["lidar_range"].append(lidar_distance)
+
+    signals = {name: array_utils.array(values, dtype=array_utils.float64) for name, values in signals.items()}
+    if scenario.true_distances is not None:
+        range_reference = scenario.true_distances
+    else:
+        # Without ground truth, compare against the valid LIDAR readings held over dropouts
+        range_reference = signals["lidar_range"].copy()
+        for tick_index in range(1, len(range_reference)):
+            if range_reference[tick_index] <= 0:
+                range_reference[tick_index] = range_reference[tick_index - 1]
+    return {
+        "scenario": scenario.scenario_name,
+        "range": {method: measure_tracking_quality(signals[f"{method}_range"], range_reference, tick_interval) for method in ("kalman", "boxcar")},
+        "offset": {method: measure_tracking_quality(signals[f"{method}_offset"], signals["true_offset"], tick_interval) for method in ("kalman", "boxcar")},
+    }
+
+
+def summarise_tick_latencies(tick_latencies):
+    """
+    Computes latency percentiles and throughput of a replay run.
+    Args:
+        tick_latencies (ndarray): Per-tick durations in seconds.
+    Returns:
+        dict: Tick count, ticks per second and p50/p90/p99/max latency in milliseconds.
+    """
+    if len(tick_latencies) == 0:
+        return {"ticks": 0, "ticks_per_second": 0.0, "p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    p50, p90, p99 = array_utils.percentile(tick_latencies, [50, 90, 99]) * 1000.0
+    return {
+        "ticks": len(tick_latencies),
+        "ticks_per_second": len(tick_latencies) / float(array_utils.sum(tick_latencies)),
+        "p50_ms": p50,
+        "p90_ms": p90,
+        "p99_ms": p99,
+        "max_ms": float(array_utils.max(tick_latencies)) * 1000.0,
+    }
+
+
+def run_benchmark_suite(tick_count=2000, repeat_count=3, scenario_names=None):
+    """
+    Replays every benchmark scenario and summarises the end-to-end tick latency.
+    Args:
+        tick_count (int): Ticks per scenario.
+        repeat_count (int): Runs per scenario; latencies of all runs are pooled.
+        scenario_names (list): Subset of BENCHMARK_SCENARIOS, defaults to all.
+    Returns:
+        dict: Scenario name mapped to its latency summary.
+    """
+    follow_module = load_follow_module()
+    if scenario_names is None:
+        scenario_names = list(BENCHMARK_SCENARIOS)
+    suite_results = {}
+    for scenario_name in scenario_names:
+        scenario = BENCHMARK_SCENARIOS[scenario_name](tick_count)
+        pooled_latencies = [run_pursuit_replay(follow_module, scenario)["tick_latencies"] for repeat in range(repeat_count)]
+        suite_results[scenario_name] = summarise_tick_latencies(array_utils.concatenate(pooled_latencies))
+    return suite_results
+
+
+SIM_MISSION_TIME_LIMIT = 900.0    # virtual seconds after which a simulated mission is made to descend
+SIM_LANDING_TIME_LIMIT = 30.0     # virtual seconds allowed for touchdown after the descent command
+SIM_COLLISION_DISTANCE = 0.5      # meters, closer approaches to the person count as collisions
+
+
+class SimulatedMissionControl:
+    """
+    Collects the events mission.VehicleHealthMonitor posts during a
+    simulated mission, in place of a MissionRuntime.
+    """
+
+    def __init__(self, virtual_clock):
+        self.virtual_clock = virtual_clock
+        self.events = []
+
+    def post_event(self, event_name, payload=None):
+        """
+        Records an event.
+        Args:
+            event_name (str): Event identifier, e.g. BATTERY_LOW.
+            payload: Optional detail.
+        """
+        self.events.append(mission.MissionEvent(event_name, payload, self.virtual_clock.monotonic()))
+
+
+def simulated_time_users(follow_module):
+    """
+    Lists the time module aliases of the code a simulated mission runs.
+    Args:
+        follow_module (module): Module returned by import_follow_module.
+    Returns:
+        list: (module, attribute name) pairs for simulator.swap_time_modules.
+    """
+    uav_interface = follow_module.regulator.uav_system
+    return [
+        (follow_module, "time"),
+        (follow_module.regulator, "clock"),
+        (follow_module.regulator.flight_recorder, "timing"),
+        (uav_interface, "timing"),
+        (follow_module.lidar_system, "timing"),
+        (follow_module.object_tracker, "timing"),
+    ]
+
+
+def bind_simulated_clock(follow_module, virtual_clock):
+    """
+    Points the clocks captured at construction time by the started system at
+    the virtual clock, dropping what they stamped during startup, and makes
+    waiting for telemetry advance it.
+    Args:
+        follow_module (module): Started follow_main module.
+        virtual_clock (VirtualClock): Clock of the simulation.
+    """
+    uav_interface = follow_module.regulator.uav_system
+    telemetry_monitor = uav_interface.telemetry_monitor
+
+    def wait_for_update(timeout=None):
+        virtual_clock.sleep(1.0 / simulator.SIM_TELEMETRY_RATE)
+        return telemetry_monitor.snapshot()
+
+    telemetry_monitor.set_clock(virtual_clock.monotonic)
+    telemetry_monitor.wait_for_update = wait_for_update
+    uav_interface.command_dispatcher.set_clock(virtual_clock.monotonic)
+    for phase_regulator in (follow_module.regulator.rotation_regulator, follow_module.regulator.steering_regulator):
+        phase_regulator.time_fn = virtual_clock.monotonic
+        phase_regulator.reset()
+
+
+def pending_abort(follow_module, mission_control):
+    """
+    Takes the first posted event that ends the flight whatever phase is running.
+    Args:
+        follow_module (module): Started follow_main module.
+        mission_control (SimulatedMissionControl): Events posted so far.
+    Returns:
+        str: Name of the event, None if none was posted.
+    """
+    while mission_control.events:
+        mission_event = mission_control.events.pop(0)
+        if mission_event.name in follow_module.ABORT_TRANSITIONS:
+            return mission_event.name
+    return None
+
+
+def fly_simulated_phase(follow_module, scene, mission_control, phase_name, mission_deadline):
+    """
+    Runs one phase of a simulated mission with the phase table of
+    follow_main.run_mission: launch leads to seek, seek to pursuit on the
+    first detection or to descend after SEEK_TIMEOUT, pursuit back to seek
+    when the target is lost, and any abort event to descend.
+    Args:
+        follow_module (module): Started follow_main module.
+        scene (SimulatedScene): Simulated world.
+        mission_control (SimulatedMissionControl): Events posted by the health monitor.
+        phase_name (str): Phase to run.
+        mission_deadline (float): Virtual time after which the mission is made to descend.
+    Returns:
+        tuple: Next phase name (None after the descent) and the reason.
+    """
+    virtual_clock = scene.virtual_clock
+    if phase_name == "launch":
+        return follow_module.perform_launch(), mission.PHASE_COMPLETED
+    if phase_name == "seek":
+        phase_started = virtual_clock.monotonic()
+        follow_module.regulator.set_operation_phase("seek")
+        follow_module.regulator.cease_uav_motion()
+        while True:
+            abort_event = pending_abort(follow_module, mission_control)
+            if abort_event is not None:
+                return follow_module.ABORT_TRANSITIONS[abort_event], abort_event
+            remaining_time = follow_module.SEEK_TIMEOUT - (virtual_clock.monotonic() - phase_started)
+            if remaining_time <= 0:
+                return "descend", mission.PHASE_TIMEOUT
+            if len(follow_module.seek_targets_once(remaining_time)) > 0:
+                return "pursuit", mission.TARGET_ACQUIRED
+    if phase_name == "pursuit":
+        follow_module.begin_pursuit()
+        while follow_module.pursue_target_frame() is not None:
+            abort_event = pending_abort(follow_module, mission_control)
+            if abort_event is not None:
+                return follow_module.ABORT_TRANSITIONS[abort_event], abort_event
+            if virtual_clock.monotonic() >= mission_deadline:
+                return "descend", mission.PHASE_TIMEOUT
+        return "seek", mission.TARGET_LOST
+    follow_module.perform_descent()
+    landing_deadline = virtual_clock.monotonic() + SIM_LANDING_TIME_LIMIT
+    while scene.vehicle.armed and virtual_clock.monotonic() < landing_deadline:
+        virtual_clock.advance(1.0 / simulator.SIM_TELEMETRY_RATE)
+    return None, mission.PHASE_COMPLETED
+
+
+def summarise_simulated_flight(scene, follow_distance):
+    """
+    Measures how well the vehicle followed the person during pursuit.
+    Args:
+        scene (SimulatedScene): Scene after the mission.
+        follow_distance (float): Distance in meters the follow loop keeps to the person.
+    Returns:
+        dict: Frames in pursuit, mean and p95 absolute bearing error in degrees,
+            mean and p95 absolute error to the follow distance in meters and the
+            closest approach in meters.
+    """
+    pursuit_truth = [(distance, bearing) for frame_time, phase_name, present, distance, bearing in scene.ground_truth
+                     if phase_name == "pursuit" and present]
+    if len(pursuit_truth) == 0:
+        return {"pursuit_frames": 0, "bearing_mean_deg": 0.0, "bearing_p95_deg": 0.0, "range_mean_m": 0.0, "range_p95_m": 0.0,
+                "closest_m": float("inf")}
+    distances, bearings = array_utils.abs(array_utils.array(pursuit_truth)).T
+    range_errors = array_utils.abs(distances - follow_distance)
+    return {
+        "pursuit_frames": len(pursuit_truth),
+        "bearing_mean_deg": float(array_utils.mean(bearings)),
+        "bearing_p95_deg": float(array_utils.percentile(bearings, 95)),
+        "range_mean_m": float(array_utils.mean(range_errors)),
+        "range_p95_m": float(array_utils.percentile(range_errors, 95)),
+        "closest_m": float(array_utils.min(distances)),
+    }
+
+
+def run_simulated_mission(mission_seed, log_dir, walk_duration=None, verbose=False, gains_path=None):
+    """
+    Flies one complete launch, seek, pursuit and descent mission of the real
+    follow loop against the closed-loop simulator in virtual time.
+    The camera, detector, TF-mini and vehicle stand-ins are driven by a
+    SimulatedScene; the clocks of the flight code are swapped for the
+    scene's virtual clock for the length of the mission.
+    Args:
+        mission_seed (int): Seed of the person's walk and the sensor noise.
+        log_dir (str): Base path for the flight logs.
+        walk_duration (float): Seconds before the person leaves, random if None.
+        verbose (bool): Let the flight code print its progress.
+        gains_path (str): Gain file to fly with, None for the built-in gains.
+    Returns:
+        dict: Seed, phase history, outcome, error text if the mission raised,
+            virtual and wall-clock duration, MAVLink messages received and the
+            pursuit quality of summarise_simulated_flight.
+    """
+    follow_module = import_follow_module()
+    virtual_clock = simulator.VirtualClock()
+    scene = simulator.SimulatedScene(virtual_clock, array_utils.random.RandomState(mission_seed), walk_duration)
+    standins.replay_state.load(scene)
+    if follow_module.regulator.uav_system.autonomous_unit is not None:
+        follow_module.regulator.deactivate_uav_connection()
+    replaced = simulator.swap_time_modules(virtual_clock.as_time_module(), simulated_time_users(follow_module))
+    mission_history = []
+    mission_error = None
+    wall_started = timing.perf_counter()
+    try:
+        with open(os.devnull, "w") as quiet_output, contextlib.redirect_stdout(sys.stdout if verbose else quiet_output):
+            follow_module.start_system(replay_arguments(log_dir, gains_path=gains_path))
+            bind_simulated_clock(follow_module, virtual_clock)
+            mission_control = SimulatedMissionControl(virtual_clock)
+            follow_module.regulator.subscribe_telemetry(mission.VehicleHealthMonitor(mission_control).handle_snapshot)
+            mission_deadline = virtual_clock.monotonic() + SIM_MISSION_TIME_LIMIT
+            phase_name = "launch"
+            while phase_name is not None:
+                scene.phase = phase_name
+                phase_started = virtual_clock.monotonic()
+                next_phase, reason = fly_simulated_phase(follow_module, scene, mission_control, phase_name, mission_deadline)
+                mission_history.append(mission.PhaseRecord(phase_name, next_phase, reason, virtual_clock.monotonic() - phase_started))
+                phase_name = next_phase
+    except Exception as error:
+        mission_error = f"{type(error).__name__}: {error}"
+    finally:
+        if follow_module.regulator.uav_system.autonomous_unit is not None:
+            follow_module.regulator.deactivate_uav_connection()
+        simulator.restore_time_modules(replaced)
+        standins.replay_state.load(None)
+    wall_time = timing.perf_counter() - wall_started
+    if mission_error is not None:
+        outcome = "failed"
+    elif scene.vehicle.landed_at is None:
+        outcome = "airborne"
+    elif any(record.reason not in (mission.PHASE_COMPLETED, mission.TARGET_ACQUIRED, mission.TARGET_LOST, mission.PHASE_TIMEOUT)
+             for record in mission_history):
+        outcome = "aborted"
+    else:
+        outcome = "landed"
+    return dict({
+        "seed": mission_seed,
+        "history": mission_history,
+        "outcome": outcome,
+        "error": mission_error,
+        "virtual_time": virtual_clock.monotonic(),
+        "wall_time": wall_time,
+        "messages_received": scene.vehicle.messages_received,
+        "acquisitions": sum(1 for record in mission_history if record.phase_name == "pursuit"),
+    }, **summarise_simulated_flight(scene, follow_module.THRESHOLD_RANGE))
+
+
+def run_simulation_soak(mission_count, first_seed=0, walk_duration=None, gains_path=None):
+    """
+    Flies many simulated missions back to back and summarises them.
+    Args:
+        mission_count (int): Number of missions.
+        first_seed (int): Seed of the first mission; mission i uses first_seed + i.
+        walk_duration (float): Seconds before the person leaves, random per mission if None.
+        gains_path (str): Gain file to fly with, None for the built-in gains.
+    Returns:
+        dict: Mission count, outcome counts, missions per hour, speed-up over
+            real time, collisions, pooled pursuit quality and the failed missions.
+    """
+    with tempfile.TemporaryDirectory(prefix="simulation_") as soak_directory:
+        log_dir = os.path.join(soak_directory, "mission")
+        mission_reports = [run_simulated_mission(first_seed + mission_index, log_dir, walk_duration, gains_path=gains_path) for mission_index in range(mission_count)]
+    wall_time = sum(report["wall_time"] for report in mission_reports)
+    virtual_time = sum(report["virtual_time"] for report in mission_reports)
+    outcomes = collections.Counter(report["outcome"] for report in mission_reports)
+    flown = [report for report in mission_reports if report["pursuit_frames"] > 0]
+    return {
+        "missions": mission_count,
+        "outcomes": dict(outcomes),
+        "missions_per_hour": mission_count / wall_time * 3600.0 if wall_time > 0 else 0.0,
+        "speedup": virtual_time / wall_time if wall_time > 0 else 0.0,
+        "mean_virtual_time": virtual_time / mission_count if mission_count else 0.0,
+        "mean_acquisitions": sum(report["acquisitions"] for report in mission_reports) / mission_count if mission_count else 0.0,
+        "collisions": sum(1 for report in mission_reports if report["closest_m"] < SIM_COLLISION_DISTANCE),
+        "bearing_mean_deg": float(array_utils.mean([report["bearing_mean_deg"] for report in flown])) if flown else 0.0,
+        "bearing_p95_deg": float(array_utils.mean([report["bearing_p95_deg"] for report in flown])) if flown else 0.0,
+        "range_mean_m": float(array_utils.mean([report["range_mean_m"] for report in flown])) if flown else 0.0,
+        "failures": [(report["seed"], report["outcome"], report["error"]) for report in mission_reports if report["outcome"] in ("failed", "airborne")],
+    }
@@ -0,0 +1,343 @@
+import sys
+import time as timing
+import types
+import numpy as array_utils
+
+REPLAY_FRAME_SIZE = (1280, 720)   # width, height of stand-in camera frames
+REPLAY_MIN_VISIBLE = 0.5          # fraction of a box that must lie inside a crop to be detected
+
+# Representative Jetson Nano start-up costs in seconds, used by the startup benchmark
+REPLAY_STARTUP_DELAYS = {
+    "detectNet": 3.0,      # deserialising the TensorRT engine
+    "videoSource": 1.0,    # opening the CSI camera
+    "serial": 0.1,         # opening the LIDAR UART
+    "connect": 2.0,        # MAVLink handshake with wait_ready
+}
+
+
+class ReplayState:
+    """
+    Shared cursor over a replay scenario.
+    The stand-in camera advances it on every Capture call; the detector and
+    serial stand-ins serve the data belonging to the current tick.
+    """
+
+    def __init__(self):
+        self.scenario = None
+        self.tick_index = -1
+        self.capture_times = []
+        self.sent_messages = []
+        self.startup_delays = {}
+
+    def simulate_startup(self, component_name):
+        """
+        Sleeps for the start-up cost configured for a stand-in component.
+        Args:
+            component_name (str): Key of startup_delays, e.g. 'detectNet'.
+        """
+        timing.sleep(self.startup_delays.get(component_name, 0.0))
+
+    def load(self, scenario):
+        """
+        Rewinds the cursor onto a new scenario.
+        Args:
+            scenario (ReplayScenario): Frames, detections and LIDAR samples to serve.
+        """
+        self.scenario = scenario
+        self.tick_index = -1
+        self.capture_times = []
+        self.sent_messages = []
+
+    def is_exhausted(self):
+        """
+        Reports whether every tick of the scenario has been served.
+        Returns:
+            bool: True once the cursor moved past the last tick.
+        """
+        return self.scenario is None or self.tick_index >= self.scenario.tick_count
+
+
+replay_state = ReplayState()
+
+
+class ReplayDetection:
+    """
+    Stand-in for a jetson_inference detectNet.Detection.
+    """
+
+    def __init__(self, left, top, right, bottom, class_id=1, confidence=0.9):
+        self.Left = float(left)
+        self.Top = float(top)
+        self.Right = float(right)
+        self.Bottom = float(bottom)
+        self.Width = self.Right - self.Left
+        self.Height = self.Bottom - self.Top
+        self.Area = self.Width * self.Height
+        self.Center = ((self.Left + self.Right) / 2.0, (self.Top + self.Bottom) / 2.0)
+        self.ClassID = class_id
+        self.Confidence = confidence
+
+
+def boxes_in_window(boxes, window, min_visible=REPLAY_MIN_VISIBLE):
+    """
+    Clips boxes to a crop window the way a detector run on the crop would see them.
+    Args:
+        boxes (list): (left, top, right, bottom) tuples in full-frame pixels.
+        window (tuple): (left, top, right, bottom) crop in full-frame pixels.
+        min_visible (float): Fraction of a box that must be inside the window.
+    Returns:
+        list: Visible parts of the boxes in window coordinates.
+    """
+    visible_boxes = []
+    for left, top, right, bottom in boxes:
+        clipped_left, clipped_top = max(left, window[0]), max(top, window[1])
+        clipped_right, clipped_bottom = min(right, window[2]), min(bottom, window[3])
+        if clipped_right <= clipped_left or clipped_bottom <= clipped_top:
+            continue
+        box_area = (right - left) * (bottom - top)
+        if (clipped_right - clipped_left) * (clipped_bottom - clipped_top) < min_visible * box_area:
+            continue
+        visible_boxes.append((clipped_left - window[0], clipped_top - window[1], clipped_right - window[0], clipped_bottom - window[1]))
+    return visible_boxes
+
+
+class ReplayFrame(array_utils.ndarray):
+    """
+    Camera frame array carrying the pixel format attribute of a cudaImage.
+    """
+    format = "bgr8"
+
+
+class ReplayCropBuffer:
+    """
+    Stand-in for a cudaAllocMapped image that only remembers which window was cropped into it.
+    """
+
+    def __init__(self, width, height, format="bgr8"):
+        self.width = width
+        self.height = height
+        self.format = format
+        self.window = None
+
+
+def replay_crop(source_image, crop_buffer, window):
+    """
+    Stand-in for jetson_utils.cudaCrop.
+    Args:
+        source_image: Full frame.
+        crop_buffer (ReplayCropBuffer): Destination buffer.
+        window (tuple): (left, top, right, bottom) crop.
+    """
+    crop_buffer.window = tuple(window)
+
+
+class ReplayDetectNet:
+    """
+    Stand-in detectNet that returns the scenario boxes of the current tick.
+    """
+
+    def __init__(self, network_name="ssd-mobilenet-v2", *args, **kwargs):
+        replay_state.simulate_startup("detectNet")
+        self.network_name = network_name
+
+    def Detect(self, captured_image, *args, **kwargs):
+        if replay_state.is_exhausted():
+            return []
+        tick_boxes = replay_state.scenario.boxes_at(replay_state.tick_index)
+        if isinstance(captured_image, ReplayCropBuffer):
+            tick_boxes = boxes_in_window(tick_boxes, captured_image.window)
+        return [ReplayDetection(*box) for box in tick_boxes]
+
+    def GetNetworkFPS(self):
+        return replay_state.scenario.network_fps if replay_state.scenario is not None else 0.0
+
+
+class ReplayVideoSource:
+    """
+    Stand-in videoSource that serves scenario frames and advances the tick cursor.
+    """
+
+    def __init__(self, uri="csi://0", *args, **kwargs):
+        replay_state.simulate_startup("videoSource")
+        self.uri = uri
+
+    def Capture(self, *args, **kwargs):
+        replay_state.tick_index += 1
+        replay_state.capture_times.append(timing.perf_counter())
+        if replay_state.is_exhausted():
+            return array_utils.zeros((REPLAY_FRAME_SIZE[1], REPLAY_FRAME_SIZE[0], 3), dtype=array_utils.uint8).view(ReplayFrame)
+        return replay_state.scenario.frame_at(replay_state.tick_index).view(ReplayFrame)
+
+    def GetWidth(self):
+        return REPLAY_FRAME_SIZE[0]
+
+    def GetHeight(self):
+        return REPLAY_FRAME_SIZE[1]
+
+    def Close(self):
+        pass
+
+
+def encode_tfmini_frame(distance, strength, temperature=25.0):
+    """
+    Builds one checksummed TF-mini serial frame.
+    Args:
+        distance (float): Distance in meters.
+        strength (float): Signal strength value.
+        temperature (float): Temperature in Celsius.
+    Returns:
+        bytes: Nine-byte frame.
+    """
+    range_value = int(round(distance * 100.0))
+    signal_value = int(strength)
+    thermal_value = int(round((temperature + 256.0) * 8.0))
+    frame = bytes([0x59, 0x59,
+                   range_value & 0xFF, (range_value >> 8) & 0xFF,
+                   signal_value & 0xFF, (signal_value >> 8) & 0xFF,
+                   thermal_value & 0xFF, (thermal_value >> 8) & 0xFF])
+    return frame + bytes([sum(frame) & 0xFF])
+
+
+class ReplaySerial:
+    """
+    Stand-in serial.Serial that streams the TF-mini frame of the current tick.
+    """
+
+    def __init__(self, port=None, baudrate=115200, timeout=None, *args, **kwargs):
+        replay_state.simulate_startup("serial")
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self._is_open = True
+
+    @property
+    def in_waiting(self):
+        return 9 if self._is_open else 0
+
+    def read(self, size=1):
+        if replay_state.scenario is None or replay_state.tick_index < 0:
+            return b""
+        # Like the real sensor, keep streaming the last sample once the scenario runs out
+        sample_index = min(replay_state.tick_index, replay_state.scenario.tick_count - 1)
+        distance, strength = replay_state.scenario.lidar_at(sample_index)
+        return encode_tfmini_frame(distance, strength)
+
+    def isOpen(self):
+        return self._is_open
+
+    def open(self):
+        self._is_open = True
+
+    def close(self):
+        self._is_open = False
+
+    def reset_input_buffer(self):
+        pass
+
+
+class ReplayVehicle:
+    """
+    Stand-in dronekit Vehicle that records every MAVLink message it is asked to send.
+    """
+
+    def __init__(self):
+        self.message_factory = types.SimpleNamespace(
+            command_long_encode=lambda *fields: types.SimpleNamespace(name="COMMAND_LONG", fields=fields, param1=fields[4], param3=fields[6]),
+            set_position_target_local_ned_encode=lambda *fields: types.SimpleNamespace(name="SET_POSITION_TARGET_LOCAL_NED", fields=fields, vx=0, vy=0, vz=0),
+        )
+        self.version = "replay"
+        self.mode = types.SimpleNamespace(name="GUIDED")
+        self.armed = True
+        self.is_armable = True
+        self.ekf_ok = True
+        self.groundspeed = 0
+        self.home_location = None
+        self.attitude = types.SimpleNamespace(roll=0.0, pitch=0.0, yaw=0.0)
+        self.velocity = [0.0, 0.0, 0.0]
+        self.battery = types.SimpleNamespace(voltage=16.8, current=0.0, level=100)
+        relative_frame = types.SimpleNamespace(lat=0.0, lon=0.0, alt=1.5)
+        self.location = types.SimpleNamespace(global_frame=relative_frame, global_relative_frame=relative_frame)
+
+    def send_mavlink(self, message):
+        if message.name == "COMMAND_LONG":
+            replay_state.sent_messages.append((message.name, message.param1 if message.param3 >= 0 else -message.param1))
+        else:
+            replay_state.sent_messages.append((message.name, message.vx))
+
+    def add_attribute_listener(self, attribute_name, callback):
+        pass
+
+    def remove_attribute_listener(self, attribute_name, callback):
+        pass
+
+    def simple_takeoff(self, target_elevation):
+        pass
+
+    def close(self):
+        pass
+
+
+def replay_connect(*args, **kwargs):
+    """
+    Stand-in dronekit.connect.
+    Returns:
+        ReplayVehicle: The vehicle of the loaded scenario if it simulates one, a new stand-in vehicle otherwise.
+    """
+    replay_state.simulate_startup("connect")
+    scenario_vehicle = getattr(replay_state.scenario, "vehicle", None)
+    if scenario_vehicle is not None:
+        return scenario_vehicle
+    return ReplayVehicle()
+
+
+def build_standin_modules():
+    """
+    Creates stand-ins for the hardware modules used by the follow loop.
+    Returns:
+        dict: Module name mapped to a module object.
+    """
+    inference_module = types.ModuleType("jetson_inference")
+    inference_module.detectNet = ReplayDetectNet
+
+    camera_module = types.ModuleType("jetson_utils")
+    camera_module.videoSource = ReplayVideoSource
+    camera_module.cudaToNumpy = lambda captured_image: captured_image
+    camera_module.cudaAllocMapped = ReplayCropBuffer
+    camera_module.cudaCrop = replay_crop
+
+    serial_module = types.ModuleType("serial")
+    serial_module.Serial = ReplaySerial
+
+    dronekit_module = types.ModuleType("dronekit")
+    dronekit_module.connect = replay_connect
+    dronekit_module.VehicleMode = lambda name: types.SimpleNamespace(name=name)
+    dronekit_module.mavutil = types.SimpleNamespace(mavlink=types.SimpleNamespace(MAV_CMD_CONDITION_YAW=115, MAV_FRAME_BODY_NED=8))
+
+    keyboard_module = types.ModuleType("keyboard")
+    keyboard_module.is_pressed = lambda key: False
+    keyboard_module.on_press_key = lambda key, callback: None
+
+    return {
+        "jetson_inference": inference_module,
+        "jetson_utils": camera_module,
+        "serial": serial_module,
+        "dronekit": dronekit_module,
+        "keyboard": keyboard_module,
+    }
+
+
+def install_standin_modules():
+    """
+    Registers the stand-in modules so later imports resolve to them, and points
+    the aliases held by component modules imported earlier at them as well.
+    """
+    standin_modules = build_standin_modules()
+    replaced_modules = {id(sys.modules[module_name]): module for module_name, module in standin_modules.items() if module_name in sys.modules}
+    for module_name, module in standin_modules.items():
+        sys.modules[module_name] = module
+    for module_name, component_module in list(sys.modules.items()):
+        if not module_name.startswith("components."):
+            continue
+        for attribute_name, value in list(vars(component_module).items()):
+            if id(value) in replaced_modules:
+                setattr(component_module, attribute_name, replaced_modules[id(value)])
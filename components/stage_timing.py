@@ -0,0 +1,265 @@
+import json
+import socket
+import threading as worker_threads
+import time as timing
+
+HISTOGRAM_SUB_BUCKET_BITS = 7          # 128 linear sub-buckets, ~1.6% worst-case resolution
+HISTOGRAM_HIGHEST_MICROSECONDS = 10000000   # values above 10 s are clamped
+EXPORT_INTERVAL = 5.0                  # seconds between periodic exports
+STATSD_PREFIX = "ai_drone"
+
+instrumentation_enabled = False
+stage_histograms = {}
+tick_budget_ns = None
+deadline_misses = 0
+worst_overrun_ns = 0
+export_path = None
+statsd_target = None
+statsd_socket = None
+histogram_lock = worker_threads.Lock()   # stages are recorded from the pipeline, control and stream threads
+export_worker = None
+export_stop = worker_threads.Event()
+
+
+class LatencyHistogram:
+    """
+    Log-linear (HDR-style) histogram of durations in microseconds.
+    Values below 128 us are counted exactly; above that every power of two is
+    split into 64 buckets, so percentiles keep a fixed relative precision
+    over the whole range with a small, fixed-size count array.
+    """
+
+    def __init__(self, highest_value=HISTOGRAM_HIGHEST_MICROSECONDS):
+        self.sub_bucket_count = 1 << HISTOGRAM_SUB_BUCKET_BITS
+        self.half_bucket_count = self.sub_bucket_count >> 1
+        self.highest_value = highest_value
+        self.counts = [0] * (self.bucket_index(highest_value) + 1)
+        self.total_count = 0
+        self.maximum_value = 0
+
+    def bucket_index(self, value):
+        """
+        Maps a value to its bucket.
+        Args:
+            value (int): Duration in microseconds.
+        Returns:
+            int: Index into the count array.
+        """
+        if value < self.sub_bucket_count:
+            return value
+        exponent = value.bit_length() - HISTOGRAM_SUB_BUCKET_BITS
+        return self.sub_bucket_count + (exponent - 1) * self.half_bucket_count + (value >> exponent) - self.half_bucket_count
+
+    def bucket_value(self, index):
+        """
+        Obtains the midpoint of a bucket.
+        Args:
+            index (int): Bucket index.
+        Returns:
+            float: Representative duration in microseconds.
+        """
+        if index < self.sub_bucket_count:
+            return float(index)
+        exponent = (index - self.sub_bucket_count) // self.half_bucket_count + 1
+        sub_bucket = (index - self.sub_bucket_count) % self.half_bucket_count + self.half_bucket_count
+        return float((sub_bucket << exponent) + (1 << (exponent - 1)))
+
+    def record(self, value):
+        """
+        Counts one duration.
+        Args:
+            value (int): Duration in microseconds.
+        """
+        if value > self.highest_value:
+            value = self.highest_value
+        self.counts[self.bucket_index(value)] += 1
+        self.total_count += 1
+        if value > self.maximum_value:
+            self.maximum_value = value
+
+    def percentile(self, percentage):
+        """
+        Estimates a percentile.
+        Args:
+            percentage (float): Percentile between 0 and 100.
+        Returns:
+            float: Duration in microseconds, 0 if empty.
+        """
+        if self.total_count == 0:
+            return 0.0
+        threshold = max(1, int(round(self.total_count * percentage / 100.0)))
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return min(self.bucket_value(index), self.maximum_value)
+        return float(self.maximum_value)
+
+    def copy(self):
+        """
+        Copies the counts, e.g. to summarise them while recording continues.
+        Returns:
+            LatencyHistogram: Independent histogram with the same counts.
+        """
+        histogram_copy = LatencyHistogram(self.highest_value)
+        histogram_copy.counts = list(self.counts)
+        histogram_copy.total_count = self.total_count
+        histogram_copy.maximum_value = self.maximum_value
+        return histogram_copy
+
+    def reset(self):
+        """
+        Clears all counts.
+        """
+        self.counts = [0] * len(self.counts)
+        self.total_count = 0
+        self.maximum_value = 0
+
+
+def configure_instrumentation(enabled=True, tick_budget=None, export_file=None, statsd_address=None):
+    """
+    Turns stage timing on or off and sets up exporting. Exports run on a
+    background thread every EXPORT_INTERVAL, never inside a control tick.
+    Args:
+        enabled (bool): Record stage durations.
+        tick_budget (float): Control tick budget in seconds for deadline-miss accounting.
+        export_file (str): Append a JSON summary line to this file on every export.
+        statsd_address (tuple): (host, port) receiving statsd-style UDP gauges.
+    """
+    global instrumentation_enabled, tick_budget_ns, export_path, statsd_target, statsd_socket, export_worker
+    stop_statistics_export()
+    instrumentation_enabled = enabled
+    tick_budget_ns = int(tick_budget * 1e9) if tick_budget is not None else None
+    export_path = export_file
+    statsd_target = statsd_address
+    if statsd_target is not None and statsd_socket is None:
+        statsd_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    reset_stage_statistics()
+    if enabled and (export_path is not None or statsd_target is not None):
+        export_stop.clear()
+        export_worker = worker_threads.Thread(target=export_periodically, name="stage_export", daemon=True)
+        export_worker.start()
+
+def export_periodically():
+    # Runs on the exporter thread until stop_statistics_export
+    while not export_stop.wait(EXPORT_INTERVAL):
+        export_stage_statistics()
+
+def stop_statistics_export():
+    """
+    Stops the periodic exporter thread if it is running.
+    """
+    global export_worker
+    export_stop.set()
+    if export_worker is not None:
+        export_worker.join()
+        export_worker = None
+
+def reset_stage_statistics():
+    """
+    Clears all histograms and deadline-miss counters.
+    """
+    global deadline_misses, worst_overrun_ns
+    with histogram_lock:
+        stage_histograms.clear()
+    deadline_misses = 0
+    worst_overrun_ns = 0
+
+def stage_start():
+    """
+    Marks the start of a timed stage.
+    Returns:
+        int: Monotonic timestamp in nanoseconds, 0 when instrumentation is off.
+    """
+    if not instrumentation_enabled:
+        return 0
+    return timing.perf_counter_ns()
+
+def stage_finish(stage_name, started):
+    """
+    Records the duration of a stage started with stage_start.
+    Args:
+        stage_name (str): Stage identifier, e.g. 'detect'.
+        started (int): Value returned by stage_start.
+    Returns:
+        int: Duration in nanoseconds, 0 when instrumentation is off.
+    """
+    if not started:
+        return 0
+    elapsed = timing.perf_counter_ns() - started
+    with histogram_lock:
+        histogram = stage_histograms.get(stage_name)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            stage_histograms[stage_name] = histogram
+        histogram.record(elapsed // 1000)
+    return elapsed
+
+def tick_finish(started):
+    """
+    Records a whole control tick and checks it against the tick budget.
+    Args:
+        started (int): Value returned by stage_start at the top of the tick.
+    """
+    global deadline_misses, worst_overrun_ns
+    elapsed = stage_finish("tick", started)
+    if not elapsed:
+        return
+    if tick_budget_ns is not None and elapsed > tick_budget_ns:
+        deadline_misses += 1
+        worst_overrun_ns = max(worst_overrun_ns, elapsed - tick_budget_ns)
+
+def summarise_stage_statistics():
+    """
+    Summarises every stage histogram. The histograms are copied under the
+    lock, so percentiles are computed without holding up the recording threads.
+    Returns:
+        dict: Stage name mapped to count and p50/p90/p99/max in milliseconds,
+        plus deadline-miss figures under 'deadline'.
+    """
+    with histogram_lock:
+        histograms = {stage_name: histogram.copy() for stage_name, histogram in stage_histograms.items()}
+    summary = {}
+    for stage_name, histogram in histograms.items():
+        summary[stage_name] = {
+            "count": histogram.total_count,
+            "p50_ms": histogram.percentile(50) / 1000.0,
+            "p90_ms": histogram.percentile(90) / 1000.0,
+            "p99_ms": histogram.percentile(99) / 1000.0,
+            "max_ms": histogram.maximum_value / 1000.0,
+        }
+    summary["deadline"] = {
+        "budget_ms": tick_budget_ns / 1e6 if tick_budget_ns is not None else None,
+        "misses": deadline_misses,
+        "worst_overrun_ms": worst_overrun_ns / 1e6,
+    }
+    return summary
+
+def export_stage_statistics():
+    """
+    Writes the current summary to the export file and/or statsd target.
+    """
+    summary = summarise_stage_statistics()
+    if export_path is not None:
+        with open(export_path, "a") as export_file:
+            export_file.write(json.dumps({"time": timing.time(), "stages": summary}) + "\n")
+    if statsd_target is not None:
+        statsd_lines = []
+        for stage_name, stage_summary in summary.items():
+            if stage_name == "deadline":
+                continue
+            for field in ("p50_ms", "p99_ms", "max_ms"):
+                statsd_lines.append(f"{STATSD_PREFIX}.{stage_name}.{field[:-3]}:{stage_summary[field]:.3f}|g")
+        statsd_lines.append(f"{STATSD_PREFIX}.deadline_misses:{summary['deadline']['misses']}|g")
+        statsd_socket.sendto("\n".join(statsd_lines).encode(), statsd_target)
+
+def parse_statsd_address(address):
+    """
+    Parses a 'host:port' string.
+    Args:
+        address (str): Target such as '127.0.0.1:8125'.
+    Returns:
+        tuple: (host, port).
+    """
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
@@ -0,0 +1,118 @@
+import concurrent.futures
+import threading as worker_threads
+import time as timing
+
+STARTUP_WORKERS = 4   # startup steps allowed to run at the same time
+
+
+class StartupOrchestrator:
+    """
+    Runs named startup steps on a thread pool, each one as soon as the
+    steps it depends on have finished, and times every step.
+    Steps are mostly I/O bound (serial ports, the MAVLink handshake,
+    loading the inference engine, opening the camera), so running them
+    side by side brings time-to-ready down to the slowest chain instead
+    of the sum. A step whose dependency failed is skipped. After all
+    steps have ended, the first failure is raised again.
+    """
+
+    def __init__(self, max_workers=STARTUP_WORKERS, clock=timing.perf_counter):
+        self.max_workers = max_workers
+        self.clock = clock
+        self.steps = {}
+        self.step_order = []
+        self.results = {}
+        self.timings = {}
+        self.failures = {}
+        self.started_at = None
+        self.finished_at = None
+        self._timing_lock = worker_threads.Lock()
+
+    def add_step(self, step_name, function, depends_on=()):
+        """
+        Registers a startup step.
+        Args:
+            step_name (str): Name shown in the breakdown.
+            function (callable): Step called without arguments.
+            depends_on (tuple): Names of steps that must succeed first.
+        """
+        for dependency in depends_on:
+            if dependency not in self.steps:
+                raise ValueError(f"Startup step '{step_name}' depends on unknown step '{dependency}'")
+        self.steps[step_name] = (function, tuple(depends_on))
+        self.step_order.append(step_name)
+
+    def _run_step(self, step_name):
+        function = self.steps[step_name][0]
+        step_started = self.clock()
+        try:
+            return function()
+        finally:
+            step_finished = self.clock()
+            with self._timing_lock:
+                self.timings[step_name] = (step_started - self.started_at, step_finished - step_started,
+                                           worker_threads.current_thread().name)
+
+    def run(self):
+        """
+        Runs every step.
+        Returns:
+            dict: Step name mapped to the value its function returned.
+        """
+        self.results = {}
+        self.timings = {}
+        self.failures = {}
+        self.started_at = self.clock()
+        pending = list(self.step_order)
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="startup") as startup_pool:
+            while pending or running:
+                for step_name in list(pending):
+                    dependencies = self.steps[step_name][1]
+                    if any(dependency in self.failures for dependency in dependencies):
+                        self.failures[step_name] = None
+                        pending.remove(step_name)
+                    elif all(dependency in self.results for dependency in dependencies):
+                        running[startup_pool.submit(self._run_step, step_name)] = step_name
+                        pending.remove(step_name)
+                if not running:
+                    continue
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for step_future in finished:
+                    step_name = running.pop(step_future)
+                    if step_future.exception() is not None:
+                        self.failures[step_name] = step_future.exception()
+                        print(f"Startup step {step_name} failed: {step_future.exception()}")
+                    else:
+                        self.results[step_name] = step_future.result()
+        self.finished_at = self.clock()
+        for step_name in self.step_order:
+            if self.failures.get(step_name) is not None:
+                raise self.failures[step_name]
+        return self.results
+
+    def report_durations(self):
+        """
+        Summarises where startup time went.
+        Returns:
+            dict: Per-step start offset, duration, thread and status (ok, failed
+                or skipped) in milliseconds, plus the wall-clock total and the
+                sum of all step durations.
+        """
+        step_reports = {}
+        for step_name in self.step_order:
+            status = "ok" if step_name in self.results else "skipped"
+            if self.failures.get(step_name) is not None:
+                status = "failed"
+            started, duration, thread_name = self.timings.get(step_name, (0.0, 0.0, None))
+            step_reports[step_name] = {
+                "start_ms": started * 1000.0,
+                "duration_ms": duration * 1000.0,
+                "thread": thread_name,
+                "status": status,
+            }
+        return {
+            "steps": step_reports,
+            "total_ms": (self.finished_at - self.started_at) * 1000.0 if self.finished_at is not None else 0.0,
+            "sequential_ms": sum(step_report["duration_ms"] for step_report in step_reports.values()),
+        }
@@ -0,0 +1,251 @@
+import numpy as array_utils
+
+from components import detection_types
+
+TRACKER_FRAME_INTERVAL = 1.0 / 30.0   # dt assumed when no timestamps are given
+TRACKER_MAX_MISSES = 10              # frames a track may coast without a matching detection
+TRACKER_MIN_HITS = 1                 # detections needed before a track can be reported
+TRACKER_MIN_IOU = 0.1                # overlap below which a pair needs the centroid gate
+TRACKER_CENTROID_GATE = 1.0          # centroid distance gate, in units of the track box size
+TRACKER_POSITION_NOISE = 1.0         # process noise on box position and size (pixels)
+TRACKER_VELOCITY_NOISE = 300.0       # acceleration noise driving the box velocity (pixels/s^2)
+TRACKER_MEASUREMENT_NOISE = 4.0      # detection noise (pixels)
+
+# State: center x, center y, width, height and their rates of change
+STATE_SIZE = 8
+MEASUREMENT_SIZE = 4
+
+
+def boxes_to_measurements(boxes):
+    """
+    Converts corner boxes to center/size measurements.
+    Args:
+        boxes (ndarray): (N, 4) left, top, right, bottom.
+    Returns:
+        ndarray: (N, 4) center x, center y, width, height.
+    """
+    return array_utils.stack([(boxes[:, 0] + boxes[:, 2]) / 2.0, (boxes[:, 1] + boxes[:, 3]) / 2.0,
+                              boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1)
+
+def measurements_to_boxes(measurements):
+    """
+    Converts center/size measurements to corner boxes.
+    Args:
+        measurements (ndarray): (N, 4) center x, center y, width, height.
+    Returns:
+        ndarray: (N, 4) left, top, right, bottom.
+    """
+    half_width = measurements[:, 2] / 2.0
+    half_height = measurements[:, 3] / 2.0
+    return array_utils.stack([measurements[:, 0] - half_width, measurements[:, 1] - half_height,
+                              measurements[:, 0] + half_width, measurements[:, 1] + half_height], axis=1)
+
+def compute_iou_matrix(boxes_a, boxes_b):
+    """
+    Computes the intersection-over-union of every pair of boxes.
+    Args:
+        boxes_a (ndarray): (N, 4) left, top, right, bottom.
+        boxes_b (ndarray): (M, 4) left, top, right, bottom.
+    Returns:
+        ndarray: (N, M) IoU values.
+    """
+    overlap_left = array_utils.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    overlap_top = array_utils.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    overlap_right = array_utils.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    overlap_bottom = array_utils.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = array_utils.clip(overlap_right - overlap_left, 0, None) * array_utils.clip(overlap_bottom - overlap_top, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return array_utils.where(union > 0, intersection / array_utils.maximum(union, 1e-9), 0.0)
+
+def assign_greedy(cost_matrix, valid_pairs):
+    """
+    Matches rows to columns by repeatedly taking the cheapest remaining valid pair.
+    Args:
+        cost_matrix (ndarray): (N, M) costs.
+        valid_pairs (ndarray): (N, M) bool mask of allowed pairs.
+    Returns:
+        tuple: Matched row indices and column indices (equal-length arrays).
+    """
+    candidate_rows, candidate_columns = array_utils.nonzero(valid_pairs)
+    order = array_utils.argsort(cost_matrix[candidate_rows, candidate_columns], kind="stable")
+    used_rows = set()
+    used_columns = set()
+    matched_rows = []
+    matched_columns = []
+    match_limit = min(cost_matrix.shape)
+    for pair in order:
+        row = candidate_rows[pair]
+        column = candidate_columns[pair]
+        if row in used_rows or column in used_columns:
+            continue
+        used_rows.add(row)
+        used_columns.add(column)
+        matched_rows.append(row)
+        matched_columns.append(column)
+        if len(matched_rows) == match_limit:
+            break
+    return array_utils.array(matched_rows, dtype=array_utils.intp), array_utils.array(matched_columns, dtype=array_utils.intp)
+
+
+class MultiTargetTracker:
+    """
+    Tracks people across frames with persistent IDs and locks onto one of them.
+    Every track carries a constant-velocity Kalman state over its box center
+    and size; all tracks are predicted and updated together as arrays.
+    Detections are associated with an IoU cost matrix, falling back to a
+    centroid-distance gate for fast motion, and greedy assignment.
+    """
+
+    def __init__(self, image_size, max_misses=TRACKER_MAX_MISSES, min_hits=TRACKER_MIN_HITS):
+        self.image_center = (image_size[0] / 2.0, image_size[1] / 2.0)
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self._measurement_model = array_utils.eye(MEASUREMENT_SIZE, STATE_SIZE)
+        self._measurement_noise = array_utils.eye(MEASUREMENT_SIZE) * TRACKER_MEASUREMENT_NOISE ** 2
+        self.reset()
+
+    def reset(self):
+        """
+        Drops every track and releases the lock.
+        """
+        self.locked_track_id = None
+        self.next_track_id = 0
+        self.last_timestamp = None
+        self.states = array_utils.zeros((0, STATE_SIZE))
+        self.covariances = array_utils.zeros((0, STATE_SIZE, STATE_SIZE))
+        self.track_ids = array_utils.zeros(0, dtype=array_utils.int64)
+        self.hits = array_utils.zeros(0, dtype=array_utils.int64)
+        self.misses = array_utils.zeros(0, dtype=array_utils.int64)
+        self.confidences = array_utils.zeros(0)
+
+    def _predict(self, elapsed):
+        transition = array_utils.eye(STATE_SIZE)
+        transition[:MEASUREMENT_SIZE, MEASUREMENT_SIZE:] = array_utils.eye(MEASUREMENT_SIZE) * elapsed
+        process_noise = array_utils.diag([TRACKER_POSITION_NOISE ** 2] * MEASUREMENT_SIZE + [(TRACKER_VELOCITY_NOISE * elapsed) ** 2] * MEASUREMENT_SIZE)
+        self.states = self.states @ transition.T
+        self.covariances = transition @ self.covariances @ transition.T + process_noise
+
+    def _correct(self, track_rows, measurements):
+        predicted_covariances = self.covariances[track_rows]
+        innovation = measurements - self.states[track_rows, :MEASUREMENT_SIZE]
+        innovation_covariance = predicted_covariances[:, :MEASUREMENT_SIZE, :MEASUREMENT_SIZE] + self._measurement_noise
+        cross_covariance = predicted_covariances[:, :, :MEASUREMENT_SIZE]
+        gains = array_utils.linalg.solve(innovation_covariance, cross_covariance.transpose(0, 2, 1)).transpose(0, 2, 1)
+        self.states[track_rows] += array_utils.einsum("tij,tj->ti", gains, innovation)
+        self.covariances[track_rows] = predicted_covariances - gains @ self._measurement_model @ predicted_covariances
+
+    def update(self, detections, timestamp=None):
+        """
+        Advances every track by one frame.
+        Args:
+            detections (list): Person detections with Left/Top/Right/Bottom attributes.
+            timestamp (float): Capture time in seconds; frame spacing is assumed when None.
+        Returns:
+            DetectionBox: Locked target, or None when no track is available.
+        """
+        elapsed = TRACKER_FRAME_INTERVAL
+        if timestamp is not None and self.last_timestamp is not None:
+            elapsed = max(timestamp - self.last_timestamp, 1e-3)
+        self.last_timestamp = timestamp
+
+        detection_boxes = array_utils.array([[detection.Left, detection.Top, detection.Right, detection.Bottom] for detection in detections], dtype=array_utils.float64).reshape(-1, 4)
+        detection_confidences = array_utils.array([getattr(detection, "Confidence", 1.0) for detection in detections], dtype=array_utils.float64)
+        measurements = boxes_to_measurements(detection_boxes)
+
+        self._predict(elapsed)
+        matched_tracks = array_utils.zeros(0, dtype=array_utils.intp)
+        matched_detections = array_utils.zeros(0, dtype=array_utils.intp)
+        if len(self.states) > 0 and len(measurements) > 0:
+            predicted_boxes = measurements_to_boxes(self.states[:, :MEASUREMENT_SIZE])
+            iou_matrix = compute_iou_matrix(predicted_boxes, detection_boxes)
+            track_scale = array_utils.maximum(array_utils.hypot(self.states[:, 2], self.states[:, 3]), 1.0)
+            centroid_distance = array_utils.hypot(self.states[:, None, 0] - measurements[None, :, 0], self.states[:, None, 1] - measurements[None, :, 1]) / track_scale[:, None]
+            valid_pairs = (iou_matrix >= TRACKER_MIN_IOU) | (centroid_distance <= TRACKER_CENTROID_GATE)
+            cost_matrix = (1.0 - iou_matrix) + centroid_distance
+            matched_tracks, matched_detections = assign_greedy(cost_matrix, valid_pairs)
+
+        if len(matched_tracks) > 0:
+            self._correct(matched_tracks, measurements[matched_detections])
+        self.misses += 1
+        self.misses[matched_tracks] = 0
+        self.hits[matched_tracks] += 1
+        self.confidences[matched_tracks] = detection_confidences[matched_detections]
+
+        unmatched_detections = array_utils.setdiff1d(array_utils.arange(len(measurements)), matched_detections)
+        if len(unmatched_detections) > 0:
+            self._spawn_tracks(measurements[unmatched_detections], detection_confidences[unmatched_detections])
+
+        surviving = self.misses <= self.max_misses
+        if not array_utils.all(surviving):
+            self.states = self.states[surviving]
+            self.covariances = self.covariances[surviving]
+            self.track_ids = self.track_ids[surviving]
+            self.hits = self.hits[surviving]
+            self.misses = self.misses[surviving]
+            self.confidences = self.confidences[surviving]
+
+        return self._select_locked_target()
+
+    def _spawn_tracks(self, measurements, confidences):
+        new_states = array_utils.zeros((len(measurements), STATE_SIZE))
+        new_states[:, :MEASUREMENT_SIZE] = measurements
+        new_covariances = array_utils.tile(array_utils.diag([TRACKER_MEASUREMENT_NOISE ** 2] * MEASUREMENT_SIZE + [TRACKER_VELOCITY_NOISE ** 2 * 100] * MEASUREMENT_SIZE), (len(measurements), 1, 1))
+        new_ids = array_utils.arange(self.next_track_id, self.next_track_id + len(measurements))
+        self.next_track_id += len(measurements)
+        self.states = array_utils.concatenate([self.states, new_states])
+        self.covariances = array_utils.concatenate([self.covariances, new_covariances])
+        self.track_ids = array_utils.concatenate([self.track_ids, new_ids])
+        self.hits = array_utils.concatenate([self.hits, array_utils.ones(len(measurements), dtype=array_utils.int64)])
+        self.misses = array_utils.concatenate([self.misses, array_utils.zeros(len(measurements), dtype=array_utils.int64)])
+        self.confidences = array_utils.concatenate([self.confidences, confidences])
+
+    def _select_locked_target(self):
+        visible = (self.hits >= self.min_hits) & (self.misses == 0)
+        locked_rows = array_utils.flatnonzero(self.track_ids == self.locked_track_id)
+        if len(locked_rows) == 0:
+            # Lost the locked person (or never had one): lock onto the visible track closest to the image center
+            self.locked_track_id = None
+            candidates = array_utils.flatnonzero(visible)
+            if len(candidates) == 0:
+                return None
+            center_distance = array_utils.hypot(self.states[candidates, 0] - self.image_center[0], self.states[candidates, 1] - self.image_center[1])
+            locked_row = candidates[int(array_utils.argmin(center_distance))]
+            self.locked_track_id = int(self.track_ids[locked_row])
+        else:
+            locked_row = locked_rows[0]
+        return self.describe_track(locked_row)
+
+    def describe_track(self, row):
+        """
+        Builds the detection record of a track from its current state.
+        Args:
+            row (int): Track row index.
+        Returns:
+            DetectionBox: Box with the persistent TrackID.
+        """
+        left, top, right, bottom = measurements_to_boxes(self.states[row:row + 1, :MEASUREMENT_SIZE])[0]
+        return detection_types.build_detection_box(left, top, right, bottom, confidence=float(self.confidences[row]), track_id=int(self.track_ids[row]))
+
+    def lock_onto(self, track_id):
+        """
+        Forces the lock onto a specific track.
+        Args:
+            track_id (int): Identifier of an existing track.
+        Returns:
+            bool: True if the track exists.
+        """
+        if track_id in self.track_ids:
+            self.locked_track_id = int(track_id)
+            return True
+        return False
+
+    def active_tracks(self):
+        """
+        Lists the tracks matched in the latest frame.
+        Returns:
+            list: DetectionBox per visible track.
+        """
+        visible_rows = array_utils.flatnonzero((self.hits >= self.min_hits) & (self.misses == 0))
+        return [self.describe_track(row) for row in visible_rows]
@@ -0,0 +1,235 @@
+import collections
+import math
+import threading as worker_threads
+import time as timing
+
+TELEMETRY_HISTORY_LENGTH = 50    # samples kept per field for the control code
+YAW_RATE_WINDOW = 0.3            # seconds of attitude history used to estimate the yaw rate
+
+TelemetrySnapshot = collections.namedtuple("TelemetrySnapshot", [
+    "timestamp",
+    "latitude", "longitude", "altitude",
+    "roll", "pitch", "yaw",
+    "velocity",
+    "battery_voltage", "battery_current", "battery_level",
+    "mode", "armed", "is_armable", "ekf_ok",
+])
+
+EMPTY_SNAPSHOT = TelemetrySnapshot(
+    timestamp=None,
+    latitude=None, longitude=None, altitude=None,
+    roll=None, pitch=None, yaw=None,
+    velocity=None,
+    battery_voltage=None, battery_current=None, battery_level=None,
+    mode=None, armed=None, is_armable=None, ekf_ok=None,
+)
+
+
+# dronekit attributes the cache listens to; is_armable is computed by dronekit
+# and never notified, so it is re-read from the vehicle on every update
+TELEMETRY_ATTRIBUTES = (
+    "location.global_relative_frame",
+    "attitude",
+    "velocity",
+    "battery",
+    "mode",
+    "armed",
+    "ekf_ok",
+)
+
+
+def extract_snapshot_fields(attribute_name, value):
+    """
+    Converts a dronekit attribute value into snapshot fields.
+    Args:
+        attribute_name (str): Name of the attribute reported by the listener.
+        value: Attribute value.
+    Returns:
+        dict: Snapshot field names mapped to plain values.
+    """
+    if attribute_name == "location.global_relative_frame":
+        return {"latitude": value.lat, "longitude": value.lon, "altitude": value.alt}
+    if attribute_name == "attitude":
+        return {"roll": value.roll, "pitch": value.pitch, "yaw": value.yaw}
+    if attribute_name == "velocity":
+        return {"velocity": tuple(value)}
+    if attribute_name == "battery":
+        return {"battery_voltage": value.voltage, "battery_current": value.current, "battery_level": value.level}
+    if attribute_name == "mode":
+        return {"mode": value.name}
+    if attribute_name == "armed":
+        return {"armed": bool(value)}
+    if attribute_name == "ekf_ok":
+        return {"ekf_ok": bool(value)}
+    return {}
+
+
+class TelemetryCache:
+    """
+    Keeps an immutable, timestamped snapshot of the UAV state.
+    dronekit attribute listeners replace the snapshot as updates arrive, so a
+    reader gets the whole state with a single reference read. A short history
+    of (timestamp, value) pairs is kept per field.
+    """
+
+    def __init__(self, history_length=TELEMETRY_HISTORY_LENGTH, clock=timing.monotonic):
+        self.clock = clock
+        self.update_count = 0
+        self._snapshot = EMPTY_SNAPSHOT
+        self._histories = {field: collections.deque(maxlen=history_length) for field in TelemetrySnapshot._fields[1:]}
+        self._update_signal = worker_threads.Condition()
+        self._observers = []
+        self._vehicle = None
+
+    def attach(self, vehicle):
+        """
+        Subscribes to the vehicle attributes and seeds the snapshot with their current values.
+        Args:
+            vehicle (Vehicle): Connected dronekit vehicle.
+        """
+        self._vehicle = vehicle
+        for attribute_name in TELEMETRY_ATTRIBUTES:
+            vehicle.add_attribute_listener(attribute_name, self.handle_attribute_update)
+        for attribute_name in TELEMETRY_ATTRIBUTES:
+            current_value = self._read_attribute(vehicle, attribute_name)
+            if current_value is not None:
+                self.handle_attribute_update(vehicle, attribute_name, current_value)
+
+    def detach(self):
+        """
+        Removes the attribute listeners.
+        """
+        if self._vehicle is None:
+            return
+        for attribute_name in TELEMETRY_ATTRIBUTES:
+            self._vehicle.remove_attribute_listener(attribute_name, self.handle_attribute_update)
+        self._vehicle = None
+
+    def set_clock(self, clock):
+        """
+        Switches to another clock, e.g. a simulation's virtual one. The history
+        stamped by the previous clock is dropped and the snapshot restamped, so
+        no fit or age check mixes the two time bases.
+        Args:
+            clock (callable): Function returning the current time in seconds.
+        """
+        with self._update_signal:
+            self.clock = clock
+            for field_history in self._histories.values():
+                field_history.clear()
+            if self._snapshot.timestamp is not None:
+                self._snapshot = self._snapshot._replace(timestamp=clock())
+
+    def _read_attribute(self, vehicle, attribute_name):
+        value = vehicle
+        for part in attribute_name.split("."):
+            value = getattr(value, part, None)
+            if value is None:
+                return None
+        return value
+
+    def handle_attribute_update(self, vehicle, attribute_name, value):
+        """
+        dronekit listener callback that refreshes the snapshot.
+        Args:
+            vehicle (Vehicle): Vehicle that raised the update.
+            attribute_name (str): Name of the changed attribute.
+            value: New attribute value.
+        """
+        if value is None:
+            return
+        changed_fields = extract_snapshot_fields(attribute_name, value)
+        if len(changed_fields) == 0:
+            return
+        armable = getattr(vehicle, "is_armable", None)
+        if armable is not None:
+            changed_fields["is_armable"] = bool(armable)
+        received_at = self.clock()
+        with self._update_signal:
+            self._snapshot = self._snapshot._replace(timestamp=received_at, **changed_fields)
+            for field, field_value in changed_fields.items():
+                self._histories[field].append((received_at, field_value))
+            self.update_count += 1
+            self._update_signal.notify_all()
+            current_snapshot = self._snapshot
+        for observer in self._observers:
+            observer(current_snapshot)
+
+    def add_observer(self, callback):
+        """
+        Registers a function called with the new snapshot after every update.
+        It runs on the telemetry thread and must return quickly.
+        Args:
+            callback (callable): Function taking a TelemetrySnapshot.
+        """
+        self._observers.append(callback)
+
+    def snapshot(self, max_age=None):
+        """
+        Obtains the latest state in one read.
+        Args:
+            max_age (float): Reject the snapshot if no update arrived within this many seconds.
+        Returns:
+            TelemetrySnapshot: Current state, or None if empty or stale.
+        """
+        current = self._snapshot
+        if current.timestamp is None:
+            return None
+        if max_age is not None and self.clock() - current.timestamp > max_age:
+            return None
+        return current
+
+    def history(self, field):
+        """
+        Obtains the recent values of one snapshot field.
+        Args:
+            field (str): Snapshot field name, e.g. 'yaw' or 'altitude'.
+        Returns:
+            list: (timestamp, value) pairs, oldest first.
+        """
+        with self._update_signal:
+            return list(self._histories[field])
+
+    def yaw_rate(self, window=YAW_RATE_WINDOW):
+        """
+        Estimates the current yaw rate from the recent attitude updates.
+        Args:
+            window (float): Seconds of history to fit.
+        Returns:
+            float: Yaw rate in rad/s (positive clockwise), 0 with fewer than two samples.
+        """
+        yaw_samples = self.history("yaw")
+        if len(yaw_samples) < 2:
+            return 0.0
+        newest_time = yaw_samples[-1][0]
+        # samples stamped after the newest one come from another clock and are never fitted
+        ordered_samples = [sample for sample in yaw_samples if newest_time - sample[0] >= 0]
+        recent_samples = [sample for sample in ordered_samples if newest_time - sample[0] <= window]
+        if len(recent_samples) < 2:
+            recent_samples = ordered_samples[-2:]
+        if len(recent_samples) < 2:
+            return 0.0
+        # Unwrap across the +-pi boundary, then fit a least-squares slope
+        unwrapped = [recent_samples[0][1]]
+        for sample_time, sample_yaw in recent_samples[1:]:
+            step = (sample_yaw - unwrapped[-1] + math.pi) % (2.0 * math.pi) - math.pi
+            unwrapped.append(unwrapped[-1] + step)
+        mean_time = sum(sample[0] for sample in recent_samples) / len(recent_samples)
+        mean_yaw = sum(unwrapped) / len(unwrapped)
+        spread = sum((sample[0] - mean_time) ** 2 for sample in recent_samples)
+        if spread <= 0:
+            return 0.0
+        return sum((sample[0] - mean_time) * (yaw - mean_yaw) for sample, yaw in zip(recent_samples, unwrapped)) / spread
+
+    def wait_for_update(self, timeout=None):
+        """
+        Blocks until the next attribute update.
+        Args:
+            timeout (float): Maximum wait in seconds.
+        Returns:
+            TelemetrySnapshot: Latest state, or None if empty.
+        """
+        with self._update_signal:
+            seen_updates = self.update_count
+            self._update_signal.wait_for(lambda: self.update_count != seen_updates, timeout)
+        return self.snapshot()
@@ -1,6 +1,161 @@
-from dronekit import *
+from components import telemetry_cache as telemetry_store
+import time as timing
+
+COMMAND_MAX_RATE = 20.0            # maximum setpoints per second on each command channel
+COMMAND_KEEPALIVE_INTERVAL = 1.0   # resend an unchanged setpoint at least this often (seconds)
+ROTATION_TOLERANCE = 0.5           # degrees within which a yaw turn counts as no turn
+VELOCITY_TOLERANCE = 0.05          # m/s within which a velocity setpoint counts as unchanged
 
 autonomous_unit = None
+command_dispatcher = None
+telemetry_monitor = None
+
+
+class MavlinkCommandDispatcher:
+    """
+    Coalesces, deduplicates and rate-limits yaw and velocity setpoints.
+    Setpoints are staged during a control tick and sent by flush(); only the
+    last one staged per channel is kept. Each channel owns a pre-encoded
+    MAVLink message whose fields are updated in place before sending.
+    Yaw is sent as a relative CONDITION_YAW, which turns again every time it
+    arrives, so only a repeated "no turn" is suppressed; every non-zero turn
+    is sent, subject to the rate limit.
+    """
+
+    def __init__(self, vehicle, max_rate=COMMAND_MAX_RATE, keepalive_interval=COMMAND_KEEPALIVE_INTERVAL,
+                 rotation_tolerance=ROTATION_TOLERANCE, velocity_tolerance=VELOCITY_TOLERANCE, clock=timing.monotonic):
+        self.vehicle = vehicle
+        self.minimum_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.keepalive_interval = keepalive_interval
+        self.tolerances = {"rotation": rotation_tolerance, "motion": velocity_tolerance}
+        self.clock = clock
+        self.sent_count = 0
+        self.suppressed_count = 0
+        self.coalesced_count = 0
+        self.rate_limited_count = 0
+        self._pending = {"rotation": None, "motion": None}
+        self._last_sent = {"rotation": None, "motion": None}
+        self._templates = {"rotation": None, "motion": None}
+
+    def stage_rotation(self, target_direction):
+        """
+        Stages a relative yaw setpoint for the next flush.
+        Args:
+            target_direction (float): Desired direction change in degrees, negative turns left.
+        """
+        self._stage("rotation", (float(target_direction),))
+
+    def stage_motion(self, speed_x, speed_y, speed_z):
+        """
+        Stages a body-frame velocity setpoint for the next flush.
+        Args:
+            speed_x (float): Forward/backward speed.
+            speed_y (float): Left/right speed.
+            speed_z (float): Up/down speed.
+        """
+        self._stage("motion", (float(speed_x), float(speed_y), float(speed_z)))
+
+    def _stage(self, channel, values):
+        if self._pending[channel] is not None:
+            self.coalesced_count += 1
+        self._pending[channel] = values
+
+    def flush(self, force=False):
+        """
+        Sends the staged setpoints that changed, are due for a keepalive and
+        fit within the rate limit. Rate-limited setpoints stay staged.
+        Args:
+            force (bool): Send staged setpoints regardless of deduplication and rate limit.
+        Returns:
+            int: Number of MAVLink messages sent.
+        """
+        sent_now = 0
+        current_time = self.clock()
+        for channel in ("rotation", "motion"):
+            values = self._pending[channel]
+            if values is None:
+                continue
+            last_sent = self._last_sent[channel]
+            if last_sent is not None and not force:
+                last_values, last_time = last_sent
+                elapsed = current_time - last_time
+                unchanged = self._is_repeatable(channel, values) and all(abs(new - old) <= self.tolerances[channel] for new, old in zip(values, last_values))
+                if unchanged and elapsed < self.keepalive_interval:
+                    self.suppressed_count += 1
+                    self._pending[channel] = None
+                    continue
+                if elapsed < self.minimum_interval:
+                    self.rate_limited_count += 1
+                    continue
+            self._transmit(channel, values)
+            self._last_sent[channel] = (values, current_time)
+            self._pending[channel] = None
+            self.sent_count += 1
+            sent_now += 1
+        return sent_now
+
+    def set_clock(self, clock):
+        """
+        Switches to another clock, forgetting the send times of the previous one.
+        Args:
+            clock (callable): Function returning the current time in seconds.
+        """
+        self.clock = clock
+        self._last_sent = {"rotation": None, "motion": None}
+
+    def _is_repeatable(self, channel, values):
+        # Sending a velocity setpoint twice holds the same velocity, sending a relative turn twice turns twice
+        if channel == "rotation":
+            return abs(values[0]) <= self.tolerances["rotation"]
+        return True
+
+    def _transmit(self, channel, values):
+        instruction_packet = self._templates[channel]
+        if instruction_packet is None:
+            instruction_packet = self._build_template(channel)
+            self._templates[channel] = instruction_packet
+        if channel == "rotation":
+            instruction_packet.param1 = abs(values[0])
+            instruction_packet.param3 = -1 if values[0] < 0 else 1
+        else:
+            instruction_packet.vx, instruction_packet.vy, instruction_packet.vz = values
+        self.vehicle.send_mavlink(instruction_packet)
+
+    def _build_template(self, channel):
+        from dronekit import mavutil
+        if channel == "rotation":
+            return self.vehicle.message_factory.command_long_encode(
+                0, 0,
+                mavutil.mavlink.MAV_CMD_CONDITION_YAW,
+                0,
+                0,
+                0,
+                1,
+                1,
+                0, 0, 0)
+        return self.vehicle.message_factory.set_position_target_local_ned_encode(
+            0,
+            0, 0,
+            mavutil.mavlink.MAV_FRAME_BODY_NED,
+            0b0000111111000111,
+            0, 0, 0,
+            0, 0, 0,
+            0, 0, 0,
+            0, 0)
+
+    def report_statistics(self):
+        """
+        Summarises how many setpoints reached the serial link.
+        Returns:
+            dict: Sent, suppressed (unchanged), coalesced (overwritten in a tick)
+            and rate-limited counts.
+        """
+        return {
+            "sent": self.sent_count,
+            "suppressed": self.suppressed_count,
+            "coalesced": self.coalesced_count,
+            "rate_limited": self.rate_limited_count,
+        }
 
 def establish_uav_connection(access_point):
     """
@@ -8,16 +163,25 @@ def establish_uav_connection(access_point):
     Args:
         access_point (str): Connection endpoint (e.g., '/dev/ttyACM0').
     """
-    global autonomous_unit
+    from dronekit import connect
+    global autonomous_unit, command_dispatcher, telemetry_monitor
     if autonomous_unit == None:
         autonomous_unit = connect(access_point, wait_ready=True, baud=57600)
+        command_dispatcher = MavlinkCommandDispatcher(autonomous_unit)
+        telemetry_monitor = telemetry_store.TelemetryCache()
+        telemetry_monitor.attach(autonomous_unit)
     print("UAV connection activated")
 
 def sever_uav_connection():
     """
     Disconnects from the UAV.
     """
+    global autonomous_unit, command_dispatcher, telemetry_monitor
+    telemetry_monitor.detach()
     autonomous_unit.close()
+    autonomous_unit = None
+    command_dispatcher = None
+    telemetry_monitor = None
 
 def query_firmware_details():
     """
@@ -30,48 +194,58 @@ def query_firmware_details():
 
 def query_position_data():
     """
-    Fetches the current GPS coordinates of the UAV.
+    Fetches the current GPS coordinates of the UAV from the telemetry snapshot.
     Returns:
-        Location: GPS coordinates.
+        tuple: (latitude, longitude, altitude above home), or None before the first update.
     """
-    global autonomous_unit
-    return autonomous_unit.location.global_frame
+    telemetry = telemetry_monitor.snapshot()
+    if telemetry is None:
+        return None
+    return telemetry.latitude, telemetry.longitude, telemetry.altitude
 
 def query_altitude_data():
     """
-    Fetches the current orientation and altitude of the UAV.
+    Fetches the current orientation of the UAV from the telemetry snapshot.
     Returns:
-        Attitude: Orientation data.
+        tuple: (roll, pitch, yaw) in radians, or None before the first update.
     """
-    global autonomous_unit
-    return autonomous_unit.attitude
+    telemetry = telemetry_monitor.snapshot()
+    if telemetry is None:
+        return None
+    return telemetry.roll, telemetry.pitch, telemetry.yaw
 
 def query_speed_data():
     """
-    Fetches the current velocity of the UAV.
+    Fetches the current velocity of the UAV from the telemetry snapshot.
     Returns:
-        list: Velocity vector [x, y, z].
+        tuple: Velocity vector (x, y, z), or None before the first update.
     """
-    global autonomous_unit
-    return autonomous_unit.velocity
+    telemetry = telemetry_monitor.snapshot()
+    if telemetry is None:
+        return None
+    return telemetry.velocity
 
 def query_power_status():
     """
-    Fetches the battery status of the UAV.
+    Fetches the battery status of the UAV from the telemetry snapshot.
     Returns:
-        Battery: Battery information.
+        tuple: (voltage, current, level), or None before the first update.
     """
-    global autonomous_unit
-    return autonomous_unit.battery
+    telemetry = telemetry_monitor.snapshot()
+    if telemetry is None:
+        return None
+    return telemetry.battery_voltage, telemetry.battery_current, telemetry.battery_level
 
 def query_operation_mode():
     """
-    Fetches the current operation mode of the UAV.
+    Fetches the current operation mode of the UAV from the telemetry snapshot.
     Returns:
-        str: Current mode name.
+        str: Current mode name, or None before the first update.
     """
-    global autonomous_unit
-    return autonomous_unit.mode.name
+    telemetry = telemetry_monitor.snapshot()
+    if telemetry is None:
+        return None
+    return telemetry.mode
 
 def query_base_position():
     """
@@ -84,11 +258,48 @@ def query_base_position():
 
 def query_navigation_health():
     """
-    Verifies the health of the navigation system (EKF).
+    Verifies the health of the navigation system (EKF) from the telemetry snapshot.
     Returns:
         bool: True if healthy, False otherwise.
     """
-    return autonomous_unit.ekf_ok
+    telemetry = telemetry_monitor.snapshot()
+    return telemetry is not None and bool(telemetry.ekf_ok)
+
+def query_telemetry_snapshot(max_age=None):
+    """
+    Fetches the cached UAV state in a single read.
+    Args:
+        max_age (float): Reject the snapshot if it is older than this many seconds.
+    Returns:
+        TelemetrySnapshot: Position, attitude, velocity, battery, mode and EKF state, or None if stale.
+    """
+    return telemetry_monitor.snapshot(max_age)
+
+def query_telemetry_history(field):
+    """
+    Fetches the recent values of one telemetry field.
+    Args:
+        field (str): Snapshot field name, e.g. 'yaw'.
+    Returns:
+        list: (timestamp, value) pairs, oldest first.
+    """
+    return telemetry_monitor.history(field)
+
+def subscribe_telemetry(callback):
+    """
+    Calls a function with every telemetry update.
+    Args:
+        callback (callable): Function taking a TelemetrySnapshot, run on the telemetry thread.
+    """
+    telemetry_monitor.add_observer(callback)
+
+def query_yaw_rate():
+    """
+    Fetches the current yaw rate estimated from the attitude updates.
+    Returns:
+        float: Yaw rate in rad/s, positive clockwise.
+    """
+    return telemetry_monitor.yaw_rate()
 
 def adjust_camera_angle(new_angle):
     """
@@ -116,38 +327,54 @@ def initiate_ascension(target_elevation):
     Args:
         target_elevation (float): Target elevation in meters.
     """
+    from dronekit import VehicleMode
     global autonomous_unit
 
     print("Configuring default speed to 3 m/s for safety")
     autonomous_unit.groundspeed = 3
 
+    # Each check reads the telemetry snapshot and wakes on the next update instead of sleeping a fixed second
     print("Performing pre-launch checks")
-    while not autonomous_unit.is_armable:
-        print("Awaiting UAV readiness...")
-        timing.sleep(1)
+    last_report = 0
+    telemetry = telemetry_monitor.snapshot()
+    while telemetry is None or not telemetry.is_armable:
+        if timing.monotonic() - last_report >= 1:
+            print("Awaiting UAV readiness...")
+            last_report = timing.monotonic()
+        telemetry = telemetry_monitor.wait_for_update(timeout=1)
 
     print("Activating propulsion systems")
     autonomous_unit.mode = VehicleMode("GUIDED")
     autonomous_unit.armed = True
 
-    while not autonomous_unit.armed:
-        print("Waiting for propulsion activation...")
-        timing.sleep(1)
+    last_report = 0
+    telemetry = telemetry_monitor.snapshot()
+    while telemetry is None or not telemetry.armed:
+        if timing.monotonic() - last_report >= 1:
+            print("Waiting for propulsion activation...")
+            last_report = timing.monotonic()
+        telemetry = telemetry_monitor.wait_for_update(timeout=1)
 
     print("Commencing ascent!")
     autonomous_unit.simple_takeoff(target_elevation)
 
+    last_report = 0
     while True:
-        print(f"Elevation: {autonomous_unit.location.global_relative_frame.alt}")
-        if autonomous_unit.location.global_relative_frame.alt >= target_elevation * 0.95:
+        telemetry = telemetry_monitor.wait_for_update(timeout=1)
+        if telemetry is None or telemetry.altitude is None:
+            continue
+        if timing.monotonic() - last_report >= 1:
+            print(f"Elevation: {telemetry.altitude}")
+            last_report = timing.monotonic()
+        if telemetry.altitude >= target_elevation * 0.95:
             print("Target elevation achieved")
             break
-        timing.sleep(1)
 
 def commence_landing():
     """
     Commands the UAV to enter landing mode.
     """
+    from dronekit import VehicleMode
     global autonomous_unit
     print("Entering DESCEND mode...")
     autonomous_unit.mode = VehicleMode("LAND")
@@ -157,56 +384,59 @@ def return_to_origin():
     Commands the UAV to return to its starting position.
     Note: No obstacle avoidance!
     """
+    from dronekit import VehicleMode
     autonomous_unit.mode = VehicleMode("RTL")
 
 def issue_rotation_command(target_direction):
     """
-    Sends a rotation command to the UAV.
+    Sends a rotation command to the UAV immediately.
     Args:
         target_direction (float): Desired direction in degrees (0-360).
     """
-    global autonomous_unit
-    rotation_rate = 0
-    turn_direction = 1
-
-    print(f"Issuing rotation command with direction: {target_direction}")
-
-    if target_direction < 0:
-        target_direction = target_direction * -1
-        turn_direction = -1
-
-    instruction_packet = autonomous_unit.message_factory.command_long_encode(
-        0, 0,
-        mavutil.mavlink.MAV_CMD_CONDITION_YAW,
-        0,
-        target_direction,
-        rotation_rate,
-        turn_direction,
-        1,
-        0, 0, 0)
-
-    autonomous_unit.send_mavlink(instruction_packet)
+    command_dispatcher.stage_rotation(target_direction)
+    command_dispatcher.flush(force=True)
 
 def issue_motion_command(speed_x, speed_y, speed_z):
     """
-    Sends a motion command to the UAV in X, Y, Z directions.
+    Sends a motion command to the UAV in X, Y, Z directions immediately.
     Args:
         speed_x (float): Forward/backward speed.
         speed_y (float): Left/right speed.
         speed_z (float): Up/down speed.
     """
-    global autonomous_unit
+    command_dispatcher.stage_motion(speed_x, speed_y, speed_z)
+    command_dispatcher.flush(force=True)
 
-    print(f"Issuing motion command: X={speed_x} Y={speed_y} Z={speed_z}")
+def send_rotation_command(target_direction):
+    """
+    Stages a rotation command for the next flush_motion_commands call.
+    Args:
+        target_direction (float): Desired direction in degrees (0-360).
+    """
+    command_dispatcher.stage_rotation(target_direction)
 
-    instruction_packet = autonomous_unit.message_factory.set_position_target_local_ned_encode(
-        0,
-        0, 0,
-        mavutil.mavlink.MAV_FRAME_BODY_NED,
-        0b0000111111000111,
-        0, 0, 0,
-        speed_x, speed_y, speed_z,
-        0, 0, 0,
-        0, 0)
+def send_motion_command(speed_x, speed_y, speed_z):
+    """
+    Stages a motion command for the next flush_motion_commands call.
+    Args:
+        speed_x (float): Forward/backward speed.
+        speed_y (float): Left/right speed.
+        speed_z (float): Up/down speed.
+    """
+    command_dispatcher.stage_motion(speed_x, speed_y, speed_z)
 
-    autonomous_unit.send_mavlink(instruction_packet)
\ No newline at end of file
+def flush_motion_commands(force=False):
+    """
+    Sends the staged rotation and motion commands once per control tick.
+    Args:
+        force (bool): Bypass deduplication and rate limiting.
+    """
+    command_dispatcher.flush(force)
+
+def query_command_statistics():
+    """
+    Fetches sent versus suppressed command counts.
+    Returns:
+        dict: Dispatcher statistics.
+    """
+    return command_dispatcher.report_statistics()
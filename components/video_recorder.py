@@ -0,0 +1,213 @@
+import multiprocessing as process_pool
+import queue
+import os
+import time as timing
+from multiprocessing import shared_memory
+import numpy as array_utils
+
+RECORDER_SLOT_COUNT = 8                      # frames that can wait for the encoder
+SEGMENT_MAX_SECONDS = 60.0                   # start a new file after this long
+SEGMENT_MAX_BYTES = 512 * 1024 * 1024        # or once the current file reaches this size
+SEGMENT_SIZE_CHECK_INTERVAL = 25             # frames between file size checks
+
+DROP_NEWEST = "drop_newest"                  # reject the incoming frame when all slots are busy
+DROP_OLDEST = "drop_oldest"                  # replace the oldest frame still waiting for the encoder
+
+# The encoder starts while other startup threads hold locks; a forked child
+# could inherit one of them held and deadlock, so it is spawned instead
+recorder_context = process_pool.get_context("spawn")
+
+
+def build_segment_path(base_path, segment_index):
+    """
+    Builds the file name of a recording segment.
+    Args:
+        base_path (str): Recording path without extension.
+        segment_index (int): Sequential segment number.
+    Returns:
+        str: Segment file path.
+    """
+    return f"{base_path}_{segment_index:04d}.avi"
+
+
+def build_frame_times_path(segment_path):
+    """
+    Builds the file name of the frame timestamps written next to a segment.
+    Args:
+        segment_path (str): Segment file path.
+    Returns:
+        str: Path of the raw little-endian float64 submission times, one per encoded frame.
+    """
+    return os.path.splitext(segment_path)[0] + "_frames.bin"
+
+
+def encode_recording_segments(memory_name, frame_shape, slot_count, pending_slots, free_slots, base_path, frame_rate,
+                              segment_seconds, segment_bytes, encoded_count, segment_count):
+    """
+    Encoder process body: writes queued frames to rotating MJPG segments.
+    Args:
+        memory_name (str): Shared memory block holding the frame slots.
+        frame_shape (tuple): Height, width and channels of each frame.
+        slot_count (int): Number of frame slots in shared memory.
+        pending_slots (Queue): (slot index, submission time) pairs waiting to be encoded, None to finish.
+        free_slots (Queue): Slot indices handed back to the producer.
+        base_path (str): Recording path without extension.
+        frame_rate (float): Frame rate stored in the AVI header.
+        segment_seconds (float): Maximum segment duration in seconds.
+        segment_bytes (int): Maximum segment size in bytes.
+        encoded_count (Value): Shared counter of written frames.
+        segment_count (Value): Shared counter of opened segments.
+    """
+    import cv2 as vision_lib
+
+    frame_memory = shared_memory.SharedMemory(name=memory_name)
+    frame_slots = array_utils.ndarray((slot_count,) + tuple(frame_shape), dtype=array_utils.uint8, buffer=frame_memory.buf)
+    frame_size = (frame_shape[1], frame_shape[0])
+    segment_writer = None
+    segment_path = None
+    frame_times_file = None
+    segment_started = 0.0
+    segment_frames = 0
+
+    while True:
+        pending_frame = pending_slots.get()
+        if pending_frame is None:
+            break
+        slot_index, submitted_at = pending_frame
+
+        rotate_segment = segment_writer is None or timing.monotonic() - segment_started >= segment_seconds
+        if not rotate_segment and segment_frames % SEGMENT_SIZE_CHECK_INTERVAL == 0:
+            rotate_segment = os.path.getsize(segment_path) >= segment_bytes
+        if rotate_segment:
+            if segment_writer is not None:
+                segment_writer.release()
+                frame_times_file.close()
+            segment_path = build_segment_path(base_path, segment_count.value)
+            segment_writer = vision_lib.VideoWriter(segment_path, vision_lib.VideoWriter_fourcc('M', 'J', 'P', 'G'), frame_rate, frame_size)
+            frame_times_file = open(build_frame_times_path(segment_path), "wb", buffering=0)
+            segment_started = timing.monotonic()
+            segment_frames = 0
+            with segment_count.get_lock():
+                segment_count.value += 1
+
+        segment_writer.write(frame_slots[slot_index])
+        frame_times_file.write(array_utils.float64(submitted_at).tobytes())
+        free_slots.put(slot_index)
+        segment_frames += 1
+        with encoded_count.get_lock():
+            encoded_count.value += 1
+
+    if segment_writer is not None:
+        segment_writer.release()
+        frame_times_file.close()
+    del frame_slots
+    frame_memory.close()
+
+
+class AsyncVideoRecorder:
+    """
+    Video recorder that encodes in a separate process.
+    Frames are copied into a fixed pool of shared-memory slots, so submitting
+    never waits for the encoder; when every slot is busy the drop policy decides
+    which frame is lost. Output is split into segments so a crash only affects
+    the file being written. Each segment gets a _frames.bin file with the
+    wall-clock submission time of every encoded frame, the clock flight log
+    records are stamped with.
+    """
+
+    def __init__(self, base_path, frame_size, frame_rate=25.0, slot_count=RECORDER_SLOT_COUNT, drop_policy=DROP_OLDEST,
+                 segment_seconds=SEGMENT_MAX_SECONDS, segment_bytes=SEGMENT_MAX_BYTES):
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.base_path = base_path
+        self.frame_shape = (int(frame_size[1]), int(frame_size[0]), 3)
+        self.frame_rate = frame_rate
+        self.slot_count = slot_count
+        self.drop_policy = drop_policy
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.submitted_count = 0
+        self.dropped_count = 0
+        self._encoded_count = recorder_context.Value("q", 0)
+        self._segment_count = recorder_context.Value("q", 0)
+        self._pending_slots = recorder_context.Queue()
+        self._free_slots = recorder_context.Queue()
+        self._frame_memory = None
+        self._frame_slots = None
+        self._encoder = None
+
+    def start(self):
+        """
+        Allocates the frame slots and launches the encoder process.
+        """
+        slot_bytes = self.frame_shape[0] * self.frame_shape[1] * self.frame_shape[2]
+        self._frame_memory = shared_memory.SharedMemory(create=True, size=slot_bytes * self.slot_count)
+        self._frame_slots = array_utils.ndarray((self.slot_count,) + self.frame_shape, dtype=array_utils.uint8, buffer=self._frame_memory.buf)
+        for slot_index in range(self.slot_count):
+            self._free_slots.put(slot_index)
+        self._encoder = recorder_context.Process(
+            target=encode_recording_segments,
+            args=(self._frame_memory.name, self.frame_shape, self.slot_count, self._pending_slots, self._free_slots,
+                  self.base_path, self.frame_rate, self.segment_seconds, self.segment_bytes,
+                  self._encoded_count, self._segment_count),
+            name="video_recorder",
+            daemon=True)
+        self._encoder.start()
+
+    def submit(self, frame_data):
+        """
+        Hands a frame to the encoder without blocking.
+        Args:
+            frame_data (ndarray): BGR image matching the recorder frame size.
+        Returns:
+            bool: True if the frame was queued, False if it was dropped.
+        """
+        if frame_data.shape != self.frame_shape:
+            raise ValueError(f"Frame shape {frame_data.shape} does not match recorder shape {self.frame_shape}")
+        self.submitted_count += 1
+        try:
+            slot_index = self._free_slots.get_nowait()
+        except queue.Empty:
+            if self.drop_policy == DROP_NEWEST:
+                self.dropped_count += 1
+                return False
+            try:
+                # Reclaim the oldest frame the encoder has not picked up yet
+                slot_index, _ = self._pending_slots.get_nowait()
+            except queue.Empty:
+                self.dropped_count += 1
+                return False
+            self.dropped_count += 1
+        array_utils.copyto(self._frame_slots[slot_index], frame_data)
+        self._pending_slots.put_nowait((slot_index, timing.time()))
+        return True
+
+    def close(self, timeout=10.0):
+        """
+        Finishes the queued frames, stops the encoder and frees the slots.
+        Args:
+            timeout (float): Maximum wait for the encoder in seconds.
+        """
+        if self._encoder is None:
+            return
+        self._pending_slots.put(None)
+        self._encoder.join(timeout)
+        if self._encoder.is_alive():
+            self._encoder.terminate()
+        self._encoder = None
+        self._frame_slots = None
+        self._frame_memory.close()
+        self._frame_memory.unlink()
+
+    def report_statistics(self):
+        """
+        Summarises recorder activity.
+        Returns:
+            dict: Submitted, encoded and dropped frame counts and the number of segments.
+        """
+        return {
+            "submitted": self.submitted_count,
+            "encoded": self._encoded_count.value,
+            "dropped": self.dropped_count,
+            "segments": self._segment_count.value,
+        }
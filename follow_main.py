@@ -1,186 +1,476 @@
-import queue
 import sys
 import time
-import argparse
+import asyncio
+import threading
+import optparse
 sys.path.insert(1, 'components')
 
-import cv2
 import collections
 
-import lidar_module as lidar_system
-import detector_ssd as object_tracker
-import uav_interface as uav
-import image_processing as vision_util
-import flight_controller as regulator
-import keyboard as input_checker
+from components import lidar_module as lidar_system
+from components import detector_ssd as object_tracker
+from components import pipeline_stages as stage_pipeline
+from components import video_recorder as flight_recorder
+from components import stage_timing as stage_timer
+from components import target_tracker as person_tracker
+from components import range_fusion as state_estimation
+from components import mission_runtime as mission
+from components import startup_orchestrator as startup
+from components import multi_camera
+from components import ground_stream
+from components import overlay_renderer as overlay
+from components import image_processing as vision_util
+from components import flight_controller as regulator
 
 # Command-line argument parser
 options_parser = optparse.OptionParser(description='Autonomous navigation for UAV')
 options_parser.add_option('--log_dir', type=str, default="logs/experiment1", help='Directory for log storage')
-options_parser.add_option('--operation', type=str, default='active', help='Operation type: active, log, or display')
+options_parser.add_option('--operation', type=str, default='active', help='Operation type: active, log, display, or replay')
 options_parser.add_option('--algorithm', type=str, default='PID', help='Control algorithm: PID or Simple')
-parsed_options, remaining_args = options_parser.parse_args()
+options_parser.add_option('--gains', type=str, default=None, help='Gain file written by the gain tuner (replay_main.py --tune) instead of the built-in gains')
+options_parser.add_option('--gain_choice', type=int, default=0, help='Entry of each channel\'s Pareto set used from --gains, 0 for the most balanced')
+options_parser.add_option('--pipeline', type=str, default='sequential', help='Pursuit loop layout: sequential or staged')
+options_parser.add_option('--instrument', action='store_true', default=False, help='Record per-stage latency histograms')
+options_parser.add_option('--tick_budget', type=float, default=40.0, help='Control tick budget in milliseconds for deadline-miss accounting')
+options_parser.add_option('--stats_file', type=str, default=None, help='File receiving periodic stage latency summaries')
+options_parser.add_option('--adaptive_inference', action='store_true', default=False, help='Detect only every few frames and propagate boxes with optical flow in between')
+options_parser.add_option('--max_detect_interval', type=int, default=8, help='Upper bound on frames between full detections with --adaptive_inference')
+options_parser.add_option('--roi', action='store_true', default=False, help='Detect in a padded window around the followed person instead of the full frame')
+options_parser.add_option('--roi_refresh', type=int, default=30, help='Frames between full-frame detections with --roi')
+options_parser.add_option('--latency_mode', type=str, default='predict', help='Capture-to-command delay compensation: predict, gains, both or off')
+options_parser.add_option('--nominal_delay', type=float, default=80.0, help='Capture-to-command delay in milliseconds the gains were tuned at')
+options_parser.add_option('--control_rate', type=float, default=0.0, help='Regulate on a separate thread at this rate in Hz, 0 to regulate once per detection')
+options_parser.add_option('--detector', type=str, default='jetson', help='Detection backend: jetson (detectNet on the GPU) or opencv (OpenCV DNN on the CPU)')
+options_parser.add_option('--dnn_model', type=str, default=None, help='Model file for --detector opencv, e.g. a frozen SSD-MobileNet-v2 .pb or .onnx')
+options_parser.add_option('--dnn_config', type=str, default='', help='Model configuration file for --detector opencv, e.g. the matching .pbtxt')
+options_parser.add_option('--video', type=str, default=None, help='Camera URI, or a video file or synthetic:// with --detector opencv')
+options_parser.add_option('--extra_cameras', type=str, default=None, help='Further cameras detected in the same batch as the forward one, e.g. downward=csi://1,rear=csi://2; one forward pass per batch with --detector opencv, one per camera with jetson')
+options_parser.add_option('--capture_mode', type=str, default='synchronized', help='Multi-camera capture: synchronized (one frame per camera per batch) or independent')
+options_parser.add_option('--direct_lidar', action='store_true', default=False, help='Read the LIDAR port inside each control tick instead of on the background reader (deterministic replays)')
+options_parser.add_option('--lidar_baud', type=int, default=lidar_system.LIDAR_BAUD_RATE, help='Baud rate of the forward LIDAR')
+options_parser.add_option('--extra_lidars', type=str, default=None, help='Further LIDARs read with the forward one by a single selector thread, e.g. altimeter=/dev/ttyUSB0@115200')
+options_parser.add_option('--stream', type=str, default=None, help='Stream frames to a ground station: udp (MJPEG datagrams) or http (multipart MJPEG)')
+options_parser.add_option('--stream_port', type=int, default=5600, help='Port the ground stream is served on')
+options_parser.add_option('--stream_bitrate', type=float, default=2000.0, help='Ground stream bitrate budget in kbit/s')
+options_parser.add_option('--stream_content', type=str, default='annotated', help='Frames streamed: annotated or raw')
+options_parser.add_option('--stream_overlay_scale', type=float, default=0.5, help='Resolution factor the streamed frames and their overlay are drawn at')
+options_parser.add_option('--overlay', type=str, default='direct', help='Overlay renderer: direct (OpenCV calls on every frame) or cached (pre-rendered layers and text; compare with replay_main.py --overlay first)')
+options_parser.add_option('--ground_station', type=str, default=None, help='host:port the UDP stream is sent to without waiting for a subscription')
+options_parser.add_option('--statsd', type=str, default=None, help='host:port receiving statsd-style stage latency gauges')
 
 # System constants
 THRESHOLD_RANGE = 1.5                          # meters
 HEIGHT_CEILING = 1.5                           # meters
 SPEED_CAP = 2                                  # meters per second
 ANGLE_LIMIT = 20                               # degrees
-BUFFER_SIZE_X = 5
-BUFFER_SIZE_Y = 5
-ROLLING_AVG_X = queue.deque(maxlen=BUFFER_SIZE_X)  # X-axis rolling average
-ROLLING_AVG_Y = queue.deque(maxlen=BUFFER_SIZE_Y)  # Y-axis rolling average
-SYSTEM_STATUS = "launch"                       # Initial phase: launch, descend, pursue, seek
-
-def system_initialization():
-    print("Starting LIDAR connection")
-    lidar_system.start_lidar_connection("/dev/ttyTHS1")
-
-    print("Configuring object detection module")
-    object_tracker.setup_recognition()
-
-    print("Linking with UAV")
-    if parsed_options.operation == "active":
-        print("Operation set to active")
-        regulator.link_to_uav('/dev/ttyACM0')
-    else:
-        print("Operation set to simulation")
-        regulator.link_to_uav('127.0.0.1:14550')
-
-system_initialization()
-
-display_width, display_height = object_tracker.retrieve_frame_dimensions()
-display_center = (display_width / 2, display_height / 2)
-log_video_recorder = cv2.VideoWriter(parsed_options.log_dir + ".avi", cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'), 25.0, (display_width, display_height))
-
-regulator.setup_control_mechanism(parsed_options.algorithm)
-regulator.start_log_files(parsed_options.log_dir)
+SEEK_TIMEOUT = 40                              # seconds of searching before the UAV lands
+STAGE_REPORT_INTERVAL = 5                      # seconds between pipeline throughput reports
+
+LIDAR_PORT = "/dev/ttyTHS1"
+UAV_ENDPOINTS = {"active": "/dev/ttyACM0"}     # any other operation connects to the simulator
+SIMULATOR_ENDPOINT = "127.0.0.1:14550"
+
+# Filled in by start_system, so importing this module touches no hardware
+parsed_options = None
+display_width = None
+display_height = None
+display_center = None
+log_video_recorder = None
+ground_streamer = None
+overlay_output = None
+target_lock = None
+range_estimate = None
+bearing_estimate = None
+
+def system_initialization(startup_workers=startup.STARTUP_WORKERS):
+    # LIDAR, inference engine, camera and UAV link come up side by side;
+    # steps that need the camera resolution wait for the camera only
+    uav_endpoint = UAV_ENDPOINTS.get(parsed_options.operation, SIMULATOR_ENDPOINT)
+    print(f"Operation set to {parsed_options.operation}, linking with UAV at {uav_endpoint}")
+    system_startup = startup.StartupOrchestrator(startup_workers)
+    system_startup.add_step("lidar", prepare_lidars)
+    system_startup.add_step("inference_engine", prepare_inference_engine)
+    system_startup.add_step("camera", prepare_cameras)
+    system_startup.add_step("uav_link", lambda: regulator.activate_uav_connection(uav_endpoint))
+    system_startup.add_step("regulation", prepare_regulation)
+    system_startup.add_step("ground_stream", prepare_ground_stream)
+    system_startup.add_step("video_recorder", prepare_video_recorder, depends_on=("camera",))
+    system_startup.add_step("tracking", prepare_tracking, depends_on=("inference_engine", "camera"))
+    system_startup.add_step("overlay", prepare_overlay, depends_on=("tracking", "video_recorder", "ground_stream"))
+    startup_results = system_startup.run()
+    if startup_results["inference_engine"]:
+        print("Inference engine reused from cache")
+    return system_startup.report_durations()
+
+def prepare_lidars():
+    # the forward LIDAR feeds range fusion; extra ones are read alongside it on the same thread
+    if parsed_options.extra_lidars is None:
+        link_status = lidar_system.activate_lidar_link(LIDAR_PORT, parsed_options.lidar_baud)
+        if not parsed_options.direct_lidar:
+            lidar_system.start_lidar_reader()
+        return link_status
+    sensor_specs = [lidar_system.LidarSensorSpec(lidar_system.PRIMARY_LIDAR, LIDAR_PORT, parsed_options.lidar_baud, lidar_system.LIDAR_RING_CAPACITY)]
+    sensor_specs += lidar_system.parse_lidar_specs(parsed_options.extra_lidars)
+    return lidar_system.open_lidar_sensors(sensor_specs)
+
+def prepare_inference_engine():
+    # the OpenCV backend loads a model file, detectNet a model name
+    network_name = object_tracker.DETECTION_NETWORK
+    if parsed_options.detector == "opencv":
+        network_name = parsed_options.dnn_model
+    return object_tracker.load_detection_network(network_name, parsed_options.detector, parsed_options.dnn_config)
+
+def prepare_cameras():
+    # the forward camera is the primary stream the follow loop pursues with
+    camera_uri = parsed_options.video or object_tracker.CAMERA_URI
+    if parsed_options.extra_cameras is None:
+        object_tracker.open_image_source(camera_uri, parsed_options.detector)
+        return
+    camera_uris = {multi_camera.PRIMARY_STREAM: camera_uri}
+    for camera_entry in parsed_options.extra_cameras.split(","):
+        stream_name, extra_uri = camera_entry.split("=", 1)
+        camera_uris[stream_name] = extra_uri
+    object_tracker.open_camera_streams(camera_uris, parsed_options.detector, parsed_options.capture_mode)
+
+def prepare_regulation():
+    gain_set = regulator.load_gain_set(parsed_options.gains, parsed_options.gain_choice) if parsed_options.gains else None
+    regulator.configure_regulation_system(parsed_options.algorithm, gain_set)
+    regulator.configure_latency_compensation(parsed_options.latency_mode, parsed_options.nominal_delay / 1000.0)
+    regulator.prepare_log_files(parsed_options.log_dir)
+
+def prepare_video_recorder():
+    global log_video_recorder
+    frame_width, frame_height = object_tracker.get_image_resolution()
+    log_video_recorder = flight_recorder.AsyncVideoRecorder(parsed_options.log_dir, (frame_width, frame_height), 25.0)
+    if "active" == parsed_options.operation:
+        log_video_recorder.start()
+
+def prepare_ground_stream():
+    global ground_streamer
+    if parsed_options.stream is None:
+        return
+    destinations = []
+    if parsed_options.ground_station is not None:
+        station_host, station_port = parsed_options.ground_station.rsplit(":", 1)
+        destinations.append((station_host, int(station_port)))
+    ground_streamer = ground_stream.GroundStreamer(parsed_options.stream, parsed_options.stream_port,
+                                                   parsed_options.stream_bitrate * 1000.0, destinations=destinations)
+    ground_streamer.start()
+
+def prepare_overlay():
+    # One sink per place annotated frames go; with no sink the overlay is never drawn
+    global overlay_output
+    overlay_output = overlay.OverlayRenderer((display_width, display_height))
+    if "active" == parsed_options.operation:
+        overlay_output.add_sink("recorder", lambda frame_data, captured_at: log_video_recorder.submit(frame_data))
+    if ground_streamer is not None:
+        annotated = parsed_options.stream_content == "annotated"
+        overlay_output.add_sink("stream", ground_streamer.submit, parsed_options.stream_overlay_scale if annotated else 1.0, annotated)
+    elif "active" != parsed_options.operation and "replay" != parsed_options.operation:
+        overlay_output.add_sink("display", show_in_window)
+
+def prepare_tracking():
+    global display_width, display_height, display_center, target_lock, range_estimate, bearing_estimate
+    display_width, display_height = object_tracker.get_image_resolution()
+    display_center = (display_width / 2, display_height / 2)
+    target_lock = person_tracker.MultiTargetTracker((display_width, display_height))
+    range_estimate = state_estimation.RangeEstimator(display_height)
+    bearing_estimate = state_estimation.BearingEstimator(display_width)
+    if parsed_options.roi:
+        object_tracker.enable_region_detection(parsed_options.roi_refresh)
+    if parsed_options.adaptive_inference:
+        object_tracker.enable_adaptive_inference(parsed_options.tick_budget / 1000.0, parsed_options.max_detect_interval)
+
+def check_option_combinations():
+    # the batched multi-camera path detects whole frames of every camera on its own capture threads
+    if parsed_options.extra_cameras is None:
+        return
+    for option_name in ("roi", "adaptive_inference"):
+        if getattr(parsed_options, option_name):
+            options_parser.error(f"--{option_name} cannot be combined with --extra_cameras")
+    if parsed_options.pipeline == "staged":
+        options_parser.error("--pipeline staged cannot be combined with --extra_cameras")
+
+def start_system(arguments=None, startup_workers=startup.STARTUP_WORKERS):
+    # Parses the command line and brings up every component; returns the startup time breakdown
+    global parsed_options
+    parsed_options, remaining_args = options_parser.parse_args(arguments)
+    check_option_combinations()
+    if parsed_options.instrument:
+        statsd_address = stage_timer.parse_statsd_address(parsed_options.statsd) if parsed_options.statsd else None
+        stage_timer.configure_instrumentation(True, parsed_options.tick_budget / 1000.0, parsed_options.stats_file, statsd_address)
+    startup_report = system_initialization(startup_workers)
+    for step_name, step_report in startup_report["steps"].items():
+        print(f"Startup {step_name}: {round(step_report['duration_ms'])} ms at +{round(step_report['start_ms'])} ms ({step_report['status']})")
+    print(f"Startup ready in {round(startup_report['total_ms'])} ms, {round(startup_report['sequential_ms'])} ms of work")
+    return startup_report
+
+# Mission-wide events that end the flight whatever phase is running
+ABORT_TRANSITIONS = {
+    mission.KEY_PRESSED: "descend",
+    mission.BATTERY_LOW: "descend",
+    mission.EKF_UNHEALTHY: "descend",
+    mission.PHASE_FAILED: "descend",
+}
+
+def begin_pursuit():
+    regulator.set_operation_phase("pursuit")
+    if parsed_options.control_rate > 0:
+        regulator.start_fixed_rate_control(parsed_options.control_rate)
 
 def execute_pursuit():
-    print(f"Phase: PURSUIT -> {SYSTEM_STATUS}")
-    while True:
-        if input_checker.check_key_pressed('q'):
-            print("User requested termination")
-            perform_descent()
-
-        tracked_objects, frame_speed, current_frame = object_tracker.fetch_recognized_objects()
-
-        if len(tracked_objects) > 0:
-            primary_target = tracked_objects[0]
-
-            target_position = primary_target.Center
-
-            horizontal_offset = vision_util.calculate_axis_difference(display_center[0], target_position[0])
-            vertical_offset = vision_util.calculate_axis_difference(display_center[1], target_position[1])
-
-            is_lidar_aimed = vision_util.is_within_bounds(display_center, primary_target.Left, primary_target.Right, primary_target.Top, primary_target.Bottom)
-
-            lidar_measure = lidar_system.fetch_lidar_range()[0]
-
-            ROLLING_AVG_Y.append(lidar_measure)
-            ROLLING_AVG_X.append(horizontal_offset)
-
-            forward_speed = 0
-            if lidar_measure > 0 and is_lidar_aimed and len(ROLLING_AVG_Y) > 0:
-                avg_distance_offset = compute_rolling_mean(ROLLING_AVG_Y)
-                avg_distance_offset = avg_distance_offset - THRESHOLD_RANGE
-                regulator.assign_distance_deviation(avg_distance_offset)
-                forward_speed = regulator.obtain_forward_speed_command()
-
-            orientation_adjust = 0
-            if len(ROLLING_AVG_X) > 0:
-                avg_horizontal_offset = compute_rolling_mean(ROLLING_AVG_X)
-                regulator.assign_horizontal_deviation(avg_horizontal_offset)
-                orientation_adjust = regulator.obtain_rotation_angle()
-
-            regulator.apply_uav_commands()
-
-            render_frame_data(lidar_measure, target_position, primary_target, current_frame, orientation_adjust, horizontal_offset, vertical_offset, frame_speed, forward_speed, is_lidar_aimed)
-        else:
-            return "seek"
+    begin_pursuit()
+    if parsed_options.pipeline == "staged":
+        return execute_pursuit_staged()
 
-def execute_searching():
-    print(f"Phase: SEARCH -> {SYSTEM_STATUS}")
-    initial_timestamp = datetime.datetime.now().timestamp()
-
-    regulator.halt_uav_motion()
-    while (datetime.datetime.now().timestamp() - initial_timestamp) < 40:
-        if input_checker.check_key_pressed('q'):
-            print("User requested termination")
-            perform_descent()
+    while pursue_target_frame() is not None:
+        pass
+    return "seek"
 
-        tracked_objects, frame_speed, current_frame = object_tracker.fetch_recognized_objects()
-        print(f"Seeking targets: {len(tracked_objects)}")
+def pursue_target_frame():
+    # One detection-to-command tick; returns the followed person, None once the target is lost
+    tick_started = stage_timer.stage_start()
+    tracked_objects, frame_speed, current_frame, captured_at = object_tracker.retrieve_detected_entities()
+    primary_target = target_lock.update(tracked_objects, captured_at)
+    object_tracker.focus_detection(primary_target)
+
+    if primary_target is not None:
+        render_arguments = regulate_towards_target(primary_target, frame_speed, current_frame, captured_at)
+        render_frame_data(*render_arguments)
+        stage_timer.tick_finish(tick_started)
+    return primary_target
+
+def regulate_towards_target(primary_target, frame_speed, current_frame, captured_at):
+    target_position = primary_target.Center
+
+    horizontal_offset = vision_util.measure_axis_deviation(display_center[0], target_position[0])
+    vertical_offset = vision_util.measure_axis_deviation(display_center[1], target_position[1])
+
+    is_lidar_aimed = vision_util.check_coordinate_in_region(display_center, primary_target.Left, primary_target.Right, primary_target.Top, primary_target.Bottom)
+    regulator.set_lidar_alignment(is_lidar_aimed)
+
+    stage_started = stage_timer.stage_start()
+    lidar_reading = lidar_system.obtain_timed_lidar_measurements()
+    stage_timer.stage_finish("lidar_read", stage_started)
+
+    # Fuse box height with LIDAR range and the pixel offset with the UAV yaw rate, each at the time it was measured
+    stage_started = stage_timer.stage_start()
+    yaw_rate = regulator.fetch_yaw_rate()
+    range_estimate.update_box(captured_at, primary_target.Top, primary_target.Bottom)
+    # A silent or stale LIDAR leaves the range to the box height; the overlay shows 0
+    lidar_measure = 0.0
+    if lidar_reading is not None:
+        lidar_time, lidar_measure, lidar_strength = lidar_reading
+        if is_lidar_aimed:
+            range_estimate.update_lidar(lidar_time, lidar_measure, lidar_strength)
+    bearing_estimate.update(captured_at, horizontal_offset, yaw_rate)
+
+    # Predict across the capture-to-command delay unless latency prediction is disabled
+    prediction_time = time.monotonic() if regulator.predicts_measurement_delay() else captured_at
+    fused_distance_offset = None
+    fused_range = range_estimate.estimate(prediction_time)
+    if fused_range is not None:
+        fused_distance_offset = fused_range - THRESHOLD_RANGE
+    fused_horizontal_offset = bearing_estimate.estimate(prediction_time, yaw_rate)
+    stage_timer.stage_finish("state_estimate", stage_started)
+
+    forward_speed = 0
+    if fused_distance_offset is not None:
+        regulator.set_distance_input(fused_distance_offset, range_estimate.track.timestamp, range_estimate.estimate_rate(), prediction_time)
+        forward_speed = regulator.fetch_velocity_command()
+
+    orientation_adjust = 0
+    if fused_horizontal_offset is not None:
+        regulator.set_horizontal_input(fused_horizontal_offset, captured_at, bearing_estimate.estimate_rate(yaw_rate), prediction_time)
+        orientation_adjust = regulator.fetch_rotation_value()
+
+    regulator.regulate_uav_motion()
+
+    return (lidar_measure, target_position, primary_target, current_frame, orientation_adjust, horizontal_offset, vertical_offset, frame_speed, forward_speed, is_lidar_aimed, captured_at)
+
+def start_pursuit_pipeline(decide_phase):
+    # Capture, detection, control and rendering run as separate workers.
+    # Each hand-off keeps only the newest item, so a slow stage skips stale frames.
+    def detect_stage(capture_output):
+        captured_image, captured_at = capture_output
+        current_frame = object_tracker.convert_frame_to_array(captured_image)
+        tracked_objects, frame_speed = object_tracker.detect_scheduled_entities(captured_image, current_frame)
+        return tracked_objects, frame_speed, current_frame, captured_at
+
+    def control_stage(detection_output):
+        tick_started = stage_timer.stage_start()
+        tracked_objects, frame_speed, current_frame, captured_at = detection_output
+        primary_target = target_lock.update(tracked_objects, captured_at)
+        object_tracker.focus_detection(primary_target)
+        if primary_target is None:
+            decide_phase("seek")
+            return None
+        render_arguments = regulate_towards_target(primary_target, frame_speed, current_frame, captured_at)
+        stage_timer.tick_finish(tick_started)
+        return render_arguments
+
+    def render_stage(render_arguments):
+        render_frame_data(*render_arguments)
+
+    pursuit_pipeline = stage_pipeline.StagedPipeline()
+    pursuit_pipeline.add_stage("capture", object_tracker.capture_image_frame)
+    pursuit_pipeline.add_stage("detect", detect_stage)
+    pursuit_pipeline.add_stage("control", control_stage)
+    pursuit_pipeline.add_stage("render", render_stage)
+    pursuit_pipeline.start()
+    return pursuit_pipeline
+
+def execute_pursuit_staged():
+    next_phase = []
+    phase_decided = threading.Event()
+
+    def decide_phase(phase_name):
+        if not phase_decided.is_set():
+            next_phase.append(phase_name)
+            phase_decided.set()
+
+    pursuit_pipeline = start_pursuit_pipeline(decide_phase)
+    last_report = time.monotonic()
+    while not phase_decided.wait(timeout=0.5):
+        if not pursuit_pipeline.is_running():
+            print(f"Pipeline stage failed: {pursuit_pipeline.report_failure()}")
+            decide_phase("descend")
+            break
+        if time.monotonic() - last_report >= STAGE_REPORT_INTERVAL:
+            report_stage_throughput(pursuit_pipeline)
+            last_report = time.monotonic()
+
+    pursuit_pipeline.stop()
+    report_stage_throughput(pursuit_pipeline)
+    return next_phase[0]
+
+def report_stage_throughput(pursuit_pipeline):
+    for stage_name, summary in pursuit_pipeline.report_stage_throughput().items():
+        print(f"Stage {stage_name}: {round(summary['items_per_second'], 1)}/s, {round(summary['mean_work_ms'], 1)} ms, busy {round(summary['utilisation'] * 100)}%, dropped {summary['dropped_inputs']}")
+    print(f"Pipeline bottleneck: {pursuit_pipeline.identify_bottleneck()}")
+
+def seek_targets_once(remaining_time):
+    tracked_objects, frame_speed, current_frame, captured_at = object_tracker.retrieve_detected_entities()
+    print(f"Seeking targets: {len(tracked_objects)}")
+    if "test" == parsed_options.operation or ground_streamer is not None:
+        overlay_output.publish(current_frame, captured_at, status_text=f"Seeking object. Remaining time: {remaining_time}")
+    return tracked_objects
+
+async def launch_phase(mission_control):
+    return await mission_control.run_blocking(perform_launch)
+
+async def seek_phase(mission_control):
+    # Ends on TARGET_ACQUIRED or on the phase timeout
+    regulator.set_operation_phase("seek")
+    await mission_control.run_blocking(regulator.cease_uav_motion)
+    while True:
+        tracked_objects = await mission_control.run_blocking(seek_targets_once, mission_control.remaining_time())
         if len(tracked_objects) > 0:
-            return "pursuit"
-        if "test" == parsed_options.operation:
-            cv2.putText(current_frame, f"Seeking object. Remaining time: {40 - (datetime.datetime.now().timestamp() - initial_timestamp)}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
-            show_frame(current_frame)
-
-    return "descend"
+            mission_control.post_event(mission.TARGET_ACQUIRED, len(tracked_objects))
+            return None
+
+async def pursuit_phase(mission_control):
+    # Ends on TARGET_LOST; each frame is one executor call, so other events are handled between frames
+    await mission_control.run_blocking(begin_pursuit)
+    if parsed_options.pipeline == "staged":
+        return await pursue_with_pipeline(mission_control)
+    while await mission_control.run_blocking(pursue_target_frame) is not None:
+        pass
+    mission_control.post_event(mission.TARGET_LOST)
+    return None
+
+async def pursue_with_pipeline(mission_control):
+    pursuit_pipeline = start_pursuit_pipeline(lambda phase_name: mission_control.post_event(mission.TARGET_LOST))
+    last_report = time.monotonic()
+    try:
+        while pursuit_pipeline.is_running():
+            await asyncio.sleep(0.5)
+            if time.monotonic() - last_report >= STAGE_REPORT_INTERVAL:
+                report_stage_throughput(pursuit_pipeline)
+                last_report = time.monotonic()
+        print(f"Pipeline stage failed: {pursuit_pipeline.report_failure()}")
+        return "descend"
+    finally:
+        pursuit_pipeline.stop()
+        report_stage_throughput(pursuit_pipeline)
+
+async def descend_phase(mission_control):
+    await mission_control.run_blocking(perform_descent)
+    return None
+
+async def run_mission():
+    import keyboard as input_checker
+    mission_control = mission.MissionRuntime([
+        mission.MissionPhase("launch", launch_phase),
+        mission.MissionPhase("seek", seek_phase, {mission.TARGET_ACQUIRED: "pursuit"}, SEEK_TIMEOUT, "descend"),
+        mission.MissionPhase("pursuit", pursuit_phase, {mission.TARGET_LOST: "seek"}),
+        mission.MissionPhase("descend", descend_phase, final=True),
+    ], ABORT_TRANSITIONS)
+    input_checker.on_press_key('q', lambda key_event: mission_control.post_event(mission.KEY_PRESSED, 'q'))
+    regulator.subscribe_telemetry(mission.VehicleHealthMonitor(mission_control).handle_snapshot)
+    mission_history = await mission_control.run("launch")
+    print(f"Mission: {[(record.phase_name, record.reason, round(record.duration, 1)) for record in mission_history]}")
 
 def perform_launch():
-    regulator.display_uav_status()
-    print(f"Phase: LAUNCH -> {SYSTEM_STATUS}")
-    regulator.activate_and_ascend(HEIGHT_CEILING)
+    regulator.show_uav_information()
+    print("Phase: LAUNCH")
+    regulator.trigger_ascension(HEIGHT_CEILING)
     return "seek"
 
 def perform_descent():
-    print(f"Phase: DESCEND -> {SYSTEM_STATUS}")
-    regulator.descend_uav()
-    object_tracker.shutdown_camera()
-    sys.exit(0)
-
-def show_frame(frame_data):
-    if "active" == parsed_options.operation:
-        log_video_recorder.write(frame_data)
-    else:
-        cv2.imshow("display", frame_data)
-        cv2.waitKey(1)
-    return
-
-def render_frame_data(lidar_measure, target_position, primary_target, current_frame, orientation_adjust, horizontal_offset, vertical_offset, frame_speed, forward_speed, is_lidar_aimed):
-    lidar_x_pos = display_width - 50
-    lidar_y_pos = display_height - 50
-    lidar_y_pos_extended = int(display_height - lidar_measure * 200)
-    cv2.line(current_frame, (lidar_x_pos, lidar_y_pos), (lidar_x_pos, lidar_y_pos_extended), (0, 255, 0), thickness=10, lineType=8, shift=0)
-    cv2.putText(current_frame, f"Range: {round(lidar_measure, 2)}", (display_width - 300, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
-
-    cv2.line(current_frame, (int(display_center[0]), int(display_center[1])), (int(target_position[0]), int(target_position[1])), (255, 0, 0), thickness=10, lineType=8, shift=0)
-
-    cv2.rectangle(current_frame, (int(primary_target.Left), int(primary_target.Bottom)), (int(primary_target.Right), int(primary_target.Top)), (0, 0, 255), thickness=10)
-
-    cv2.circle(current_frame, (int(display_center[0]), int(display_center[1])), 20, (0, 255, 0), thickness=-1, lineType=8, shift=0)
-
-    cv2.circle(current_frame, (int(target_position[0]), int(target_position[1])), 20, (0, 0, 255), thickness=-1, lineType=8, shift=0)
-
-    cv2.putText(current_frame, f"FPS: {round(frame_speed, 2)} Rotation: {round(orientation_adjust, 2)} Forward: {round(forward_speed, 2)}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
-    cv2.putText(current_frame, f"LIDAR aligned: {is_lidar_aimed}", (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
-    cv2.putText(current_frame, f"X offset: {round(horizontal_offset, 2)} Y offset: {round(vertical_offset, 2)}", (50, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3, cv2.LINE_AA)
-
-    show_frame(current_frame)
-
-def compute_rolling_mean(data_buffer):
-    cumulative_sum = 0
-    for entry in data_buffer:
-        cumulative_sum += entry
-
-    return cumulative_sum / len(data_buffer)
-
-while True:
-    # Core execution loop for managing system phases
-    """ Controls whether PID or Simple algorithm is applied based on input """
-
-    if SYSTEM_STATUS == "pursuit":
-        regulator.update_phase("pursuit")
-        SYSTEM_STATUS = execute_pursuit()
-
-    elif SYSTEM_STATUS == "seek":
-        regulator.update_phase("seek")
-        SYSTEM_STATUS = execute_searching()
-
-    elif SYSTEM_STATUS == "launch":
-        SYSTEM_STATUS = perform_launch()
-
-    elif SYSTEM_STATUS == "descend":
-        SYSTEM_STATUS = perform_descent()
\ No newline at end of file
+    print("Phase: DESCEND")
+    regulator.trigger_descent()
+    lidar_system.stop_lidar_reader()
+    object_tracker.terminate_image_source()
+    regulator.close_log_files()
+    if parsed_options.instrument:
+        stage_timer.stop_statistics_export()
+        stage_timer.export_stage_statistics()
+    log_video_recorder.close()
+    print(f"Recorder: {log_video_recorder.report_statistics()}")
+    if ground_streamer is not None:
+        print(f"Ground stream: {ground_streamer.report_statistics()}")
+        ground_streamer.close()
+    print(f"Control delay: {regulator.summarise_control_delay()}")
+    if parsed_options.control_rate > 0:
+        print(f"Control cadence: {regulator.report_fixed_rate_control()}")
+    if parsed_options.roi:
+        print(f"Region detection: {object_tracker.report_region_detection()}")
+    if parsed_options.adaptive_inference:
+        print(f"Inference schedule: {object_tracker.report_inference_schedule()}")
+    if parsed_options.extra_cameras is not None:
+        print(f"Cameras: {object_tracker.report_multi_camera()}")
+    if parsed_options.extra_lidars is not None:
+        print(f"LIDARs: {lidar_system.report_lidar_sensors()}")
+        lidar_system.close_lidar_sensors()
+
+def show_in_window(frame_data, captured_at=None):
+    import cv2
+    cv2.imshow("display", frame_data)
+    cv2.waitKey(1)
+
+def show_frame(frame_data, captured_at=None):
+    # Hands a frame annotated by the direct renderer to every sink unchanged
+    stage_started = stage_timer.stage_start()
+    for sink in overlay_output.sinks.values():
+        if sink.enabled:
+            sink.consumer(frame_data, captured_at)
+    stage_timer.stage_finish("video_write", stage_started)
+
+def render_frame_data(lidar_measure, target_position, primary_target, current_frame, orientation_adjust, horizontal_offset, vertical_offset, frame_speed, forward_speed, is_lidar_aimed, captured_at=None):
+    if not overlay_output.has_active_sinks():
+        return
+    stage_started = stage_timer.stage_start()
+    overlay_state = overlay.PursuitOverlay(lidar_measure, target_position, primary_target, orientation_adjust, horizontal_offset,
+                                           vertical_offset, frame_speed, forward_speed, is_lidar_aimed)
+    if "direct" == parsed_options.overlay:
+        overlay.draw_direct_overlay(current_frame, overlay_state, display_center)
+        stage_timer.stage_finish("render", stage_started)
+        show_frame(current_frame, captured_at)
+        return
+    overlay_output.publish(current_frame, captured_at, overlay_state)
+    stage_timer.stage_finish("render", stage_started)
+
+if __name__ == "__main__":
+    start_system()
+    asyncio.run(run_mission())
@@ -0,0 +1,262 @@
+import optparse
+import os
+import sys
+import numpy as array_utils
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'components'))
+
+from components import replay_harness as replay
+from components import stage_timing as stage_timer
+from components import gain_tuner as tuner
+from components import flight_index as log_index
+
+# Command-line argument parser
+options_parser = optparse.OptionParser(description='Offline replay and benchmark of the follow loop')
+options_parser.add_option('--scenario', type=str, default='all', help='Benchmark scenario name, path to a recorded .npz scenario, or all')
+options_parser.add_option('--ticks', type=int, default=2000, help='Ticks per synthetic scenario')
+options_parser.add_option('--repeat', type=int, default=3, help='Runs per scenario')
+options_parser.add_option('--save', type=str, default=None, help='Store the synthetic scenario as .npz instead of running it')
+options_parser.add_option('--schedule', action='store_true', default=False, help='Benchmark the adaptive inference scheduler with a fake detector instead of the follow loop')
+options_parser.add_option('--roi', action='store_true', default=False, help='Benchmark window detection around the target against full-frame detection')
+options_parser.add_option('--fusion', action='store_true', default=False, help='Benchmark lag and jitter of the Kalman range/offset estimators against a 5-sample boxcar')
+options_parser.add_option('--detect_cost', type=float, default=50.0, help='Fake detector latency in milliseconds for --schedule and --roi')
+options_parser.add_option('--pixel_cost', type=float, default=15.0, help='Extra fake detector latency in milliseconds per megapixel for --roi')
+options_parser.add_option('--roi_refresh', type=int, default=30, help='Frames between full-frame detections for --roi')
+options_parser.add_option('--startup', action='store_true', default=False, help='Benchmark sequential against concurrent system start-up with simulated hardware start-up costs')
+options_parser.add_option('--detector_bench', action='store_true', default=False, help='Benchmark OpenCV DNN detection throughput over batch sizes and thread counts')
+options_parser.add_option('--batch_sizes', type=str, default='1,2,4,8', help='Comma-separated batch sizes for --detector_bench')
+options_parser.add_option('--workers', type=str, default='1,2,4', help='Comma-separated preprocessing thread counts for --detector_bench')
+options_parser.add_option('--dnn_model', type=str, default=None, help='Model file for --detector_bench; without one a simulated network is timed')
+options_parser.add_option('--dnn_config', type=str, default='', help='Model configuration file for --detector_bench')
+options_parser.add_option('--video', type=str, default=None, help='Video file read for --detector_bench instead of synthetic frames; comma-separated files for --cameras')
+options_parser.add_option('--cameras', type=str, default=None, help='Comma-separated camera counts to benchmark batched multi-camera detection over, e.g. 1,2,3')
+options_parser.add_option('--capture_mode', type=str, default='synchronized', help='Capture mode for --cameras: synchronized or independent')
+options_parser.add_option('--ground_stream', type=str, default=None, help='Stream synthetic frames to loopback receivers over udp or http and report per-client latency')
+options_parser.add_option('--stream_bitrate', type=float, default=2000.0, help='Bitrate budget in kbit/s for --ground_stream')
+options_parser.add_option('--clients', type=int, default=2, help='Receivers connected for --ground_stream')
+options_parser.add_option('--overlay', action='store_true', default=False, help='Benchmark the cached overlay renderer against direct OpenCV drawing')
+options_parser.add_option('--simulate', type=int, default=0, help='Fly this many complete missions against the closed-loop simulator in virtual time')
+options_parser.add_option('--seed', type=int, default=0, help='Seed of the first simulated mission; mission i uses seed + i')
+options_parser.add_option('--gains', type=str, default=None, help='Gain file flown by --simulate, or written by --tune')
+options_parser.add_option('--tune', type=str, default=None, help='Sweep PID gains of a channel against the plant model: rotation, steering or all')
+options_parser.add_option('--tune_logs', type=str, default=None, help='Comma-separated flight logs whose pursuits replace the synthetic target motion for --tune')
+options_parser.add_option('--processes', type=int, default=tuner.TUNING_WORKERS, help='Worker processes for --tune')
+options_parser.add_option('--lidars', type=str, default=None, help='Comma-separated LIDAR counts to read from ptys with one selector thread and with one thread per port, e.g. 1,2,4')
+options_parser.add_option('--lidar_seconds', type=float, default=3.0, help='Seconds of TF-mini frames streamed to each pty for --lidars')
+options_parser.add_option('--index', type=str, default=None, help='Comma-separated flight base paths or log directories to ingest into the flight index')
+options_parser.add_option('--index_dir', type=str, default='log/index', help='Directory of the columnar flight index for --index and --query')
+options_parser.add_option('--query', type=str, default=None, help='Comma-separated index queries to time, or all: ' + ', '.join(log_index.TICK_QUERIES))
+options_parser.add_option('--frames', type=int, default=10, help='Matching video frames fetched per --query')
+options_parser.add_option('--stages', action='store_true', default=False, help='Also report per-stage latency percentiles')
+
+
+def print_stage_summary():
+    for stage_name, stage_summary in stage_timer.summarise_stage_statistics().items():
+        if stage_name != "deadline":
+            print(f"    {stage_name:<16} p50={stage_summary['p50_ms']:.3f} ms  p99={stage_summary['p99_ms']:.3f} ms  max={stage_summary['max_ms']:.3f} ms")
+    stage_timer.reset_stage_statistics()
+
+
+def print_summary(scenario_name, summary):
+    print(f"{scenario_name:<20} ticks={summary['ticks']:<6} {summary['ticks_per_second']:8.1f} ticks/s  "
+          f"p50={summary['p50_ms']:.3f} ms  p90={summary['p90_ms']:.3f} ms  p99={summary['p99_ms']:.3f} ms  max={summary['max_ms']:.3f} ms")
+
+
+def print_schedule_summary(summary):
+    print(f"{summary['scenario']:<20} detections={summary['detections']}/{summary['frames']} (forced {summary['forced_detections']})  "
+          f"detect={summary['mean_detect_ms']:.1f} ms  propagate={summary['mean_propagate_ms']:.2f} ms  "
+          f"rate {summary['detect_only_rate']:.1f} -> {summary['effective_rate']:.1f} frames/s (x{summary['control_rate_gain']:.2f})  "
+          f"IoU mean={summary['mean_iou']:.3f} min={summary['min_iou']:.3f}")
+
+
+def print_region_summary(summary):
+    line = (f"{summary['scenario']:<20} {summary['mode']:<6} detect mean={summary['mean_detect_ms']:.1f} ms  p99={summary['p99_detect_ms']:.1f} ms  "
+            f"IoU={summary['mean_iou']:.3f}  unlocked={summary['unlocked_ticks']}")
+    if summary['mode'] == 'window':
+        line += (f"  windows={summary['window_detections']} full={summary['full_detections']} fallbacks={summary['fallbacks']} "
+                 f"area={summary['mean_window_fraction'] * 100:.0f}%")
+    print(line)
+
+
+def print_fusion_summary(summary):
+    for signal_name, unit in (("range", "m"), ("offset", "px")):
+        for method_name, quality in summary[signal_name].items():
+            print(f"{summary['scenario']:<20} {signal_name:<7} {method_name:<7} rms={quality['rms_error']:.3f} {unit}  "
+                  f"lag={quality['lag_ms']:.0f} ms  jitter={quality['jitter']:.3f} {unit}")
+
+
+def print_startup_summary(label, result):
+    startup_report = result["startup"]
+    print(f"{label:<20} import={result['import_ms']:.1f} ms  ready={startup_report['total_ms']:.0f} ms  work={startup_report['sequential_ms']:.0f} ms")
+    for step_name, step_report in startup_report["steps"].items():
+        print(f"    {step_name:<16} +{step_report['start_ms']:6.0f} ms  {step_report['duration_ms']:6.0f} ms  {step_report['status']}")
+
+def print_detector_summary(summary):
+    print(f"batch={summary['batch_size']:<3} workers={summary['workers']:<3} {summary['frames_per_second']:6.1f} frames/s  "
+          f"batch p50={summary['batch_p50_ms']:.1f} ms  p99={summary['batch_p99_ms']:.1f} ms  "
+          f"forward={summary['forward_share'] * 100:.0f}%  people={summary['people_found']}")
+
+def print_camera_summary(stream_count, summary):
+    # the per-camera layout is what the Jetson backend does, detectNet taking one image per call
+    layout = "batched (opencv)" if summary["batched"] else "per-camera (jetson)"
+    print(f"cameras={stream_count} {summary['capture_mode']:<12} {layout:<19} total={summary['total_frames_per_second']:6.1f} frames/s  "
+          f"batch size={summary['mean_batch_size']:.2f}")
+    for stream_name, stream_report in summary["streams"].items():
+        print(f"    {stream_name:<10} {stream_report['frames_per_second']:6.1f} frames/s  latency p50={stream_report['latency_p50_ms']:.1f} ms  "
+              f"p99={stream_report['latency_p99_ms']:.1f} ms  dropped={stream_report['dropped_frames']}")
+
+def print_stream_summary(transport, summary):
+    print(f"{transport:<5} sent {summary['encoded']}/{summary['submitted']} frames  {summary['bitrate'] / 1000.0:.0f} kbit/s  "
+          f"quality={summary['quality']} scale={summary['scale']}  submit p99={summary['submit_p99_ms']:.2f} ms  max={summary['submit_max_ms']:.2f} ms")
+    for client_name, client_report in summary["clients"].items():
+        print(f"    sender {client_name:<16} {client_report['frames_sent']} frames  latency p50={client_report['latency_p50_ms']:.1f} ms  "
+              f"p99={client_report['latency_p99_ms']:.1f} ms")
+    for receiver_index, receiver_report in enumerate(summary["receivers"]):
+        print(f"    receiver {receiver_index:<14} {receiver_report['frames']} frames  latency p50={receiver_report['latency_p50_ms']:.1f} ms  "
+              f"p99={receiver_report['latency_p99_ms']:.1f} ms")
+
+def print_overlay_summary(summary):
+    for renderer_name, renderer_report in summary.items():
+        hit_rate = f"  text cache hits={renderer_report['text_hit_rate'] * 100:.0f}%" if "text_hit_rate" in renderer_report else ""
+        print(f"{renderer_name:<12} p50={renderer_report['p50_ms']:.3f} ms  p99={renderer_report['p99_ms']:.3f} ms{hit_rate}")
+
+def print_simulation_summary(summary):
+    print(f"missions={summary['missions']} {summary['missions_per_hour']:.0f} missions/h  x{summary['speedup']:.0f} real time  "
+          f"mean mission={summary['mean_virtual_time']:.1f} s  outcomes={summary['outcomes']}")
+    print(f"    pursuit bearing error mean={summary['bearing_mean_deg']:.1f} deg  p95={summary['bearing_p95_deg']:.1f} deg  "
+          f"range error mean={summary['range_mean_m']:.2f} m  acquisitions={summary['mean_acquisitions']:.2f}  collisions={summary['collisions']}")
+    for seed, outcome, error in summary["failures"]:
+        print(f"    seed {seed}: {outcome} {error or ''}")
+
+def print_tuning_summary(channel, result, shown=5):
+    print(f"{channel:<9} {result['combinations']} combinations over {len(result['profiles'])} profiles, Pareto set of {len(result['pareto'])}")
+    for entry in result["pareto"][:shown]:
+        print(f"    P={entry['proportional']:.3f} I={entry['integral']:.3f} D={entry['derivative']:.3f} limit={entry['output_limit']:.0f}  "
+              f"overshoot={entry['overshoot'] * 100:.0f}%  settling={entry['settling_time']:.2f} s  effort={entry['effort']:.2f}  rms={entry['rms_error']:.2f}")
+
+def print_lidar_summary(sensor_count, summary):
+    print(f"lidars={sensor_count} {summary['layout']:<9} threads={summary['threads']:<3} cpu={summary['cpu_percent']:5.1f}%  "
+          f"snapshot skew p50={summary['skew_p50_ms']:.2f} ms  p99={summary['skew_p99_ms']:.2f} ms")
+    for sensor_name, sensor_report in summary["sensors"].items():
+        print(f"    {sensor_name:<10} received={sensor_report['received']:<6} lost={sensor_report['lost']:<4} "
+              f"latency p50={sensor_report['latency_p50_ms']:.2f} ms  p99={sensor_report['latency_p99_ms']:.2f} ms")
+
+def print_index_summary(summary):
+    print(f"index: {summary['flights']} flights ({summary['reread_flights']} read)  {summary['ticks']} ticks  {summary['frames']} frames  "
+          f"in {summary['elapsed']:.2f} s")
+
+def print_query_summary(query_name, summary):
+    print(f"{query_name:<20} ticks={summary['ticks']:<8} flights={summary['flights']:<5} frames={summary['frames']:<7} "
+          f"query={summary['query_ms']:.1f} ms  frame fetch={summary['frame_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    parsed_options, remaining_args = options_parser.parse_args()
+    stage_timer.configure_instrumentation(parsed_options.stages)
+
+    if parsed_options.save is not None:
+        replay.save_scenario(replay.BENCHMARK_SCENARIOS[parsed_options.scenario](parsed_options.ticks), parsed_options.save)
+        print(f"Scenario stored in {parsed_options.save}")
+        sys.exit(0)
+
+    if parsed_options.startup:
+        print_startup_summary("sequential", replay.run_startup_benchmark(1))
+        print_startup_summary("concurrent", replay.run_startup_benchmark(4))
+        print_startup_summary("concurrent, cached", replay.run_startup_benchmark(4, warm=True))
+        replay.remove_replay_logs()
+        sys.exit(0)
+
+    if parsed_options.detector_bench:
+        benchmark_frames = replay.read_benchmark_frames(parsed_options.ticks, parsed_options.video)
+        for worker_count in [int(value) for value in parsed_options.workers.split(",")]:
+            for batch_size in [int(value) for value in parsed_options.batch_sizes.split(",")]:
+                print_detector_summary(replay.run_detector_throughput(benchmark_frames, batch_size, worker_count,
+                                                                      parsed_options.dnn_model, parsed_options.dnn_config))
+        sys.exit(0)
+
+    if parsed_options.cameras is not None:
+        video_paths = parsed_options.video.split(",") if parsed_options.video else None
+        for stream_count in [int(value) for value in parsed_options.cameras.split(",")]:
+            for batched in (False, True):
+                print_camera_summary(stream_count, replay.run_multi_camera_benchmark(stream_count, parsed_options.capture_mode, parsed_options.ticks,
+                                                                                     video_paths, batched, parsed_options.dnn_model, parsed_options.dnn_config))
+        sys.exit(0)
+
+    if parsed_options.simulate > 0:
+        print_simulation_summary(replay.run_simulation_soak(parsed_options.simulate, parsed_options.seed, gains_path=parsed_options.gains))
+        sys.exit(0)
+
+    if parsed_options.tune is not None:
+        plant = tuner.build_plant_model()
+        log_paths = parsed_options.tune_logs.split(",") if parsed_options.tune_logs else None
+        channels = list(tuner.TUNING_CHANNELS) if parsed_options.tune == "all" else [parsed_options.tune]
+        channel_results = {channel: tuner.tune_channel(channel, plant, log_paths=log_paths, worker_count=parsed_options.processes) for channel in channels}
+        for channel, result in channel_results.items():
+            print_tuning_summary(channel, result)
+        if parsed_options.gains is not None:
+            tuner.save_gain_set(parsed_options.gains, channel_results, plant)
+            print(f"Gain sets stored in {parsed_options.gains}")
+        sys.exit(0)
+
+    if parsed_options.lidars is not None:
+        for sensor_count in [int(value) for value in parsed_options.lidars.split(",")]:
+            for layout in replay.LIDAR_LAYOUTS:
+                print_lidar_summary(sensor_count, replay.run_lidar_benchmark(sensor_count, layout, parsed_options.lidar_seconds))
+        sys.exit(0)
+
+    if parsed_options.index is not None or parsed_options.query is not None:
+        if parsed_options.index is not None:
+            print_index_summary(log_index.update_flight_index(parsed_options.index.split(","), parsed_options.index_dir))
+        if parsed_options.query is not None:
+            flight_index = log_index.FlightIndex(parsed_options.index_dir)
+            query_names = list(log_index.TICK_QUERIES) if parsed_options.query == "all" else parsed_options.query.split(",")
+            for query_name, summary in log_index.run_index_queries(flight_index, query_names, parsed_options.frames).items():
+                print_query_summary(query_name, summary)
+            flight_index.close()
+        sys.exit(0)
+
+    if parsed_options.overlay:
+        print_overlay_summary(replay.run_overlay_benchmark(parsed_options.ticks))
+        sys.exit(0)
+
+    if parsed_options.ground_stream is not None:
+        transports = ["udp", "http"] if parsed_options.ground_stream == "all" else [parsed_options.ground_stream]
+        for transport in transports:
+            print_stream_summary(transport, replay.run_ground_stream_benchmark(transport, parsed_options.ticks, parsed_options.stream_bitrate * 1000.0,
+                                                                               parsed_options.clients))
+        sys.exit(0)
+
+    if parsed_options.schedule or parsed_options.roi or parsed_options.fusion:
+        if parsed_options.scenario.endswith(".npz"):
+            benchmark_scenarios = [replay.load_scenario(parsed_options.scenario)]
+        else:
+            scenario_names = list(replay.BENCHMARK_SCENARIOS) if parsed_options.scenario == 'all' else [parsed_options.scenario]
+            benchmark_scenarios = [replay.BENCHMARK_SCENARIOS[scenario_name](parsed_options.ticks) for scenario_name in scenario_names]
+        for benchmark_scenario in benchmark_scenarios:
+            if parsed_options.schedule:
+                print_schedule_summary(replay.run_inference_schedule_replay(benchmark_scenario, parsed_options.detect_cost / 1000.0))
+            if parsed_options.fusion:
+                print_fusion_summary(replay.run_range_fusion_replay(benchmark_scenario))
+            if parsed_options.roi:
+                for use_window in (False, True):
+                    print_region_summary(replay.run_region_detection_replay(benchmark_scenario, parsed_options.detect_cost / 1000.0,
+                                                                            parsed_options.pixel_cost / 1000.0, parsed_options.roi_refresh, use_window))
+        sys.exit(0)
+
+    if parsed_options.scenario.endswith(".npz"):
+        follow_module = replay.load_follow_module()
+        recorded_scenario = replay.load_scenario(parsed_options.scenario)
+        pooled_latencies = [replay.run_pursuit_replay(follow_module, recorded_scenario)["tick_latencies"] for repeat in range(parsed_options.repeat)]
+        print_summary(recorded_scenario.scenario_name, replay.summarise_tick_latencies(array_utils.concatenate(pooled_latencies)))
+        if parsed_options.stages:
+            print_stage_summary()
+        replay.remove_replay_logs()
+        sys.exit(0)
+
+    scenario_names = list(replay.BENCHMARK_SCENARIOS) if parsed_options.scenario == 'all' else [parsed_options.scenario]
+    for scenario_name in scenario_names:
+        summary = replay.run_benchmark_suite(parsed_options.ticks, parsed_options.repeat, [scenario_name])[scenario_name]
+        print_summary(scenario_name, summary)
+        if parsed_options.stages:
+            print_stage_summary()
+    replay.remove_replay_logs()